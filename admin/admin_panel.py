@@ -5,6 +5,7 @@ Only accessible with admin credentials.
 
 import streamlit as st
 from main.utils.supabase_auth import get_supabase_auth, get_current_user, is_authenticated
+from main.utils.progress_history import session_memory_report
 from datetime import datetime
 import json
 
@@ -58,6 +59,58 @@ def admin_dashboard():
     with col3:
         st.metric("Demo Users", stats['demo_users'])
     
+    daily_counts = auth.get_daily_emission_counts(days=30)
+    if daily_counts:
+        import pandas as pd
+        st.markdown("**Emission records saved per day (last 30 days)**")
+        st.bar_chart(pd.DataFrame(daily_counts).set_index('day')['records'])
+    
+    # Goal progress kept in memory by each live session (this server process only)
+    st.subheader("🧠 Session Memory")
+    sessions = session_memory_report()
+    if sessions:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Live Sessions", len(sessions))
+        with col2:
+            st.metric("Progress History Memory", f"{sum(s['bytes'] for s in sessions) / 1024:.1f} KB")
+        with col3:
+            st.metric("Entries Moved to Storage", sum(s['spilled'] for s in sessions))
+        st.dataframe([{
+            'session': session['session'][:8],
+            'user': session['user'],
+            'entries': session['entries'],
+            'moved to storage': session['spilled'],
+            'memory (KB)': round(session['bytes'] / 1024, 1)
+        } for session in sessions], use_container_width=True)
+    else:
+        st.info("No sessions have progress history yet.")
+    
+    # Records flagged by main/utils/anomaly.py, left out of every total until reviewed
+    st.subheader("🚩 Flagged Records")
+    flagged = auth.get_flagged_emissions(limit=100)
+    if flagged:
+        st.dataframe([{
+            'id': record['id'][:8],
+            'user': record['user_id'][:8],
+            'category': record['category'],
+            'kg CO₂': record['emissions'],
+            'saved': record['created_at'][:10]
+        } for record in flagged], use_container_width=True)
+        
+        labels = {record['id']: f"{record['id'][:8]} · {record['category']} · {record['emissions']} kg CO₂"
+                  for record in flagged}
+        selected = st.multiselect("Records to review", list(labels), format_func=labels.get)
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("✅ Keep (count again)", disabled=not selected):
+                st.success(f"Kept {auth.review_flagged_emissions(selected, keep=True)} records.")
+        with col2:
+            if st.button("🗑️ Delete", disabled=not selected):
+                st.success(f"Deleted {auth.review_flagged_emissions(selected, keep=False)} records.")
+    else:
+        st.info("No flagged records to review.")
+    
     st.divider()
     
     # Admin actions
@@ -67,8 +120,16 @@ def admin_dashboard():
     
     with col1:
         if st.button("🗑️ Clean Demo Users", type="secondary"):
-            # Remove demo users older than 24 hours
-            demo_users_removed = auth.cleanup_demo_users(1)
+            # Remove demo users older than 24 hours, in chunks
+            progress = st.progress(0.0, text="Removing old demo users...")
+            
+            def report_progress(deleted, total, rate):
+                progress.progress(
+                    min(deleted / total, 1.0) if total else 1.0,
+                    text=f"Removed {deleted}/{total} demo users ({rate:.0f} users/s)"
+                )
+            
+            demo_users_removed = auth.cleanup_demo_users(1, progress_callback=report_progress)
             
             if demo_users_removed > 0:
                 st.success(f"Removed {demo_users_removed} old demo users.")
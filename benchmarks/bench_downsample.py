@@ -0,0 +1,59 @@
+"""
+Payload size and build time of the progress history chart for long histories.
+
+Builds the goals-page line chart from synthetic daily histories with and
+without downsampling and reports the number of points, the plotly JSON size
+sent to the browser and the build time (needs plotly).
+
+Usage:
+    python -m benchmarks.bench_downsample --years 1 5 10 --max-points 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from main.utils import charts
+
+
+def daily_history(days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'date': pd.date_range('2015-01-01', periods=days, freq='D'),
+        'total': 150 + 20 * np.sin(np.arange(days) / 30) + rng.normal(0, 10, days),
+        'target': 167.0,
+    })
+
+
+def measure(frame: pd.DataFrame, **kwargs):
+    start = time.perf_counter()
+    fig = charts.progress_history_figure(frame, **kwargs)
+    elapsed = time.perf_counter() - start
+    points = len(fig.data[0].x)
+    return points, len(fig.to_json()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History chart payload with and without downsampling.")
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 5, 10])
+    parser.add_argument('--max-points', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'history':<10} {'mode':<14} {'points':>7} {'payload':>10} {'build':>8}")
+    for years in args.years:
+        frame = daily_history(years * 365)
+        modes = [
+            ("all points", {'max_points': len(frame)}),
+            ("lttb", {'max_points': args.max_points, 'method': 'lttb'}),
+            ("minmax", {'max_points': args.max_points, 'method': 'minmax'}),
+            ("weekly+lttb", {'timeframe': 'week', 'max_points': args.max_points}),
+        ]
+        for label, kwargs in modes:
+            points, payload, elapsed = measure(frame, **kwargs)
+            print(f"{years:>2} years   {label:<14} {points:>7,} {payload / 1024:>8.0f}KB {elapsed * 1000:>6.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Batch goal forecasting for the weekly digest: vectorized vs per-user fits.
+
+Fits synthetic monthly histories for many users with ForecastBatch in one
+call and one user at a time, then times folding in a new month for one
+user with ForecastBatch.update against refitting the whole batch.
+
+Usage:
+    python -m benchmarks.bench_forecasting --users 1000 10000 --months 36
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from main.utils.forecasting import MODELS, ForecastBatch, month_index, month_label
+
+START = month_index('2022-01')
+
+
+def histories(users: int, months: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(150, 600, (users, 1))
+    slope = rng.normal(-3, 4, (users, 1))
+    season = rng.uniform(0, 40, (users, 1)) * np.cos(2 * np.pi * np.arange(months) / 12)
+    values = base + slope * np.arange(months) + season + rng.normal(0, 20, (users, months))
+    # Users skip about one month in ten
+    values[rng.random((users, months)) < 0.1] = np.nan
+    return values
+
+
+def fit_and_forecast(user_ids, values, targets) -> float:
+    start = time.perf_counter()
+    batch = ForecastBatch(user_ids, START, values)
+    for model in MODELS:
+        batch.goal_dates(targets, model=model)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal forecasting cost, batched vs one user at a time.")
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--loop-users', type=int, default=200, help="Users timed in the per-user loop")
+    args = parser.parse_args()
+
+    print(f"{'users':>7} {'batch':>10} {'per user (est.)':>16} {'speedup':>8} {'update':>9} {'refit':>10}")
+    for users in args.users:
+        values = histories(users, args.months)
+        user_ids = list(range(users))
+        targets = np.full(users, 167.0)
+
+        batch_s = fit_and_forecast(user_ids, values, targets)
+
+        sample = min(args.loop_users, users)
+        start = time.perf_counter()
+        for row in range(sample):
+            fit_and_forecast([row], values[row:row + 1], targets[row:row + 1])
+        loop_s = (time.perf_counter() - start) / sample * users
+
+        batch = ForecastBatch(user_ids, START, values)
+        start = time.perf_counter()
+        batch.update(0, month_label(START + args.months), 200.0)
+        update_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ForecastBatch(user_ids, START, np.column_stack([values, np.full(users, np.nan)]))
+        refit_s = time.perf_counter() - start
+
+        print(f"{users:>7} {batch_s * 1000:>8.1f}ms {loop_s * 1000:>14.1f}ms {loop_s / batch_s:>7.1f}x "
+              f"{update_s * 1e6:>7.1f}us {refit_s * 1000:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Login throughput benchmark for the password hashing service.
+
+Simulates concurrent logins (password verification against stored scrypt
+hashes) at several cost settings and reports throughput and latency
+percentiles, to help pick PASSWORD_HASH_COST for the deployment hardware.
+
+Usage:
+    python -m benchmarks.bench_login --costs 12 13 14 15 --logins 200 --concurrency 16
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from main.utils.password_hashing import HashingService, hash_password
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_login_benchmark(cost: int, logins: int, concurrency: int, workers: int) -> Dict[str, float]:
+    """Verify `logins` passwords from `concurrency` request threads at one cost."""
+    service = HashingService(max_workers=workers, cost=cost)
+    stored = hash_password("correct horse battery staple", cost=cost)
+    # Warm up the worker processes
+    service.verify("correct horse battery staple", stored)
+
+    def login(_):
+        start = time.perf_counter()
+        service.verify("correct horse battery staple", stored)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+
+    return {
+        'cost': cost,
+        'logins_per_sec': logins / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput per scrypt cost.")
+    parser.add_argument('--costs', type=int, nargs='+', default=[12, 13, 14, 15])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2, help="Hashing pool size")
+    args = parser.parse_args()
+
+    print(f"{'cost':>4}  {'logins/s':>9}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for cost in args.costs:
+        result = run_login_benchmark(cost, args.logins, args.concurrency, args.workers)
+        print(f"{result['cost']:>4}  {result['logins_per_sec']:>9.1f}  "
+              f"{result['p50_ms']:>8.1f}  {result['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Rerun cost of the analytics and goals charts, with and without page_cache.
+
+A Streamlit rerun caused by a widget interaction usually leaves the emission
+values unchanged, so each rerun calls the chart builders with the same
+inputs. This times those calls against the plain builders in charts.py and
+the st.cache_data wrappers in page_cache.py (needs streamlit and plotly).
+
+Usage:
+    python -m benchmarks.bench_page_cache --reruns 50
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.bench_login import percentile
+from main.data.emission_factors import BENCHMARKS
+from main.utils import charts, page_cache
+
+HISTORY = charts.progress_history_frame([(f"2024-{month:02d}-01", 150.0 + month * 3, 167.0)
+                                          for month in range(1, 13)])
+
+# (label, plain builder, cached builder) for one page rerun
+PAGE_CHARTS = [
+    ("breakdown", lambda: charts.breakdown_figure(120.5, 80.25, 95.0),
+     lambda: page_cache.breakdown_figure(120.5, 80.25, 95.0)),
+    ("benchmarks", lambda: charts.benchmark_figure(295.75, BENCHMARKS),
+     lambda: page_cache.benchmark_figure(295.75)),
+    ("goal progress", lambda: charts.goal_progress_figure(295.75, 167.0),
+     lambda: page_cache.goal_progress_figure(295.75, 167.0)),
+    ("history", lambda: charts.progress_history_figure(HISTORY),
+     lambda: page_cache.progress_history_figure(HISTORY)),
+]
+
+
+def time_reruns(build: Callable[[], object], reruns: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - start)
+    return {
+        'mean_ms': statistics.mean(timings) * 1000,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chart rebuild cost per rerun, cached vs uncached.")
+    parser.add_argument('--reruns', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'chart':<15} {'uncached p50':>13} {'cached p50':>11} {'cached p99':>11} {'speedup':>8}")
+    totals = {'plain': 0.0, 'cached': 0.0}
+    for label, plain, cached in PAGE_CHARTS:
+        # The first cached call fills the cache, as the first page view would
+        cached()
+        plain_stats = time_reruns(plain, args.reruns)
+        cached_stats = time_reruns(cached, args.reruns)
+        totals['plain'] += plain_stats['mean_ms']
+        totals['cached'] += cached_stats['mean_ms']
+        print(f"{label:<15} {plain_stats['p50_ms']:>11.2f}ms {cached_stats['p50_ms']:>9.2f}ms "
+              f"{cached_stats['p99_ms']:>9.2f}ms {plain_stats['p50_ms'] / cached_stats['p50_ms']:>7.1f}x")
+
+    print(f"\nChart time per rerun: {totals['plain']:.1f}ms uncached, {totals['cached']:.1f}ms cached")
+
+
+if __name__ == '__main__':
+    main()
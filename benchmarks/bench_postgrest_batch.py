@@ -0,0 +1,86 @@
+"""
+Benchmark batched, pooled PostgREST writes against one-request-per-row.
+
+Runs against a local PostgREST stand-in with simulated per-request latency
+and reports rows/sec and request latency percentiles for both strategies.
+
+Usage:
+    python -m benchmarks.bench_postgrest_batch --rows 2000 --latency 0.005
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+import requests
+
+from benchmarks.bench_login import percentile
+from benchmarks.postgrest_standin import PostgrestStandIn
+from main.utils.postgrest_batch import PostgrestBatchWriter
+
+
+def make_rows(count: int):
+    categories = ['transport', 'energy', 'food']
+    return [{
+        'user_id': f"user-{i % 50}",
+        'category': categories[i % 3],
+        'emissions': float(i % 200),
+        'details': {'source': 'benchmark'},
+        'created_at': datetime.now().isoformat(),
+    } for i in range(count)]
+
+
+def bench_per_row(url: str, rows) -> dict:
+    """One un-pooled request per row, like SupabaseAuth.save_user_emissions."""
+    latencies = []
+    start = time.perf_counter()
+    for row in rows:
+        t0 = time.perf_counter()
+        requests.post(f"{url}/rest/v1/user_emissions", json=row,
+                      headers={'apikey': 'key', 'Authorization': 'Bearer key'})
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return {'rows_per_sec': len(rows) / elapsed, 'latencies': latencies}
+
+
+def bench_batched(url: str, rows, batch_rows: int, concurrency: int, flush_size: int) -> dict:
+    """Rows flushed in groups (as the write-behind queue does) via the batching writer."""
+    writer = PostgrestBatchWriter(url, 'key', max_rows_per_request=batch_rows,
+                                  max_concurrency=concurrency)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(rows), flush_size):
+        t0 = time.perf_counter()
+        writer.insert('user_emissions', rows[i:i + flush_size])
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return {'rows_per_sec': len(rows) / elapsed, 'latencies': latencies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched PostgREST writes.")
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.005, help="Simulated seconds per request")
+    parser.add_argument('--batch-rows', type=int, default=100, help="Rows per request")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--flush-size', type=int, default=500, help="Rows per flush call")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    with PostgrestStandIn(latency=args.latency) as standin:
+        results = {
+            'per-row': bench_per_row(standin.url, rows),
+            'batched': bench_batched(standin.url, rows, args.batch_rows, args.concurrency, args.flush_size),
+        }
+
+    print(f"{'strategy':>8}  {'rows/s':>9}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for name, result in results.items():
+        latencies = result['latencies']
+        print(f"{name:>8}  {result['rows_per_sec']:>9.0f}  "
+              f"{statistics.median(latencies) * 1000:>8.1f}  {percentile(latencies, 99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
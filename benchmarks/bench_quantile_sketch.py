@@ -0,0 +1,94 @@
+"""
+Accuracy and query cost of the population percentile sketch vs exact ranks.
+
+Generates synthetic monthly emission values for each category, builds one
+QuantileSketch per category from monthly partial sketches (as the database
+keeps them), and compares its percentiles with exact ones computed by
+sorting all values, which is what a per-page-view query would have to do.
+
+Usage:
+    python -m benchmarks.bench_quantile_sketch --values 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+from bisect import bisect_right
+from typing import Callable, Dict, List
+
+from main.utils.quantile_sketch import QuantileSketch
+
+# Rough shapes of per-calculation monthly emissions (kg CO₂)
+DISTRIBUTIONS: Dict[str, Callable[[random.Random], float]] = {
+    'transport': lambda rng: rng.lognormvariate(4.6, 0.9),
+    'energy': lambda rng: rng.gammavariate(2.0, 60.0),
+    'food': lambda rng: max(0.0, rng.gauss(180.0, 55.0)),
+}
+MONTHS = 3
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def measure(category: str, count: int, queries: int, seed: int) -> Dict[str, float]:
+    rng = random.Random(seed)
+    draw = DISTRIBUTIONS[category]
+    values = [draw(rng) for _ in range(count)]
+
+    start = time.perf_counter()
+    sketch = QuantileSketch()
+    per_month = count // MONTHS
+    for month in range(MONTHS):
+        partial = QuantileSketch()
+        partial.extend(values[month * per_month:(month + 1) * per_month if month < MONTHS - 1 else count])
+        sketch.merge(partial)
+    build_s = time.perf_counter() - start
+
+    probes = [draw(rng) for _ in range(queries)]
+
+    start = time.perf_counter()
+    ordered = sorted(values)
+    exact_ranks = [bisect_right(ordered, probe) / count for probe in probes]
+    exact_s = time.perf_counter() - start
+
+    sketch.rank(0.0)  # builds the cumulative counts once, as a cached sketch would have
+    start = time.perf_counter()
+    sketch_ranks = [sketch.rank(probe) for probe in probes]
+    sketch_s = time.perf_counter() - start
+
+    rank_errors = [abs(a - b) for a, b in zip(sketch_ranks, exact_ranks)]
+    relative_errors = [abs(sketch.quantile(q) / ordered[int(q * (count - 1))] - 1)
+                       for q in QUANTILES if ordered[int(q * (count - 1))] > 0]
+    return {
+        'buckets': len(sketch.counts),
+        'build_ms': build_s * 1000,
+        'max_rank_err': max(rank_errors) * 100,
+        'mean_rank_err': sum(rank_errors) / len(rank_errors) * 100,
+        'max_value_err': max(relative_errors) * 100,
+        'exact_ms': exact_s * 1000,
+        'sketch_us': sketch_s / queries * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantile sketch accuracy and query time vs exact percentiles.")
+    parser.add_argument('--values', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'category':<10} {'values':>9} {'buckets':>8} {'max rank err':>13} {'mean rank err':>14} "
+          f"{'max value err':>14} {'exact sort':>11} {'sketch rank':>12}")
+    rows: List[Dict[str, float]] = []
+    for count in args.values:
+        for category in DISTRIBUTIONS:
+            result = measure(category, count, args.queries, args.seed)
+            rows.append(result)
+            print(f"{category:<10} {count:>9} {result['buckets']:>8} {result['max_rank_err']:>11.3f}pp "
+                  f"{result['mean_rank_err']:>12.4f}pp {result['max_value_err']:>13.2f}% "
+                  f"{result['exact_ms']:>9.1f}ms {result['sketch_us']:>10.2f}us")
+
+    print(f"\nWorst percentile error: {max(row['max_rank_err'] for row in rows):.3f} points; "
+          f"worst quantile value error: {max(row['max_value_err'] for row in rows):.2f}%")
+
+
+if __name__ == '__main__':
+    main()
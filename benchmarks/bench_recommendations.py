@@ -0,0 +1,109 @@
+"""
+Action ranking: vectorized savings matrix vs recalculating each action per user.
+
+Ranks the action catalog for many synthetic users with one savings_matrix
+call, and for a sample of users by re-running the core calculators on each
+action's edited inputs, which is what a rule-per-action implementation
+would do. The two must agree; the per-user cost is scaled up to all users.
+
+Usage:
+    python -m benchmarks.bench_recommendations --users 1000 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from main.core.energy import energy_emissions
+from main.core.food import DAYS_PER_MONTH, detailed_food_emissions
+from main.core.recommendations import (
+    ACTIONS, CAR_FUELS, COLUMN, ENERGY_SOURCES, FEATURES, FOODS, footprint, savings_matrix, top_actions
+)
+from main.core.transport import transport_emissions
+
+
+def profiles(users: int, seed: int = 0) -> np.ndarray:
+    """Feature rows with one car fuel per user, detailed diets and sourcing shares."""
+    rng = np.random.default_rng(seed)
+    features = np.zeros((users, len(FEATURES)))
+    car = rng.integers(0, len(CAR_FUELS), users)
+    features[np.arange(users), [COLUMN[f'car_km_{CAR_FUELS[i]}'] for i in car]] = rng.uniform(0, 2000, users)
+    features[:, COLUMN['bus_km_diesel']] = rng.uniform(0, 300, users)
+    features[:, COLUMN['train_km_electric']] = rng.uniform(0, 400, users)
+    for length, rate in [('short', 1.0), ('medium', 0.3), ('long', 0.1)]:
+        features[:, COLUMN[f'{length}_flights']] = rng.exponential(rate, users).round(1)
+    for source in ENERGY_SOURCES:
+        features[:, COLUMN[source]] = rng.uniform(0, 800, users) * (rng.random(users) < 0.6)
+    for food in FOODS:
+        features[:, COLUMN[f'{food}_servings']] = rng.integers(0, 30, users)
+    features[:, COLUMN['local_produce_pct']] = rng.integers(0, 100, users)
+    features[:, COLUMN['organic_pct']] = rng.integers(0, 100, users)
+    return features
+
+
+def calculator_total(row: np.ndarray) -> float:
+    """Footprint of one feature row through the core calculators."""
+    car = next((fuel for fuel in CAR_FUELS if row[COLUMN[f'car_km_{fuel}']]), 'petrol')
+    transport = transport_emissions(
+        row[COLUMN[f'car_km_{car}']], car, row[COLUMN['bus_km_diesel']], 'diesel',
+        row[COLUMN['train_km_electric']], 'electric', row[COLUMN['short_flights']],
+        row[COLUMN['medium_flights']], row[COLUMN['long_flights']])['total']
+    energy = energy_emissions(**{source: row[COLUMN[source]] for source in ENERGY_SOURCES})
+    servings = {food: row[COLUMN[f'{food}_servings']] for food in FOODS}
+    # Milk is entered as glasses a day
+    servings['milk'] /= DAYS_PER_MONTH
+    food = detailed_food_emissions(servings, row[COLUMN['local_produce_pct']], row[COLUMN['organic_pct']])['total']
+    return transport + energy + food
+
+
+def per_user_savings(row: np.ndarray) -> np.ndarray:
+    before = calculator_total(row)
+    # An action applied to a car-less or mixed row can leave km under several
+    # fuels, which the calculators can't take; the loop splits those out
+    savings = []
+    for action in ACTIONS:
+        changed = action.apply(row[None, :])[0]
+        cars = [fuel for fuel in CAR_FUELS if changed[COLUMN[f'car_km_{fuel}']]]
+        extra = sum(footprint(_only_car(changed, fuel))[0, 0] for fuel in cars[1:])
+        savings.append(before - calculator_total(_only_car(changed, cars[0]) if cars else changed) - extra)
+    return np.array(savings)
+
+
+def _only_car(row: np.ndarray, keep: str) -> np.ndarray:
+    row = row.copy()
+    for fuel in CAR_FUELS:
+        if fuel != keep:
+            row[COLUMN[f'car_km_{fuel}']] = 0
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommendation ranking cost, vectorized vs per user.")
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--loop-users', type=int, default=200, help="Users timed in the per-user loop")
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'users':>7} {'batch':>10} {'per user (est.)':>16} {'speedup':>8} {'max diff':>10}")
+    for users in args.users:
+        features = profiles(users)
+
+        start = time.perf_counter()
+        savings = savings_matrix(features)
+        top_actions(savings, args.k)
+        batch_s = time.perf_counter() - start
+
+        sample = min(args.loop_users, users)
+        start = time.perf_counter()
+        looped = np.array([per_user_savings(features[row]) for row in range(sample)])
+        for row in looped:
+            np.argsort(-row)[:args.k]
+        loop_s = (time.perf_counter() - start) / sample * users
+
+        diff = np.abs(looped - savings[:sample]).max()
+        print(f"{users:>7} {batch_s * 1000:>8.1f}ms {loop_s * 1000:>14.1f}ms {loop_s / batch_s:>7.1f}x {diff:>10.2e}")
+
+
+if __name__ == '__main__':
+    main()
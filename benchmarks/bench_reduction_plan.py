@@ -0,0 +1,51 @@
+"""
+Reduction plan solver: one user on the goals page and a batch of users.
+
+Times plan() for single users (the interactive path, which should stay
+well under 100 ms) and plan_batch() over synthetic user bases, and reports
+how many of the targets are reachable.
+
+Usage:
+    python -m benchmarks.bench_reduction_plan --users 1000 100000
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.bench_recommendations import profiles
+from main.core.recommendations import footprint
+from main.core.reduction_plan import plan_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reduction plan solver latency and batch throughput.")
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--runs', type=int, default=50, help="Single-user solves timed")
+    parser.add_argument('--cut', type=float, default=0.2, help="Targets are the footprint cut by this share")
+    args = parser.parse_args()
+
+    features = profiles(args.runs, seed=1)
+    targets = footprint(features).sum(axis=1) * (1 - args.cut)
+    timings = []
+    for row in range(args.runs):
+        start = time.perf_counter()
+        plan_batch(features[row:row + 1], targets[row:row + 1])
+        timings.append(time.perf_counter() - start)
+    print(f"single user: median {statistics.median(timings) * 1000:.2f}ms, max {max(timings) * 1000:.2f}ms")
+
+    print(f"{'users':>7} {'batch':>10} {'per user':>10} {'reached':>8}")
+    for users in args.users:
+        features = profiles(users)
+        targets = footprint(features).sum(axis=1) * (1 - args.cut)
+        start = time.perf_counter()
+        plans = plan_batch(features, targets)
+        batch_s = time.perf_counter() - start
+        reached = np.mean([result['reached'] for result in plans])
+        print(f"{users:>7} {batch_s * 1000:>8.1f}ms {batch_s / users * 1e6:>8.1f}us {reached:>7.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Minimal local stand-in for Supabase's REST APIs, for benchmarks and tests.
+
+Supports:
+- POST /rest/v1/<table> with a JSON object or array (insert, or with
+  ``on_conflict`` an upsert, or with ``Prefer: resolution=ignore-duplicates``
+  an insert skipping existing keys)
+- GET /rest/v1/<table>?<column>=eq.<value>
+- POST /auth/v1/admin/users, which also creates the user_profiles row the
+  schema's signup trigger would, and GET /auth/v1/admin/users/<id>
+
+Rows are kept in memory. An optional delay simulates network/database
+latency per request.
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qsl, urlsplit
+
+
+class PostgrestStandIn:
+    """In-process HTTP server recording rows per table."""
+
+    def __init__(self, latency: float = 0.0, fail_status: int = 0):
+        self.latency = latency
+        self.fail_status = fail_status
+        self.rows: Dict[str, List[Dict[str, Any]]] = {}
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        self.tokens: List[str] = []
+        self._lock = threading.Lock()
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.startswith('/auth/v1/admin/users/'):
+                    user_id = url.path.rsplit('/', 1)[-1]
+                    with standin._lock:
+                        standin.requests += 1
+                        found = [user for user in standin.users.values() if user['id'] == user_id]
+                    if found:
+                        self._reply(200, json.dumps(found[0]).encode())
+                    else:
+                        self._reply(404, b'{"code":404,"error_code":"user_not_found","msg":"User not found"}')
+                    return
+                table = url.path.rsplit('/', 1)[-1]
+                filters = {k: v[3:] for k, v in parse_qsl(url.query) if v.startswith('eq.')}
+                with standin._lock:
+                    standin.requests += 1
+                    found = [row for row in standin.rows.get(table, [])
+                             if all(str(row.get(k)) == v for k, v in filters.items())]
+                self._reply(200, json.dumps(found).encode())
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if standin.latency:
+                    time.sleep(standin.latency)
+                if standin.fail_status:
+                    self._reply(standin.fail_status, b'{"message":"stand-in failure"}')
+                    return
+
+                url = urlsplit(self.path)
+                payload = json.loads(body)
+                with standin._lock:
+                    standin.requests += 1
+                    if url.path == '/auth/v1/admin/users':
+                        status, reply = standin._create_user(payload)
+                        self._reply(status, json.dumps(reply).encode())
+                        return
+
+                    params = dict(parse_qsl(url.query))
+                    rows = payload if isinstance(payload, list) else [payload]
+                    standin.tokens.append(self.headers.get('Authorization', '')[len('Bearer '):])
+                    standin._store(url.path.rsplit('/', 1)[-1], rows, params.get('on_conflict'),
+                                   'resolution=ignore-duplicates' in self.headers.get('Prefer', ''))
+                self._reply(201, b'')
+
+            def _reply(self, status, body):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _store(self, table: str, rows: List[Dict[str, Any]], on_conflict: str = None,
+               ignore_duplicates: bool = False):
+        existing = self.rows.setdefault(table, [])
+        if not on_conflict:
+            existing.extend(rows)
+            return
+
+        keys = on_conflict.split(',')
+        index = {tuple(row.get(k) for k in keys): i for i, row in enumerate(existing)}
+        for row in rows:
+            position = index.get(tuple(row.get(k) for k in keys))
+            if position is None:
+                index[tuple(row.get(k) for k in keys)] = len(existing)
+                existing.append(dict(row))
+            elif not ignore_duplicates:
+                existing[position].update(row)
+
+    def _create_user(self, payload: Dict[str, Any]):
+        email = payload['email']
+        if email in self.users:
+            return 422, {"code": 422, "error_code": "email_exists",
+                         "msg": "A user with this email address has already been registered"}
+
+        user = {"id": payload.get('id') or str(uuid.uuid4()), "email": email,
+                "user_metadata": payload.get('user_metadata', {})}
+        self.users[email] = user
+        # Mirrors the handle_new_user() trigger in supabase_schema.sql
+        self._store('user_profiles', [{
+            'user_id': user['id'],
+            'username': user['user_metadata'].get('username', email.split('@')[0]),
+            'email': email,
+        }], on_conflict='user_id')
+        return 200, user
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
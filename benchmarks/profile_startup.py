@@ -0,0 +1,51 @@
+"""
+Cold-start import profile for the Streamlit app.
+
+Imports the module-level dependencies of streamlit_app.py and of each page
+in a fresh interpreter (after streamlit itself, which `streamlit run` has
+already loaded) and prints the total and the slowest modules. With --log,
+reports a PYTHONPROFILEIMPORTTIME log from a real server start instead.
+
+Usage:
+    python -m benchmarks.profile_startup [--top 15] [--pages streamlit_app.py categories/energy.py]
+    PYTHONPROFILEIMPORTTIME=1 streamlit run streamlit_app.py 2> importtime.log
+    python -m benchmarks.profile_startup --log importtime.log
+"""
+
+import argparse
+from pathlib import Path
+
+from main.utils.import_profile import ROOT, format_report, parse_importtime, profile_imports, script_imports
+
+PAGES = [
+    "streamlit_app.py",
+    "overview/home.py",
+    "categories/transport.py",
+    "categories/energy.py",
+    "categories/enhanced_food.py",
+    "categories/goals_tracking.py",
+    "results/enhanced_analytics.py",
+    "profile/user_profile.py",
+    "admin/admin_panel.py",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time per module at app startup.")
+    parser.add_argument('--pages', nargs='+', default=PAGES, help="Scripts to profile, relative to the repo root")
+    parser.add_argument('--top', type=int, default=15, help="Slowest modules to list per script")
+    parser.add_argument('--log', type=Path, help="Report an existing -X importtime log instead")
+    args = parser.parse_args()
+
+    if args.log:
+        print(format_report(str(args.log), parse_importtime(args.log.read_text()), args.top))
+        return
+
+    for page in args.pages:
+        timings = profile_imports(script_imports(ROOT / page), preload=['streamlit'])
+        print(format_report(page, timings, args.top))
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+"""
+Benchmark suite: core calculators, factor loading, the /calculate route and SQLite storage.
+
+Every case sets up its inputs once, then times one call repeatedly: the
+number of calls per sample grows until a sample takes at least --min-time,
+and the median and best time per call over --repeat samples are recorded.
+Results are written as JSON together with the Python version and machine,
+so a later run can be compared against a saved baseline. `compare` prints
+the change per case and exits with status 1 when any case got slower than
+the threshold allows, so it can gate a CI job. Compare runs from the same
+machine only; the numbers mean nothing across hardware, and shared runners
+swing enough between runs to need a threshold well above the default.
+
+Cases whose dependencies aren't installed (fastapi and httpx for the API,
+streamlit for DatabaseAuth) are recorded as skipped rather than failing
+the run.
+
+Usage:
+    python -m benchmarks.suite run --output baseline.json
+    python -m benchmarks.suite run --only calculators storage --output current.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.3
+"""
+
+import argparse
+import importlib.util
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+# Setup receives a scratch directory and returns the operation to time
+Setup = Callable[[Path], Callable[[], Any]]
+
+
+class Case(NamedTuple):
+    name: str
+    setup: Setup
+    requires: Sequence[str]
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, requires: Sequence[str] = ()):
+    """Register a benchmark case; names are 'group.case' so --only can pick groups."""
+    def register(setup: Setup) -> Setup:
+        CASES.append(Case(name, setup, tuple(requires)))
+        return setup
+    return register
+
+
+# Inputs of a typical calculator submission
+TRANSPORT = dict(km_car=800, car_fuel_type='petrol', km_bus=120, bus_fuel_type='diesel', km_train=200,
+                 train_type='electric', short_flights=1, medium_flights=0, long_flights=0)
+ENERGY = dict(kwh_electricity=300, kwh_oil=0, kwh_gas=900, kwh_wood=50)
+SERVINGS = {'beef': 8, 'chicken': 12, 'pork': 4, 'cheese': 20, 'milk': 1, 'eggs': 16, 'legumes': 6}
+BATCH_USERS = 10000
+
+
+@case('calculators.transport')
+def transport_case(workdir: Path):
+    from main.core.transport import transport_emissions
+    return lambda: transport_emissions(**TRANSPORT)
+
+
+@case('calculators.energy')
+def energy_case(workdir: Path):
+    from main.core.energy import energy_emissions
+    return lambda: energy_emissions(**ENERGY)
+
+
+@case('calculators.food')
+def food_case(workdir: Path):
+    from main.core.food import detailed_food_emissions
+    return lambda: detailed_food_emissions(SERVINGS, local_produce_pct=40, organic_pct=20)
+
+
+@case('calculators.footprint_batch')
+def footprint_batch_case(workdir: Path):
+    from benchmarks.bench_recommendations import profiles
+    from main.core.recommendations import footprint
+
+    features = profiles(BATCH_USERS)
+    return lambda: footprint(features)
+
+
+@case('calculators.savings_batch')
+def savings_batch_case(workdir: Path):
+    from benchmarks.bench_recommendations import profiles
+    from main.core.recommendations import savings_matrix
+
+    features = profiles(BATCH_USERS)
+    return lambda: savings_matrix(features)
+
+
+@case('calculators.recommend')
+def recommend_case(workdir: Path):
+    from main.core.recommendations import recommend
+
+    return lambda: recommend(transport=TRANSPORT, energy=ENERGY, food={'servings': SERVINGS}, k=5)
+
+
+@case('factors.load')
+def factors_case(workdir: Path):
+    import yaml
+    from main.data.emission_factors import DATA_PATH
+
+    # What importing main.data.emission_factors costs, without reloading the
+    # module under the calculators that hold references to its tables
+    def load():
+        with open(DATA_PATH, 'r') as file:
+            return yaml.safe_load(file)
+    return load
+
+
+@case('api.calculate', requires=('fastapi', 'httpx'))
+def api_case(workdir: Path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from main.api.api import router
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    payload = {**TRANSPORT, **ENERGY, 'diet_type': 'average'}
+
+    def post():
+        response = client.post('/calculate', json=payload)
+        response.raise_for_status()
+        return response
+    return post
+
+
+def _history_rows(days: int) -> Iterable[tuple]:
+    today = date.today()
+    for day in range(days):
+        transport, energy, food = 150.0 + day % 40, 90.0 + day % 15, 110.0 + day % 25
+        yield (today - timedelta(days=day)).isoformat(), transport, energy, food, transport + energy + food
+
+
+def _emission_database(workdir: Path, history_days: int = 0):
+    from main.utils.database import EmissionDatabase
+
+    db = EmissionDatabase(str(workdir / 'emissions.db'))
+    with sqlite3.connect(db.db_path) as conn:
+        conn.executemany("""
+            INSERT INTO emissions (date, transport_emissions, energy_emissions, food_emissions, total_emissions)
+            VALUES (?, ?, ?, ?, ?)
+        """, _history_rows(history_days))
+    return db
+
+
+@case('storage.emission_db_save')
+def emission_db_save_case(workdir: Path):
+    db = _emission_database(workdir)
+    return lambda: db.save_calculation(150.0, 90.0, 110.0, {'transport': TRANSPORT, 'energy': ENERGY})
+
+
+@case('storage.emission_db_history')
+def emission_db_history_case(workdir: Path):
+    db = _emission_database(workdir, history_days=365)
+    return lambda: db.get_historical_data(limit=50)
+
+
+@case('storage.emission_db_monthly')
+def emission_db_monthly_case(workdir: Path):
+    db = _emission_database(workdir, history_days=365)
+    today = date.today()
+    return lambda: db.get_monthly_summary(today.year, today.month)
+
+
+def _database_auth(workdir: Path, history_days: int = 0):
+    from main.utils.database_auth import DatabaseAuth
+
+    auth = DatabaseAuth(str(workdir / 'users.db'))
+    with sqlite3.connect(auth.db_path) as conn:
+        # Inserted directly: register_user would time the password hash too
+        user_id = conn.execute("INSERT INTO users (username, password_hash) VALUES ('bench', '')").lastrowid
+        conn.executemany("""
+            INSERT INTO user_emissions
+                (user_id, date, transport_emissions, energy_emissions, food_emissions, total_emissions)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, ((user_id, *row) for row in _history_rows(history_days)))
+    return auth
+
+
+@case('storage.auth_save', requires=('streamlit',))
+def auth_save_case(workdir: Path):
+    auth = _database_auth(workdir)
+    return lambda: auth.save_user_emissions('bench', 150.0, 90.0, 110.0)
+
+
+@case('storage.auth_history', requires=('streamlit',))
+def auth_history_case(workdir: Path):
+    auth = _database_auth(workdir, history_days=365)
+    return lambda: auth.get_user_emissions('bench', days=30)
+
+
+@case('storage.auth_totals', requires=('streamlit',))
+def auth_totals_case(workdir: Path):
+    auth = _database_auth(workdir, history_days=365)
+    return lambda: auth.get_emission_totals('bench')
+
+
+@case('storage.auth_monthly', requires=('streamlit',))
+def auth_monthly_case(workdir: Path):
+    auth = _database_auth(workdir, history_days=365)
+    return lambda: auth.get_monthly_emissions('bench', months=12)
+
+
+def measure(operation: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Median and best seconds per call over `repeat` samples of at least `min_time` each."""
+    operation()  # Warm up caches and lazy imports
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        samples.append((time.perf_counter() - start) / loops)
+    return {
+        'median_s': statistics.median(samples),
+        'min_s': min(samples),
+        'loops': loops,
+        'repeat': repeat,
+    }
+
+
+def missing_modules(requires: Sequence[str]) -> List[str]:
+    return [name for name in requires if importlib.util.find_spec(name) is None]
+
+
+def run_suite(only: Optional[Sequence[str]] = None, repeat: int = 5, min_time: float = 0.2,
+              report: Callable[[str], None] = print) -> Dict[str, Any]:
+    """
+    Run the registered cases (those whose name starts with one of `only`, if given).
+
+    :return: JSON-ready dict with 'meta' (when and where it ran) and 'cases'
+        (per case the measure() result, or 'skipped' with the reason).
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for bench in CASES:
+        if only and not any(bench.name == prefix or bench.name.startswith(prefix + '.') for prefix in only):
+            continue
+        missing = missing_modules(bench.requires)
+        if missing:
+            results[bench.name] = {'skipped': f"{', '.join(missing)} not installed"}
+            report(f"{bench.name:<28} skipped ({results[bench.name]['skipped']})")
+            continue
+        with tempfile.TemporaryDirectory() as workdir:
+            results[bench.name] = measure(bench.setup(Path(workdir)), repeat, min_time)
+        report(f"{bench.name:<28} {format_seconds(results[bench.name]['median_s']):>10}")
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'repeat': repeat,
+            'min_time': min_time,
+        },
+        'cases': results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.2,
+            stat: str = 'median_s') -> List[Dict[str, Any]]:
+    """
+    Per case present in both runs, the ratio of current to baseline time.
+
+    A case is a regression when its ratio exceeds 1 + threshold. Cases missing
+    from either run or skipped in either are listed with a status instead.
+    """
+    rows = []
+    for name in sorted(set(baseline['cases']) | set(current['cases'])):
+        before, after = baseline['cases'].get(name), current['cases'].get(name)
+        if before is None or after is None:
+            rows.append({'name': name, 'status': 'new' if before is None else 'missing'})
+        elif 'skipped' in before or 'skipped' in after:
+            rows.append({'name': name, 'status': 'skipped'})
+        else:
+            ratio = after[stat] / before[stat]
+            status = 'regression' if ratio > 1 + threshold else 'faster' if ratio < 1 - threshold else 'ok'
+            rows.append({'name': name, 'status': status, 'baseline': before[stat], 'current': after[stat],
+                         'ratio': ratio})
+    return rows
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the benchmark suite or compare two runs.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Run the suite and write the results as JSON")
+    run.add_argument('--output', '-o', help="JSON file to write (prints to stdout if omitted)")
+    run.add_argument('--only', nargs='+', help="Groups or cases to run, e.g. calculators storage.auth_save")
+    run.add_argument('--repeat', type=int, default=5, help="Samples per case")
+    run.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds per sample")
+
+    check = commands.add_parser('compare', help="Compare a run against a baseline")
+    check.add_argument('baseline')
+    check.add_argument('current')
+    check.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown, 0.2 = 20%%")
+    check.add_argument('--stat', choices=['median_s', 'min_s'], default='median_s')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_suite(args.only, args.repeat, args.min_time, report=lambda line: print(line, file=sys.stderr))
+        text = json.dumps(results, indent=2)
+        if args.output:
+            Path(args.output).write_text(text + '\n')
+        else:
+            print(text)
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    rows = compare(baseline, current, args.threshold, args.stat)
+    print(f"{'case':<28} {'baseline':>10} {'current':>10} {'change':>8}  status")
+    for row in rows:
+        if 'ratio' in row:
+            print(f"{row['name']:<28} {format_seconds(row['baseline']):>10} {format_seconds(row['current']):>10} "
+                  f"{row['ratio'] - 1:>+7.0%}  {row['status']}")
+        else:
+            print(f"{row['name']:<28} {'':>10} {'':>10} {'':>8}  {row['status']}")
+    regressions = [row['name'] for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
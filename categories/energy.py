@@ -1,7 +1,9 @@
 import streamlit as st
-from main.core.energy import energy_emissions
+from main.core.energy import energy_breakdown
 from main.utils.validators import validate_and_show_warning, validate_energy_input
 from main.utils.supabase_auth import get_supabase_auth, get_current_user, is_authenticated
+from main.utils.fragments import fragment
+
 st.set_page_config(
     page_title="Energy Emissions",
     page_icon="⚡",
@@ -22,23 +24,8 @@ st.markdown("""
 
 st.divider()
 
-energy_sources = st.multiselect(
-    "Select your household energy sources:",
-    options=["Electricity", "Oil", "Gas", "Wood"]
-)
-
-energy_inputs = {}
-
-if energy_sources:
-    st.subheader("Enter monthly energy consumption (kWh)")
-    cols = st.columns(len(energy_sources))
-
-    for i, source in enumerate(energy_sources):
-        label = f"{source} (kWh per month):"
-        key = f"kwh_{source.lower()}"
-        energy_inputs[key] = cols[i].number_input(label, min_value=0, value=0, help=f"Monthly {source.lower()} consumption")
-
-if st.button("Calculate Energy Emissions"):
+def show_energy_results(energy_inputs):
+    """Validate, show and save the total; runs only when the user submits."""
     # Validate inputs before calculation
     validation_errors = []
     
@@ -50,47 +37,73 @@ if st.button("Calculate Energy Emissions"):
     
     if validation_errors:
         st.error(f"Please check your input for: {', '.join(validation_errors)}")
-    else:
-        try:
-            total_energy_emissions = energy_emissions(
-                kwh_electricity=energy_inputs.get("kwh_electricity", 0),
-                kwh_oil=energy_inputs.get("kwh_oil", 0),
-                kwh_gas=energy_inputs.get("kwh_gas", 0),
-                kwh_wood=energy_inputs.get("kwh_wood", 0)   
-            )
+        return
+    
+    try:
+        total_energy_emissions = sum(energy_breakdown(**energy_inputs).values())
 
-            st.subheader("Total Monthly Energy Emissions")
-            st.write(f"Your total monthly energy emissions are: **{total_energy_emissions:.2f} kg CO2**")
-            
-            # Store in session state for use in other pages
-            st.session_state["energy_emissions"] = total_energy_emissions
-            
-            # Save to database if user is authenticated
-            if is_authenticated():
-                auth = get_supabase_auth()
-                emission_details = {
-                    'kwh_electricity': energy_inputs.get("kwh_electricity", 0),
-                    'kwh_oil': energy_inputs.get("kwh_oil", 0),
-                    'kwh_gas': energy_inputs.get("kwh_gas", 0),
-                    'kwh_wood': energy_inputs.get("kwh_wood", 0),
-                    'calculation_date': str(st.session_state.get('calculation_date', ''))
-                }
-                
-                if auth.save_user_emissions('energy', total_energy_emissions, emission_details):
-                    st.success("✅ Energy emissions saved to your profile!")
-                else:
-                    st.warning("Could not save energy emissions to database.")
+        st.subheader("Total Monthly Energy Emissions")
+        st.write(f"Your total monthly energy emissions are: **{total_energy_emissions:.2f} kg CO2**")
+        
+        # Store in session state for use in other pages
+        st.session_state["energy_emissions"] = total_energy_emissions
+        st.session_state["energy_inputs"] = dict(energy_inputs)
+        
+        # Save to database if user is authenticated
+        if is_authenticated():
+            auth = get_supabase_auth()
+            emission_details = {
+                'kwh_electricity': energy_inputs.get("kwh_electricity", 0),
+                'kwh_oil': energy_inputs.get("kwh_oil", 0),
+                'kwh_gas': energy_inputs.get("kwh_gas", 0),
+                'kwh_wood': energy_inputs.get("kwh_wood", 0),
+                'calculation_date': str(st.session_state.get('calculation_date', ''))
+            }
             
-            st.markdown("""
-                ### Tips to Reduce Energy Emissions:
-                - Use energy-efficient appliances.
-                - Switch to renewable energy sources.
-                - Insulate your home to reduce heating needs.
-                - Consider using a programmable thermostat.
-            """)
-            
-        except Exception as e:
-            st.error(f"Error calculating energy emissions: {str(e)}")
-            st.info("Please check your inputs and try again.")
-else:
-    st.warning("Please select your energy sources and enter your consumption to calculate emissions.")
\ No newline at end of file
+            if auth.queue_user_emissions('energy', total_energy_emissions, emission_details):
+                st.success("✅ Energy emissions will be saved to your profile in the background.")
+            else:
+                st.warning("Could not save energy emissions to database.")
+        
+        st.markdown("""
+            ### Tips to Reduce Energy Emissions:
+            - Use energy-efficient appliances.
+            - Switch to renewable energy sources.
+            - Insulate your home to reduce heating needs.
+            - Consider using a programmable thermostat.
+        """)
+        
+    except Exception as e:
+        st.error(f"Error calculating energy emissions: {str(e)}")
+        st.info("Please check your inputs and try again.")
+
+# Changing a source or a reading reruns only this fragment, not the whole page
+@fragment
+def energy_calculator():
+    energy_sources = st.multiselect(
+        "Select your household energy sources:",
+        options=["Electricity", "Oil", "Gas", "Wood"]
+    )
+
+    energy_inputs = {}
+
+    if energy_sources:
+        st.subheader("Enter monthly energy consumption (kWh)")
+        cols = st.columns(len(energy_sources))
+
+        for i, source in enumerate(energy_sources):
+            label = f"{source} (kWh per month):"
+            key = f"kwh_{source.lower()}"
+            energy_inputs[key] = cols[i].number_input(label, min_value=0, value=0, help=f"Monthly {source.lower()} consumption")
+
+        # Live preview per source
+        breakdown = energy_breakdown(**energy_inputs)
+        for i, key in enumerate(energy_inputs):
+            cols[i].caption(f"≈ {breakdown[key]:.2f} kg CO2 per month")
+
+    if st.button("Calculate Energy Emissions"):
+        show_energy_results(energy_inputs)
+    else:
+        st.warning("Please select your energy sources and enter your consumption to calculate emissions.")
+
+energy_calculator()
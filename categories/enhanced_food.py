@@ -1,7 +1,8 @@
 import streamlit as st
-from main.core.food import food_emissions
+from main.core.food import food_emissions, detailed_food_emissions, monthly_servings
 from main.utils.validators import validate_and_show_warning, validate_food_serving
 from main.utils.supabase_auth import get_supabase_auth, get_current_user, is_authenticated
+from main.utils.fragments import fragment
 
 st.set_page_config(
     page_title="Food Emissions",
@@ -18,133 +19,45 @@ st.markdown("""
 
 st.divider()
 
-# Food categories with detailed options
-col1, col2 = st.columns(2)
+FOOD_LABELS = {
+    'beef': "Beef servings",
+    'pork': "Pork servings",
+    'chicken': "Chicken servings",
+    'fish': "Fish servings",
+    'legumes': "Legume servings",
+    'tofu': "Tofu servings",
+    'milk': "Milk glasses",
+    'cheese': "Cheese servings",
+    'eggs': "Eggs per month"
+}
 
-with col1:
-    st.subheader("🥩 Meat & Protein")
-    
-    # Meat consumption tracking
-    beef_servings = st.slider("Beef servings per month:", 0, 60, 8, help="1 serving ≈ 100g")
-    pork_servings = st.slider("Pork servings per month:", 0, 60, 4)
-    chicken_servings = st.slider("Chicken servings per month:", 0, 60, 12)
-    fish_servings = st.slider("Fish servings per month:", 0, 60, 8)
-    
-    # Plant-based proteins
-    st.subheader("🌱 Plant-Based Proteins")
-    legume_servings = st.slider("Legumes/beans servings per month:", 0, 60, 16)
-    tofu_servings = st.slider("Tofu/tempeh servings per month:", 0, 60, 4)
-
-with col2:
-    st.subheader("🥛 Dairy & Eggs")
-    milk_glasses = st.slider("Glasses of milk per day:", 0, 5, 1, help="1 glass ≈ 250ml")
-    cheese_servings = st.slider("Cheese servings per month:", 0, 60, 12, help="1 serving ≈ 30g")
-    eggs_per_month = st.slider("Eggs per month:", 0, 90, 16)
-    
-    st.subheader("🍎 Fruits & Vegetables")
-    local_produce_pct = st.slider("% of produce that's local/seasonal:", 0, 100, 50)
-    organic_pct = st.slider("% of food that's organic:", 0, 100, 20)
-
-# Alternative: Quick diet type selection
-st.divider()
-st.subheader("🍽️ Quick Diet Type Selection")
-
-diet_type = st.selectbox(
-    "Or choose a general diet type:",
-    options=[
-        ("custom", "Custom (use sliders above)"),
-        ("high_meat", "High Meat Diet"), 
-        ("average", "Average Omnivore"), 
-        ("vegetarian", "Vegetarian"), 
-        ("vegan", "Vegan")
-    ],
-    format_func=lambda x: x[1]
-)
-
-# Calculate emissions based on input method
-if st.button("Calculate Food Emissions", type="primary"):
+def show_food_results(diet_key, servings, local_produce_pct, organic_pct, breakdown):
+    """Validate, show the full breakdown and save; runs only when the user submits."""
     # Validate inputs if using custom mode
-    if diet_type[0] == "custom":
+    if diet_key == "custom":
         validation_errors = []
         
-        # Validate serving inputs
-        servings_to_validate = [
-            (beef_servings, "Beef servings"),
-            (pork_servings, "Pork servings"),
-            (chicken_servings, "Chicken servings"),
-            (fish_servings, "Fish servings"),
-            (legume_servings, "Legume servings"),
-            (tofu_servings, "Tofu servings"),
-            (milk_glasses, "Milk glasses"),
-            (cheese_servings, "Cheese servings"),
-            (eggs_per_month, "Eggs per month")
-        ]
-        
-        for serving_value, field_name in servings_to_validate:
+        for food, serving_value in servings.items():
+            field_name = FOOD_LABELS[food]
             if not validate_and_show_warning(serving_value, validate_food_serving, field_name, st):
                 validation_errors.append(field_name.lower())
         
         if validation_errors:
             st.error(f"Please check your input for: {', '.join(validation_errors)}")
-            st.stop()
+            return
     
     try:
-        if diet_type[0] == "custom":
-            # Detailed calculation based on specific foods
-            # Emission factors (kg CO2 per serving)
-            FOOD_EMISSIONS = {
-                'beef': 6.6,        # kg CO2 per 100g serving
-                'pork': 2.9,
-                'chicken': 1.6,
-                'fish': 1.2,
-                'legumes': 0.1,
-                'tofu': 0.3,
-                'milk': 0.4,        # per 250ml glass
-                'cheese': 1.0,      # per 30g serving
-                'eggs': 0.4         # per egg
-            }
-            
-            monthly_emissions = (
-                beef_servings * FOOD_EMISSIONS['beef'] +
-                pork_servings * FOOD_EMISSIONS['pork'] +
-                chicken_servings * FOOD_EMISSIONS['chicken'] +
-                fish_servings * FOOD_EMISSIONS['fish'] +
-                legume_servings * FOOD_EMISSIONS['legumes'] +
-                tofu_servings * FOOD_EMISSIONS['tofu'] +
-                (milk_glasses * 30.44) * FOOD_EMISSIONS['milk'] +  # Daily to monthly
-                cheese_servings * FOOD_EMISSIONS['cheese'] +
-                eggs_per_month * FOOD_EMISSIONS['eggs']
-            )
-            
-            # Apply modifiers for local/organic food
-            local_reduction = (local_produce_pct / 100) * 0.15  # 15% reduction for local
-            organic_reduction = (organic_pct / 100) * 0.05      # 5% reduction for organic
-            
-            total_reduction = min(local_reduction + organic_reduction, 0.25)  # Max 25% reduction
-            monthly_emissions = monthly_emissions * (1 - total_reduction)
-            
+        if diet_key == "custom":
             # Detailed breakdown
             st.subheader("📊 Detailed Food Emissions Breakdown")
             
-            breakdown_data = {
-                'Food Category': ['Beef', 'Pork', 'Chicken', 'Fish', 'Legumes', 'Tofu', 'Milk', 'Cheese', 'Eggs'],
-                'Monthly Servings': [beef_servings, pork_servings, chicken_servings, fish_servings, 
-                                   legume_servings, tofu_servings, milk_glasses*30.44, cheese_servings, eggs_per_month],
-                'Monthly Emissions (kg CO₂)': [
-                    beef_servings * FOOD_EMISSIONS['beef'],
-                    pork_servings * FOOD_EMISSIONS['pork'], 
-                    chicken_servings * FOOD_EMISSIONS['chicken'],
-                    fish_servings * FOOD_EMISSIONS['fish'],
-                    legume_servings * FOOD_EMISSIONS['legumes'],
-                    tofu_servings * FOOD_EMISSIONS['tofu'],
-                    (milk_glasses * 30.44) * FOOD_EMISSIONS['milk'],
-                    cheese_servings * FOOD_EMISSIONS['cheese'],
-                    eggs_per_month * FOOD_EMISSIONS['eggs']
-                ]
-            }
-            
             import pandas as pd
-            df_breakdown = pd.DataFrame(breakdown_data)
+            consumed = monthly_servings(servings)
+            df_breakdown = pd.DataFrame({
+                'Food Category': [food.title() for food in consumed],
+                'Monthly Servings': list(consumed.values()),
+                'Monthly Emissions (kg CO₂)': [breakdown[food] for food in consumed]
+            })
             df_breakdown = df_breakdown[df_breakdown['Monthly Servings'] > 0]  # Only show consumed items
             
             if not df_breakdown.empty:
@@ -156,82 +69,23 @@ if st.button("Calculate Food Emissions", type="primary"):
                             title="Monthly Food Emissions by Category")
                 st.plotly_chart(fig, use_container_width=True)
             
-            food_emissions_result = monthly_emissions
+            food_emissions_result = breakdown['total']
             
         else:
             # Use simple diet type calculation
-            food_emissions_result = food_emissions(diet_type=diet_type[0])
-        
-        st.success(f"✅ Calculation complete!")
-        
-        # Results display
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("Monthly Food Emissions", f"{food_emissions_result:.1f} kg CO₂")
-        
-        with col2:
-            st.metric("Daily Average", f"{food_emissions_result/30:.1f} kg CO₂")
-        
-        with col3:
-            annual_projection = food_emissions_result * 12
-            st.metric("Annual Projection", f"{annual_projection:.1f} kg CO₂")
-        
-        # Store in session state
-        st.session_state["food_emissions"] = food_emissions_result
-        
-        # Save to database if user is authenticated
-        if is_authenticated():
-            auth = get_supabase_auth()
-            emission_details = {
-                'diet_type': diet_type[0],
-                'beef_servings': beef_servings if diet_type[0] == "custom" else 0,
-                'pork_servings': pork_servings if diet_type[0] == "custom" else 0,
-                'chicken_servings': chicken_servings if diet_type[0] == "custom" else 0,
-                'fish_servings': fish_servings if diet_type[0] == "custom" else 0,
-                'legume_servings': legume_servings if diet_type[0] == "custom" else 0,
-                'tofu_servings': tofu_servings if diet_type[0] == "custom" else 0,
-                'milk_glasses': milk_glasses if diet_type[0] == "custom" else 0,
-                'cheese_servings': cheese_servings if diet_type[0] == "custom" else 0,
-                'eggs_per_month': eggs_per_month if diet_type[0] == "custom" else 0,
-                'local_produce_pct': local_produce_pct if diet_type[0] == "custom" else 0,
-                'organic_pct': organic_pct if diet_type[0] == "custom" else 0,
-                'calculation_date': str(st.session_state.get('calculation_date', ''))
-            }
-            
-            if auth.save_user_emissions('food', food_emissions_result, emission_details):
-                st.success("✅ Food emissions saved to your profile!")
-            else:
-                st.warning("Could not save food emissions to database.")
-        
-        # Comparison and tips
-        st.subheader("🌱 Improvement Suggestions")
-        
-        if food_emissions_result > 150:
-            st.warning("🔴 Your food emissions are quite high. Consider these changes:")
-            st.markdown("""
-            - **Reduce red meat**: Replace 1-2 beef meals per week with chicken or plant-based alternatives
-            - **Try plant-based proteins**: Incorporate more legumes, tofu, and nuts
-            - **Choose local produce**: Reduce transportation emissions by 10-15%
-            """)
-        elif food_emissions_result > 100:
-            st.info("🟡 Your food emissions are moderate. Small changes can make a big difference:")
-            st.markdown("""
-            - **Meatless Mondays**: Try one plant-based day per week
-            - **Seasonal eating**: Choose fruits and vegetables in season
-            - **Reduce food waste**: Plan meals and store food properly
-            """)
-        else:
-            st.success("🟢 Great job! Your food emissions are relatively low.")
-            st.markdown("""
-            - **Keep it up**: Your current diet has a low carbon footprint
-            - **Share knowledge**: Help others reduce their food emissions
-            - **Consider organic**: Support sustainable farming practices
-            """)
-            
+            food_emissions_result = food_emissions(diet_type=diet_key)
     except Exception as e:
         st.error(f"Error calculating food emissions: {str(e)}")
         st.info("Please check your inputs and try again.")
+        return
+    
+    st.success(f"✅ Calculation complete!")
+    
+    # Results display
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Monthly Food Emissions", f"{food_emissions_result:.1f} kg CO₂")
     
     with col2:
         st.metric("Daily Average", f"{food_emissions_result/30:.1f} kg CO₂")
@@ -240,6 +94,40 @@ if st.button("Calculate Food Emissions", type="primary"):
         annual_projection = food_emissions_result * 12
         st.metric("Annual Projection", f"{annual_projection:.1f} kg CO₂")
     
+    # Store in session state
+    st.session_state["food_emissions"] = food_emissions_result
+    st.session_state["food_inputs"] = {
+        'diet_type': diet_key,
+        'servings': dict(servings),
+        'local_produce_pct': local_produce_pct,
+        'organic_pct': organic_pct
+    }
+    
+    # Save to database if user is authenticated
+    if is_authenticated():
+        auth = get_supabase_auth()
+        custom = diet_key == "custom"
+        emission_details = {
+            'diet_type': diet_key,
+            'beef_servings': servings['beef'] if custom else 0,
+            'pork_servings': servings['pork'] if custom else 0,
+            'chicken_servings': servings['chicken'] if custom else 0,
+            'fish_servings': servings['fish'] if custom else 0,
+            'legume_servings': servings['legumes'] if custom else 0,
+            'tofu_servings': servings['tofu'] if custom else 0,
+            'milk_glasses': servings['milk'] if custom else 0,
+            'cheese_servings': servings['cheese'] if custom else 0,
+            'eggs_per_month': servings['eggs'] if custom else 0,
+            'local_produce_pct': local_produce_pct if custom else 0,
+            'organic_pct': organic_pct if custom else 0,
+            'calculation_date': str(st.session_state.get('calculation_date', ''))
+        }
+        
+        if auth.queue_user_emissions('food', food_emissions_result, emission_details):
+            st.success("✅ Food emissions will be saved to your profile in the background.")
+        else:
+            st.warning("Could not save food emissions to database.")
+    
     # Comparison and tips
     st.subheader("🌱 Improvement Suggestions")
     
@@ -264,9 +152,83 @@ if st.button("Calculate Food Emissions", type="primary"):
         - **Share knowledge**: Help others reduce their food emissions
         - **Consider organic**: Support sustainable farming practices
         """)
+
+# Moving a slider reruns only this fragment, not the whole page
+@fragment
+def food_calculator():
+    # Food categories with detailed options
+    col1, col2 = st.columns(2)
     
-    # Store in session state
-    st.session_state["food_emissions"] = food_emissions_result
+    with col1:
+        st.subheader("🥩 Meat & Protein")
+        
+        # Meat consumption tracking
+        beef_servings = st.slider("Beef servings per month:", 0, 60, 8, help="1 serving ≈ 100g")
+        pork_servings = st.slider("Pork servings per month:", 0, 60, 4)
+        chicken_servings = st.slider("Chicken servings per month:", 0, 60, 12)
+        fish_servings = st.slider("Fish servings per month:", 0, 60, 8)
+        
+        # Plant-based proteins
+        st.subheader("🌱 Plant-Based Proteins")
+        legume_servings = st.slider("Legumes/beans servings per month:", 0, 60, 16)
+        tofu_servings = st.slider("Tofu/tempeh servings per month:", 0, 60, 4)
+    
+    with col2:
+        st.subheader("🥛 Dairy & Eggs")
+        milk_glasses = st.slider("Glasses of milk per day:", 0, 5, 1, help="1 glass ≈ 250ml")
+        cheese_servings = st.slider("Cheese servings per month:", 0, 60, 12, help="1 serving ≈ 30g")
+        eggs_per_month = st.slider("Eggs per month:", 0, 90, 16)
+        
+        st.subheader("🍎 Fruits & Vegetables")
+        local_produce_pct = st.slider("% of produce that's local/seasonal:", 0, 100, 50)
+        organic_pct = st.slider("% of food that's organic:", 0, 100, 20)
+    
+    servings = {
+        'beef': beef_servings,
+        'pork': pork_servings,
+        'chicken': chicken_servings,
+        'fish': fish_servings,
+        'legumes': legume_servings,
+        'tofu': tofu_servings,
+        'milk': milk_glasses,
+        'cheese': cheese_servings,
+        'eggs': eggs_per_month
+    }
+    breakdown = detailed_food_emissions(servings, local_produce_pct, organic_pct)
+    
+    # Alternative: Quick diet type selection
+    st.divider()
+    st.subheader("🍽️ Quick Diet Type Selection")
+    
+    diet_type = st.selectbox(
+        "Or choose a general diet type:",
+        options=[
+            ("custom", "Custom (use sliders above)"),
+            ("high_meat", "High Meat Diet"), 
+            ("average", "Average Omnivore"), 
+            ("vegetarian", "Vegetarian"), 
+            ("vegan", "Vegan")
+        ],
+        format_func=lambda x: x[1]
+    )
+    
+    # Live preview
+    if diet_type[0] == "custom":
+        protein = sum(breakdown[food] for food in ('beef', 'pork', 'chicken', 'fish', 'legumes', 'tofu'))
+        dairy = sum(breakdown[food] for food in ('milk', 'cheese', 'eggs'))
+        preview1, preview2, preview3 = st.columns(3)
+        preview1.metric("Meat & Protein", f"{protein:.1f} kg CO₂")
+        preview2.metric("Dairy & Eggs", f"{dairy:.1f} kg CO₂")
+        preview3.metric("Estimated Monthly Total", f"{breakdown['total']:.1f} kg CO₂",
+                        help="After local/organic reductions")
+    else:
+        st.metric("Estimated Monthly Total", f"{food_emissions(diet_type=diet_type[0]):.1f} kg CO₂")
+    
+    # Calculate emissions based on input method
+    if st.button("Calculate Food Emissions", type="primary"):
+        show_food_results(diet_type[0], servings, local_produce_pct, organic_pct, breakdown)
+
+food_calculator()
 
 st.divider()
 
@@ -1,10 +1,11 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
 import json
+import uuid
 from main.utils.validators import validate_and_show_warning, validate_positive_number
 from main.utils.supabase_auth import get_supabase_auth, get_current_user, is_authenticated
+from main.utils import page_cache
+from main.utils.progress_history import get_progress_history
 
 st.set_page_config(
     page_title="Goals & Progress Tracking",
@@ -40,9 +41,8 @@ else:
             'target_date': (datetime.now() + timedelta(days=365)).strftime('%Y-%m-%d')
         }
 
-# Initialize progress data (will be loaded from database in future)
-if 'progress_data' not in st.session_state:
-    st.session_state['progress_data'] = []
+# Latest progress entries; older ones are saved to the user's profile
+progress_history = get_progress_history(owner=auth.get_current_user_id())
 
 # Goal Setting Section
 st.subheader("🎯 Set Your Carbon Reduction Goals")
@@ -145,21 +145,7 @@ with col4:
 
 # Progress visualization
 if current_total > 0:
-    progress_df = pd.DataFrame({
-        'Category': ['Current Emissions', 'Remaining to Target'],
-        'Amount': [min(current_total, target), max(0, target - current_total)]
-    })
-    
-    if current_total > target:
-        progress_df = pd.DataFrame({
-            'Category': ['Target', 'Over Target'],
-            'Amount': [target, current_total - target]
-        })
-    
-    fig = px.pie(progress_df, values='Amount', names='Category', 
-                title=f"Progress vs Target ({target:.1f} kg CO₂)",
-                color_discrete_map={'Current Emissions': '#2ca02c', 'Remaining to Target': '#d3d3d3',
-                                  'Target': '#2ca02c', 'Over Target': '#ff4444'})
+    fig = page_cache.goal_progress_figure(current_total, target)
     st.plotly_chart(fig, use_container_width=True)
 
 st.divider()
@@ -171,38 +157,39 @@ if current_total > target:
     reduction_needed = current_total - target
     st.warning(f"⚠️ You need to reduce {reduction_needed:.1f} kg CO₂ to meet your monthly target.")
     
-    # Generate specific recommendations
-    st.markdown("**Recommended Actions:**")
+    # Actions ranked by their exact saving on the calculator inputs
+    from main.core.recommendations import recommend
     
-    # Transport recommendations
-    if transport > current_total * 0.3:
-        transport_reduction = min(reduction_needed * 0.4, transport * 0.3)
-        st.markdown(f"""
-        🚗 **Transport ({transport:.1f} kg CO₂)**: Target reduction: {transport_reduction:.1f} kg
-        - Walk/cycle for trips under 5km (saves ~2-4 kg CO₂ per trip)
-        - Use public transport for 2-3 car trips (saves ~3-8 kg CO₂ per trip)
-        - Combine errands into one trip
-        """)
-    
-    # Energy recommendations  
-    if energy > current_total * 0.3:
-        energy_reduction = min(reduction_needed * 0.3, energy * 0.25)
-        st.markdown(f"""
-        ⚡ **Energy ({energy:.1f} kg CO₂)**: Target reduction: {energy_reduction:.1f} kg
-        - Lower thermostat by 2°C (saves ~15-20 kg CO₂/month)
-        - Switch to LED bulbs (saves ~2-5 kg CO₂/month)
-        - Unplug devices when not in use (saves ~3-8 kg CO₂/month)
-        """)
+    st.markdown("**Recommended Actions:**")
     
-    # Food recommendations
-    if food > current_total * 0.3:
-        food_reduction = min(reduction_needed * 0.3, food * 0.2)
-        st.markdown(f"""
-        🥗 **Food ({food:.1f} kg CO₂)**: Target reduction: {food_reduction:.1f} kg
-        - Replace 1 beef meal with chicken (saves ~15-20 kg CO₂)
-        - Try 2 plant-based meals per week (saves ~10-15 kg CO₂)
-        - Reduce food waste by 25% (saves ~5-10 kg CO₂)
-        """)
+    calculator_inputs = {category: st.session_state.get(f"{category}_inputs")
+                         for category in ('transport', 'energy', 'food')}
+    if not any(calculator_inputs.values()):
+        st.info("Use the calculators to get actions ranked by how much they save you.")
+    else:
+        for action in recommend(**calculator_inputs, k=5):
+            st.markdown(f"- {action['title']}: saves **{action['saving_kg']:.1f} kg CO₂** per month")
+        
+        # Least-effort combination of actions that reaches the target
+        from main.core.recommendations import ACTIONS
+        from main.core.reduction_plan import plan
+        
+        st.markdown("**Easiest Plan to Reach Your Target:**")
+        titles = {action.key: action.title for action in ACTIONS}
+        excluded = st.multiselect("Actions you can't take", options=list(titles), format_func=titles.get,
+                                  key="plan_excluded")
+        reduction_plan = plan(target, **calculator_inputs, excluded=excluded)
+        for key in reduction_plan['actions']:
+            st.markdown(f"- {titles[key]}")
+        after = reduction_plan['total_kg'] - reduction_plan['saving_kg']
+        if reduction_plan['reached']:
+            st.success(f"These bring your footprint to {after:.1f} kg CO₂ a month, within your target "
+                       f"(effort score {reduction_plan['effort']}).")
+        elif reduction_plan['actions']:
+            st.warning(f"Even all of these only bring you to {after:.1f} kg CO₂ a month; "
+                       f"consider a more gradual target.")
+        else:
+            st.warning("None of our actions apply to the inputs you entered.")
 
 else:
     st.success(f"🎉 Congratulations! You're {target - current_total:.1f} kg CO₂ under your monthly target!")
@@ -217,6 +204,7 @@ else:
 if st.button("Save Current Progress", type="primary"):
     if current_total > 0:
         progress_entry = {
+            'id': str(uuid.uuid4()),
             'date': datetime.now().strftime('%Y-%m-%d'),
             'transport': transport,
             'energy': energy,
@@ -226,10 +214,9 @@ if st.button("Save Current Progress", type="primary"):
             'met_target': current_total <= target
         }
         
-        if 'progress_data' not in st.session_state:
-            st.session_state['progress_data'] = []
-        
-        st.session_state['progress_data'].append(progress_entry)
+        # Saved to the profile straight away; the session only keeps the latest entries
+        progress_history.append(progress_entry)
+        auth.queue_progress_entries([progress_entry])
         st.success("Progress saved! Check the Historical Progress section below.")
     else:
         st.warning("Please calculate your emissions first in other sections.")
@@ -237,42 +224,69 @@ if st.button("Save Current Progress", type="primary"):
 st.divider()
 
 # Historical Progress (if any data exists)
-if st.session_state.get('progress_data'):
+# Older entries come from the profile, the latest from the session (until their save lands)
+saved_progress = auth.get_progress_points(exclude=progress_history.ids())
+if len(progress_history) or saved_progress:
     st.subheader("📈 Historical Progress")
     
-    df_progress = pd.DataFrame(st.session_state['progress_data'])
-    df_progress['date'] = pd.to_datetime(df_progress['date'])
-    
-    # Line chart of progress over time
-    fig_progress = px.line(df_progress, x='date', y=['total', 'target'], 
-                          title="Emissions vs Target Over Time",
-                          labels={'value': 'kg CO₂', 'date': 'Date'})
+    # Line chart of the entries saved to the profile and those kept in this session
+    timeframe = st.radio("Show", ["day", "week", "month"], horizontal=True,
+                         format_func=lambda period: f"Per {period}", key="progress_timeframe")
+    fig_progress = page_cache.progress_history_figure(progress_history.frame_with(saved_progress), timeframe)
     st.plotly_chart(fig_progress, use_container_width=True)
+    if saved_progress:
+        st.caption(f"Includes {len(saved_progress)} earlier entries saved to your profile.")
     
-    # Progress statistics
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        avg_emissions = df_progress['total'].mean()
-        st.metric("Average Emissions", f"{avg_emissions:.1f} kg CO₂")
+    if len(progress_history):
+        # Progress statistics (over every entry this session, including spilled ones)
+        progress_stats = progress_history.stats()
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric("Average Emissions", f"{progress_stats['average']:.1f} kg CO₂")
+        
+        with col2:
+            st.metric("Target Success Rate", f"{progress_stats['success_rate']:.1f}%")
+
+# Goal forecast from the monthly footprint (the mean of each month's saved calculations,
+# so saving the same results twice doesn't double a month), leaving out this month
+# as it is still incomplete
+this_month = datetime.now().strftime('%Y-%m')
+monthly_history = [month for month in auth.get_monthly_emissions(months=36, average=True)
+                   if month['month'] < this_month]
+if len(monthly_history) >= 3:
+    st.subheader("🔮 Goal Forecast")
+    from main.utils.forecasting import ForecastBatch
+    from main.utils.timeframe_standards import annual_to_monthly
     
-    with col2:
-        targets_met = df_progress['met_target'].sum()
-        total_entries = len(df_progress)
-        success_rate = (targets_met / total_entries) * 100
-        st.metric("Target Success Rate", f"{success_rate:.1f}%")
+    model = st.radio("Model", ["holt", "linear", "seasonal"], horizontal=True, key="forecast_model",
+                     format_func={'holt': "Smoothed trend", 'linear': "Straight line",
+                                  'seasonal': "Seasonal"}.get,
+                     help="Seasonal adds month-of-year effects once you have two years of data.")
+    forecaster = ForecastBatch.from_rows([{'user_id': username, **month} for month in monthly_history])
+    goals = st.session_state['carbon_goals']
+    trend = forecaster.trend_per_month(model)[0]
     
-    with col3:
-        if len(df_progress) > 1:
-            trend = df_progress['total'].iloc[-1] - df_progress['total'].iloc[0]
-            st.metric("Overall Trend", f"{trend:+.1f} kg CO₂")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Trend", f"{trend:+.1f} kg CO₂/month")
+    for column, label, goal in [(col2, "Monthly Target Reached", goals['monthly_target']),
+                                (col3, "On Pace for Annual Target", annual_to_monthly(goals['annual_target']))]:
+        dates = forecaster.goal_dates([goal], model=model)[0]
+        with column:
+            st.metric(label, dates['expected'] or "Not within 2 years")
+            if dates['expected']:
+                st.caption(f"80% range: {dates['earliest']} to {dates['latest'] or 'later than 2 years'}")
+    st.caption(f"Based on complete months up to {monthly_history[-1]['month']}; "
+               "calculations saved this month count once it ends.")
 
 # Export progress data
-if st.session_state.get('progress_data'):
+if len(progress_history):
     st.subheader("📥 Export Progress Data")
     
     if st.button("Generate Progress Report"):
-        df_export = pd.DataFrame(st.session_state['progress_data'])
+        import pandas as pd
+        df_export = pd.DataFrame(progress_history.entries())
         csv = df_export.to_csv(index=False)
         
         st.download_button(
@@ -88,6 +88,12 @@ if st.button("Calculate Transport Emissions"):
             
             # Store in session state for use in other pages
             st.session_state["transport_emissions"] = total
+            st.session_state["transport_inputs"] = {
+                'km_car': km_car, 'car_fuel_type': car_fuel_type.lower(),
+                'km_bus': km_bus, 'bus_fuel_type': bus_fuel_type.lower(),
+                'km_train': km_train, 'train_type': train_type.lower(),
+                'short_flights': short_flights, 'medium_flights': medium_flights, 'long_flights': long_flights
+            }
             
             # Save to database if user is authenticated
             if is_authenticated():
@@ -105,8 +111,8 @@ if st.button("Calculate Transport Emissions"):
                     'calculation_date': str(st.session_state.get('calculation_date', ''))
                 }
                 
-                if auth.save_user_emissions('transport', total, emission_details):
-                    st.success("✅ Transport emissions saved to your profile!")
+                if auth.queue_user_emissions('transport', total, emission_details):
+                    st.success("✅ Transport emissions will be saved to your profile in the background.")
                 else:
                     st.warning("Could not save transport emissions to database.")
             
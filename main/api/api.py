@@ -19,15 +19,15 @@ def calculate_emissions(data: EmissionRequest):
         short_flights=data.short_flights,
         medium_flights=data.medium_flights,
         long_flights=data.long_flights
-    )
+    )['total']
 
     food = food_emissions(data.diet_type)
 
     energy = energy_emissions(
-        electricity=data.kwh_electricity,
-        oil=data.kwh_oil,
-        gas=data.kwh_gas,
-        wood=data.kwh_wood
+        kwh_electricity=data.kwh_electricity,
+        kwh_oil=data.kwh_oil,
+        kwh_gas=data.kwh_gas,
+        kwh_wood=data.kwh_wood
     )
 
     total = transport + food + energy
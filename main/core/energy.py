@@ -1,10 +1,16 @@
+from typing import Dict
 
 
-def energy_emissions(**kwargs) -> float:
+def energy_breakdown(**kwargs) -> Dict[str, float]:
+    """
+    Calculate monthly emissions per energy source.
+    
+    :param kwargs: Monthly consumption in kWh, keyed like ENERGY_FACTORS (e.g. kwh_electricity=300).
+    :return: CO2 emissions in kg per source.
+    """
     from main.data.emission_factors import ENERGY_FACTORS
 
-    total = 0.0
-    for source, kwh in kwargs.items():
-        factor = ENERGY_FACTORS.get(source, 0)
-        total += kwh * factor
-    return total
\ No newline at end of file
+    return {source: kwh * ENERGY_FACTORS.get(source, 0) for source, kwh in kwargs.items()}
+
+def energy_emissions(**kwargs) -> float:
+    return float(sum(energy_breakdown(**kwargs).values()))
@@ -1,4 +1,8 @@
-from main.data.emission_factors import FOOD_FACTORS
+from typing import Dict
+
+from main.data.emission_factors import FOOD_FACTORS, FOOD_SERVING_FACTORS
+
+DAYS_PER_MONTH = 30.44
 
 def food_emissions(diet_type: str) -> float:
     """
@@ -8,4 +12,43 @@ def food_emissions(diet_type: str) -> float:
     :return: Monthly CO2 emissions in kg.
     """
     daily_emission = FOOD_FACTORS.get(diet_type, FOOD_FACTORS['average'])  # Default to 'average' if diet type is unknown
-    return daily_emission * 30  # Monthly emissions
\ No newline at end of file
+    return daily_emission * 30  # Monthly emissions
+
+def monthly_servings(servings: Dict[str, float]) -> Dict[str, float]:
+    """
+    Convert calculator inputs to monthly servings per food.
+    
+    :param servings: Servings per month per food in FOOD_SERVING_FACTORS, except 'milk' (glasses per day).
+    :return: Monthly servings per food.
+    """
+    monthly = {food: servings.get(food, 0) for food in FOOD_SERVING_FACTORS}
+    monthly['milk'] = monthly['milk'] * DAYS_PER_MONTH  # Daily to monthly
+    return monthly
+
+def food_sourcing_reduction(local_produce_pct: float, organic_pct: float) -> float:
+    """
+    Share of food emissions saved by local/seasonal and organic sourcing.
+    
+    :return: Fraction between 0 and 0.25.
+    """
+    local_reduction = (local_produce_pct / 100) * 0.15  # 15% reduction for local
+    organic_reduction = (organic_pct / 100) * 0.05      # 5% reduction for organic
+    return min(local_reduction + organic_reduction, 0.25)  # Max 25% reduction
+
+def detailed_food_emissions(servings: Dict[str, float], local_produce_pct: float = 0,
+                            organic_pct: float = 0) -> Dict[str, float]:
+    """
+    Calculate monthly food emissions from individual foods.
+    
+    :param servings: See monthly_servings.
+    :param local_produce_pct: Percentage of produce that is local/seasonal.
+    :param organic_pct: Percentage of food that is organic.
+    :return: Monthly CO2 emissions in kg per food (before sourcing reductions) and 'total' (after).
+    """
+    breakdown = {
+        food: amount * FOOD_SERVING_FACTORS[food]
+        for food, amount in monthly_servings(servings).items()
+    }
+    subtotal = sum(breakdown.values())
+    breakdown['total'] = subtotal * (1 - food_sourcing_reduction(local_produce_pct, organic_pct))
+    return breakdown
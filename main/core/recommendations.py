@@ -0,0 +1,278 @@
+"""
+Ranked reduction actions with exact savings.
+
+A user's calculator inputs are flattened into one row of a feature matrix
+(distance per car fuel, kWh per source, monthly servings per food, ...), on
+which ``footprint`` reproduces the transport, energy and food calculators
+exactly. Each action in ``ACTIONS`` is a vectorized edit of that matrix,
+e.g. "move a quarter of car kilometres to the train", so the savings of
+every action for every user come from one ``savings_matrix`` call and top-k
+ranking is an argsort per row. Savings are monthly kg CO₂.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from main.core.food import DAYS_PER_MONTH
+from main.data.emission_factors import (
+    CAR_FUEL_CONSUMPTION, ENERGY_FACTORS, FOOD_FACTORS, FOOD_SERVING_FACTORS, TRANSPORT_FACTORS
+)
+
+CAR_FUELS = ('petrol', 'diesel', 'electric')
+BUS_FUELS = ('diesel', 'biofuel', 'electric')
+TRAIN_TYPES = ('electric', 'diesel')
+FLIGHTS = ('short', 'medium', 'long')
+ENERGY_SOURCES = tuple(ENERGY_FACTORS)
+FOODS = tuple(FOOD_SERVING_FACTORS)
+
+FEATURES = (
+    [f'car_km_{fuel}' for fuel in CAR_FUELS]
+    + [f'bus_km_{fuel}' for fuel in BUS_FUELS]
+    + [f'train_km_{kind}' for kind in TRAIN_TYPES]
+    + [f'{length}_flights' for length in FLIGHTS]
+    + list(ENERGY_SOURCES)
+    # Quick diet-type estimate (0 when the detailed calculator was used)
+    + ['diet_kg']
+    + [f'{food}_servings' for food in FOODS]
+    + ['local_produce_pct', 'organic_pct']
+)
+COLUMN = {name: i for i, name in enumerate(FEATURES)}
+CATEGORIES = ('transport', 'energy', 'food')
+
+# Emission per unit of each feature that adds up linearly (food servings are
+# scaled by the sourcing reduction separately)
+TRANSPORT_WEIGHTS = np.zeros(len(FEATURES))
+for fuel in CAR_FUELS:
+    TRANSPORT_WEIGHTS[COLUMN[f'car_km_{fuel}']] = TRANSPORT_FACTORS['car'].get(fuel, 0) * CAR_FUEL_CONSUMPTION.get(fuel, 0)
+for fuel in BUS_FUELS:
+    TRANSPORT_WEIGHTS[COLUMN[f'bus_km_{fuel}']] = TRANSPORT_FACTORS['bus'].get(fuel, 0)
+for kind in TRAIN_TYPES:
+    TRANSPORT_WEIGHTS[COLUMN[f'train_km_{kind}']] = TRANSPORT_FACTORS['train'].get(kind, 0)
+for length in FLIGHTS:
+    TRANSPORT_WEIGHTS[COLUMN[f'{length}_flights']] = TRANSPORT_FACTORS['flight'][length]
+
+ENERGY_WEIGHTS = np.zeros(len(FEATURES))
+for source in ENERGY_SOURCES:
+    ENERGY_WEIGHTS[COLUMN[source]] = ENERGY_FACTORS[source]
+
+SERVING_WEIGHTS = np.zeros(len(FEATURES))
+for food in FOODS:
+    SERVING_WEIGHTS[COLUMN[f'{food}_servings']] = FOOD_SERVING_FACTORS[food]
+
+# Assumptions behind the action catalog
+HEAT_PUMP_COP = 3.0          # kWh of heat per kWh of electricity
+THERMOSTAT_SAVING = 0.06     # share of heating energy saved per degree lower
+SHORT_FLIGHT_KM = 500        # train distance replacing a short flight
+SERVINGS_SWAPPED = 4         # servings per month moved by the food swaps
+FLIGHTS_PER_YEAR = 1 / 12    # one trip a year, as a monthly average
+
+
+class Action(NamedTuple):
+    key: str
+    category: str
+    title: str
+    apply: Callable[[np.ndarray], np.ndarray]
+
+
+def footprint(features: np.ndarray) -> np.ndarray:
+    """Monthly kg CO₂ per category (users x 3: transport, energy, food) for a feature matrix."""
+    features = np.atleast_2d(features)
+    local = features[:, COLUMN['local_produce_pct']] / 100 * 0.15
+    organic = features[:, COLUMN['organic_pct']] / 100 * 0.05
+    sourcing = np.minimum(local + organic, 0.25)
+    food = features[:, COLUMN['diet_kg']] + (features @ SERVING_WEIGHTS) * (1 - sourcing)
+    return np.column_stack([features @ TRANSPORT_WEIGHTS, features @ ENERGY_WEIGHTS, food])
+
+
+def _edit(edit: Callable[[np.ndarray], None]) -> Callable[[np.ndarray], np.ndarray]:
+    """Turn an in-place edit of a copy into an action."""
+    def apply(features: np.ndarray) -> np.ndarray:
+        changed = np.array(features, dtype=float, copy=True)
+        edit(changed)
+        return changed
+    return apply
+
+
+def _move(source: str, target: str, amount: Callable[[np.ndarray], np.ndarray]):
+    """Move amount(source column) from one feature to another."""
+    def edit(features: np.ndarray):
+        moved = amount(features[:, COLUMN[source]])
+        features[:, COLUMN[source]] -= moved
+        features[:, COLUMN[target]] += moved
+    return _edit(edit)
+
+
+def _scale(columns: Iterable[str], factor: float):
+    def edit(features: np.ndarray):
+        for column in columns:
+            features[:, COLUMN[column]] *= factor
+    return _edit(edit)
+
+
+def _car_to(target: str, share: float):
+    def edit(features: np.ndarray):
+        for fuel in ('petrol', 'diesel'):
+            moved = features[:, COLUMN[f'car_km_{fuel}']] * share
+            features[:, COLUMN[f'car_km_{fuel}']] -= moved
+            features[:, COLUMN[target]] += moved
+    return _edit(edit)
+
+
+def _fewer_flights(length: str, train_km: float = 0.0):
+    def edit(features: np.ndarray):
+        removed = np.minimum(features[:, COLUMN[f'{length}_flights']], FLIGHTS_PER_YEAR)
+        features[:, COLUMN[f'{length}_flights']] -= removed
+        features[:, COLUMN['train_km_electric']] += removed * train_km
+    return _edit(edit)
+
+
+def _heat_pump(source: str):
+    def edit(features: np.ndarray):
+        features[:, COLUMN['kwh_electricity']] += features[:, COLUMN[source]] / HEAT_PUMP_COP
+        features[:, COLUMN[source]] = 0
+    return _edit(edit)
+
+
+def _diet_at_most(diet_type: str):
+    def edit(features: np.ndarray):
+        features[:, COLUMN['diet_kg']] = np.minimum(features[:, COLUMN['diet_kg']], FOOD_FACTORS[diet_type] * 30)
+    return _edit(edit)
+
+
+def _at_least(column: str, value: float):
+    def edit(features: np.ndarray):
+        features[:, COLUMN[column]] = np.maximum(features[:, COLUMN[column]], value)
+    return _edit(edit)
+
+
+def _swap_servings(source: str, target: str):
+    return _move(f'{source}_servings', f'{target}_servings', lambda servings: np.minimum(servings, SERVINGS_SWAPPED))
+
+
+ACTIONS: List[Action] = [
+    Action('car_to_electric', 'transport', "Switch your car to electric", _car_to('car_km_electric', 1.0)),
+    Action('car_to_train', 'transport', "Take the train for a quarter of your car kilometres",
+           _car_to('train_km_electric', 0.25)),
+    Action('drive_less', 'transport', "Combine errands to drive 10% less",
+           _scale([f'car_km_{fuel}' for fuel in CAR_FUELS], 0.9)),
+    Action('short_flight_to_train', 'transport', "Take the train instead of one short flight a year",
+           _fewer_flights('short', SHORT_FLIGHT_KM)),
+    Action('skip_medium_flight', 'transport', "Skip one medium-haul flight a year", _fewer_flights('medium')),
+    Action('skip_long_flight', 'transport', "Replace one long-haul flight a year with a closer trip",
+           _fewer_flights('long')),
+    Action('gas_heat_pump', 'energy', "Replace gas heating with a heat pump", _heat_pump('kwh_gas')),
+    Action('oil_heat_pump', 'energy', "Replace oil heating with a heat pump", _heat_pump('kwh_oil')),
+    Action('lower_thermostat', 'energy', "Lower the thermostat by 1°C",
+           _scale(['kwh_gas', 'kwh_oil', 'kwh_wood'], 1 - THERMOSTAT_SAVING)),
+    Action('save_electricity', 'energy', "Cut electricity use by 10% (LEDs, no standby)",
+           _scale(['kwh_electricity'], 0.9)),
+    Action('beef_to_legumes', 'food', f"Swap {SERVINGS_SWAPPED} beef servings a month for legumes",
+           _swap_servings('beef', 'legumes')),
+    Action('beef_to_chicken', 'food', f"Swap {SERVINGS_SWAPPED} beef servings a month for chicken",
+           _swap_servings('beef', 'chicken')),
+    Action('pork_to_tofu', 'food', f"Swap {SERVINGS_SWAPPED} pork servings a month for tofu",
+           _swap_servings('pork', 'tofu')),
+    Action('halve_cheese', 'food', "Halve your cheese", _scale(['cheese_servings'], 0.5)),
+    Action('buy_local', 'food', "Buy at least half your produce local and seasonal",
+           _at_least('local_produce_pct', 50)),
+    Action('go_vegetarian', 'food', "Move to a vegetarian diet", _diet_at_most('vegetarian')),
+]
+ACTION_KEYS = [action.key for action in ACTIONS]
+
+
+def features_from_inputs(transport: Optional[Dict[str, Any]] = None, energy: Optional[Dict[str, Any]] = None,
+                         food: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    One feature row from calculator inputs.
+
+    :param transport: transport_emissions() keyword arguments.
+    :param energy: kWh per source, keyed like ENERGY_FACTORS.
+    :param food: {'diet_type', 'servings', 'local_produce_pct', 'organic_pct'}; diet_type 'custom'
+        uses the servings (as in the detailed food calculator), any other value the quick estimate.
+    """
+    row = np.zeros(len(FEATURES))
+    if transport:
+        for prefix, kind_key, distance_key in [('car_km', 'car_fuel_type', 'km_car'),
+                                               ('bus_km', 'bus_fuel_type', 'km_bus'),
+                                               ('train_km', 'train_type', 'km_train')]:
+            column = f"{prefix}_{str(transport.get(kind_key, '')).lower()}"
+            if column in COLUMN:
+                row[COLUMN[column]] = transport.get(distance_key, 0) or 0
+        for length in FLIGHTS:
+            row[COLUMN[f'{length}_flights']] = transport.get(f'{length}_flights', 0) or 0
+    for source, kwh in (energy or {}).items():
+        if source in COLUMN:
+            row[COLUMN[source]] = kwh or 0
+    if food:
+        diet_type = food.get('diet_type', 'custom')
+        if diet_type == 'custom':
+            servings = food.get('servings', {})
+            for food_name in FOODS:
+                amount = servings.get(food_name, 0) or 0
+                row[COLUMN[f'{food_name}_servings']] = amount * DAYS_PER_MONTH if food_name == 'milk' else amount
+            row[COLUMN['local_produce_pct']] = food.get('local_produce_pct', 0) or 0
+            row[COLUMN['organic_pct']] = food.get('organic_pct', 0) or 0
+        else:
+            row[COLUMN['diet_kg']] = FOOD_FACTORS.get(diet_type, FOOD_FACTORS['average']) * 30
+    return row
+
+
+# Saved emission details (see the calculator pages) -> calculator inputs
+TRANSPORT_DETAIL_KEYS = {'car_km': 'km_car', 'car_fuel': 'car_fuel_type', 'bus_km': 'km_bus',
+                         'bus_fuel': 'bus_fuel_type', 'train_km': 'km_train', 'train_type': 'train_type',
+                         'short_flights': 'short_flights', 'medium_flights': 'medium_flights',
+                         'long_flights': 'long_flights'}
+FOOD_DETAIL_KEYS = {'beef_servings': 'beef', 'pork_servings': 'pork', 'chicken_servings': 'chicken',
+                    'fish_servings': 'fish', 'legume_servings': 'legumes', 'tofu_servings': 'tofu',
+                    'milk_glasses': 'milk', 'cheese_servings': 'cheese', 'eggs_per_month': 'eggs'}
+
+
+def inputs_from_details(category: str, details: Dict[str, Any]) -> Dict[str, Any]:
+    """Calculator inputs from the details saved with an emission record."""
+    if category == 'transport':
+        return {target: details.get(source, 0) for source, target in TRANSPORT_DETAIL_KEYS.items()}
+    if category == 'energy':
+        return {source: details.get(source, 0) for source in ENERGY_SOURCES}
+    if category == 'food':
+        return {
+            'diet_type': details.get('diet_type', 'custom'),
+            'servings': {food: details.get(key, 0) for key, food in FOOD_DETAIL_KEYS.items()},
+            'local_produce_pct': details.get('local_produce_pct', 0),
+            'organic_pct': details.get('organic_pct', 0),
+        }
+    raise ValueError(f"Unknown category: {category}")
+
+
+def feature_matrix(profiles: Iterable[Dict[str, Optional[Dict[str, Any]]]]) -> np.ndarray:
+    """Stack profiles ({'transport': ..., 'energy': ..., 'food': ...} inputs) into a feature matrix."""
+    rows = [features_from_inputs(profile.get('transport'), profile.get('energy'), profile.get('food'))
+            for profile in profiles]
+    return np.array(rows) if rows else np.zeros((0, len(FEATURES)))
+
+
+def savings_matrix(features: np.ndarray, actions: List[Action] = ACTIONS) -> np.ndarray:
+    """Monthly kg CO₂ saved by each action for each user (users x actions); negative means it adds emissions."""
+    features = np.atleast_2d(features)
+    current = footprint(features).sum(axis=1)
+    savings = np.zeros((len(features), len(actions)))
+    for column, action in enumerate(actions):
+        savings[:, column] = current - footprint(action.apply(features)).sum(axis=1)
+    return savings
+
+
+def top_actions(savings: np.ndarray, k: int = 5, min_saving: float = 0.1) -> List[List[int]]:
+    """Indexes of each user's k largest savings, best first, leaving out savings under min_saving kg."""
+    order = np.argsort(-savings, axis=1, kind='stable')[:, :k]
+    return [[int(index) for index in row if savings[user, index] >= min_saving]
+            for user, row in enumerate(order)]
+
+
+def recommend(transport: Optional[Dict[str, Any]] = None, energy: Optional[Dict[str, Any]] = None,
+              food: Optional[Dict[str, Any]] = None, k: int = 5) -> List[Dict[str, Any]]:
+    """A single user's top-k actions as dicts (key, category, title, saving_kg), best first."""
+    features = features_from_inputs(transport, energy, food)[None, :]
+    savings = savings_matrix(features)
+    return [{'key': ACTIONS[index].key, 'category': ACTIONS[index].category,
+             'title': ACTIONS[index].title, 'saving_kg': float(savings[0, index])}
+            for index in top_actions(savings, k)[0]]
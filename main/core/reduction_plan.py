@@ -0,0 +1,180 @@
+"""
+Least-effort plans that bring a footprint under a monthly target.
+
+Picking actions from the catalog in main.core.recommendations is a
+multiple-choice knapsack: actions that edit the same inputs (all the car
+actions, say) don't add up, so they are put in a group and every subset of
+the group is scored exactly on the recalculated footprint. Across groups
+savings do add up (each is linear in the inputs the others edit), so a
+dynamic program over integer effort keeps, for every total effort, the largest
+saving reachable with the groups seen so far. The plan is the cheapest
+effort whose saving covers the gap to the target, which is exact.
+
+Everything is vectorized over users: a batch of profiles costs one pass
+over the ~70 group subsets, each a numpy operation on users x effort.
+"""
+
+from itertools import combinations
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from main.core.recommendations import ACTION_KEYS, ACTIONS, features_from_inputs, footprint, savings_matrix
+
+# Effort of each action on a 1 (trivial) to 10 (major purchase) scale
+EFFORT = {
+    'car_to_electric': 8,
+    'car_to_train': 4,
+    'drive_less': 1,
+    'short_flight_to_train': 2,
+    'skip_medium_flight': 3,
+    'skip_long_flight': 4,
+    'gas_heat_pump': 9,
+    'oil_heat_pump': 9,
+    'lower_thermostat': 1,
+    'save_electricity': 2,
+    'beef_to_legumes': 2,
+    'beef_to_chicken': 1,
+    'pork_to_tofu': 2,
+    'halve_cheese': 2,
+    'buy_local': 3,
+    'go_vegetarian': 6,
+}
+
+# Actions that edit the same inputs, in the order they are applied together
+# (e.g. a quarter of the driving moves to the train before the rest goes
+# electric). Savings of different groups add up.
+GROUPS: List[Tuple[str, ...]] = [
+    ('car_to_train', 'drive_less', 'car_to_electric'),
+    ('short_flight_to_train',),
+    ('skip_medium_flight',),
+    ('skip_long_flight',),
+    ('lower_thermostat', 'save_electricity', 'gas_heat_pump', 'oil_heat_pump'),
+    ('beef_to_legumes', 'beef_to_chicken', 'pork_to_tofu', 'halve_cheese', 'buy_local'),
+    ('go_vegetarian',),
+]
+
+# Actions saving less than this (kg CO₂ a month) on their own don't apply
+# to the user, e.g. car actions without a car
+MIN_SAVING = 0.1
+# Users solved together; small enough for the users x effort tables to stay in cache
+CHUNK_USERS = 1024
+
+_INDEX = {key: i for i, key in enumerate(ACTION_KEYS)}
+
+
+def _subsets(group: Tuple[str, ...]) -> List[Tuple[int, ...]]:
+    """Every subset of a group as catalog indexes in application order, empty first."""
+    indexes = [_INDEX[key] for key in group]
+    return [subset for size in range(len(indexes) + 1) for subset in combinations(indexes, size)]
+
+
+OPTIONS = [_subsets(group) for group in GROUPS]
+OPTION_EFFORT = [np.array([sum(EFFORT[ACTION_KEYS[index]] for index in option) for option in options])
+                 for options in OPTIONS]
+MAX_EFFORT = sum(EFFORT.values())
+
+
+def _option_savings(features: np.ndarray, current: np.ndarray, options: List[Tuple[int, ...]]) -> np.ndarray:
+    """Exact saving of applying each option's actions together (users x options)."""
+    savings = np.zeros((len(features), len(options)))
+    for column, option in enumerate(options[1:], start=1):
+        changed = features
+        for index in option:
+            changed = ACTIONS[index].apply(changed)
+        savings[:, column] = current - footprint(changed).sum(axis=1)
+    return savings
+
+
+def _usable(options: List[Tuple[int, ...]], allowed: np.ndarray) -> np.ndarray:
+    """Whether every action of each option is allowed (users x options)."""
+    return np.column_stack([allowed[:, list(option)].all(axis=1) for option in options])
+
+
+def _solve(savings: List[np.ndarray], needed: np.ndarray):
+    """
+    Run the knapsack for one chunk of users: (reached, effort, saving, users x actions taken).
+
+    `savings` holds each group's users x options savings, -inf where an option isn't allowed.
+    """
+    users = len(needed)
+    # tables[g][u, e]: largest saving from the first g groups with total effort exactly e
+    best = np.full((users, MAX_EFFORT + 1), -np.inf)
+    best[:, 0] = 0.0
+    tables = [best]
+    for costs, group_savings in zip(OPTION_EFFORT, savings):
+        step = np.full_like(best, -np.inf)
+        for column, cost in enumerate(costs):
+            np.maximum(step[:, cost:], best[:, :MAX_EFFORT + 1 - cost] + group_savings[:, column, None],
+                       out=step[:, cost:])
+        best = step
+        tables.append(best)
+
+    # Cheapest effort covering the gap, else the cheapest effort with the largest saving
+    covers = best >= needed[:, None] - 1e-9
+    reached = covers.any(axis=1)
+    efforts = np.where(reached, covers.argmax(axis=1), best.argmax(axis=1))
+    rows = np.arange(users)
+    saved = best[rows, efforts]
+
+    # Walk the groups back: the option taken is the one that reproduces the table entry
+    taken = np.zeros((users, len(ACTIONS)), dtype=bool)
+    effort = efforts.copy()
+    for group in reversed(range(len(OPTIONS))):
+        options, costs, group_savings = OPTIONS[group], OPTION_EFFORT[group], savings[group]
+        target, previous = tables[group + 1][rows, effort], tables[group]
+        picked = np.full(users, -1)
+        for column, cost in enumerate(costs):
+            fits = (picked < 0) & (effort >= cost)
+            value = previous[rows, np.maximum(effort - cost, 0)] + group_savings[:, column]
+            picked[fits & (value == target)] = column
+        for column, option in enumerate(options[1:], start=1):
+            taken[np.ix_(picked == column, list(option))] = True
+        effort -= costs[picked]
+    return reached, efforts, saved, taken
+
+
+def plan_batch(features: np.ndarray, targets: Iterable[float],
+               excluded: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """
+    Least-effort plan for every user in a feature matrix.
+
+    :param features: Feature matrix from feature_matrix().
+    :param targets: Monthly target (kg CO₂) per user.
+    :param excluded: Optional users x actions boolean mask of actions a user has ruled out.
+    :return: Per user, a dict with 'actions' (catalog keys), 'effort', 'saving_kg',
+        'total_kg' (current footprint), 'target_kg' and 'reached'. When the target
+        is out of reach, the plan is the cheapest one with the largest saving.
+    """
+    features = np.atleast_2d(np.asarray(features, dtype=float))
+    targets = np.broadcast_to(np.asarray(list(targets), dtype=float), (len(features),))
+    current = footprint(features).sum(axis=1)
+
+    allowed = savings_matrix(features) >= MIN_SAVING
+    if excluded is not None:
+        allowed &= ~np.asarray(excluded, dtype=bool)
+    savings = [np.where(_usable(options, allowed), _option_savings(features, current, options), -np.inf)
+               for options in OPTIONS]
+
+    plans = []
+    for start in range(0, len(features), CHUNK_USERS):
+        chunk = slice(start, start + CHUNK_USERS)
+        reached, efforts, saved, taken = _solve([group[chunk] for group in savings], current[chunk] - targets[chunk])
+        plans.extend({
+            'actions': [key for key, on in zip(ACTION_KEYS, row) if on],
+            'effort': effort,
+            'saving_kg': saving,
+            'total_kg': total,
+            'target_kg': target,
+            'reached': hit,
+        } for row, effort, saving, total, target, hit in zip(
+            taken.tolist(), efforts.tolist(), saved.tolist(), current[chunk].tolist(), targets[chunk].tolist(),
+            reached.tolist()))
+    return plans
+
+
+def plan(target: float, transport: Optional[Dict[str, Any]] = None, energy: Optional[Dict[str, Any]] = None,
+         food: Optional[Dict[str, Any]] = None, excluded: Iterable[str] = ()) -> Dict[str, Any]:
+    """A single user's least-effort plan from calculator inputs (see plan_batch for the result)."""
+    mask = np.isin(ACTION_KEYS, list(excluded))[None, :]
+    return plan_batch(features_from_inputs(transport, energy, food)[None, :], [target], mask)[0]
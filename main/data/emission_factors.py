@@ -10,7 +10,9 @@ with open(DATA_PATH, 'r') as file:
 
 TRANSPORT_FACTORS = emission_factors['transport']
 FOOD_FACTORS = emission_factors['diet']
+FOOD_SERVING_FACTORS = emission_factors['food_servings']
 ENERGY_FACTORS = emission_factors['energy']
+BENCHMARKS = emission_factors['benchmarks']
 
 CAR_FUEL_CONSUMPTION = {
     'petrol': 0.2,  # L/km
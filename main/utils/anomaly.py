@@ -0,0 +1,324 @@
+"""
+Anomaly detection over emission records.
+
+Data entry mistakes (100000 km in a month, nine long-haul flights) pass
+the per-field limits in main.utils.validators but distort every aggregate
+they land in. Each record is scored against two baselines, both computed
+for the whole table at once with a sort per grouping:
+
+* the user's own history in that category, as a robust z-score
+  (distance from the median in units of the scaled MAD);
+* everyone's records in that category and calendar month (the seasonal
+  baseline, falling back to the category as a whole when a month has few
+  records), as the number of interquartile ranges above the upper quartile.
+
+Scores are computed on log(1 + kg CO₂), since emissions are heavily
+skewed. A record is flagged when it is far out for the population and the
+user has too little history to vouch for it or is far out for the user as
+well, so someone who always drives a lot isn't flagged for driving a lot.
+Only high values are flagged: they are the ones that inflate aggregates.
+
+Flagged rows are left out of the totals, monthly series and rollups
+(emission_aggregates, retention, supabase_schema.sql section 15) until
+someone reviews them (review_records, or the admin panel for Supabase):
+a record kept has its flag cleared and `reviewed` set, so it counts again
+and is never flagged again; a record rejected is deleted.
+
+Usage:
+    python -m main.utils.anomaly --source sqlite --db users.db --since 2024-06-01
+    python -m main.utils.anomaly --db users.db --list
+    python -m main.utils.anomaly --db users.db --keep 12 40 --reject 17
+"""
+
+import argparse
+import sqlite3
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from main.utils.emission_aggregates import CATEGORIES
+from main.utils.retention import add_flag_columns
+
+# Interquartile ranges above the upper quartile of the population (3 is Tukey's "far out")
+POPULATION_FENCE = 3.0
+# Robust z-score against the user's own history
+USER_Z_LIMIT = 3.5
+# Records a user needs in a category before their history counts
+MIN_HISTORY = 5
+# Records a calendar month needs before it gets its own population baseline
+MIN_SEASON = 30
+# Records a category needs before anything in it is flagged
+MIN_POPULATION = 30
+# Smallest spread used as a scale, in log units (about 5%), so a flat history
+# doesn't turn every small change into an outlier
+MIN_SCALE = 0.05
+# MAD to standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+def _codes(*columns: Sequence[Any]) -> np.ndarray:
+    """Dense integer code per row for the combination of the given columns."""
+    combined = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        _, inverse = np.unique(np.asarray(column), return_inverse=True)
+        combined = combined * (inverse.max() + 1 if len(inverse) else 1) + inverse
+    return np.unique(combined, return_inverse=True)[1]
+
+
+def group_quantiles(groups: np.ndarray, values: np.ndarray, quantiles: Sequence[float],
+                    n_groups: int) -> np.ndarray:
+    """
+    Linearly interpolated quantiles of `values` within each group.
+
+    :param groups: Group code (0..n_groups-1) of each value.
+    :return: n_groups x len(quantiles) array, NaN for empty groups.
+    """
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    present = counts > 0
+    for column, q in enumerate(quantiles):
+        position = starts[present] + q * (counts[present] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, starts[present] + counts[present] - 1)
+        result[present, column] = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return result
+
+
+def score_records(user_ids: Sequence[Any], categories: Sequence[str], months: Sequence[str],
+                  values: Sequence[float], baseline: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Score every record against its user's history and the population.
+
+    :param user_ids: User of each record.
+    :param categories: Category of each record.
+    :param months: 'YYYY-MM' month of each record.
+    :param values: Emissions (kg CO₂) of each record.
+    :param baseline: Optional mask of the records the baselines are built from
+        (leave out rows already flagged); every record is scored either way.
+    :return: Arrays 'user_z' (NaN without enough history), 'population_score'
+        (IQRs above the upper quartile, NaN without enough population) and 'flagged'.
+    """
+    x = np.log1p(np.maximum(np.asarray(values, dtype=float), 0))
+    n = len(x)
+    baseline = np.ones(n, dtype=bool) if baseline is None else np.asarray(baseline, dtype=bool)
+    month_of_year = np.fromiter((int(str(month)[5:7]) for month in months), dtype=np.int64, count=n)
+
+    # Own history: median and MAD per (user, category)
+    history = _codes(user_ids, categories)
+    n_history = history.max() + 1 if n else 0
+    median = group_quantiles(history[baseline], x[baseline], [0.5], n_history)[:, 0]
+    deviation = np.abs(x - median[history])
+    mad = group_quantiles(history[baseline], deviation[baseline], [0.5], n_history)[:, 0]
+    history_size = np.bincount(history[baseline], minlength=n_history)
+    scale = np.maximum(MAD_SCALE * mad[history], MIN_SCALE)
+    user_z = np.where(history_size[history] >= MIN_HISTORY, (x - median[history]) / scale, np.nan)
+
+    # Population: quartiles per (category, calendar month), else per category
+    category = _codes(categories)
+    season = _codes(categories, month_of_year)
+    n_category = category.max() + 1 if n else 0
+    n_season = season.max() + 1 if n else 0
+    by_category = group_quantiles(category[baseline], x[baseline], [0.25, 0.75], n_category)[category]
+    by_season = group_quantiles(season[baseline], x[baseline], [0.25, 0.75], n_season)[season]
+    seasonal = (np.bincount(season[baseline], minlength=n_season) >= MIN_SEASON)[season]
+    q1, q3 = np.where(seasonal[:, None], by_season, by_category).T
+    enough = (np.bincount(category[baseline], minlength=n_category) >= MIN_POPULATION)[category]
+    population_score = np.where(enough, (x - q3) / np.maximum(q3 - q1, MIN_SCALE), np.nan)
+
+    with np.errstate(invalid='ignore'):
+        far_out = population_score > POPULATION_FENCE
+        unusual_for_user = np.isnan(user_z) | (user_z > USER_Z_LIMIT)
+    return {
+        'user_z': user_z,
+        'population_score': population_score,
+        'flagged': far_out & unusual_for_user,
+    }
+
+
+def sqlite_records(conn: sqlite3.Connection) -> Dict[str, np.ndarray]:
+    """
+    DatabaseAuth user_emissions rows, one record per category.
+
+    A row holds all three categories, so its id repeats and the row is
+    flagged if any of its categories is.
+    """
+    rows = conn.execute("""
+        SELECT id, user_id, date, transport_emissions, energy_emissions, food_emissions,
+               COALESCE(flagged, 0), COALESCE(reviewed, 0)
+        FROM user_emissions
+    """).fetchall()
+    ids, users, dates, transport, energy, food, flagged, reviewed = (
+        zip(*rows) if rows else ([] for _ in range(8)))
+    repeat = len(CATEGORIES)
+    return {
+        'id': np.repeat(np.array(ids, dtype=np.int64), repeat),
+        'user_id': np.repeat(np.array(users, dtype=np.int64), repeat),
+        'category': np.tile(np.array(CATEGORIES), len(rows)),
+        'date': np.repeat(np.array([str(day)[:10] for day in dates], dtype='U10'), repeat),
+        'emissions': np.column_stack([transport, energy, food]).astype(float).ravel() if rows else np.zeros(0),
+        'flagged': np.repeat(np.array(flagged, dtype=bool), repeat),
+        'reviewed': np.repeat(np.array(reviewed, dtype=bool), repeat),
+    }
+
+
+def supabase_records(client, batch_size: int = 1000) -> Dict[str, np.ndarray]:
+    """Every Supabase user_emissions row (needs the service role key to see all users)."""
+    records: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        page = (client.table('user_emissions')
+                .select('id,user_id,category,emissions,created_at,flagged,reviewed')
+                .order('created_at').order('id')
+                .range(start, start + batch_size - 1).execute().data or [])
+        records.extend(page)
+        if len(page) < batch_size:
+            break
+        start += batch_size
+    return {
+        'id': np.array([record['id'] for record in records], dtype=object),
+        'user_id': np.array([record['user_id'] for record in records], dtype=object).astype(str),
+        'category': np.array([record['category'] for record in records], dtype='U9'),
+        'date': np.array([record['created_at'][:10] for record in records], dtype='U10'),
+        'emissions': np.array([float(record['emissions']) for record in records]),
+        'flagged': np.array([bool(record.get('flagged')) for record in records], dtype=bool),
+        'reviewed': np.array([bool(record.get('reviewed')) for record in records], dtype=bool),
+    }
+
+
+def find_anomalies(records: Dict[str, np.ndarray], since: Optional[str] = None) -> List[Any]:
+    """
+    Ids of records to flag: scored as anomalies, dated `since` or later,
+    and neither flagged nor reviewed yet.
+    """
+    if not len(records['id']):
+        return []
+    scores = score_records(records['user_id'], records['category'], records['date'],
+                           records['emissions'], baseline=~records['flagged'])
+    new = ~records['flagged'] & ~records['reviewed']
+    if since:
+        new &= records['date'] >= since
+    return list(dict.fromkeys(records['id'][scores['flagged'] & new].tolist()))
+
+
+def flag_sqlite(conn: sqlite3.Connection, since: Optional[str] = None, chunk_size: int = 500) -> int:
+    """Flag anomalous DatabaseAuth rows; returns how many were flagged."""
+    ids = find_anomalies(sqlite_records(conn), since)
+    with conn:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            conn.execute(f"UPDATE user_emissions SET flagged = 1 WHERE id IN ({','.join('?' * len(chunk))})",
+                         chunk)
+    return len(ids)
+
+
+def flag_supabase(client, since: Optional[str] = None, chunk_size: int = 200) -> int:
+    """Flag anomalous Supabase rows; returns how many were flagged."""
+    ids = find_anomalies(supabase_records(client), since)
+    for start in range(0, len(ids), chunk_size):
+        client.table('user_emissions').update({'flagged': True}).in_('id', ids[start:start + chunk_size]).execute()
+    return len(ids)
+
+
+def flagged_records(conn: sqlite3.Connection, limit: int = 100) -> List[Dict[str, Any]]:
+    """Flagged DatabaseAuth rows awaiting review, newest first."""
+    rows = conn.execute("""
+        SELECT id, user_id, date, transport_emissions, energy_emissions, food_emissions, total_emissions
+        FROM user_emissions WHERE flagged
+        ORDER BY date DESC, id DESC LIMIT ?
+    """, (limit,)).fetchall()
+    columns = ['id', 'user_id', 'date', 'transport_emissions', 'energy_emissions', 'food_emissions',
+               'total_emissions']
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def review_records(conn: sqlite3.Connection, ids: Sequence[Any], keep: bool, chunk_size: int = 500) -> int:
+    """
+    Resolve flagged DatabaseAuth rows. Kept rows are unflagged and marked
+    reviewed, so they count again; rejected ones are deleted. Rows that
+    aren't flagged are left alone. Returns how many rows were resolved.
+    """
+    resolved = 0
+    with conn:
+        for start in range(0, len(ids), chunk_size):
+            chunk = list(ids[start:start + chunk_size])
+            placeholders = ','.join('?' * len(chunk))
+            if keep:
+                cursor = conn.execute(f"UPDATE user_emissions SET flagged = 0, reviewed = 1 "
+                                      f"WHERE flagged AND id IN ({placeholders})", chunk)
+            else:
+                cursor = conn.execute(f"DELETE FROM user_emissions WHERE flagged AND id IN ({placeholders})", chunk)
+            resolved += cursor.rowcount
+    return resolved
+
+
+def flagged_supabase_records(client, limit: int = 100) -> List[Dict[str, Any]]:
+    """Flagged Supabase rows awaiting review, newest first (needs the service role key)."""
+    return (client.table('user_emissions')
+            .select('id,user_id,category,emissions,details,created_at')
+            .eq('flagged', True).order('created_at', desc=True)
+            .limit(limit).execute().data or [])
+
+
+def review_supabase_records(client, ids: Sequence[Any], keep: bool, chunk_size: int = 200) -> List[Dict[str, Any]]:
+    """Resolve flagged Supabase rows like review_records; returns the rows resolved."""
+    resolved: List[Dict[str, Any]] = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = list(ids[start:start + chunk_size])
+        table = client.table('user_emissions')
+        query = table.update({'flagged': False, 'reviewed': True}) if keep else table.delete()
+        resolved.extend(query.eq('flagged', True).in_('id', chunk).execute().data or [])
+    return resolved
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Flag anomalous emission records.")
+    parser.add_argument('--source', choices=['sqlite', 'supabase'], default='sqlite')
+    parser.add_argument('--db', default='users.db', help="SQLite database path")
+    parser.add_argument('--since', default=(date.today() - timedelta(days=7)).isoformat(),
+                        help="Only flag records from this date on (YYYY-MM-DD)")
+    parser.add_argument('--list', action='store_true', help="List flagged SQLite records instead of flagging")
+    parser.add_argument('--keep', type=int, nargs='+', default=[], metavar='ID',
+                        help="Clear the flag on these SQLite records and count them again")
+    parser.add_argument('--reject', type=int, nargs='+', default=[], metavar='ID',
+                        help="Delete these flagged SQLite records")
+    args = parser.parse_args(argv)
+
+    if args.list or args.keep or args.reject:
+        conn = sqlite3.connect(args.db)
+        try:
+            add_flag_columns(conn)
+            if args.list:
+                for record in flagged_records(conn):
+                    print(record)
+            kept = review_records(conn, args.keep, keep=True)
+            rejected = review_records(conn, args.reject, keep=False)
+        finally:
+            conn.close()
+        if args.keep or args.reject:
+            print(f"Kept {kept} and deleted {rejected} flagged records")
+        return
+
+    if args.source == 'sqlite':
+        conn = sqlite3.connect(args.db)
+        try:
+            add_flag_columns(conn)
+            flagged = flag_sqlite(conn, args.since)
+        finally:
+            conn.close()
+    else:
+        import os
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        client = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY'))
+        flagged = flag_supabase(client, args.since)
+    print(f"Flagged {flagged} records since {args.since}")
+
+
+if __name__ == "__main__":
+    main()
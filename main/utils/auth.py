@@ -4,46 +4,35 @@ Simple user authentication with password hashing and session management.
 """
 
 import streamlit as st
-import hashlib
-import json
 import os
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
 from pathlib import Path
+from main.utils.password_hashing import get_hashing_service
+from main.utils.user_log import UserLogStore
 
 class SimpleAuth:
     """Simple authentication system using local file storage."""
     
-    def __init__(self, users_file: str = "users.json"):
+    def __init__(self, users_file: str = "users.log", legacy_users_file: str = "users.json"):
         self.users_file = Path(users_file)
-        self.users = self._load_users()
-    
-    def _load_users(self) -> Dict:
-        """Load users from file or create empty dict."""
-        if self.users_file.exists():
-            try:
-                with open(self.users_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return {}
-        return {}
-    
-    def _save_users(self):
-        """Save users to file."""
-        with open(self.users_file, 'w') as f:
-            json.dump(self.users, f, indent=2)
+        # Append-only log; an old users.json is imported on first start
+        self.store = UserLogStore(users_file, legacy_path=legacy_users_file)
+    
+    # Salt of the old single-round SHA-256 hashes, still accepted and upgraded on login
+    LEGACY_SALT = "emission_calculator_salt"
     
     def _hash_password(self, password: str) -> str:
-        """Hash password with salt."""
-        salt = "emission_calculator_salt"
-        return hashlib.sha256((password + salt).encode()).hexdigest()
+        """Hash password with scrypt in the hashing process pool."""
+        return get_hashing_service().hash(password)
     
     def register_user(self, username: str, password: str, email: str = "") -> bool:
         """Register a new user."""
-        if username in self.users:
+        # Saves hashing for names already taken; add() settles races with other sessions
+        if username in self.store:
             return False
         
-        self.users[username] = {
+        return self.store.add(username, {
             "password_hash": self._hash_password(password),
             "email": email,
             "created_at": datetime.now().isoformat(),
@@ -53,48 +42,56 @@ class SimpleAuth:
                 "language": "en",
                 "notifications": True
             }
-        }
-        self._save_users()
-        return True
+        })
     
     def authenticate(self, username: str, password: str) -> bool:
         """Authenticate user credentials."""
-        if username not in self.users:
+        user = self.store.get(username)
+        if not user:
             return False
         
-        stored_hash = self.users[username]["password_hash"]
-        password_hash = self._hash_password(password)
+        stored_hash = user["password_hash"]
+        valid, needs_rehash = get_hashing_service().verify(password, stored_hash, self.LEGACY_SALT)
         
-        if stored_hash == password_hash:
-            # Update last login
-            self.users[username]["last_login"] = datetime.now().isoformat()
-            self._save_users()
+        if valid:
+            changes = {"last_login": datetime.now().isoformat()}
+            # Transparently upgrade legacy or weaker hashes
+            if needs_rehash:
+                changes["password_hash"] = self._hash_password(password)
+            
+            self.store.update(username, changes)
             return True
         
         return False
     
     def user_exists(self, username: str) -> bool:
         """Check if user exists."""
-        return username in self.users
+        return username in self.store
     
     def get_user_info(self, username: str) -> Optional[Dict]:
         """Get user information."""
-        if username in self.users:
-            user_data = self.users[username].copy()
+        user = self.store.get(username)
+        if user:
+            user_data = user.copy()
             user_data.pop('password_hash', None)  # Don't return password hash
             return user_data
         return None
     
     def update_user_settings(self, username: str, settings: Dict) -> bool:
         """Update user settings."""
-        if username not in self.users:
+        user = self.store.get(username)
+        if not user:
             return False
         
-        self.users[username]["settings"].update(settings)
-        self._save_users()
-        return True
+        merged = {**user.get("settings", {}), **settings}
+        return self.store.update(username, {"settings": merged})
 
 # Streamlit authentication functions
+@st.cache_resource
+def get_auth_system() -> SimpleAuth:
+    """Get the process-wide auth system, so all sessions share one user store."""
+    return SimpleAuth()
+
 def init_auth_session():
     """Initialize authentication session state."""
     if 'authenticated' not in st.session_state:
@@ -102,7 +99,7 @@ def init_auth_session():
     if 'username' not in st.session_state:
         st.session_state.username = None
     if 'auth_system' not in st.session_state:
-        st.session_state.auth_system = SimpleAuth()
+        st.session_state.auth_system = get_auth_system()
 
 def login_form():
     """Display login form."""
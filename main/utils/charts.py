@@ -0,0 +1,114 @@
+"""
+Data frames and plotly figures for the analytics and goals pages.
+
+The builders are plain functions of their input values, so the pages can
+cache them by value (see main.utils.page_cache) instead of rebuilding the
+frames and figures on every widget interaction. pandas and plotly are
+imported on first use, so loading a page that shows no chart doesn't pay
+for them.
+"""
+
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+CATEGORY_COLORS = {'Transport': '#ff7f0e', 'Energy': '#2ca02c', 'Food': '#d62728'}
+
+# (date, total, target) per saved progress entry
+ProgressPoint = Tuple[str, float, float]
+
+
+def breakdown_frame(transport: float, energy: float, food: float) -> "pd.DataFrame":
+    """Emissions and share per category."""
+    import pandas as pd
+
+    total = transport + energy + food
+    values = [transport, energy, food]
+    return pd.DataFrame({
+        'Category': ['Transport', 'Energy', 'Food'],
+        'Emissions': values,
+        'Percentage': [value / total * 100 if total else 0.0 for value in values]
+    })
+
+
+def benchmark_frame(total_emissions: float, benchmarks: Dict[str, float]) -> "pd.DataFrame":
+    """The user's monthly emissions next to the reference benchmarks."""
+    import pandas as pd
+
+    return pd.DataFrame({
+        'Category': list(benchmarks.keys()) + ['Your Emissions'],
+        'Monthly Emissions': list(benchmarks.values()) + [total_emissions]
+    })
+
+
+def goal_progress_frame(current_total: float, target: float) -> "pd.DataFrame":
+    """Emissions so far against the monthly target (or the overshoot)."""
+    import pandas as pd
+
+    if current_total > target:
+        return pd.DataFrame({
+            'Category': ['Target', 'Over Target'],
+            'Amount': [target, current_total - target]
+        })
+    return pd.DataFrame({
+        'Category': ['Current Emissions', 'Remaining to Target'],
+        'Amount': [min(current_total, target), max(0, target - current_total)]
+    })
+
+
+def progress_history_frame(points: List[ProgressPoint]) -> "pd.DataFrame":
+    import pandas as pd
+
+    frame = pd.DataFrame(points, columns=['date', 'total', 'target'])
+    frame['date'] = pd.to_datetime(frame['date'])
+    return frame
+
+
+def breakdown_figure(transport: float, energy: float, food: float):
+    import plotly.express as px
+
+    fig = px.pie(breakdown_frame(transport, energy, food), values='Emissions', names='Category',
+                 title="Monthly Emissions Breakdown",
+                 color_discrete_map=CATEGORY_COLORS)
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+
+def benchmark_figure(total_emissions: float, benchmarks: Dict[str, float]):
+    import plotly.express as px
+
+    fig = px.bar(benchmark_frame(total_emissions, benchmarks), x='Category', y='Monthly Emissions',
+                 title="Your Emissions vs. Global Benchmarks",
+                 color='Category',
+                 color_discrete_map={'Your Emissions': '#1f77b4'})
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def goal_progress_figure(current_total: float, target: float):
+    import plotly.express as px
+
+    return px.pie(goal_progress_frame(current_total, target), values='Amount', names='Category',
+                  title=f"Progress vs Target ({target:.1f} kg CO₂)",
+                  color_discrete_map={'Current Emissions': '#2ca02c', 'Remaining to Target': '#d3d3d3',
+                                      'Target': '#2ca02c', 'Over Target': '#ff4444'})
+
+
+def progress_history_figure(frame: "pd.DataFrame", timeframe: str = 'day',
+                            max_points: int = 500, method: str = 'lttb'):
+    """
+    Line chart of a progress_history_frame.
+
+    Entries are averaged per `timeframe` and then downsampled to at most
+    `max_points` points, so long histories stay cheap to send and draw.
+    """
+    import plotly.express as px
+    from main.utils.downsample import downsample_frame
+    from main.utils.timeframe_standards import resample_history
+
+    frame = resample_history(frame, timeframe, value_columns=['total', 'target'])
+    frame = downsample_frame(frame, x='date', y='total', max_points=max_points, method=method)
+    return px.line(frame, x='date', y=['total', 'target'],
+                   title="Emissions vs Target Over Time",
+                   labels={'value': 'kg CO₂', 'date': 'Date'})
@@ -0,0 +1,111 @@
+"""
+Circuit breaker with per-call timeouts for remote backend calls.
+
+Each call runs in a small worker pool and is abandoned after ``call_timeout``
+seconds, so a slow backend costs a page at most that long per call. After
+``failure_threshold`` consecutive failures the circuit opens and calls fail
+immediately with CircuitOpenError (callers fall back to cached data). Once
+``reset_timeout`` has passed a single trial call is let through; success
+closes the circuit again, failure re-opens it.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The backend is considered down; the call was not attempted."""
+
+
+class CallTimeoutError(TimeoutError):
+    """The call did not finish within the breaker's timeout."""
+
+
+class CircuitBreaker:
+    """Fails fast while a backend is unhealthy."""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 call_timeout: float = 5.0, max_workers: int = 8,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param failure_threshold: Consecutive failures that open the circuit.
+        :param reset_timeout: Seconds to stay open before a trial call.
+        :param call_timeout: Seconds to wait for a call before giving up on it.
+        :param max_workers: Threads running calls (abandoned calls hold one until they return).
+        :param clock: Time source, injectable for tests.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='breaker')
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.rejected = 0
+        self.timeouts = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError("Backend unavailable, try again shortly")
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN:
+                # Only one trial call at a time
+                if self._trial_running:
+                    self.rejected += 1
+                    raise CircuitOpenError("Backend unavailable, try again shortly")
+                self._trial_running = True
+
+    def _record(self, success: bool):
+        with self._lock:
+            self._trial_running = False
+            if success:
+                self._state = CLOSED
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn with a timeout, raising CircuitOpenError without calling it while open."""
+        self._before_call()
+        future = self._executor.submit(fn, *args, **kwargs)
+        try:
+            result = future.result(timeout=self.call_timeout)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            self._record(False)
+            raise CallTimeoutError(f"Backend call timed out after {self.call_timeout:.1f}s")
+        except Exception:
+            self._record(False)
+            raise
+        self._record(True)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self._failures,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+        }
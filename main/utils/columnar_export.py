@@ -0,0 +1,213 @@
+"""
+Columnar export of emission history.
+
+Streams user emission records from SQLite or Supabase into Arrow record
+batches and writes them as a Parquet dataset partitioned by month and
+category. Reading back uses partition pruning and Parquet statistics, so
+filters on month, category or user only touch the files they need.
+
+Usage:
+    python -m main.utils.columnar_export --source sqlite --db users.db --out exports/emissions
+"""
+
+import argparse
+import io
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CATEGORIES = ('transport', 'energy', 'food')
+
+EMISSION_SCHEMA = pa.schema([
+    ('user_id', pa.string()),
+    ('category', pa.string()),
+    ('emissions', pa.float64()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+    ('details', pa.string()),
+    ('month', pa.string()),
+])
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('month', pa.string()), ('category', pa.string())]),
+    flavor='hive'
+)
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse SQLite/PostgREST timestamps into aware UTC datetimes."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _to_batch(rows: List[Dict[str, Any]]) -> pa.RecordBatch:
+    """Convert normalized row dicts into a record batch."""
+    columns = {name: [row[name] for row in rows] for name in EMISSION_SCHEMA.names}
+    return pa.RecordBatch.from_pydict(columns, schema=EMISSION_SCHEMA)
+
+
+def iter_sqlite_batches(db_path: str = "users.db", batch_size: int = 10000) -> Iterator[pa.RecordBatch]:
+    """
+    Stream the SQLite user_emissions table as record batches.
+
+    The wide transport/energy/food columns are unpivoted into one row per
+    category so the output matches the Supabase layout.
+    """
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.execute("""
+            SELECT user_id, date, transport_emissions, energy_emissions,
+                   food_emissions, created_at
+            FROM user_emissions
+            ORDER BY id
+        """)
+        while True:
+            records = cursor.fetchmany(batch_size)
+            if not records:
+                break
+
+            rows = []
+            for user_id, date, transport, energy, food, created_at in records:
+                timestamp = _parse_timestamp(created_at or date)
+                for category, value in zip(CATEGORIES, (transport, energy, food)):
+                    rows.append({
+                        'user_id': str(user_id),
+                        'category': category,
+                        'emissions': float(value or 0),
+                        'created_at': timestamp,
+                        'details': None,
+                        'month': str(date or timestamp.date())[:7],
+                    })
+            yield _to_batch(rows)
+
+
+def iter_supabase_batches(client, user_id: Optional[str] = None,
+                          batch_size: int = 1000) -> Iterator[pa.RecordBatch]:
+    """
+    Stream the Supabase user_emissions table as record batches.
+
+    :param client: A supabase Client.
+    :param user_id: Only export this user's rows (RLS applies either way).
+    :param batch_size: Rows fetched per request.
+    """
+    start = 0
+    while True:
+        query = client.table('user_emissions').select('user_id,category,emissions,details,created_at')
+        if user_id:
+            query = query.eq('user_id', user_id)
+        response = query.order('created_at').order('id').range(start, start + batch_size - 1).execute()
+        records = response.data or []
+        if not records:
+            break
+
+        rows = []
+        for record in records:
+            timestamp = _parse_timestamp(record['created_at'])
+            rows.append({
+                'user_id': str(record['user_id']),
+                'category': record['category'],
+                'emissions': float(record['emissions']),
+                'created_at': timestamp,
+                'details': json.dumps(record['details']) if record.get('details') is not None else None,
+                'month': timestamp.strftime('%Y-%m'),
+            })
+        yield _to_batch(rows)
+
+        if len(records) < batch_size:
+            break
+        start += batch_size
+
+
+def write_partitioned_parquet(batches: Iterable[pa.RecordBatch], out_dir: str,
+                              overwrite: bool = False) -> None:
+    """
+    Write record batches as a Parquet dataset partitioned by month and category.
+
+    Batches are consumed lazily, so memory use is bounded by the batch size.
+    """
+    ds.write_dataset(
+        batches,
+        out_dir,
+        schema=EMISSION_SCHEMA,
+        format='parquet',
+        partitioning=PARTITIONING,
+        existing_data_behavior='delete_matching' if overwrite else 'overwrite_or_ignore',
+        basename_template='part-{i}-' + datetime.now().strftime('%Y%m%d%H%M%S') + '.parquet',
+    )
+
+
+def read_emission_history(path: str, months: Optional[List[str]] = None,
+                          categories: Optional[List[str]] = None,
+                          user_id: Optional[str] = None,
+                          columns: Optional[List[str]] = None) -> pa.Table:
+    """
+    Read an exported dataset, pushing filters down to the partition and file level.
+
+    :param months: Months to include, as 'YYYY-MM' strings.
+    :param categories: Categories to include.
+    :param user_id: Only include this user's rows.
+    :param columns: Columns to load (defaults to all).
+    """
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+
+    condition = None
+    filters = []
+    if months:
+        filters.append(ds.field('month').isin(months))
+    if categories:
+        filters.append(ds.field('category').isin(categories))
+    if user_id is not None:
+        filters.append(ds.field('user_id') == str(user_id))
+    for f in filters:
+        condition = f if condition is None else condition & f
+
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def emission_history_parquet_bytes(batches: Iterable[pa.RecordBatch]) -> bytes:
+    """Write record batches to a single in-memory Parquet file (for downloads)."""
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, EMISSION_SCHEMA) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export emission history to partitioned Parquet.")
+    parser.add_argument('--source', choices=['sqlite', 'supabase'], default='sqlite')
+    parser.add_argument('--db', default='users.db', help="SQLite database path")
+    parser.add_argument('--out', default='exports/emissions', help="Output directory")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--overwrite', action='store_true', help="Replace existing partitions")
+    args = parser.parse_args()
+
+    if args.source == 'sqlite':
+        batches = iter_sqlite_batches(args.db, args.batch_size)
+    else:
+        import os
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        client = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY'))
+        batches = iter_supabase_batches(client, batch_size=args.batch_size)
+
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    write_partitioned_parquet(batches, args.out, overwrite=args.overwrite)
+    print(f"Exported emission history to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Maintained counters for the admin dashboard (users.db).
+
+Triggers keep user totals, last-login days and emissions-per-day counts up
+to date as rows change, so reading the statistics touches a handful of
+small rows instead of counting the users and user_emissions tables.
+Active users are summed from at most one row per day of the window.
+Emission counts record activity: rows later removed by retention or demo
+cleanup stay counted on the day they were created. Rows flagged as
+anomalies (main.utils.anomaly) are taken out until the flag is cleared.
+"""
+
+import sqlite3
+from typing import Dict, List
+
+COUNTER_TABLES_DDL = """
+    CREATE TABLE IF NOT EXISTS app_counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS user_login_days (
+        day TEXT PRIMARY KEY,
+        users INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS emission_daily_counts (
+        day TEXT PRIMARY KEY,
+        records INTEGER NOT NULL DEFAULT 0,
+        total_emissions REAL NOT NULL DEFAULT 0
+    );
+"""
+
+COUNTER_TRIGGERS_DDL = """
+    CREATE TRIGGER IF NOT EXISTS count_users_insert AFTER INSERT ON users
+    BEGIN
+        UPDATE app_counters SET value = value + 1 WHERE name = 'total_users';
+        UPDATE app_counters SET value = value + COALESCE(NEW.is_demo, 0) WHERE name = 'demo_users';
+        INSERT INTO user_login_days (day, users)
+        SELECT date(NEW.last_login), 1 WHERE NEW.last_login IS NOT NULL
+        ON CONFLICT(day) DO UPDATE SET users = users + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS count_users_delete AFTER DELETE ON users
+    BEGIN
+        UPDATE app_counters SET value = value - 1 WHERE name = 'total_users';
+        UPDATE app_counters SET value = value - COALESCE(OLD.is_demo, 0) WHERE name = 'demo_users';
+        UPDATE user_login_days SET users = users - 1 WHERE day = date(OLD.last_login);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS count_users_demo_flag AFTER UPDATE OF is_demo ON users
+    BEGIN
+        UPDATE app_counters SET value = value + COALESCE(NEW.is_demo, 0) - COALESCE(OLD.is_demo, 0)
+        WHERE name = 'demo_users';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS count_users_login AFTER UPDATE OF last_login ON users
+    WHEN date(NEW.last_login) IS NOT date(OLD.last_login)
+    BEGIN
+        UPDATE user_login_days SET users = users - 1 WHERE day = date(OLD.last_login);
+        INSERT INTO user_login_days (day, users)
+        SELECT date(NEW.last_login), 1 WHERE NEW.last_login IS NOT NULL
+        ON CONFLICT(day) DO UPDATE SET users = users + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS count_user_emissions AFTER INSERT ON user_emissions
+    BEGIN
+        INSERT INTO emission_daily_counts (day, records, total_emissions)
+        VALUES (date(COALESCE(NEW.date, NEW.created_at)), 1, COALESCE(NEW.total_emissions, 0))
+        ON CONFLICT(day) DO UPDATE SET
+            records = records + 1,
+            total_emissions = total_emissions + excluded.total_emissions;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS count_user_emissions_flag AFTER UPDATE OF flagged ON user_emissions
+    WHEN COALESCE(NEW.flagged, 0) != COALESCE(OLD.flagged, 0)
+    BEGIN
+        UPDATE emission_daily_counts SET
+            records = records + CASE WHEN NEW.flagged THEN -1 ELSE 1 END,
+            total_emissions = total_emissions
+                + CASE WHEN NEW.flagged THEN -1 ELSE 1 END * COALESCE(NEW.total_emissions, 0)
+        WHERE day = date(COALESCE(NEW.date, NEW.created_at));
+    END;
+"""
+
+
+# One-time backfill for databases that predate the counters. It runs before
+# app_counters is seeded, so it only finds the table empty the first time.
+COUNTER_BACKFILL_SQL = """
+    INSERT INTO user_login_days (day, users)
+    SELECT date(last_login), COUNT(*) FROM users
+    WHERE last_login IS NOT NULL AND NOT EXISTS (SELECT 1 FROM app_counters)
+    GROUP BY date(last_login)
+    ON CONFLICT(day) DO NOTHING;
+
+    INSERT INTO emission_daily_counts (day, records, total_emissions)
+    SELECT date(COALESCE(date, created_at)), COUNT(*), COALESCE(SUM(total_emissions), 0)
+    FROM user_emissions
+    WHERE NOT EXISTS (SELECT 1 FROM app_counters)
+    GROUP BY date(COALESCE(date, created_at))
+    ON CONFLICT(day) DO NOTHING;
+
+    INSERT OR IGNORE INTO app_counters (name, value)
+    SELECT 'total_users', COUNT(*) FROM users
+    UNION ALL
+    SELECT 'demo_users', COALESCE(SUM(is_demo), 0) FROM users;
+"""
+
+
+def install_counters(conn: sqlite3.Connection):
+    """
+    Create the counter tables and triggers, seeding them from existing rows the first time.
+
+    Runs as one write transaction, so processes starting together can't
+    both backfill, and no rows change between the backfill and the triggers.
+    """
+    try:
+        conn.executescript("BEGIN IMMEDIATE;" + COUNTER_TABLES_DDL + COUNTER_BACKFILL_SQL
+                           + COUNTER_TRIGGERS_DDL + "COMMIT;")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def read_user_counters(conn: sqlite3.Connection, active_days: int = 30) -> Dict[str, int]:
+    """Total, active (logged in within `active_days`) and demo user counts."""
+    counters = dict(conn.execute("SELECT name, value FROM app_counters").fetchall())
+    active = conn.execute("""
+        SELECT COALESCE(SUM(users), 0) FROM user_login_days
+        WHERE day >= date('now', ?)
+    """, (f"-{int(active_days)} days",)).fetchone()[0]
+    return {
+        "total_users": counters.get('total_users', 0),
+        "active_users": active,
+        "demo_users": counters.get('demo_users', 0)
+    }
+
+
+def read_daily_emission_counts(conn: sqlite3.Connection, days: int = 30) -> List[Dict]:
+    """Emission records created per day over the last `days` days, oldest first."""
+    rows = conn.execute("""
+        SELECT day, records, total_emissions FROM emission_daily_counts
+        WHERE day >= date('now', ?)
+        ORDER BY day
+    """, (f"-{int(days)} days",)).fetchall()
+    return [{"day": day, "records": records, "total_emissions": total} for day, records, total in rows]
@@ -5,6 +5,7 @@ import json
 from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any
+from main.utils.retention import EMISSIONS_ROLLUP_DDL
 
 class EmissionDatabase:
     """Simple SQLite database for storing emission calculations."""
@@ -16,6 +17,7 @@ class EmissionDatabase:
     def init_database(self):
         """Initialize the database with required tables."""
         with sqlite3.connect(self.db_path) as conn:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS emissions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,6 +30,9 @@ class EmissionDatabase:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_emissions_date ON emissions (date)")
+            # Older raw rows are folded into this table by main.utils.retention
+            conn.execute(EMISSIONS_ROLLUP_DDL)
             conn.commit()
     
     def save_calculation(self, transport: float, energy: float, food: float, 
@@ -66,21 +71,30 @@ class EmissionDatabase:
             date_end = f"{year:04d}-{month+1:02d}-01"
         
         with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
+            # Recent calculations are still raw; older ones live in the monthly rollup
+            raw = conn.execute("""
                 SELECT 
-                    AVG(transport_emissions) as avg_transport,
-                    AVG(energy_emissions) as avg_energy,
-                    AVG(food_emissions) as avg_food,
-                    AVG(total_emissions) as avg_total,
-                    COUNT(*) as calculation_count
+                    SUM(transport_emissions),
+                    SUM(energy_emissions),
+                    SUM(food_emissions),
+                    SUM(total_emissions),
+                    COUNT(*)
                 FROM emissions 
                 WHERE date >= ? AND date < ?
-            """, (date_start, date_end))
-            row = cursor.fetchone()
+            """, (date_start, date_end)).fetchone()
+            rolled = conn.execute("""
+                SELECT transport_emissions, energy_emissions, food_emissions,
+                       total_emissions, calculation_count
+                FROM emissions_monthly
+                WHERE month = ?
+            """, (date_start[:7],)).fetchone() or (0, 0, 0, 0, 0)
+            
+            sums = [(a or 0) + (b or 0) for a, b in zip(raw, rolled)]
+            count = sums[4]
             return {
-                'avg_transport': row[0] or 0,
-                'avg_energy': row[1] or 0,
-                'avg_food': row[2] or 0,
-                'avg_total': row[3] or 0,
-                'calculation_count': row[4] or 0
+                'avg_transport': sums[0] / count if count else 0,
+                'avg_energy': sums[1] / count if count else 0,
+                'avg_food': sums[2] / count if count else 0,
+                'avg_total': sums[3] / count if count else 0,
+                'calculation_count': count
             }
@@ -5,12 +5,18 @@ Uses SQLite for secure, reliable user management.
 
 import streamlit as st
 import sqlite3
-import hashlib
 import json
 import os
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
 from pathlib import Path
+from main.utils.retention import USER_EMISSIONS_ROLLUP_DDL, add_flag_columns, delete_demo_users
+from main.utils.counters import install_counters, read_daily_emission_counts, read_user_counters
+from main.utils.emission_aggregates import empty_totals, user_emission_totals, user_monthly_emissions
+from main.utils.user_cache import get_session_cache
+from main.utils.password_hashing import get_hashing_service
+from main.utils.session_store import get_session_store
+from main.utils.session_cookie import read_session_cookie, write_session_cookie
 
 class DatabaseAuth:
     """Database-based authentication system using SQLite."""
@@ -18,10 +24,14 @@ class DatabaseAuth:
     def __init__(self, db_path: str = "users.db"):
         self.db_path = Path(db_path)
         self.init_database()
+        self.sessions = get_session_store(str(self.db_path))
     
     def init_database(self):
         """Initialize the database with required tables."""
         with sqlite3.connect(self.db_path) as conn:
+            # Lets the retention job return freed pages (only applies to new databases)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,10 +42,22 @@ class DatabaseAuth:
                     last_login TIMESTAMP,
                     is_active BOOLEAN DEFAULT 1,
                     is_admin BOOLEAN DEFAULT 0,
-                    settings TEXT DEFAULT '{}'
+                    settings TEXT DEFAULT '{}',
+                    is_demo BOOLEAN DEFAULT 0
                 )
             """)
             
+            # Databases created before the demo flag existed
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+            if 'is_demo' not in columns:
+                conn.execute("ALTER TABLE users ADD COLUMN is_demo BOOLEAN DEFAULT 0")
+                conn.execute("UPDATE users SET is_demo = 1 WHERE username LIKE 'demo_%'")
+            
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_users_demo_created
+                ON users (is_demo, created_at)
+            """)
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS user_sessions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -48,6 +70,15 @@ class DatabaseAuth:
                 )
             """)
             
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_sessions_expires
+                ON user_sessions (expires_at)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id
+                ON user_sessions (user_id)
+            """)
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS user_emissions (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -58,10 +89,27 @@ class DatabaseAuth:
                     food_emissions REAL DEFAULT 0,
                     total_emissions REAL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    flagged BOOLEAN DEFAULT 0,
+                    reviewed BOOLEAN DEFAULT 0,
                     FOREIGN KEY (user_id) REFERENCES users (id)
                 )
             """)
             
+            # Databases created before anomaly flags existed
+            add_flag_columns(conn)
+            
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_emissions_user_date
+                ON user_emissions (user_id, date)
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_emissions_date
+                ON user_emissions (date)
+            """)
+            
+            # Older raw rows are folded into this table by main.utils.retention
+            conn.execute(USER_EMISSIONS_ROLLUP_DDL)
+            
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS user_goals (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,14 +124,24 @@ class DatabaseAuth:
                 )
             """)
             
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_goals_user_id
+                ON user_goals (user_id)
+            """)
+            
             conn.commit()
+            
+            # Trigger-maintained counters for the admin statistics
+            install_counters(conn)
+    
+    # Salt of the old single-round SHA-256 hashes, still accepted and upgraded on login
+    LEGACY_SALT = "emission_calculator_salt_2024"
     
     def _hash_password(self, password: str) -> str:
-        """Hash password with salt using SHA-256."""
-        salt = "emission_calculator_salt_2024"
-        return hashlib.sha256((password + salt).encode()).hexdigest()
+        """Hash password with scrypt in the hashing process pool."""
+        return get_hashing_service().hash(password)
     
-    def register_user(self, username: str, password: str, email: str = "") -> bool:
+    def register_user(self, username: str, password: str, email: str = "", is_demo: bool = False) -> bool:
         """Register a new user."""
         try:
             with sqlite3.connect(self.db_path) as conn:
@@ -97,13 +155,13 @@ class DatabaseAuth:
                 # Create new user
                 password_hash = self._hash_password(password)
                 cursor.execute("""
-                    INSERT INTO users (username, password_hash, email, settings)
-                    VALUES (?, ?, ?, ?)
+                    INSERT INTO users (username, password_hash, email, settings, is_demo)
+                    VALUES (?, ?, ?, ?, ?)
                 """, (username, password_hash, email, json.dumps({
                     "units": "metric",
                     "language": "en",
                     "notifications": True
-                })))
+                }), int(is_demo)))
                 
                 conn.commit()
                 return True
@@ -136,8 +194,16 @@ class DatabaseAuth:
                     return False
                 
                 # Verify password
-                password_hash = self._hash_password(password)
-                if stored_hash == password_hash:
+                valid, needs_rehash = get_hashing_service().verify(password, stored_hash, self.LEGACY_SALT)
+                if valid:
+                    # Transparently upgrade legacy or weaker hashes
+                    if needs_rehash:
+                        cursor.execute("""
+                            UPDATE users 
+                            SET password_hash = ? 
+                            WHERE id = ?
+                        """, (self._hash_password(password), user_id))
+                    
                     # Update last login
                     cursor.execute("""
                         UPDATE users 
@@ -153,8 +219,39 @@ class DatabaseAuth:
             print(f"Database error: {e}")
             return False
     
+    def create_session(self, username: str) -> Optional[str]:
+        """Create a session token for an authenticated user."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                user = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+            if not user:
+                return None
+            return self.sessions.create_session(user[0], username)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+    
+    def validate_session(self, token: Optional[str]) -> Optional[str]:
+        """Return the username for a valid session token."""
+        try:
+            return self.sessions.validate(token)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+    
+    def end_session(self, token: str):
+        """Revoke a session token."""
+        try:
+            self.sessions.revoke(token)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+    
     def get_user_info(self, username: str) -> Optional[Dict]:
-        """Get user information."""
+        """Get user information (cached per session)."""
+        return get_session_cache().get_or_load(username, 'info', lambda: self._fetch_user_info(username))
+    
+    def _fetch_user_info(self, username: str) -> Optional[Dict]:
+        """Load user information from the database, bypassing the cache."""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
@@ -210,6 +307,7 @@ class DatabaseAuth:
                 """, (json.dumps(current_settings), username))
                 
                 conn.commit()
+                get_session_cache().invalidate(username, 'info')
                 return True
                 
         except sqlite3.Error as e:
@@ -284,6 +382,34 @@ class DatabaseAuth:
             print(f"Database error: {e}")
             return []
     
+    def get_emission_totals(self, username: str) -> Dict:
+        """Get a user's all-time totals per category, summed in SQL."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                user = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+                if not user:
+                    return empty_totals()
+                
+                return user_emission_totals(conn, user[0])
+                
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return empty_totals()
+    
+    def get_monthly_emissions(self, username: str, months: int = 12) -> List[Dict]:
+        """Get a user's per-month totals for the last `months` months, oldest first."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                user = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+                if not user:
+                    return []
+                
+                return user_monthly_emissions(conn, user[0], months)
+                
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return []
+    
     def save_user_goals(self, username: str, annual_target: float, monthly_target: float) -> bool:
         """Save or update user goals."""
         try:
@@ -306,6 +432,7 @@ class DatabaseAuth:
                 """, (user_id, annual_target, monthly_target))
                 
                 conn.commit()
+                get_session_cache().invalidate(username, 'goals')
                 return True
                 
         except sqlite3.Error as e:
@@ -313,7 +440,11 @@ class DatabaseAuth:
             return False
     
     def get_user_goals(self, username: str) -> Optional[Dict]:
-        """Get user goals."""
+        """Get user goals (cached per session)."""
+        return get_session_cache().get_or_load(username, 'goals', lambda: self._fetch_user_goals(username))
+    
+    def _fetch_user_goals(self, username: str) -> Optional[Dict]:
+        """Load user goals from the database, bypassing the cache."""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
@@ -351,57 +482,47 @@ class DatabaseAuth:
             return None
     
     def get_user_stats(self) -> Dict:
-        """Get user statistics for admin."""
+        """Get user statistics for admin from the maintained counters."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Total users
-                cursor.execute("SELECT COUNT(*) FROM users")
-                total_users = cursor.fetchone()[0]
-                
-                # Active users (logged in within last 30 days)
-                cursor.execute("""
-                    SELECT COUNT(*) FROM users 
-                    WHERE last_login >= date('now', '-30 days')
-                """)
-                active_users = cursor.fetchone()[0]
-                
-                # Demo users
-                cursor.execute("SELECT COUNT(*) FROM users WHERE username LIKE 'demo_%'")
-                demo_users = cursor.fetchone()[0]
-                
-                return {
-                    "total_users": total_users,
-                    "active_users": active_users,
-                    "demo_users": demo_users
-                }
+                # Active users: logged in within the last 30 days
+                return read_user_counters(conn, active_days=30)
                 
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return {"total_users": 0, "active_users": 0, "demo_users": 0}
     
-    def cleanup_demo_users(self, days_old: int = 1) -> int:
-        """Remove demo users older than specified days."""
+    def get_daily_emission_counts(self, days: int = 30) -> List[Dict]:
+        """Get the number of emission records created per day, oldest first."""
         try:
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+                return read_daily_emission_counts(conn, days)
                 
-                # Delete old demo users
-                cursor.execute("""
-                    DELETE FROM users 
-                    WHERE username LIKE 'demo_%' 
-                    AND created_at < date('now', '-{} days')
-                """.format(days_old))
-                
-                deleted_count = cursor.rowcount
-                conn.commit()
-                
-                return deleted_count
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return []
+    
+    def cleanup_demo_users(self, days_old: int = 1, chunk_size: int = 500,
+                           progress_callback: Optional[Callable[[int, int, float], None]] = None) -> int:
+        """
+        Remove demo users older than specified days, together with their data,
+        in short chunked transactions (see retention.delete_demo_users).
+        """
+        deleted_count = 0
+        
+        def report(deleted, total, rate):
+            nonlocal deleted_count
+            deleted_count = deleted
+            if progress_callback:
+                progress_callback(deleted, total, rate)
+        
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                return delete_demo_users(conn, days_old, chunk_size, report)
                 
         except sqlite3.Error as e:
             print(f"Database error: {e}")
-            return 0
+            return deleted_count
 
 # Updated Streamlit authentication functions
 def init_auth_session():
@@ -412,6 +533,45 @@ def init_auth_session():
         st.session_state.username = None
     if 'auth_system' not in st.session_state:
         st.session_state.auth_system = DatabaseAuth()
+    
+    # Links shared before tokens left the URL; never trusted, just dropped
+    if 'session' in st.query_params:
+        del st.query_params['session']
+    
+    # Set or cleared on the previous run (login and logout rerun straight away)
+    if 'pending_session_cookie' in st.session_state:
+        write_session_cookie(*st.session_state.pop('pending_session_cookie'))
+    
+    # The token travels in a cookie, not the URL, where it would leak through
+    # browser history, referrers, proxy logs and shared links. A new browser
+    # session (reload, another worker) resumes from the cookie.
+    token = st.session_state.get('session_token')
+    from_cookie = not token and not st.session_state.get('skip_session_cookie')
+    if from_cookie:
+        token = read_session_cookie()
+    username = st.session_state.auth_system.validate_session(token) if token else None
+    if username:
+        st.session_state.session_token = token
+        st.session_state.authenticated = True
+        st.session_state.username = username
+    elif token:
+        st.session_state.session_token = None
+        st.session_state.authenticated = False
+        st.session_state.username = None
+        if from_cookie:
+            # Expired or revoked; this connection keeps sending it until a reload
+            st.session_state.skip_session_cookie = True
+            write_session_cookie(None, 0)
+
+def start_session(username: str):
+    """Mark the user as logged in and issue a session token."""
+    auth = st.session_state.auth_system
+    token = auth.create_session(username)
+    st.session_state.session_token = token
+    st.session_state.authenticated = True
+    st.session_state.username = username
+    st.session_state.skip_session_cookie = False
+    st.session_state.pending_session_cookie = (token, int(auth.sessions.session_ttl))
 
 def login_form():
     """Display login form."""
@@ -426,8 +586,7 @@ def login_form():
             if username and password:
                 auth = st.session_state.auth_system
                 if auth.authenticate(username, password):
-                    st.session_state.authenticated = True
-                    st.session_state.username = username
+                    start_session(username)
                     st.success("Login successful!")
                     st.rerun()
                 else:
@@ -463,8 +622,15 @@ def register_form():
 
 def logout():
     """Logout user."""
+    token = st.session_state.get('session_token')
+    if token:
+        st.session_state.auth_system.end_session(token)
+        st.session_state.session_token = None
     st.session_state.authenticated = False
     st.session_state.username = None
+    # The page loaded with the old cookie, so don't resume from it before it's deleted
+    st.session_state.skip_session_cookie = True
+    st.session_state.pending_session_cookie = (None, 0)
     # Clear user-specific session data
     keys_to_clear = [
         'transport_emissions', 'energy_emissions', 'food_emissions',
@@ -512,10 +678,9 @@ def show_auth_page():
         if st.button("Create Demo Account", type="primary"):
             demo_username = f"demo_{int(datetime.now().timestamp())}"
             auth = st.session_state.auth_system
-            if auth.register_user(demo_username, "demo123", "demo@example.com"):
+            if auth.register_user(demo_username, "demo123", "demo@example.com", is_demo=True):
                 if auth.authenticate(demo_username, "demo123"):
-                    st.session_state.authenticated = True
-                    st.session_state.username = demo_username
+                    start_session(demo_username)
                     st.success("Demo account created! You're now logged in.")
                     st.rerun()
     
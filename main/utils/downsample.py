@@ -0,0 +1,86 @@
+"""
+Downsampling for long time-series charts.
+
+Plotting every stored point of a multi-year daily history sends a huge
+plotly payload to the browser. These helpers pick a subset of rows that
+keeps the visual shape of the line:
+
+- ``lttb_indices``: Largest-Triangle-Three-Buckets. One point per bucket,
+  chosen to preserve the area of the curve; good general-purpose default.
+- ``minmax_indices``: the minimum and maximum of every bucket, so no peak
+  or dip is ever dropped.
+
+Both always keep the first and last point and return sorted row positions.
+"""
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], threshold: int) -> np.ndarray:
+    """Positions of at most `threshold` points chosen by LTTB."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Points 1..n-2 split into threshold-2 buckets; the ends are always kept
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.intp)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Point in this bucket forming the largest triangle with the last pick and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def minmax_indices(y: Sequence[float], max_points: int) -> np.ndarray:
+    """Positions of each bucket's minimum and maximum, at most `max_points` in total."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if max_points >= n or max_points < 4:
+        return np.arange(n)
+
+    buckets = np.array_split(np.arange(1, n - 1), (max_points - 2) // 2)
+    picks = [0, n - 1]
+    for bucket in buckets:
+        if len(bucket):
+            picks.append(bucket[np.argmin(y[bucket])])
+            picks.append(bucket[np.argmax(y[bucket])])
+    return np.unique(picks)
+
+
+def downsample_frame(frame: pd.DataFrame, x: str, y: str, max_points: int,
+                     method: str = 'lttb') -> pd.DataFrame:
+    """
+    Keep at most `max_points` rows of a frame sorted by `x`.
+
+    Rows are chosen from the `y` column; other columns (e.g. a target line)
+    are kept for the same rows.
+    """
+    if len(frame) <= max_points:
+        return frame
+    if method == 'lttb':
+        x_values = frame[x]
+        if pd.api.types.is_datetime64_any_dtype(x_values):
+            x_values = x_values.astype('int64') / 1e9
+        positions = lttb_indices(x_values, frame[y], max_points)
+    elif method == 'minmax':
+        positions = minmax_indices(frame[y], max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}. Use one of {', '.join(METHODS)}")
+    return frame.iloc[positions].reset_index(drop=True)
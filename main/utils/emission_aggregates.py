@@ -0,0 +1,128 @@
+"""
+Per-user emission aggregates computed by the database.
+
+Totals and monthly series are summed in SQL (over the raw rows plus the
+monthly rollups written by main.utils.retention), so the result size and
+the amount of data sent to the app no longer grow with a user's history.
+Rows flagged by main.utils.anomaly are left out until they are reviewed.
+The Supabase backend uses the equivalent RPC functions in supabase_schema.sql
+and shares the row shaping helpers below.
+"""
+
+import sqlite3
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+CATEGORIES = ['transport', 'energy', 'food']
+
+
+def empty_totals() -> Dict[str, Any]:
+    totals: Dict[str, Any] = {category: 0.0 for category in CATEGORIES}
+    totals.update({'total': 0.0, 'record_count': 0})
+    return totals
+
+
+def month_cutoff(months: int, today: Optional[date] = None) -> str:
+    """First month ('YYYY-MM') of a window of `months` months ending this month."""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def totals_from_category_rows(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold get_emission_totals() RPC rows (category, total, record_count) into one dict."""
+    totals = empty_totals()
+    for row in rows:
+        amount = float(row.get('total') or 0)
+        totals[row['category']] = totals.get(row['category'], 0.0) + amount
+        totals['total'] += amount
+        totals['record_count'] += int(row.get('record_count') or 0)
+    return totals
+
+
+def monthly_from_category_rows(rows: Iterable[Dict[str, Any]], average: bool = False) -> List[Dict[str, Any]]:
+    """
+    Pivot get_monthly_emissions() RPC rows (month, category, total, record_count) to one dict per month.
+
+    With `average`, each category holds the mean of the month's saved calculations
+    instead of their sum. Every calculation is already an estimate of a monthly
+    footprint, so that mean is the month's footprint however often it was saved.
+    """
+    months: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        month = str(row['month'])[:7]
+        entry = months.setdefault(month, {'month': month, **{c: 0.0 for c in CATEGORIES}, 'total': 0.0})
+        amount = float(row.get('total') or 0)
+        if average:
+            amount /= max(int(row.get('record_count') or 1), 1)
+        entry[row['category']] = entry.get(row['category'], 0.0) + amount
+        entry['total'] += amount
+    return [months[month] for month in sorted(months)]
+
+
+def user_emission_totals(conn: sqlite3.Connection, user_id: int) -> Dict[str, Any]:
+    """All-time totals for a DatabaseAuth user (raw rows plus rollups)."""
+    row = conn.execute("""
+        SELECT SUM(transport), SUM(energy), SUM(food), SUM(total), SUM(records)
+        FROM (
+            SELECT SUM(transport_emissions) AS transport, SUM(energy_emissions) AS energy,
+                   SUM(food_emissions) AS food, SUM(total_emissions) AS total,
+                   COUNT(*) AS records
+            FROM user_emissions WHERE user_id = ? AND NOT flagged
+            UNION ALL
+            SELECT SUM(transport_emissions), SUM(energy_emissions), SUM(food_emissions),
+                   SUM(total_emissions), SUM(record_count)
+            FROM user_emissions_monthly WHERE user_id = ?
+        )
+    """, (user_id, user_id)).fetchone()
+
+    totals = empty_totals()
+    for key, value in zip(CATEGORIES + ['total'], row[:4]):
+        totals[key] = value or 0.0
+    totals['record_count'] = row[4] or 0
+    return totals
+
+
+def user_monthly_emissions(conn: sqlite3.Connection, user_id: int, months: int = 12,
+                           today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Per-month sums for a DatabaseAuth user over the last `months` months, oldest first."""
+    cutoff = month_cutoff(months, today)
+    rows = conn.execute("""
+        SELECT month, SUM(transport), SUM(energy), SUM(food), SUM(total)
+        FROM (
+            SELECT substr(date, 1, 7) AS month, transport_emissions AS transport,
+                   energy_emissions AS energy, food_emissions AS food, total_emissions AS total
+            FROM user_emissions WHERE user_id = ? AND date >= ? AND NOT flagged
+            UNION ALL
+            SELECT month, transport_emissions, energy_emissions, food_emissions, total_emissions
+            FROM user_emissions_monthly WHERE user_id = ? AND month >= ?
+        )
+        GROUP BY month
+        ORDER BY month
+    """, (user_id, cutoff + "-01", user_id, cutoff)).fetchall()
+
+    return [
+        {'month': month, 'transport': transport or 0.0, 'energy': energy or 0.0,
+         'food': food or 0.0, 'total': total or 0.0}
+        for month, transport, energy, food, total in rows
+    ]
+
+
+def all_users_monthly_emissions(conn: sqlite3.Connection, months: int = 12,
+                                today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Per-user, per-month totals for every DatabaseAuth user over the last `months` months."""
+    cutoff = month_cutoff(months, today)
+    rows = conn.execute("""
+        SELECT user_id, month, SUM(total)
+        FROM (
+            SELECT user_id, substr(date, 1, 7) AS month, total_emissions AS total
+            FROM user_emissions WHERE date >= ? AND NOT flagged
+            UNION ALL
+            SELECT user_id, month, total_emissions
+            FROM user_emissions_monthly WHERE month >= ?
+        )
+        GROUP BY user_id, month
+        ORDER BY user_id, month
+    """, (cutoff + "-01", cutoff)).fetchall()
+
+    return [{'user_id': user_id, 'month': month, 'total': total or 0.0} for user_id, month, total in rows]
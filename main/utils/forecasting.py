@@ -0,0 +1,355 @@
+"""
+Forecasting when users will reach their emission goals.
+
+Fits three models to monthly emission totals for a batch of users at once
+(one row per user, one column per month, NaN where a month has no data):
+
+- ``linear``: least-squares trend line.
+- ``holt``: Holt's linear exponential smoothing, with the smoothing
+  parameters picked per user from a small grid by one-step-ahead error.
+- ``seasonal``: the trend line plus a month-of-year effect, once a user has
+  two years of data (the plain trend line before that).
+
+Each model keeps constant-size state per user (running sums for the
+regression models, level and trend for Holt), so ``ForecastBatch.update``
+folds in a new month without refitting the history. ``goal_dates`` reports
+the first month the forecast reaches a target, with the months the lower
+and upper ends of the prediction interval reach it.
+
+Weekly digest over every DatabaseAuth user:
+    python -m main.utils.forecasting --users-db users.db --model holt
+"""
+
+import argparse
+import json
+import sqlite3
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from main.utils.emission_aggregates import all_users_monthly_emissions
+from main.utils.timeframe_standards import annual_to_monthly
+
+MODELS = ('linear', 'holt', 'seasonal')
+SEASON = 12
+# Month-of-year effects need every month of the year seen this many times
+MIN_SEASON_REPEATS = 2
+# Running sums kept per user and month of the year (self.sums)
+SUMS = ('n', 'x', 'y', 'xx', 'xy', 'yy')
+HOLT_ALPHAS = (0.2, 0.4, 0.6, 0.8)
+HOLT_BETAS = (0.05, 0.2, 0.4)
+
+
+def month_index(month: str) -> int:
+    """Months since year 0 for a 'YYYY-MM' (or 'YYYY-MM-DD') string."""
+    year, number = str(month)[:7].split('-')
+    return int(year) * 12 + int(number) - 1
+
+
+def month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def history_matrix(rows: Iterable[Dict[str, Any]], value: str = 'total') -> Tuple[List[Any], int, np.ndarray]:
+    """
+    Pivot (user_id, month, value) rows into a users x months matrix.
+
+    Returns the user ids (one per row), the month index of the first column
+    and the matrix, with NaN where a user has no data for a month. Rows for
+    the same user and month are summed.
+    """
+    rows = list(rows)
+    if not rows:
+        return [], 0, np.empty((0, 0))
+    users = list(dict.fromkeys(row['user_id'] for row in rows))
+    positions = {user_id: i for i, user_id in enumerate(users)}
+    months = np.array([month_index(row['month']) for row in rows])
+    origin = int(months.min())
+
+    values = np.zeros((len(users), int(months.max()) - origin + 1))
+    observed = np.zeros(values.shape, dtype=bool)
+    user_rows = np.array([positions[row['user_id']] for row in rows])
+    np.add.at(values, (user_rows, months - origin), [float(row[value] or 0) for row in rows])
+    observed[user_rows, months - origin] = True
+    values[~observed] = np.nan
+    return users, origin, values
+
+
+def _holt_pass(values: np.ndarray, alpha: np.ndarray, beta: np.ndarray):
+    """
+    Run Holt's method over every row of `values`, skipping missing months.
+
+    `alpha` and `beta` broadcast against one column of `values`, so a grid of
+    parameters is run in one pass. The trend starts as the slope between the
+    first two observations. Level and trend are as of each user's last
+    observed month; a gap of g months is forecast as level + g * trend.
+    """
+    shape = np.broadcast_shapes(np.shape(alpha), np.shape(beta), (values.shape[0],))
+    level = np.full(shape, np.nan)
+    trend = np.zeros(shape)
+    sse = np.zeros(shape)
+    errors = np.zeros(shape)
+    seen = np.zeros(shape)
+    last = np.full(shape, -1.0)
+
+    for t in range(values.shape[1]):
+        y = values[:, t]
+        observed = ~np.isnan(y)
+        gap = t - last
+        first = observed & (seen == 0)
+        second = observed & (seen == 1)
+        later = observed & (seen >= 2)
+
+        error = y - (level + gap * trend)
+        sse = np.where(later, sse + error ** 2, sse)
+        errors = errors + later
+        # Error-correction form of the level and trend updates
+        smoothed_level = level + gap * trend + alpha * error
+        smoothed_trend = trend + alpha * beta * error
+
+        trend = np.where(second, (y - level) / gap, np.where(later, smoothed_trend, trend))
+        level = np.where(first | second, y, np.where(later, smoothed_level, level))
+        last = np.where(observed, t, last)
+        seen = seen + observed
+    return level, trend, sse, errors, seen, last
+
+
+def _least_squares(n, sx, sy, sxx, sxy, syy):
+    """Trend line from running sums: slope, intercept, residual sum of squares and spread of x."""
+    spread_x = sxx - sx ** 2 / n
+    covariance = sxy - sx * sy / n
+    slope = covariance / spread_x
+    intercept = (sy - slope * sx) / n
+    rss = np.maximum(syy - sy ** 2 / n - slope * covariance, 0.0)
+    valid = (n >= 3) & (spread_x > 0)
+    return (np.where(valid, slope, np.nan), np.where(valid, intercept, np.nan),
+            np.where(valid, rss, np.nan), spread_x)
+
+
+class ForecastBatch:
+    """Fitted forecasting state for a batch of users' monthly totals."""
+
+    def __init__(self, user_ids: Sequence[Any], origin: int, values: np.ndarray,
+                 alphas: Sequence[float] = HOLT_ALPHAS, betas: Sequence[float] = HOLT_BETAS):
+        """
+        :param user_ids: One id per row of `values`.
+        :param origin: Month index (see month_index) of the first column.
+        :param values: Users x months totals, NaN for months without data.
+        """
+        self.user_ids = list(user_ids)
+        self.origin = origin
+        self._rows = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        self._alphas, self._betas = tuple(alphas), tuple(betas)
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[None, :]
+
+        # Regression sums per month of the year; x counts months from origin
+        observed = ~np.isnan(values)
+        x = np.arange(values.shape[1], dtype=float)
+        y = np.where(observed, values, 0.0)
+        columns = np.stack([observed, observed * x, y, observed * x ** 2, y * x, y ** 2])
+        season = (origin + np.arange(values.shape[1])) % SEASON
+        self.sums = np.zeros((len(SUMS), len(self.user_ids), SEASON))
+        for month in range(SEASON):
+            self.sums[:, :, month] = columns[:, :, season == month].sum(axis=2)
+
+        # Holt: run every (alpha, beta) pair at once and keep each user's best
+        grid = np.array([(a, b) for a in alphas for b in betas])
+        level, trend, sse, errors, seen, last = _holt_pass(values, grid[:, :1], grid[:, 1:])
+        mse = np.where(errors > 0, sse / np.maximum(errors, 1), np.inf)
+        best = np.argmin(mse, axis=0)
+        users = np.arange(len(self.user_ids))
+        self.alpha = grid[best, 0]
+        self.beta = grid[best, 1]
+        self.level = level[best, users]
+        self.trend = trend[best, users]
+        self.holt_sse = sse[best, users]
+        self.holt_errors = errors[best, users]
+        self.points = seen[best, users]
+        self.last = last[best, users].astype(int)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], value: str = 'total', **kwargs) -> "ForecastBatch":
+        """Fit from (user_id, month, total) rows, e.g. monthly emissions with a user_id added."""
+        user_ids, origin, values = history_matrix(rows, value)
+        return cls(user_ids, origin, values, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def _add_user(self, user_id: Any) -> int:
+        self._rows[user_id] = len(self.user_ids)
+        self.user_ids.append(user_id)
+        for name in ('points', 'holt_sse', 'holt_errors', 'trend'):
+            setattr(self, name, np.append(getattr(self, name), 0.0))
+        self.sums = np.concatenate([self.sums, np.zeros((len(SUMS), 1, SEASON))], axis=1)
+        self.level = np.append(self.level, np.nan)
+        # No history to choose from yet, so new users get the middle of the grid
+        self.alpha = np.append(self.alpha, self._alphas[len(self._alphas) // 2])
+        self.beta = np.append(self.beta, self._betas[len(self._betas) // 2])
+        self.last = np.append(self.last, -1)
+        return len(self.user_ids) - 1
+
+    def update(self, user_id: Any, month: str, value: float):
+        """Fold in one new monthly total, later than the user's last one, in constant time."""
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._add_user(user_id)
+        x = month_index(month) - self.origin
+        if x <= self.last[row]:
+            raise ValueError(f"{month} is not after the last month fitted for {user_id}")
+
+        season = (self.origin + x) % SEASON
+        self.sums[:, row, season] += (1, x, value, x * x, x * value, value * value)
+
+        gap = x - self.last[row]
+        self.points[row] += 1
+        if self.points[row] == 1:
+            self.level[row] = value
+        elif self.points[row] == 2:
+            self.trend[row] = (value - self.level[row]) / gap
+            self.level[row] = value
+        else:
+            error = value - (self.level[row] + gap * self.trend[row])
+            self.holt_sse[row] += error ** 2
+            self.holt_errors[row] += 1
+            self.level[row] += gap * self.trend[row] + self.alpha[row] * error
+            self.trend[row] += self.alpha[row] * self.beta[row] * error
+        self.last[row] = x
+
+    def _regression(self):
+        """Slope, intercept, residual sum of squares and spread of x per user."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return _least_squares(*self.sums.sum(axis=2))
+
+    def forecast(self, model: str = 'holt', horizon: int = 24,
+                 level: float = 0.8) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Forecast the `horizon` months after each user's last month.
+
+        Returns month indexes, mean, lower and upper bounds of the `level`
+        prediction interval, each users x horizon. Users with fewer than
+        three months of data get NaN.
+        """
+        if model not in MODELS:
+            raise ValueError(f"Unknown forecasting model: {model}. Use one of {', '.join(MODELS)}")
+        steps = np.arange(1, horizon + 1, dtype=float)
+        x = self.last[:, None] + steps
+        months = self.origin + x.astype(int)
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+
+        if model == 'holt':
+            mean = self.level[:, None] + steps * self.trend[:, None]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sigma2 = np.where(self.holt_errors > 0, self.holt_sse / self.holt_errors, np.nan)
+            # Var of an h-step forecast: sigma^2 * (1 + sum_{j<h} alpha^2 (1 + j beta)^2)
+            j = np.arange(horizon, dtype=float)
+            terms = (self.alpha[:, None] ** 2) * (1 + j * self.beta[:, None]) ** 2
+            terms[:, 0] = 1.0
+            variance = sigma2[:, None] * np.cumsum(terms, axis=1)
+            mean = np.where((self.points >= 3)[:, None], mean, np.nan)
+        else:
+            n, sx, sy, sxx, sxy, syy = self.sums.sum(axis=2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                slope, intercept, rss, spread_x = _least_squares(n, sx, sy, sxx, sxy, syy)
+                mean = intercept[:, None] + slope[:, None] * x
+                dof = n - 2
+                extra = np.zeros_like(mean)
+                distance = x - (sx / n)[:, None]
+                if model == 'seasonal':
+                    # Slope shared by all months, one intercept per month of the year
+                    season = months % SEASON
+                    month_n, month_x, month_y, month_xx, month_xy, month_yy = self.sums
+                    present = month_n > 0
+                    safe_n = np.where(present, month_n, 1)
+                    within = [np.where(present, value, 0.0).sum(axis=1) for value in (
+                        month_xx - month_x ** 2 / safe_n, month_xy - month_x * month_y / safe_n,
+                        month_yy - month_y ** 2 / safe_n)]
+                    shared_slope = within[1] / within[0]
+                    month_intercepts = (month_y - shared_slope[:, None] * month_x) / safe_n
+                    seasonal_mean = np.take_along_axis(month_intercepts, season, axis=1) + shared_slope[:, None] * x
+                    seasonal_n = np.take_along_axis(safe_n, season, axis=1)
+                    seasonal_distance = x - np.take_along_axis(month_x / safe_n, season, axis=1)
+
+                    seasonal = ((month_n >= MIN_SEASON_REPEATS).all(axis=1) & (within[0] > 0))[:, None]
+                    mean = np.where(seasonal, seasonal_mean, mean)
+                    extra = np.where(seasonal, 1 / seasonal_n - 1 / n[:, None], 0.0)
+                    distance = np.where(seasonal, seasonal_distance, distance)
+                    spread_x = np.where(seasonal[:, 0], within[0], spread_x)
+                    rss = np.where(seasonal[:, 0], np.maximum(within[2] - shared_slope * within[1], 0.0), rss)
+                    dof = np.where(seasonal[:, 0], n - 1 - SEASON, dof)
+                sigma2 = rss / np.maximum(dof, 1)
+                variance = sigma2[:, None] * (1 + 1 / n[:, None] + extra + distance ** 2 / spread_x[:, None])
+
+        spread = z * np.sqrt(variance)
+        return months, mean, mean - spread, mean + spread
+
+    def goal_dates(self, targets: Sequence[float], model: str = 'holt', horizon: int = 24,
+                   level: float = 0.8) -> List[Dict[str, Any]]:
+        """
+        First forecast month at or below each user's monthly target.
+
+        'expected' is where the forecast mean reaches the target, 'earliest'
+        and 'latest' where the lower and upper interval bounds do. Each is a
+        'YYYY-MM' string, or None if it isn't reached within `horizon` months.
+        """
+        months, mean, lower, upper = self.forecast(model, horizon, level)
+        targets = np.asarray(targets, dtype=float)[:, None]
+
+        def first_month(series: np.ndarray) -> List[Optional[str]]:
+            reached = series <= targets
+            first = np.argmax(reached, axis=1)
+            return [month_label(int(months[row, first[row]])) if reached[row].any() else None
+                    for row in range(len(self.user_ids))]
+
+        return [{'user_id': user_id, 'expected': expected, 'earliest': earliest, 'latest': latest}
+                for user_id, expected, earliest, latest in zip(
+                    self.user_ids, first_month(mean), first_month(lower), first_month(upper))]
+
+    def trend_per_month(self, model: str = 'holt') -> np.ndarray:
+        """Current trend in kg CO₂ per month for each user (NaN below three months of data)."""
+        if model == 'holt':
+            return np.where(self.points >= 3, self.trend, np.nan)
+        return self._regression()[0]
+
+
+def digest(conn: sqlite3.Connection, months: int = 36, model: str = 'holt',
+           horizon: int = 24) -> List[Dict[str, Any]]:
+    """Goal forecasts for every DatabaseAuth user with goals (users.db)."""
+    batch = ForecastBatch.from_rows(all_users_monthly_emissions(conn, months))
+    # Latest goals per user; users without goals are left out
+    goals = {user_id: (annual, monthly) for user_id, annual, monthly in conn.execute("""
+        SELECT user_id, annual_target, monthly_target FROM user_goals
+        WHERE id IN (SELECT MAX(id) FROM user_goals GROUP BY user_id)
+    """)}
+    user_goals = [goals.get(user_id, (None, None)) for user_id in batch.user_ids]
+
+    monthly = batch.goal_dates([monthly or np.nan for _, monthly in user_goals], model, horizon)
+    annual = batch.goal_dates([annual_to_monthly(annual) if annual else np.nan for annual, _ in user_goals],
+                              model, horizon)
+    trend = batch.trend_per_month(model)
+    return [{
+        'user_id': user_id,
+        'trend_per_month': None if np.isnan(trend[row]) else round(float(trend[row]), 2),
+        'monthly_target': {key: monthly[row][key] for key in ('expected', 'earliest', 'latest')},
+        'annual_target': {key: annual[row][key] for key in ('expected', 'earliest', 'latest')},
+    } for row, user_id in enumerate(batch.user_ids) if user_id in goals]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast when each user reaches their emission goals.")
+    parser.add_argument('--users-db', default='users.db')
+    parser.add_argument('--months', type=int, default=36, help="History to fit, in months")
+    parser.add_argument('--model', choices=MODELS, default='holt')
+    parser.add_argument('--horizon', type=int, default=24, help="Months to look ahead")
+    args = parser.parse_args()
+
+    with sqlite3.connect(args.users_db) as conn:
+        for entry in digest(conn, args.months, args.model, args.horizon):
+            print(json.dumps(entry))
+
+
+if __name__ == "__main__":
+    main()
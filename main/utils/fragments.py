@@ -0,0 +1,19 @@
+"""
+Fragment decorator that works across the Streamlit versions we support.
+
+A fragment reruns on its own when one of its widgets changes, instead of
+rerunning the whole page script (imports, auth lookups, every other
+section). Streamlit 1.33-1.36 call it st.experimental_fragment; 1.37+ call
+it st.fragment. Without either, the function simply runs as part of the page.
+"""
+
+import streamlit as st
+
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+
+def fragment(func):
+    """Run `func` as a Streamlit fragment where supported."""
+    if _fragment is None:
+        return func
+    return _fragment(func)
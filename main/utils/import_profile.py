@@ -0,0 +1,95 @@
+"""
+Import-time profiling for the Streamlit entry point and pages.
+
+Runs the module-level imports of a script in a fresh interpreter with
+``-X importtime`` and parses the report, so cold-start cost can be
+measured per module and checked against a budget. Modules in ``preload``
+(e.g. streamlit itself, which ``streamlit run`` imports before any page)
+are imported first and left out of the totals.
+
+The same parser reads the log of a real server start:
+    PYTHONPROFILEIMPORTTIME=1 streamlit run streamlit_app.py 2> importtime.log
+"""
+
+import ast
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# Libraries a page should only load when it draws a chart or talks to Supabase
+HEAVY_MODULES = ('pandas', 'numpy', 'plotly', 'pyarrow', 'supabase')
+
+MARKER = "-- startup imports --"
+ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(text: str) -> List[ImportTiming]:
+    """Parse ``-X importtime`` output (lines after MARKER only, if present)."""
+    if MARKER in text:
+        text = text.split(MARKER, 1)[1]
+    timings = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip(" ")
+        # Nesting is shown as two extra spaces per level after the one separator
+        depth = (len(name) - len(stripped) - 1) // 2
+        timings.append(ImportTiming(stripped.rstrip(), int(self_us), int(cumulative_us), depth))
+    return timings
+
+
+def script_imports(path: Path) -> List[str]:
+    """Module-level import statements of a script, as source lines."""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def profile_imports(statements: Iterable[str], preload: Iterable[str] = (),
+                    python: str = sys.executable, cwd: Optional[Path] = None) -> List[ImportTiming]:
+    """Run import statements in a fresh interpreter and return their timings."""
+    code = "\n".join([
+        *(f"import {module}" for module in preload),
+        f"import sys; sys.stderr.write({MARKER!r} + '\\n')",
+        *statements,
+    ])
+    result = subprocess.run([python, "-X", "importtime", "-c", code], cwd=cwd or ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("Import failed:\n" + "\n".join(errors[-10:]))
+    return parse_importtime(result.stderr)
+
+
+def total_ms(timings: List[ImportTiming]) -> float:
+    """Wall time of all imports in the report (top-level cumulative times)."""
+    return sum(t.cumulative_us for t in timings if t.depth == 0) / 1000
+
+
+def loaded_packages(timings: List[ImportTiming]) -> Dict[str, float]:
+    """Top-level packages loaded, with the cumulative ms of their root module."""
+    packages = {}
+    for timing in timings:
+        if "." not in timing.module:
+            packages[timing.module] = max(packages.get(timing.module, 0.0), timing.cumulative_us / 1000)
+    return packages
+
+
+def format_report(title: str, timings: List[ImportTiming], top: int = 15) -> str:
+    """Total import time and the slowest modules by cumulative time."""
+    lines = [f"{title}: {total_ms(timings):.1f}ms, {len(timings)} modules"]
+    heavy = sorted(set(loaded_packages(timings)) & set(HEAVY_MODULES))
+    if heavy:
+        lines.append(f"  heavy libraries loaded: {', '.join(heavy)}")
+    for timing in sorted(timings, key=lambda t: t.cumulative_us, reverse=True)[:top]:
+        lines.append(f"  {timing.cumulative_us / 1000:9.1f}ms  {timing.self_us / 1000:8.1f}ms self  "
+                     f"{'  ' * timing.depth}{timing.module}")
+    return "\n".join(lines)
@@ -0,0 +1,56 @@
+"""
+Streamlit caches for reference data and chart builds.
+
+Reference data (emission factors and benchmarks) is read-only and held once
+per process with st.cache_resource. Figures and frames are cached with
+st.cache_data keyed by their input values, so a rerun that doesn't change
+the numbers skips pandas and plotly entirely. The caches are shared by all
+sessions: entries depend only on the values passed in, never on who asked.
+Each cache keeps at most CHART_CACHE_ENTRIES entries for CHART_CACHE_TTL
+seconds, which bounds memory however many users are active.
+"""
+
+import os
+from typing import Any, Dict
+
+import streamlit as st
+
+from main.utils import charts
+
+CHART_CACHE_ENTRIES = int(os.getenv('CHART_CACHE_ENTRIES', '256'))
+CHART_CACHE_TTL = float(os.getenv('CHART_CACHE_TTL', '3600'))
+# Points per history line; longer histories are downsampled
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS', '500'))
+
+
+@st.cache_resource
+def get_reference_data() -> Dict[str, Any]:
+    """Emission factors and benchmarks, loaded once per process."""
+    from main.data.emission_factors import emission_factors
+    return emission_factors
+
+
+def get_benchmarks() -> Dict[str, float]:
+    """Monthly per-person benchmarks (kg CO₂) for comparison charts."""
+    return get_reference_data()['benchmarks']
+
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, ttl=CHART_CACHE_TTL, show_spinner=False)
+def breakdown_figure(transport: float, energy: float, food: float):
+    return charts.breakdown_figure(transport, energy, food)
+
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, ttl=CHART_CACHE_TTL, show_spinner=False)
+def benchmark_figure(total_emissions: float):
+    return charts.benchmark_figure(total_emissions, get_benchmarks())
+
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, ttl=CHART_CACHE_TTL, show_spinner=False)
+def goal_progress_figure(current_total: float, target: float):
+    return charts.goal_progress_figure(current_total, target)
+
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, ttl=CHART_CACHE_TTL, show_spinner=False)
+def progress_history_figure(frame, timeframe: str = 'day'):
+    # Keyed by the frame's contents; saved histories can be long, so the figure is downsampled
+    return charts.progress_history_figure(frame, timeframe, max_points=CHART_MAX_POINTS)
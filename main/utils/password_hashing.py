@@ -0,0 +1,142 @@
+"""
+Password hashing with a memory-hard KDF (scrypt) run off the request thread.
+
+Hashes are stored as ``scrypt$<log2 N>$<r>$<p>$<salt>$<hash>`` (base64 parts),
+so the cost can be raised later without invalidating existing passwords.
+Legacy single-round salted SHA-256 hex digests are still accepted and are
+reported as needing a rehash, so callers can upgrade them on the next login.
+
+Hashing runs in a bounded process pool: a burst of logins uses at most
+``max_workers`` cores instead of stalling every Streamlit/API thread.
+"""
+
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+SCHEME = "scrypt"
+DEFAULT_COST = int(os.getenv('PASSWORD_HASH_COST', '14'))  # log2 of the scrypt N parameter
+DEFAULT_BLOCK_SIZE = 8
+DEFAULT_PARALLELISM = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, cost: int, r: int, p: int) -> bytes:
+    n = 2 ** cost
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n + 1024 * 1024, dklen=KEY_BYTES)
+
+
+def hash_password(password: str, cost: int = DEFAULT_COST,
+                  r: int = DEFAULT_BLOCK_SIZE, p: int = DEFAULT_PARALLELISM) -> str:
+    """Hash a password with a fresh random salt."""
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, cost, r, p)
+    return f"{SCHEME}${cost}${r}${p}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def verify_password(password: str, stored_hash: str, legacy_salt: Optional[str] = None,
+                    cost: int = DEFAULT_COST, r: int = DEFAULT_BLOCK_SIZE,
+                    p: int = DEFAULT_PARALLELISM) -> Tuple[bool, bool]:
+    """
+    Check a password against a stored hash.
+
+    :param legacy_salt: Salt used by the old SHA-256 scheme, if it may be present.
+    :param cost: The currently configured cost; hashes made with other
+        parameters (cost, r or p) need a rehash.
+    :return: (valid, needs_rehash)
+    """
+    if stored_hash.startswith(SCHEME + "$"):
+        try:
+            _, hash_cost, hash_r, hash_p, salt, key = stored_hash.split("$")
+            params = (int(hash_cost), int(hash_r), int(hash_p))
+        except ValueError:
+            return False, False
+        candidate = _scrypt(password, _b64decode(salt), *params)
+        valid = hmac.compare_digest(candidate, _b64decode(key))
+        return valid, valid and params != (cost, r, p)
+
+    if legacy_salt is not None:
+        legacy_hash = hashlib.sha256((password + legacy_salt).encode()).hexdigest()
+        valid = hmac.compare_digest(legacy_hash, stored_hash)
+        return valid, valid
+
+    return False, False
+
+
+class HashingService:
+    """Runs password hashing in a bounded process pool."""
+
+    def __init__(self, max_workers: Optional[int] = None, cost: int = DEFAULT_COST,
+                 max_pending: Optional[int] = None, r: int = DEFAULT_BLOCK_SIZE,
+                 p: int = DEFAULT_PARALLELISM):
+        """
+        :param max_workers: Worker processes (defaults to PASSWORD_HASH_WORKERS or 2).
+        :param cost: log2 of the scrypt N parameter for new hashes.
+        :param max_pending: Jobs allowed in flight before callers wait (defaults to 4x workers).
+        :param r: scrypt block size for new hashes.
+        :param p: scrypt parallelism for new hashes.
+        """
+        self.max_workers = max_workers or int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+        self.cost, self.r, self.p = cost, r, p
+        # Spawned, not forked: forking the multi-threaded server can copy a lock
+        # another thread holds into the worker, which then deadlocks on it
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        self._slots = threading.BoundedSemaphore(max_pending or self.max_workers * 4)
+
+    def _submit(self, fn, *args) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash_async(self, password: str) -> Future:
+        """Hash a password in the pool; the future resolves to the encoded hash."""
+        return self._submit(hash_password, password, self.cost, self.r, self.p)
+
+    def verify_async(self, password: str, stored_hash: str, legacy_salt: Optional[str] = None) -> Future:
+        """Verify a password in the pool; the future resolves to (valid, needs_rehash)."""
+        return self._submit(verify_password, password, stored_hash, legacy_salt, self.cost, self.r, self.p)
+
+    def hash(self, password: str) -> str:
+        """Hash a password, waiting for the pool."""
+        return self.hash_async(password).result()
+
+    def verify(self, password: str, stored_hash: str, legacy_salt: Optional[str] = None) -> Tuple[bool, bool]:
+        """Verify a password, waiting for the pool."""
+        return self.verify_async(password, stored_hash, legacy_salt).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_service: Optional[HashingService] = None
+_service_lock = threading.Lock()
+
+
+def get_hashing_service() -> HashingService:
+    """Get the process-wide hashing service."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = HashingService()
+        return _service
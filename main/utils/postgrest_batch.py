@@ -0,0 +1,121 @@
+"""
+Batching PostgREST client for Supabase writes.
+
+Rows for the same table are grouped into multi-row requests (one JSON
+array per request instead of one request per row), sent over a pooled
+keep-alive HTTP connection, and independent requests (other tables or
+further chunks) are sent concurrently. Rows carrying their own primary key
+can be inserted with ``on_conflict`` so a retried batch skips the rows an
+earlier attempt already wrote.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PostgrestError(Exception):
+    """A PostgREST request failed."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"PostgREST error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class PostgrestBatchWriter:
+    """Sends multi-row inserts/upserts to PostgREST over pooled connections."""
+
+    def __init__(self, base_url: str, api_key: str, access_token: Optional[str] = None,
+                 max_rows_per_request: int = 500, max_concurrency: int = 4,
+                 timeout: float = 10.0):
+        """
+        :param base_url: Supabase project URL (PostgREST lives under /rest/v1).
+        :param api_key: Project API key (anon or service role).
+        :param access_token: User JWT for RLS; defaults to the API key.
+        :param max_rows_per_request: Rows per request before splitting.
+        :param max_concurrency: Requests in flight (and pooled connections).
+        :param timeout: Per-request timeout in seconds.
+        """
+        self.rest_url = base_url.rstrip('/') + '/rest/v1'
+        self.max_rows_per_request = max_rows_per_request
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'apikey': api_key,
+            'Authorization': f"Bearer {access_token or api_key}",
+            'Content-Type': 'application/json',
+        })
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix='postgrest')
+
+    def _post(self, table: str, rows: List[Dict[str, Any]], on_conflict: Optional[str],
+              access_token: Optional[str], ignore_duplicates: bool = False):
+        headers = {'Prefer': 'return=minimal'}
+        if access_token:
+            headers['Authorization'] = f"Bearer {access_token}"
+        params = {}
+        if on_conflict:
+            resolution = 'ignore-duplicates' if ignore_duplicates else 'merge-duplicates'
+            headers['Prefer'] += f',resolution={resolution}'
+            params['on_conflict'] = on_conflict
+
+        response = self.session.post(
+            f"{self.rest_url}/{table}",
+            data=json.dumps(rows, default=str),
+            headers=headers,
+            params=params,
+            timeout=self.timeout,
+        )
+        if response.status_code >= 300:
+            raise PostgrestError(response.status_code, response.text)
+
+    def write(self, batches: Dict[str, List[Dict[str, Any]]],
+              on_conflict: Optional[Dict[str, str]] = None,
+              access_token: Optional[str] = None, ignore_duplicates: bool = False) -> int:
+        """
+        Write rows for several tables; chunks and tables are sent concurrently.
+
+        :param batches: Table name -> rows to insert.
+        :param on_conflict: Table name -> conflict columns, to upsert instead of insert.
+        :param access_token: User JWT for these requests, overriding the default.
+        :param ignore_duplicates: Skip rows that conflict instead of updating them.
+        :return: Number of rows written. Raises PostgrestError once every request
+                 has finished if any of them failed; the others are not rolled back.
+        """
+        on_conflict = on_conflict or {}
+        futures = []
+        written = 0
+        for table, rows in batches.items():
+            for start in range(0, len(rows), self.max_rows_per_request):
+                chunk = rows[start:start + self.max_rows_per_request]
+                futures.append(self._executor.submit(self._post, table, chunk, on_conflict.get(table),
+                                                    access_token, ignore_duplicates))
+                written += len(chunk)
+
+        # Wait for every request so the caller's retry doesn't race ones still in flight
+        failed = [future.exception() for future in futures if future.exception() is not None]
+        if failed:
+            raise failed[0]
+        return written
+
+    def insert(self, table: str, rows: List[Dict[str, Any]], access_token: Optional[str] = None,
+               on_conflict: Optional[str] = None) -> int:
+        """Insert rows into one table, skipping rows whose `on_conflict` columns already exist."""
+        return self.write({table: rows}, on_conflict={table: on_conflict} if on_conflict else None,
+                          access_token=access_token, ignore_duplicates=True)
+
+    def upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str,
+               access_token: Optional[str] = None) -> int:
+        """Insert or update rows in one table, keyed by `on_conflict` columns."""
+        return self.write({table: rows}, on_conflict={table: on_conflict}, access_token=access_token)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,152 @@
+"""
+Bounded per-session history of goal progress snapshots.
+
+The goals page saves every snapshot to the persistence backend as it is
+taken and keeps only the latest ``capacity`` in the session; older ones are
+dropped from memory and read back from storage when the history is shown.
+Running totals cover every snapshot added this session, so the
+page's statistics stay exact without holding the full history, and the
+history DataFrame is updated one row at a time instead of being rebuilt.
+Live histories are registered per session so the admin panel can report
+how much memory each session holds.
+"""
+
+import os
+import sys
+import threading
+import weakref
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from main.utils.charts import ProgressPoint, progress_history_frame
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# session id -> history, dropped automatically when the session goes away
+_registry: "weakref.WeakValueDictionary[str, ProgressHistory]" = weakref.WeakValueDictionary()
+_registry_lock = threading.Lock()
+
+
+class ProgressHistory:
+    """Ring buffer of progress entries with running statistics."""
+
+    def __init__(self, capacity: int = 50, owner: Optional[str] = None):
+        self.capacity = capacity
+        self.owner = owner
+        self._entries: deque = deque()
+        self._frame: Optional["pd.DataFrame"] = None
+        self.count = 0
+        self.spilled = 0
+        self.met_count = 0
+        self.total_sum = 0.0
+        self.first_total: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Add an entry and return the entries dropped to stay within capacity."""
+        self._entries.append(entry)
+        self.count += 1
+        self.total_sum += entry['total']
+        self.met_count += bool(entry['total'] <= entry['target'])
+        if self.first_total is None:
+            self.first_total = entry['total']
+
+        evicted = []
+        while len(self._entries) > self.capacity:
+            evicted.append(self._entries.popleft())
+        self.spilled += len(evicted)
+
+        if self._frame is not None:
+            self._frame = self._frame_append(self._frame, entry, len(evicted))
+        return evicted
+
+    def entries(self) -> List[Dict[str, Any]]:
+        return list(self._entries)
+
+    def ids(self) -> Set[str]:
+        """Ids of the entries in memory, to tell them apart from saved copies."""
+        return {entry['id'] for entry in self._entries if 'id' in entry}
+
+    def points(self) -> List[Tuple[str, float, float]]:
+        """(date, total, target) per entry in memory, oldest first."""
+        return [(entry['date'], entry['total'], entry['target']) for entry in self._entries]
+
+    @staticmethod
+    def _frame_append(frame: "pd.DataFrame", entry: Dict[str, Any], evicted: int) -> "pd.DataFrame":
+        import pandas as pd
+
+        row = progress_history_frame([(entry['date'], entry['total'], entry['target'])])
+        if evicted:
+            frame = frame.iloc[evicted:]
+        return pd.concat([frame, row], ignore_index=True)
+
+    def frame(self) -> "pd.DataFrame":
+        """Entries in memory as a DataFrame (date, total, target); don't modify it in place."""
+        if self._frame is None:
+            self._frame = progress_history_frame(self.points())
+        return self._frame
+
+    def frame_with(self, saved: List[ProgressPoint]) -> "pd.DataFrame":
+        """Saved points (e.g. older entries read back from the user's profile) followed by the entries in memory."""
+        if not saved:
+            return self.frame()
+        import pandas as pd
+
+        return pd.concat([progress_history_frame(saved), self.frame()], ignore_index=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistics over every entry added, including spilled ones."""
+        if not self.count:
+            return {'count': 0, 'average': 0.0, 'success_rate': 0.0, 'trend': 0.0}
+        return {
+            'count': self.count,
+            'average': self.total_sum / self.count,
+            'success_rate': self.met_count / self.count * 100,
+            'trend': self._entries[-1]['total'] - self.first_total,
+        }
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the entries and the cached DataFrame."""
+        size = sys.getsizeof(self._entries)
+        for entry in self._entries:
+            size += sys.getsizeof(entry) + sum(sys.getsizeof(value) for value in entry.values())
+        if self._frame is not None:
+            size += int(self._frame.memory_usage(deep=True).sum())
+        return size
+
+
+def register_history(session_id: str, history: ProgressHistory):
+    with _registry_lock:
+        _registry[session_id] = history
+
+
+def session_memory_report() -> List[Dict[str, Any]]:
+    """Progress history held by each live session, largest first."""
+    with _registry_lock:
+        histories = list(_registry.items())
+    report = [{
+        'session': session_id,
+        'user': history.owner,
+        'entries': len(history),
+        'spilled': history.spilled,
+        'bytes': history.memory_bytes(),
+    } for session_id, history in histories]
+    return sorted(report, key=lambda row: row['bytes'], reverse=True)
+
+
+def get_progress_history(owner: Optional[str] = None) -> ProgressHistory:
+    """Get the current Streamlit session's history, starting a new one when the user changes."""
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    history = st.session_state.get('progress_history')
+    if history is None or history.owner != owner:
+        history = ProgressHistory(capacity=int(os.getenv('PROGRESS_HISTORY_SIZE', '50')), owner=owner)
+        st.session_state.progress_history = history
+
+    ctx = get_script_run_ctx()
+    register_history(ctx.session_id if ctx else 'local', history)
+    return history
@@ -0,0 +1,130 @@
+"""
+Mergeable quantile sketch for population percentiles.
+
+Values are counted in logarithmic buckets (the DDSketch layout): bucket i
+holds values in (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so
+every quantile is returned within relative error ``a`` of a true value. A
+rank is off by at most the share of values within that margin of the
+query, and usually far less since ranks interpolate within the bucket.
+Sketches merge by adding bucket counts, which is what lets the database
+keep one sketch per category and month with a plain ``count = count + n``
+upsert on the insert path (see section 14 of supabase_schema.sql) and lets
+the app sum a few months at read time.
+Bucket math here matches ``emission_sketch_bucket()`` in the schema.
+
+Size depends only on the spread of values, not on how many were added: at
+1% accuracy, 0.01 kg to 100 t spans under 800 buckets.
+"""
+
+import math
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+RELATIVE_ACCURACY = 0.01
+# Smaller values (including zero) share the lowest bucket
+MIN_VALUE = 0.01
+
+
+class QuantileSketch:
+    """Log-bucketed value counts with rank and quantile queries."""
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY, min_value: float = MIN_VALUE):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self._cdf: Optional[Tuple[List[int], List[int]]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def bucket(self, value: float) -> int:
+        return math.ceil(math.log(max(value, self.min_value)) / self._log_gamma)
+
+    def bucket_value(self, index: int) -> float:
+        """Representative value of a bucket, within relative_accuracy of anything in it."""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add_bucket(self, index: int, count: int):
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self._cdf = None
+
+    def add(self, value: float, count: int = 1):
+        self.add_bucket(self.bucket(value), count)
+
+    def extend(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Add another sketch's counts to this one and return self."""
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Cannot merge sketches with different accuracy settings")
+        for index, count in other.counts.items():
+            self.add_bucket(index, count)
+        return self
+
+    def _cumulative(self) -> Tuple[List[int], List[int]]:
+        """Bucket indexes in order with running counts (cached until the next change)."""
+        if self._cdf is None:
+            indexes = sorted(self.counts)
+            self._cdf = (indexes, list(accumulate(self.counts[index] for index in indexes)))
+        return self._cdf
+
+    def rank(self, value: float) -> float:
+        """Estimated fraction of values less than or equal to `value` (0 for an empty sketch)."""
+        if not self.count:
+            return 0.0
+        indexes, cumulative = self._cumulative()
+        index = self.bucket(value)
+        position = bisect_right(indexes, index)
+        if not position or indexes[position - 1] != index:
+            return (cumulative[position - 1] if position else 0) / self.count
+
+        # Values at or below min_value are counted as equal; otherwise the
+        # value's own bucket is spread evenly over its log range
+        below = cumulative[position - 2] if position > 1 else 0
+        within = 1.0 if value <= self.min_value else math.log(value) / self._log_gamma - (index - 1)
+        return (below + self.counts[index] * min(max(within, 0.0), 1.0)) / self.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile `q` (0..1), or None for an empty sketch."""
+        if not self.count:
+            return None
+        indexes, cumulative = self._cumulative()
+        target = min(max(q, 0.0), 1.0) * (self.count - 1)
+        position = bisect_right(cumulative, target)
+        return self.bucket_value(indexes[min(position, len(indexes) - 1)])
+
+    def to_rows(self) -> List[Dict[str, int]]:
+        return [{'bucket': index, 'count': count} for index, count in sorted(self.counts.items())]
+
+
+def sketches_from_rows(rows: Iterable[Dict[str, Any]]) -> Dict[str, QuantileSketch]:
+    """Build one sketch per category from get_emission_sketch() RPC rows (category, bucket, count)."""
+    sketches: Dict[str, QuantileSketch] = {}
+    for row in rows:
+        sketch = sketches.setdefault(row['category'], QuantileSketch())
+        sketch.add_bucket(int(row['bucket']), int(row['count']))
+    return sketches
+
+
+def percentile_ranks(values: Dict[str, float], sketches: Dict[str, QuantileSketch]) -> Dict[str, Optional[float]]:
+    """Percentile (0-100) of each category value among everyone's, or None without data."""
+    return {category: sketches[category].rank(value) * 100 if category in sketches and sketches[category].count else None
+            for category, value in values.items()}
+
+
+def ordinal(number: int) -> str:
+    """1 -> '1st', 2 -> '2nd', 11 -> '11th', 22 -> '22nd'."""
+    if 10 <= number % 100 <= 20:
+        suffix = 'th'
+    else:
+        suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f"{number}{suffix}"
@@ -0,0 +1,243 @@
+"""
+Retention and compaction for raw emission records.
+
+Raw rows older than a retention window are archived to gzip-compressed
+JSON lines files, folded into monthly rollup tables and deleted in short
+chunked transactions. Freed pages are then returned to the filesystem with
+an incremental VACUUM, so table size and query latency stay bounded.
+Old demo accounts are removed the same way, together with their data.
+
+Usage:
+    python -m main.utils.retention --users-db users.db --emissions-db emissions.db --keep-days 90
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Monthly rollups for DatabaseAuth.user_emissions (users.db)
+USER_EMISSIONS_ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS user_emissions_monthly (
+        user_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        transport_emissions REAL DEFAULT 0,
+        energy_emissions REAL DEFAULT 0,
+        food_emissions REAL DEFAULT 0,
+        total_emissions REAL DEFAULT 0,
+        record_count INTEGER DEFAULT 0,
+        PRIMARY KEY (user_id, month),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+"""
+
+# Monthly rollups for EmissionDatabase.emissions (emissions.db)
+EMISSIONS_ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS emissions_monthly (
+        month TEXT PRIMARY KEY,
+        transport_emissions REAL DEFAULT 0,
+        energy_emissions REAL DEFAULT 0,
+        food_emissions REAL DEFAULT 0,
+        total_emissions REAL DEFAULT 0,
+        calculation_count INTEGER DEFAULT 0
+    )
+"""
+
+# Anomaly flags on DatabaseAuth.user_emissions (set by main.utils.anomaly).
+# Flagged rows stay raw and out of the rollups until they are reviewed.
+FLAG_COLUMNS = {'flagged': 'BOOLEAN DEFAULT 0', 'reviewed': 'BOOLEAN DEFAULT 0'}
+
+_SUM_COLUMNS = ['transport_emissions', 'energy_emissions', 'food_emissions', 'total_emissions']
+
+# Extra condition on the rows a table may compact
+_COMPACTABLE = {'user_emissions': 'AND NOT flagged', 'emissions': ''}
+
+_ROLLUP_SQL = {
+    'user_emissions': """
+        INSERT INTO user_emissions_monthly
+            (user_id, month, transport_emissions, energy_emissions, food_emissions,
+             total_emissions, record_count)
+        SELECT user_id, substr(date, 1, 7), SUM(transport_emissions), SUM(energy_emissions),
+               SUM(food_emissions), SUM(total_emissions), COUNT(*)
+        FROM user_emissions
+        WHERE id BETWEEN ? AND ? AND date < ? AND NOT flagged
+        GROUP BY user_id, substr(date, 1, 7)
+        ON CONFLICT(user_id, month) DO UPDATE SET
+            {updates},
+            record_count = record_count + excluded.record_count
+    """,
+    'emissions': """
+        INSERT INTO emissions_monthly
+            (month, transport_emissions, energy_emissions, food_emissions,
+             total_emissions, calculation_count)
+        SELECT substr(date, 1, 7), SUM(transport_emissions), SUM(energy_emissions),
+               SUM(food_emissions), SUM(total_emissions), COUNT(*)
+        FROM emissions
+        WHERE id BETWEEN ? AND ? AND date < ?
+        GROUP BY substr(date, 1, 7)
+        ON CONFLICT(month) DO UPDATE SET
+            {updates},
+            calculation_count = calculation_count + excluded.calculation_count
+    """,
+}
+
+
+def _rollup_sql(table: str) -> str:
+    updates = ",\n            ".join(f"{c} = {c} + excluded.{c}" for c in _SUM_COLUMNS)
+    return _ROLLUP_SQL[table].format(updates=updates)
+
+
+def add_flag_columns(conn: sqlite3.Connection) -> None:
+    """Add the anomaly flag columns to user_emissions tables created before they existed."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(user_emissions)")}
+    for name, ddl in FLAG_COLUMNS.items():
+        if name not in columns:
+            conn.execute(f"ALTER TABLE user_emissions ADD COLUMN {name} {ddl}")
+
+
+def _archive_rows(archive_dir: Path, table: str, rows: List[Dict]) -> None:
+    """Append rows to per-month gzip JSON lines files and sync them to disk."""
+    by_month: Dict[str, List[Dict]] = {}
+    for row in rows:
+        by_month.setdefault(str(row['date'])[:7], []).append(row)
+
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    for month, month_rows in by_month.items():
+        path = archive_dir / f"{table}-{month}.jsonl.gz"
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            for row in month_rows:
+                f.write(json.dumps(row) + "\n")
+        with open(path, 'rb') as f:
+            os.fsync(f.fileno())
+
+
+def compact_table(conn: sqlite3.Connection, table: str, keep_days: int,
+                  archive_dir: str = "archive", chunk_size: int = 1000) -> Dict[str, int]:
+    """
+    Archive, roll up and delete rows of `table` older than `keep_days`.
+
+    Each chunk is archived before its transaction commits, so a crash can at
+    worst leave duplicate lines in the archive, never lose data.
+    """
+    cutoff = (datetime.now().date() - timedelta(days=keep_days)).isoformat()
+    rollup_sql = _rollup_sql(table)
+    keep = _COMPACTABLE[table]
+    conn.row_factory = sqlite3.Row
+
+    compacted = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT * FROM {table}
+            WHERE id > ? AND date < ? {keep}
+            ORDER BY id
+            LIMIT ?
+        """, (last_id, cutoff, chunk_size)).fetchall()
+        if not rows:
+            break
+
+        rows = [dict(row) for row in rows]
+        first_id, last_id = rows[0]['id'], rows[-1]['id']
+
+        _archive_rows(Path(archive_dir), table, rows)
+        with conn:
+            conn.execute(rollup_sql, (first_id, last_id, cutoff))
+            conn.execute(f"DELETE FROM {table} WHERE id BETWEEN ? AND ? AND date < ? {keep}",
+                         (first_id, last_id, cutoff))
+        compacted += len(rows)
+
+    return {'compacted': compacted}
+
+
+def reclaim_space(conn: sqlite3.Connection) -> int:
+    """
+    Return free pages to the filesystem and report how many were freed.
+
+    Databases created before incremental auto-vacuum was enabled are switched
+    over with a one-time full VACUUM.
+    """
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        conn.execute("PRAGMA incremental_vacuum")
+    free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return max(free_before - free_after, 0)
+
+
+# DatabaseAuth tables whose rows are removed together with their user
+USER_DEPENDENT_TABLES = ['user_emissions', 'user_emissions_monthly', 'user_goals', 'user_sessions']
+
+
+def delete_demo_users(conn: sqlite3.Connection, days_old: int = 1, chunk_size: int = 500,
+                      progress_callback: Optional[Callable[[int, int, float], None]] = None) -> int:
+    """
+    Remove demo users older than `days_old` days, together with their data.
+
+    Users are deleted in chunks of `chunk_size`, each in its own short
+    transaction, so the write lock is never held for long. After every
+    chunk `progress_callback(deleted, total, users_per_second)` is called.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days_old)).strftime("%Y-%m-%d %H:%M:%S")
+    # Both queries are served by idx_users_demo_created
+    total = conn.execute("SELECT COUNT(*) FROM users WHERE is_demo = 1 AND created_at < ?", (cutoff,)).fetchone()[0]
+    deleted = 0
+    start = time.perf_counter()
+    while True:
+        user_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM users WHERE is_demo = 1 AND created_at < ? LIMIT ?", (cutoff, chunk_size))]
+        if not user_ids:
+            return deleted
+        placeholders = ",".join("?" * len(user_ids))
+        with conn:
+            for table in USER_DEPENDENT_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE user_id IN ({placeholders})", user_ids)
+            conn.execute(f"DELETE FROM users WHERE id IN ({placeholders})", user_ids)
+        deleted += len(user_ids)
+        if progress_callback:
+            elapsed = time.perf_counter() - start
+            progress_callback(deleted, total, deleted / elapsed if elapsed else 0.0)
+
+
+def compact_database(db_path: str, table: str, keep_days: int = 90,
+                     archive_dir: str = "archive", chunk_size: int = 1000) -> Dict[str, int]:
+    """Run compaction and space reclamation for one database file."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if table == 'user_emissions':
+            conn.execute(USER_EMISSIONS_ROLLUP_DDL)
+            add_flag_columns(conn)
+        else:
+            conn.execute(EMISSIONS_ROLLUP_DDL)
+        stats = compact_table(conn, table, keep_days, archive_dir, chunk_size)
+        stats['pages_freed'] = reclaim_space(conn)
+        return stats
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old emission records into monthly rollups.")
+    parser.add_argument('--users-db', default='users.db')
+    parser.add_argument('--emissions-db', default='emissions.db')
+    parser.add_argument('--keep-days', type=int, default=int(os.getenv('EMISSION_RETENTION_DAYS', '90')))
+    parser.add_argument('--archive-dir', default='archive')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    for db_path, table in [(args.users_db, 'user_emissions'), (args.emissions_db, 'emissions')]:
+        if not Path(db_path).exists():
+            print(f"Skipping {db_path}: not found")
+            continue
+        stats = compact_database(db_path, table, args.keep_days, args.archive_dir, args.chunk_size)
+        print(f"{db_path}: compacted {stats['compacted']} rows, freed {stats['pages_freed']} pages")
+
+
+if __name__ == "__main__":
+    main()
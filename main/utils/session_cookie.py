@@ -0,0 +1,62 @@
+"""
+Session token carried in a browser cookie, so a login survives reloads and
+works on whichever server worker the next connection lands on.
+
+Streamlit scripts never get an HTTP response to add a Set-Cookie header to,
+so the cookie is read from the headers of the page's websocket request and
+written by a zero-height component running ``document.cookie``. It is
+SameSite=Strict, Secure on HTTPS, and expires with the server-side session.
+Being written from script, it can't be HttpOnly; only the token's digest is
+stored, and logging out revokes it server-side as well as deleting it.
+"""
+
+import json
+from http.cookies import CookieError, SimpleCookie
+from typing import Optional
+
+COOKIE_NAME = "emission_session"
+
+
+def parse_cookie(header: str, name: str = COOKIE_NAME) -> Optional[str]:
+    """Value of cookie `name` in a Cookie request header, if present."""
+    cookies = SimpleCookie()
+    try:
+        cookies.load(header or "")
+    except CookieError:
+        return None
+    morsel = cookies.get(name)
+    return morsel.value if morsel and morsel.value else None
+
+
+def cookie_script(token: Optional[str], max_age: int, name: str = COOKIE_NAME) -> str:
+    """Script setting the cookie to `token` for `max_age` seconds, or deleting it when token is None."""
+    value = token if token else ""
+    age = int(max_age) if token else 0
+    return (
+        "<script>"
+        "const secure = window.parent.location.protocol === 'https:' ? '; Secure' : '';"
+        f"window.parent.document.cookie = {json.dumps(name)} + '=' + {json.dumps(value)}"
+        f" + '; Max-Age={age}; Path=/; SameSite=Strict' + secure;"
+        "</script>"
+    )
+
+
+def read_session_cookie() -> Optional[str]:
+    """The session token sent by the browser with this page load."""
+    import streamlit as st
+
+    context = getattr(st, 'context', None)
+    if context is not None and hasattr(context, 'cookies'):
+        return context.cookies.get(COOKIE_NAME) or None
+
+    # Streamlit before 1.37 only exposes the raw request headers
+    from streamlit.web.server.websocket_headers import _get_websocket_headers
+    headers = _get_websocket_headers() or {}
+    return parse_cookie(headers.get('Cookie', ''))
+
+
+def write_session_cookie(token: Optional[str], max_age: int):
+    """Set (or with None, delete) the session cookie in the browser."""
+    import streamlit.components.v1 as components
+
+    components.html(cookie_script(token, max_age), height=0)
@@ -0,0 +1,185 @@
+"""
+Token-based sessions backed by the SQLite user_sessions table.
+
+Tokens are random URL-safe strings; only their SHA-256 digest is stored.
+Validation goes through an in-process LRU cache (token -> user, expiry),
+so the common path never touches the database. Cached entries are
+re-checked against the database after ``cache_ttl`` seconds, which bounds
+how long a revocation made by another worker can go unnoticed. A background
+sweeper deletes expired and revoked rows in small batches.
+"""
+
+import hashlib
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _to_db_time(epoch: float) -> str:
+    """Format like SQLite's CURRENT_TIMESTAMP (UTC)."""
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def _from_db_time(text: str) -> float:
+    return datetime.strptime(text, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+class SessionStore:
+    """Creates, validates and expires session tokens."""
+
+    def __init__(self, db_path: str = "users.db", session_ttl: float = 7 * 24 * 3600,
+                 cache_ttl: float = 60.0, max_cache_entries: int = 10000,
+                 clock: Callable[[], float] = time.time):
+        self.db_path = Path(db_path)
+        self.session_ttl = session_ttl
+        self.cache_ttl = cache_ttl
+        self.max_cache_entries = max_cache_entries
+        self._clock = clock
+        # digest -> (username, expires_at, recheck_at)
+        self._cache: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, digest: str, username: str, expires_at: float):
+        with self._lock:
+            self._cache[digest] = (username, expires_at, self._clock() + self.cache_ttl)
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+
+    def _forget(self, digest: str):
+        with self._lock:
+            self._cache.pop(digest, None)
+
+    def create_session(self, user_id: int, username: str) -> str:
+        """Create a session for a user and return its token."""
+        token = secrets.token_urlsafe(32)
+        digest = _digest(token)
+        expires_at = self._clock() + self.session_ttl
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT INTO user_sessions (user_id, session_token, expires_at, is_active)
+                VALUES (?, ?, ?, 1)
+            """, (user_id, digest, _to_db_time(expires_at)))
+            conn.commit()
+
+        self._remember(digest, username, expires_at)
+        return token
+
+    def validate(self, token: Optional[str]) -> Optional[str]:
+        """Return the username for a valid token, or None."""
+        if not token:
+            return None
+        digest = _digest(token)
+        now = self._clock()
+
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry and entry[2] > now:
+                self._cache.move_to_end(digest)
+                if entry[1] > now:
+                    self.hits += 1
+                    return entry[0]
+        if entry:
+            self._forget(digest)
+        self.misses += 1
+
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("""
+                SELECT u.username, s.expires_at
+                FROM user_sessions s
+                JOIN users u ON u.id = s.user_id
+                WHERE s.session_token = ? AND s.is_active = 1 AND u.is_active = 1
+            """, (digest,)).fetchone()
+
+        if not row:
+            return None
+        username, expires_text = row
+        expires_at = _from_db_time(expires_text)
+        if expires_at <= now:
+            return None
+
+        self._remember(digest, username, expires_at)
+        return username
+
+    def revoke(self, token: str):
+        """End a session."""
+        digest = _digest(token)
+        self._forget(digest)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE user_sessions SET is_active = 0 WHERE session_token = ?", (digest,))
+            conn.commit()
+
+    def sweep_expired(self, batch_size: int = 500) -> int:
+        """Delete expired and revoked sessions in short batches. Returns rows deleted."""
+        now_text = _to_db_time(self._clock())
+        deleted = 0
+        with sqlite3.connect(self.db_path) as conn:
+            while True:
+                cursor = conn.execute("""
+                    DELETE FROM user_sessions
+                    WHERE id IN (
+                        SELECT id FROM user_sessions
+                        WHERE expires_at <= ? OR is_active = 0
+                        LIMIT ?
+                    )
+                """, (now_text, batch_size))
+                conn.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+
+        now = self._clock()
+        with self._lock:
+            for digest in [d for d, entry in self._cache.items() if entry[1] <= now]:
+                del self._cache[digest]
+        return deleted
+
+    def start_sweeper(self, interval: float = 300.0, batch_size: int = 500):
+        """Run sweep_expired every `interval` seconds in a daemon thread."""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep_expired(batch_size)
+                except sqlite3.Error as e:
+                    print(f"Database error: {e}")
+
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+
+_stores: Dict[str, SessionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_session_store(db_path: str = "users.db") -> SessionStore:
+    """Get the process-wide session store (and its sweeper) for a database."""
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        if key not in _stores:
+            store = SessionStore(db_path)
+            store.start_sweeper()
+            _stores[key] = store
+        return _stores[key]
@@ -3,12 +3,29 @@ Supabase authentication and database integration.
 This replaces the current SQLite database_auth.py
 """
 
+import itertools
 import os
-from supabase import create_client, Client
-from typing import Optional, Dict, Any
+import secrets
+import time
+import uuid
+from typing import TYPE_CHECKING, Optional, Dict, Any, Iterable, List, Callable, Tuple
 import streamlit as st
 from datetime import datetime
 from dotenv import load_dotenv
+from main.utils.write_behind import WriteBehindQueue
+from main.utils.user_cache import get_session_cache
+from main.utils.circuit_breaker import CLOSED, CircuitBreaker
+from main.utils.emission_aggregates import empty_totals, monthly_from_category_rows, totals_from_category_rows
+from main.utils.quantile_sketch import QuantileSketch, sketches_from_rows
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+DEFAULT_SETTINGS = {
+    "units": "metric",
+    "language": "en",
+    "notifications": True
+}
 
 # Load environment variables
 load_dotenv()
@@ -25,7 +42,35 @@ class SupabaseAuth:
         if not supabase_url or not supabase_key:
             raise ValueError("Missing Supabase credentials. Please set SUPABASE_URL and SUPABASE_ANON_KEY in your .env file.")
         
-        self.client: Client = create_client(supabase_url, supabase_key)
+        # Imported here so pages that only check the session don't load the HTTP client libraries
+        from supabase import create_client
+        from main.utils.postgrest_batch import PostgrestBatchWriter
+        
+        self.client: "Client" = create_client(supabase_url, supabase_key)
+        
+        # Background writes share requests across sessions when a service role key is available
+        service_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+        self.has_service_key = bool(service_key)
+        # Admin-only reads (app-wide counters) need the service role
+        self.admin_client: Optional["Client"] = create_client(supabase_url, service_key) if service_key else None
+        self.batch_writer = PostgrestBatchWriter(
+            supabase_url,
+            service_key or supabase_key,
+            max_rows_per_request=int(os.getenv('SUPABASE_BATCH_ROWS', '500')),
+            max_concurrency=int(os.getenv('SUPABASE_BATCH_CONCURRENCY', '4'))
+        )
+        # Without the service role, queued rows are written with their owner's JWT (kept in memory only)
+        self._writer_tokens: Dict[str, str] = {}
+        # Changed per (table, user) when queued rows land, so cached reads of them reload
+        self._write_versions: Dict[Tuple[str, str], int] = {}
+        self._write_counter = itertools.count(1)
+        
+        # Bounds how long a page waits on a slow or unreachable backend
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('SUPABASE_BREAKER_THRESHOLD', '3')),
+            reset_timeout=float(os.getenv('SUPABASE_BREAKER_RESET', '30')),
+            call_timeout=float(os.getenv('SUPABASE_CALL_TIMEOUT', '5'))
+        )
     
     def register_user(self, email: str, password: str, username: str) -> bool:
         """Register a new user with Supabase Auth."""
@@ -44,6 +89,7 @@ class SupabaseAuth:
             if auth_response.user:
                 # Store user info in session
                 st.session_state.user = auth_response.user
+                st.session_state.access_token = auth_response.session.access_token if auth_response.session else None
                 st.session_state.authenticated = True
                 return True
             return False
@@ -63,6 +109,7 @@ class SupabaseAuth:
             if auth_response.user:
                 # Store user info in session
                 st.session_state.user = auth_response.user
+                st.session_state.access_token = auth_response.session.access_token if auth_response.session else None
                 st.session_state.authenticated = True
                 return True
             return False
@@ -71,12 +118,38 @@ class SupabaseAuth:
             st.error(f"Authentication failed: {str(e)}")
             return False
     
+    def create_demo_user(self) -> bool:
+        """
+        Create a throwaway demo account and sign in to it (requires service role).
+        
+        The account is confirmed straight away and marked is_demo, so
+        cleanup_demo_users removes it and its data once it is old.
+        """
+        if not self.admin_client:
+            st.info("Set SUPABASE_SERVICE_ROLE_KEY to offer demo accounts.")
+            return False
+        username = f"demo_{uuid.uuid4().hex[:12]}"
+        email = f"{username}@example.com"
+        password = secrets.token_urlsafe(16)
+        try:
+            self.breaker.call(self.admin_client.auth.admin.create_user, {
+                "email": email,
+                "password": password,
+                "email_confirm": True,
+                "user_metadata": {"username": username, "is_demo": True}
+            })
+        except Exception as e:
+            st.error(f"Failed to create demo account: {str(e)}")
+            return False
+        return self.authenticate(email, password)
+    
     def logout(self):
         """Logout user."""
         try:
             self.client.auth.sign_out()
             st.session_state.authenticated = False
             st.session_state.user = None
+            st.session_state.access_token = None
             return True
         except Exception as e:
             st.error(f"Logout failed: {str(e)}")
@@ -96,86 +169,374 @@ class SupabaseAuth:
             return user.id
         return None
     
+    def _emission_row(self, user_id: str, category: str, emissions: float, details: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a user_emissions row, with its own id so a replayed write can't duplicate it."""
+        return {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'category': category,
+            'emissions': emissions,
+            'details': details,
+            'created_at': datetime.now().isoformat()
+        }
+    
     def save_user_emissions(self, category: str, emissions: float, details: Dict[str, Any]) -> bool:
-        """Save user emissions to Supabase."""
+        """Save user emissions to Supabase (queued for replay if it is unreachable)."""
+        user_id = self.get_current_user_id()
+        if not user_id:
+            st.error("User not authenticated")
+            return False
+        
+        row = self._emission_row(user_id, category, emissions, details)
         try:
-            user_id = self.get_current_user_id()
-            if not user_id:
-                st.error("User not authenticated")
-                return False
-            
-            self.client.table('user_emissions').insert({
-                'user_id': user_id,
-                'category': category,
-                'emissions': emissions,
-                'details': details,
-                'created_at': datetime.now().isoformat()
-            }).execute()
-            return True
+            self.breaker.call(lambda: self.client.table('user_emissions').insert(row).execute())
+            self._rows_written('user_emissions', [row])
         except Exception as e:
-            st.error(f"Failed to save emissions: {str(e)}")
+            self._remember_writer(user_id)
+            get_emission_write_queue().enqueue(row, owner=user_id)
+            st.warning(f"Couldn't reach Supabase ({str(e)}). Your emissions will be saved once it's back.")
+        return True
+    
+    def _remember_writer(self, user_id: str):
+        """Keep the signed-in user's JWT so their queued rows pass row level security."""
+        token = st.session_state.get('access_token')
+        if token and not self.has_service_key:
+            self._writer_tokens[user_id] = token
+    
+    def _write_as_owners(self, write: Callable[..., int], table: str, rows: List[Dict[str, Any]], **kwargs) -> None:
+        """
+        Send queued rows through the batch writer. Raises on failure.
+        
+        With the service role key they go out together. Otherwise each user's
+        rows are sent with that user's JWT; rows of users whose token isn't
+        known (e.g. after a restart) fail and stay queued until they're back.
+        """
+        if self.has_service_key:
+            self.breaker.call(write, table, rows, **kwargs)
+            return
+        
+        by_owner: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_owner.setdefault(row['user_id'], []).append(row)
+        error = None
+        for user_id, owned in by_owner.items():
+            token = self._writer_tokens.get(user_id)
+            try:
+                if not token:
+                    raise PermissionError(f"No session token to save queued rows for user {user_id}")
+                self.breaker.call(write, table, owned, access_token=token, **kwargs)
+            except Exception as e:
+                error = error or e
+        if error:
+            raise error
+    
+    def _rows_written(self, table: str, rows: List[Dict[str, Any]]):
+        for user_id in {row['user_id'] for row in rows}:
+            self._write_versions[(table, user_id)] = next(self._write_counter)
+    
+    def _write_version(self, table: str, user_id: str) -> int:
+        """Part of cache keys for reads of `table`, changed whenever writes reach it."""
+        return self._write_versions.get((table, user_id), 0)
+    
+    def insert_emission_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert emission rows in pooled multi-row requests, skipping rows already saved. Raises on failure."""
+        try:
+            self._write_as_owners(self.batch_writer.insert, 'user_emissions', rows, on_conflict='id,created_at')
+        finally:
+            self._rows_written('user_emissions', rows)
+    
+    def upsert_goal_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Write queued user_goals rows, keeping the latest per user. Raises on failure."""
+        latest = {row['user_id']: row for row in rows}
+        self._write_as_owners(self.batch_writer.upsert, 'user_goals', list(latest.values()), on_conflict='user_id')
+    
+    def insert_progress_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert user_progress rows in pooled multi-row requests, skipping rows already saved. Raises on failure."""
+        try:
+            self._write_as_owners(self.batch_writer.insert, 'user_progress', rows, on_conflict='id')
+        finally:
+            # Some owners' rows may have landed even if others failed
+            self._rows_written('user_progress', rows)
+    
+    def queue_progress_entries(self, entries: List[Dict[str, Any]]) -> bool:
+        """Queue goal progress entries for a background save, keeping any ids they already carry."""
+        user_id = self.get_current_user_id()
+        if not user_id:
             return False
+        
+        self._remember_writer(user_id)
+        queue = get_progress_write_queue()
+        for entry in entries:
+            queue.enqueue({
+                'id': entry.get('id') or str(uuid.uuid4()),
+                'user_id': user_id,
+                'recorded_on': entry['date'],
+                'transport': entry['transport'],
+                'energy': entry['energy'],
+                'food': entry['food'],
+                'total': entry['total'],
+                'target': entry['target'],
+                'met_target': entry['total'] <= entry['target']
+            }, owner=user_id)
+        return True
     
-    def get_user_emissions(self) -> list:
-        """Get current user's emission history."""
+    def queue_user_emissions(self, category: str, emissions: float, details: Dict[str, Any]) -> Optional[str]:
+        """Queue user emissions for a background save and return the entry id."""
+        user_id = self.get_current_user_id()
+        if not user_id:
+            st.error("User not authenticated")
+            return None
+        
+        row = self._emission_row(user_id, category, emissions, details)
+        self._remember_writer(user_id)
+        return get_emission_write_queue().enqueue(row, owner=user_id)
+    
+    def _read(self, user_id: str, key: str, loader: Callable[[], Any], default: Any,
+              label: str, cached: bool = False) -> Any:
+        """
+        Load through the circuit breaker and remember the result.
+        
+        With `cached`, fresh cached values are served without a request. If the
+        backend fails or the circuit is open, the last known value is returned.
+        """
+        cache = get_session_cache()
         try:
-            user_id = self.get_current_user_id()
-            if not user_id:
-                return []
-            
-            response = self.client.table('user_emissions').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
-            return response.data
+            if cached:
+                return cache.get_or_load(user_id, key, lambda: self.breaker.call(loader))
+            value = self.breaker.call(loader)
+            cache.set(user_id, key, value)
+            return value
         except Exception as e:
-            st.error(f"Failed to get emissions: {str(e)}")
+            found, value = cache.peek(user_id, key, allow_stale=True)
+            if found:
+                return value
+            st.error(f"Failed to get {label}: {str(e)}")
+            return default
+    
+    def get_user_emissions(self) -> list:
+        """Get current user's emission history."""
+        user_id = self.get_current_user_id()
+        if not user_id:
+            return []
+        
+        return self._read(user_id, 'emissions', lambda: self.client.table('user_emissions').select('*').eq(
+            'user_id', user_id).order('created_at', desc=True).execute().data, [], "emissions")
+    
+    def get_emission_totals(self) -> Dict[str, Any]:
+        """Get current user's all-time totals per category, summed by the database."""
+        user_id = self.get_current_user_id()
+        if not user_id:
+            return empty_totals()
+        
+        return self._read(user_id, 'emission_totals', lambda: totals_from_category_rows(
+            self.client.rpc('get_emission_totals').execute().data or []), empty_totals(), "emission totals")
+    
+    def get_monthly_emissions(self, months: int = 12, average: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get current user's per-month totals for the last `months` months, oldest first.
+        With `average`, the mean per saved calculation in each category instead of the sum.
+        """
+        user_id = self.get_current_user_id()
+        if not user_id:
+            return []
+        
+        # Reloaded once saves land; otherwise cached, as it only changes when they do
+        key = f"monthly_emissions:{months}:{average}:{self._write_version('user_emissions', user_id)}"
+        return self._read(user_id, key, lambda: monthly_from_category_rows(
+            self.client.rpc('get_monthly_emissions', {'months_back': months}).execute().data or [],
+            average=average), [], "monthly emissions", cached=True)
+    
+    def get_emission_sketches(self, months: int = 3) -> Dict[str, QuantileSketch]:
+        """Get everyone's emission distribution per category over the last `months` months."""
+        if not self.get_current_user_id():
+            return {}
+        
+        # Not tied to the user, so it's cached under no user id
+        return self._read(None, f'emission_sketches:{months}', lambda: sketches_from_rows(
+            self.client.rpc('get_emission_sketch', {'months': months}).execute().data or []),
+            {}, "population percentiles", cached=True)
+    
+    def get_progress_points(self, exclude: Iterable[str] = ()) -> List[Tuple[str, float, float]]:
+        """
+        Get current user's saved progress entries as (date, total, target), oldest first,
+        leaving out the entries whose ids are in `exclude` (e.g. those still in the session).
+        """
+        user_id = self.get_current_user_id()
+        if not user_id:
             return []
+        
+        key = f"progress_points:{self._write_version('user_progress', user_id)}"
+        rows = self._read(user_id, key, lambda: [
+            (row['id'], row['recorded_on'], row['total'], row['target'])
+            for row in self.client.table('user_progress').select('id,recorded_on,total,target').eq(
+                'user_id', user_id).order('recorded_on').execute().data
+        ], [], "saved progress", cached=True)
+        exclude = set(exclude)
+        return [(recorded_on, total, target) for row_id, recorded_on, total, target in rows
+                if row_id not in exclude]
     
     def save_user_goals(self, goals: Dict[str, Any]) -> bool:
-        """Save user goals to Supabase."""
+        """Save user goals to Supabase (queued for replay if it is unreachable)."""
+        user_id = self.get_current_user_id()
+        if not user_id:
+            st.error("User not authenticated")
+            return False
+        
+        row = {
+            'user_id': user_id,
+            'goals': goals,
+            'updated_at': datetime.now().isoformat()
+        }
+        get_session_cache().set(user_id, 'goals', goals)
+        
+        queue = get_goal_write_queue()
+        # Earlier queued saves must land first, so don't overtake them
+        if not queue.summary(owner=user_id)['pending']:
+            try:
+                # Upsert goals (update if exists, insert if not)
+                self.breaker.call(lambda: self.client.table('user_goals').upsert(row, on_conflict='user_id').execute())
+                return True
+            except Exception as e:
+                st.warning(f"Couldn't reach Supabase ({str(e)}). Your goals will be saved once it's back.")
+        
+        self._remember_writer(user_id)
+        queue.enqueue(row, owner=user_id)
+        return True
+    
+    def get_user_goals(self) -> Dict[str, Any]:
+        """Get current user's goals."""
+        user_id = self.get_current_user_id()
+        if not user_id:
+            return {}
+        
+        return self._read(user_id, 'goals', lambda: self._fetch_user_goals(user_id), {}, "goals", cached=True)
+    
+    def _fetch_user_goals(self, user_id: str) -> Dict[str, Any]:
+        """Load goals from Supabase, bypassing the cache."""
+        response = self.client.table('user_goals').select('*').eq('user_id', user_id).execute()
+        if response.data:
+            return response.data[0]['goals']
+        return {}
+    
+    def get_user_settings(self) -> Dict[str, Any]:
+        """Get current user's settings (stored in the auth user metadata)."""
+        user_id = self.get_current_user_id()
+        if not user_id:
+            return dict(DEFAULT_SETTINGS)
+        
+        return self._read(user_id, 'settings', self._fetch_user_settings, dict(DEFAULT_SETTINGS),
+                          "settings", cached=True)
+    
+    def _fetch_user_settings(self) -> Dict[str, Any]:
+        """Load settings from Supabase, bypassing the cache."""
+        response = self.client.auth.get_user()
+        metadata = (response.user.user_metadata or {}) if response and response.user else {}
+        return {**DEFAULT_SETTINGS, **metadata.get('settings', {})}
+    
+    def update_user_settings(self, settings: Dict[str, Any]) -> bool:
+        """Update current user's settings."""
         try:
             user_id = self.get_current_user_id()
             if not user_id:
                 st.error("User not authenticated")
                 return False
             
-            # Upsert goals (update if exists, insert if not)
-            self.client.table('user_goals').upsert({
-                'user_id': user_id,
-                'goals': goals,
-                'updated_at': datetime.now().isoformat()
-            }).execute()
+            merged = {**self.get_user_settings(), **settings}
+            self.breaker.call(self.client.auth.update_user, {"data": {"settings": merged}})
+            get_session_cache().set(user_id, 'settings', merged)
             return True
         except Exception as e:
-            st.error(f"Failed to save goals: {str(e)}")
+            st.error(f"Failed to update settings: {str(e)}")
             return False
     
-    def get_user_goals(self) -> Dict[str, Any]:
-        """Get current user's goals."""
+    def get_user_stats(self) -> Dict[str, int]:
+        """Get user statistics for admin from the maintained counters (requires service role)."""
+        empty = {'total_users': 0, 'active_users': 0, 'demo_users': 0}
+        if not self.admin_client:
+            st.info("Set SUPABASE_SERVICE_ROLE_KEY to see user statistics.")
+            return empty
         try:
-            user_id = self.get_current_user_id()
-            if not user_id:
-                return {}
-            
-            response = self.client.table('user_goals').select('*').eq('user_id', user_id).execute()
+            response = self.breaker.call(lambda: self.admin_client.rpc('get_app_counters', {'active_days': 30}).execute())
             if response.data:
-                return response.data[0]['goals']
-            return {}
+                return {key: int(response.data[0][key] or 0) for key in empty}
+            return empty
         except Exception as e:
-            st.error(f"Failed to get goals: {str(e)}")
-            return {}
+            st.error(f"Failed to get stats: {str(e)}")
+            return empty
     
-    def get_user_stats(self) -> Dict[str, int]:
-        """Get user statistics for admin (requires service role)."""
+    def cleanup_demo_users(self, days_old: int = 1, chunk_size: int = 500,
+                           progress_callback: Optional[Callable[[int, int, float], None]] = None) -> int:
+        """
+        Remove demo users older than `days_old` days, together with their data (requires service role).
+        
+        The old demo accounts are counted once; then each delete_demo_users call
+        deletes one chunk of auth users in its own transaction, and their rows go
+        with them through ON DELETE CASCADE. After every chunk
+        `progress_callback(deleted, total, users_per_second)` is called.
+        """
+        if not self.admin_client:
+            st.info("Set SUPABASE_SERVICE_ROLE_KEY to remove demo users.")
+            return 0
+        deleted = 0
+        start = time.perf_counter()
         try:
-            # This would need service role key for admin functions
-            # For now, return mock data
-            return {
-                'total_users': 1,
-                'active_users': 1,
-                'demo_users': 0
-            }
+            total = int(self.breaker.call(lambda: self.admin_client.rpc(
+                'count_demo_users', {'days_old': days_old}).execute()).data or 0)
+            while True:
+                response = self.breaker.call(lambda: self.admin_client.rpc(
+                    'delete_demo_users', {'days_old': days_old, 'batch_size': chunk_size}).execute())
+                chunk = int(response.data or 0)
+                deleted += chunk
+                if chunk and progress_callback:
+                    elapsed = time.perf_counter() - start
+                    # Demo accounts may expire while this runs
+                    progress_callback(deleted, max(total, deleted), deleted / elapsed if elapsed else 0.0)
+                if chunk < chunk_size:
+                    return deleted
         except Exception as e:
-            st.error(f"Failed to get stats: {str(e)}")
-            return {'total_users': 0, 'active_users': 0, 'demo_users': 0}
+            st.error(f"Failed to remove demo users: {str(e)}")
+            return deleted
+    
+    def get_flagged_emissions(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get emission records flagged as likely data entry mistakes, newest first (requires service role)."""
+        if not self.admin_client:
+            st.info("Set SUPABASE_SERVICE_ROLE_KEY to review flagged records.")
+            return []
+        from main.utils.anomaly import flagged_supabase_records
+        try:
+            return self.breaker.call(flagged_supabase_records, self.admin_client, limit)
+        except Exception as e:
+            st.error(f"Failed to get flagged records: {str(e)}")
+            return []
+    
+    def review_flagged_emissions(self, ids: List[str], keep: bool) -> int:
+        """
+        Resolve flagged emission records (requires service role): kept ones count
+        again and won't be flagged again, the others are deleted.
+        """
+        if not self.admin_client or not ids:
+            return 0
+        from main.utils.anomaly import review_supabase_records
+        try:
+            resolved = self.breaker.call(review_supabase_records, self.admin_client, ids, keep)
+        except Exception as e:
+            st.error(f"Failed to review flagged records: {str(e)}")
+            return 0
+        # The owners' totals and monthly series changed
+        self._rows_written('user_emissions', resolved)
+        return len(resolved)
+    
+    def get_daily_emission_counts(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Get the number of emission records created per day, oldest first (requires service role)."""
+        if not self.admin_client:
+            return []
+        try:
+            response = self.breaker.call(lambda: self.admin_client.rpc('get_daily_emission_counts', {'days': days}).execute())
+            return [{'day': row['day'], 'records': int(row['records']), 'total_emissions': float(row['total_emissions'])}
+                    for row in response.data or []]
+        except Exception as e:
+            st.error(f"Failed to get emission counts: {str(e)}")
+            return []
 
 # Global instance
 @st.cache_resource
@@ -183,6 +544,67 @@ def get_supabase_auth():
     """Get cached Supabase auth instance."""
     return SupabaseAuth()
 
+@st.cache_resource
+def get_emission_write_queue() -> WriteBehindQueue:
+    """Get the process-wide write-behind queue for emission saves."""
+    auth = get_supabase_auth()
+    return WriteBehindQueue(
+        auth.insert_emission_rows,
+        storage_path=os.getenv('EMISSION_QUEUE_PATH', 'pending_emissions.json'),
+        max_batch_size=int(os.getenv('EMISSION_QUEUE_BATCH_SIZE', '50')),
+        flush_interval=float(os.getenv('EMISSION_QUEUE_FLUSH_INTERVAL', '2.0')),
+        # Keep retrying through a backend outage instead of giving up after seconds
+        max_retries=int(os.getenv('WRITE_QUEUE_MAX_RETRIES', '30')),
+        backoff_max=60.0
+    )
+
+@st.cache_resource
+def get_goal_write_queue() -> WriteBehindQueue:
+    """Get the process-wide queue replaying goal saves made while Supabase was unreachable."""
+    auth = get_supabase_auth()
+    return WriteBehindQueue(
+        auth.upsert_goal_rows,
+        storage_path=os.getenv('GOAL_QUEUE_PATH', 'pending_goals.json'),
+        flush_interval=5.0,
+        max_retries=int(os.getenv('WRITE_QUEUE_MAX_RETRIES', '30')),
+        backoff_max=60.0
+    )
+
+@st.cache_resource
+def get_progress_write_queue() -> WriteBehindQueue:
+    """Get the process-wide queue saving goal progress entries that no longer fit in the session."""
+    auth = get_supabase_auth()
+    return WriteBehindQueue(
+        auth.insert_progress_rows,
+        storage_path=os.getenv('PROGRESS_QUEUE_PATH', 'pending_progress.json'),
+        flush_interval=5.0,
+        max_retries=int(os.getenv('WRITE_QUEUE_MAX_RETRIES', '30')),
+        backoff_max=60.0
+    )
+
+def show_save_status():
+    """Show pending or failed background saves for the current user."""
+    auth = get_supabase_auth()
+    user_id = auth.get_current_user_id()
+    if not user_id:
+        return
+    
+    if auth.breaker.state != CLOSED:
+        st.warning("⚠️ Supabase is unreachable. Showing your last loaded data; changes will be saved once it's back.")
+    if get_goal_write_queue().summary(owner=user_id)['pending']:
+        st.info("⏳ Saving your goal changes in the background...")
+    
+    queue = get_emission_write_queue()
+    summary = queue.summary(owner=user_id)
+    
+    if summary['pending']:
+        st.info(f"⏳ Saving {summary['pending']} emission record(s) in the background...")
+    if summary['failed']:
+        st.error(f"❌ {summary['failed']} emission record(s) could not be saved: {summary['last_error']}")
+        if st.button("Retry failed saves", key="retry_failed_saves"):
+            queue.retry_failed(owner=user_id)
+            st.rerun()
+
 # Helper functions for compatibility
 def get_current_user():
     """Get current user email."""
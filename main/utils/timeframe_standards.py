@@ -22,13 +22,20 @@ SECTION STANDARDS:
 4. Results: Monthly totals with annual projections
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 # Standard conversion factors
 DAYS_PER_MONTH = 30.44
 WEEKS_PER_MONTH = 4.33
 MONTHS_PER_YEAR = 12
 
+# Resampling periods for history charts (pandas offset aliases, labelled by period start)
+RESAMPLE_RULES = {
+    'day': 'D',
+    'week': 'W-MON',
+    'month': 'MS'
+}
+
 def daily_to_monthly(daily_value: float) -> float:
     """Convert daily value to monthly equivalent."""
     return daily_value * DAYS_PER_MONTH
@@ -113,3 +120,31 @@ def get_timeframe_help_text(section: str) -> str:
     }
     
     return help_texts.get(section, "Enter monthly values for this category.")
+
+def resample_history(frame, timeframe: str, date_column: str = 'date',
+                     value_columns: List[str] = None, how: str = 'mean'):
+    """
+    Resample a dated history to one row per day, week or month.
+    
+    History entries are monthly emission estimates, so the default averages
+    the entries in each period rather than summing them. Periods without
+    entries are dropped.
+    
+    Args:
+        frame: DataFrame with a datetime column
+        timeframe: 'day', 'week' (starting Monday) or 'month'
+        date_column: Name of the datetime column
+        value_columns: Columns to aggregate (default: all numeric columns)
+        how: Aggregation ('mean', 'sum', 'max', ...)
+        
+    Returns:
+        DataFrame with `date_column` set to the start of each period
+    """
+    if timeframe not in RESAMPLE_RULES:
+        raise ValueError(f"Unknown timeframe: {timeframe}. Use one of {', '.join(RESAMPLE_RULES)}")
+    
+    indexed = frame.set_index(date_column).sort_index()
+    if value_columns is None:
+        value_columns = list(indexed.select_dtypes('number').columns)
+    resampled = indexed[value_columns].resample(RESAMPLE_RULES[timeframe], label='left', closed='left').agg(how)
+    return resampled.dropna(how='all').reset_index()
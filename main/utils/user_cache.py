@@ -0,0 +1,78 @@
+"""
+Per-user read-through cache for goals, settings and other small records.
+
+Values are loaded on first access, served from memory until their TTL
+expires, and replaced on writes (write-through) so the next read never
+goes back to the backend. Hit and miss counters show how effective it is.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class UserDataCache:
+    """Read-through cache keyed by (user, key) with a TTL."""
+
+    def __init__(self, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[Tuple[Hashable, str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, user_id: Hashable, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached value or load, store and return it."""
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry and entry[0] > self._clock():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        self.set(user_id, key, value)
+        return value
+
+    def peek(self, user_id: Hashable, key: str, allow_stale: bool = False) -> Tuple[bool, Any]:
+        """Look up a value without loading it. Returns (found, value)."""
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+        if entry and (allow_stale or entry[0] > self._clock()):
+            return True, entry[1]
+        return False, None
+
+    def set(self, user_id: Hashable, key: str, value: Any):
+        """Store a value, e.g. right after writing it to the backend."""
+        with self._lock:
+            self._entries[(user_id, key)] = (self._clock() + self.ttl, value)
+
+    def invalidate(self, user_id: Hashable, key: Optional[str] = None):
+        """Drop one key, or every key for the user when key is None."""
+        with self._lock:
+            if key is not None:
+                self._entries.pop((user_id, key), None)
+            else:
+                for cache_key in [k for k in self._entries if k[0] == user_id]:
+                    del self._entries[cache_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+        }
+
+
+def get_session_cache() -> UserDataCache:
+    """Get the cache stored in the current Streamlit session (shared across reruns)."""
+    import streamlit as st
+
+    if 'user_data_cache' not in st.session_state:
+        st.session_state.user_data_cache = UserDataCache(ttl=float(os.getenv('USER_CACHE_TTL', '300')))
+    return st.session_state.user_data_cache
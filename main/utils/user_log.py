@@ -0,0 +1,238 @@
+"""
+Append-only, crash-safe user store for the file-based auth backend.
+
+Every change is appended to a JSON lines log as a single write, so a login
+costs one small append regardless of how many users exist. The full state
+is kept in an in-memory index rebuilt from the log on startup. A torn last
+line (e.g. after a crash mid-write) is discarded on load. When the log has
+grown well beyond the number of users it is compacted into a snapshot,
+written to a temporary file and atomically swapped in.
+
+Several processes (or stores) may share one log. Changes and compaction
+hold an exclusive lock on a `.lock` file next to the log, and every read
+and write first applies the records others appended since the last one,
+or reloads the snapshot if another process compacted the log. The file the
+index was built from is kept open, so its inode can't be reused by a newer
+snapshot and mistaken for it. Without fcntl (Windows) only threads of one
+process are serialized.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class UserLogStore:
+    """Users kept in memory and persisted as an append-only log."""
+
+    def __init__(self, path: str = "users.log", legacy_path: Optional[str] = "users.json",
+                 compact_ratio: float = 4.0, min_compact_records: int = 1000, fsync: bool = True):
+        """
+        :param path: The log file.
+        :param legacy_path: Old whole-file JSON store imported when no log exists yet.
+        :param compact_ratio: Compact when records exceed this multiple of the user count.
+        :param min_compact_records: Never compact logs smaller than this.
+        :param fsync: Sync every append to disk.
+        """
+        self.path = Path(path)
+        self.compact_ratio = compact_ratio
+        self.min_compact_records = min_compact_records
+        self.fsync = fsync
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self._records = 0
+        self._lock = threading.Lock()
+        self._lock_path = self.path.with_suffix(self.path.suffix + ".lock")
+        # How far into which file the index has been built
+        self._file: Optional[BinaryIO] = None
+        self._offset = 0
+
+        with self._locked():
+            if self.path.exists():
+                self._catch_up()
+            elif legacy_path and Path(legacy_path).exists():
+                self._import_legacy(Path(legacy_path))
+
+    @contextmanager
+    def _locked(self, shared: bool = False) -> Iterator[None]:
+        """Hold the thread lock and the inter-process file lock."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # -- loading -----------------------------------------------------------
+
+    def _apply(self, record: Dict[str, Any]):
+        op, username = record["op"], record["user"]
+        if op == "put":
+            self.users[username] = record["data"]
+        elif op == "set" and username in self.users:
+            self.users[username].update(record["data"])
+        elif op == "del":
+            self.users.pop(username, None)
+
+    def _catch_up(self):
+        """
+        Apply records appended since the last call, stopping at a torn
+        trailing record. Caller holds the lock.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if not self._is_current(stat) or stat.st_size < self._offset:
+            # First load, or another process swapped in a snapshot
+            self._reopen()
+            self.users.clear()
+            self._records = 0
+            self._offset = 0
+        if stat.st_size == self._offset:
+            return
+
+        self._file.seek(self._offset)
+        for line in self._file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                self._apply(json.loads(line))
+            except (json.JSONDecodeError, KeyError):
+                break
+            self._records += 1
+            self._offset += len(line)
+
+    def _is_current(self, stat: os.stat_result) -> bool:
+        """Whether `stat` is of the file the index was built from."""
+        if self._file is None:
+            return False
+        held = os.fstat(self._file.fileno())
+        return (held.st_dev, held.st_ino) == (stat.st_dev, stat.st_ino)
+
+    def _reopen(self, handle: Optional[BinaryIO] = None):
+        if self._file is not None:
+            self._file.close()
+        self._file = handle or open(self.path, 'rb')
+
+    def _import_legacy(self, legacy_path: Path):
+        try:
+            with open(legacy_path, 'r') as f:
+                self.users.update(json.load(f))
+        except (json.JSONDecodeError, FileNotFoundError):
+            pass
+        self._write_snapshot()
+
+    # -- writing -----------------------------------------------------------
+
+    def _append(self, record: Dict[str, Any]):
+        """Append a record. Caller holds the exclusive lock and has caught up."""
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode('utf-8')
+        with open(self.path, 'ab') as f:
+            if f.tell() > self._offset:
+                # Drop a torn record left by a crash mid-write
+                f.truncate(self._offset)
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        if self._file is None:
+            self._reopen()
+        self._apply(record)
+        self._records += 1
+        self._offset += len(line)
+
+        if (self._records >= self.min_compact_records
+                and self._records > self.compact_ratio * max(len(self.users), 1)):
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """Rewrite the log as one record per user and swap it in atomically. Caller holds the lock."""
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        f = open(tmp_path, 'w+b')
+        try:
+            for username, data in self.users.items():
+                f.write((json.dumps({"op": "put", "user": username, "data": data},
+                                    separators=(",", ":")) + "\n").encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            raise
+        if self._file is not None:
+            # Windows can't replace a file that is open
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        # The new snapshot stays open as the file the index is built from
+        self._reopen(f)
+        self._offset = f.tell()
+        self._records = len(self.users)
+
+    def put(self, username: str, data: Dict[str, Any]):
+        """Create or replace a user."""
+        with self._locked():
+            self._catch_up()
+            self._append({"op": "put", "user": username, "data": data})
+
+    def add(self, username: str, data: Dict[str, Any]) -> bool:
+        """Create a user unless one with that name exists (in any process)."""
+        with self._locked():
+            self._catch_up()
+            if username in self.users:
+                return False
+            self._append({"op": "put", "user": username, "data": data})
+            return True
+
+    def update(self, username: str, fields: Dict[str, Any]) -> bool:
+        """Overwrite top-level fields of an existing user."""
+        with self._locked():
+            self._catch_up()
+            if username not in self.users:
+                return False
+            self._append({"op": "set", "user": username, "data": fields})
+            return True
+
+    def delete(self, username: str):
+        """Remove a user."""
+        with self._locked():
+            self._catch_up()
+            if username in self.users:
+                self._append({"op": "del", "user": username})
+
+    def compact(self):
+        """Force a snapshot of the current state."""
+        with self._locked():
+            self._catch_up()
+            self._write_snapshot()
+
+    def refresh(self):
+        """Apply changes other processes made since the last read or write."""
+        with self._locked(shared=True):
+            self._catch_up()
+
+    def close(self):
+        """Release the log file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __contains__(self, username: str) -> bool:
+        self.refresh()
+        return username in self.users
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        return self.users.get(username)
@@ -0,0 +1,274 @@
+"""
+Write-behind queue for persisting records without blocking the UI.
+
+Records are acknowledged immediately, appended to a local journal file so
+they survive restarts, and flushed to the backend in batches by a background
+thread once a size or time threshold is reached. Failed flushes are retried
+with exponential backoff.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+PENDING = "pending"
+FAILED = "failed"
+SAVED = "saved"
+
+
+class WriteBehindQueue:
+    """Batched, disk-backed queue of records waiting to be written."""
+
+    def __init__(self, flush_fn: Callable[[List[Dict[str, Any]]], None],
+                 storage_path: str = "pending_writes.json",
+                 max_batch_size: int = 50, flush_interval: float = 2.0,
+                 max_retries: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, autostart: bool = True):
+        """
+        Create a queue.
+
+        :param flush_fn: Writes a list of records; must raise on failure.
+        :param storage_path: Local file used to persist unsaved records.
+        :param max_batch_size: Flush as soon as this many records are pending.
+        :param flush_interval: Flush at least this often (seconds).
+        :param max_retries: Attempts before a record is marked as failed.
+        :param backoff_base: First retry delay (seconds), doubled per attempt.
+        :param backoff_max: Upper bound for the retry delay (seconds).
+        :param autostart: Start the background flusher immediately.
+        """
+        self.flush_fn = flush_fn
+        self.storage_path = Path(storage_path)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._saved: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+        self._load()
+        if autostart:
+            self.start()
+
+    # -- persistence -------------------------------------------------------
+    # The file is a journal with one JSON line per change ({"put": entry} or
+    # {"drop": entry_id}), appended and fsynced, so queuing a record costs the
+    # same however long the queue has grown during an outage. It is rewritten
+    # with just the unsaved entries on load and after a flush writes records.
+
+    def _load(self):
+        """Restore unsaved records from disk."""
+        if not self.storage_path.exists():
+            return
+        try:
+            with open(self.storage_path, 'r') as f:
+                text = f.read()
+        except OSError as e:
+            print(f"Could not load pending writes: {e}")
+            return
+        if text.lstrip().startswith('['):
+            # Queue files written before the journal format
+            try:
+                changes = [{"put": entry} for entry in json.loads(text)]
+            except json.JSONDecodeError as e:
+                print(f"Could not load pending writes: {e}")
+                return
+        else:
+            changes = []
+            for line in text.splitlines():
+                try:
+                    changes.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line torn by a crash mid-append
+                    continue
+        for change in changes:
+            if "put" in change:
+                self._entries[change["put"]["id"]] = change["put"]
+            else:
+                self._entries.pop(change.get("drop"), None)
+        for entry in self._entries.values():
+            # Anything left over from a previous run is due immediately
+            entry["next_attempt_at"] = 0.0
+        self._compact()
+
+    def _append(self, changes: List[Dict[str, Any]]):
+        """Append changes to the journal and sync them. Caller holds the lock."""
+        with open(self.storage_path, 'a') as f:
+            f.write(''.join(json.dumps(change) + '\n' for change in changes))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        """Atomically rewrite the journal as the unsaved records. Caller holds the lock."""
+        tmp_path = self.storage_path.with_suffix(self.storage_path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(''.join(json.dumps({"put": entry}) + '\n' for entry in self._entries.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.storage_path)
+
+    # -- public API --------------------------------------------------------
+
+    def enqueue(self, record: Dict[str, Any], owner: Optional[str] = None) -> str:
+        """Queue a record for writing and return its entry id."""
+        entry_id = uuid.uuid4().hex
+        with self._cond:
+            self._entries[entry_id] = {
+                "id": entry_id,
+                "owner": owner,
+                "record": record,
+                "status": PENDING,
+                "attempts": 0,
+                "next_attempt_at": 0.0,
+                "error": None,
+                "queued_at": time.time(),
+            }
+            self._append([{"put": self._entries[entry_id]}])
+            if self._pending_count() >= self.max_batch_size:
+                self._cond.notify()
+        return entry_id
+
+    def status(self, entry_id: str) -> Optional[str]:
+        """Return 'pending', 'failed' or 'saved' for an entry, or None if unknown."""
+        with self._cond:
+            entry = self._entries.get(entry_id)
+            if entry:
+                return entry["status"]
+            if entry_id in self._saved:
+                return SAVED
+        return None
+
+    def summary(self, owner: Optional[str] = None) -> Dict[str, Any]:
+        """Count pending and failed records, optionally for a single owner."""
+        with self._cond:
+            entries = [e for e in self._entries.values()
+                       if owner is None or e["owner"] == owner]
+        failed = [e for e in entries if e["status"] == FAILED]
+        return {
+            "pending": sum(1 for e in entries if e["status"] == PENDING),
+            "failed": len(failed),
+            "last_error": failed[-1]["error"] if failed else None,
+        }
+
+    def retry_failed(self, owner: Optional[str] = None) -> int:
+        """Move failed records back to pending. Returns the number requeued."""
+        with self._cond:
+            requeued = [e for e in self._entries.values()
+                        if e["status"] == FAILED and (owner is None or e["owner"] == owner)]
+            for entry in requeued:
+                entry.update(status=PENDING, attempts=0, next_attempt_at=0.0, error=None)
+            if requeued:
+                self._append([{"put": entry} for entry in requeued])
+                self._cond.notify()
+        return len(requeued)
+
+    def discard_failed(self, owner: Optional[str] = None) -> int:
+        """Drop failed records. Returns the number removed."""
+        with self._cond:
+            ids = [e["id"] for e in self._entries.values()
+                   if e["status"] == FAILED and (owner is None or e["owner"] == owner)]
+            for entry_id in ids:
+                del self._entries[entry_id]
+            if ids:
+                self._append([{"drop": entry_id} for entry_id in ids])
+        return len(ids)
+
+    # -- flushing ----------------------------------------------------------
+
+    def _pending_count(self) -> int:
+        return sum(1 for e in self._entries.values() if e["status"] == PENDING)
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def flush(self) -> int:
+        """Write all due records now. Returns the number written."""
+        written = 0
+        with self._flush_lock:
+            try:
+                while True:
+                    now = time.time()
+                    with self._cond:
+                        batch = [e for e in self._entries.values()
+                                 if e["status"] == PENDING and e["next_attempt_at"] <= now]
+                        batch = batch[:self.max_batch_size]
+                    if not batch:
+                        return written
+
+                    try:
+                        self.flush_fn([e["record"] for e in batch])
+                    except Exception as e:
+                        self._mark_failed_attempt(batch, str(e))
+                        return written
+
+                    with self._cond:
+                        for entry in batch:
+                            self._entries.pop(entry["id"], None)
+                            self._saved[entry["id"]] = now
+                        self._trim_saved()
+                        self._append([{"drop": entry["id"]} for entry in batch])
+                    written += len(batch)
+            finally:
+                if written:
+                    with self._cond:
+                        self._compact()
+
+    def _mark_failed_attempt(self, batch: List[Dict[str, Any]], error: str):
+        now = time.time()
+        with self._cond:
+            for entry in batch:
+                entry["attempts"] += 1
+                entry["error"] = error
+                if entry["attempts"] >= self.max_retries:
+                    entry["status"] = FAILED
+                else:
+                    entry["next_attempt_at"] = now + self._retry_delay(entry["attempts"])
+            self._append([{"put": entry} for entry in batch])
+
+    def _trim_saved(self, keep: int = 1000):
+        """Bound the memory used to remember recently saved entry ids."""
+        if len(self._saved) > keep:
+            for entry_id in list(self._saved)[:len(self._saved) - keep]:
+                del self._saved[entry_id]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if self._pending_count() < self.max_batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Write-behind flush error: {e}")
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        """Stop the flusher and make a final attempt to write pending records."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
@@ -1,168 +1,317 @@
 """
 Migration script to move data from SQLite to Supabase.
 Run this after setting up your Supabase project.
+
+The SQLite database is streamed in chunks. Auth users are created by a
+bounded pool of workers, profiles, goals and emissions are upserted in
+multi-row requests, and progress is saved to a checkpoint file after every
+chunk. Supabase ids are derived from the SQLite ids, so re-running the script
+(or resuming after a failure) never duplicates rows.
+
+Usage:
+    python migrate_to_supabase.py [--db users.db] [--checkpoint migration_checkpoint.json]
+                                  [--chunk-size 500] [--workers 8]
 """
 
-import sqlite3
+import argparse
+import json
 import os
-from supabase import create_client, Client
+import secrets
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
-import hashlib
-from dotenv import load_dotenv
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from main.utils.postgrest_batch import PostgrestBatchWriter, PostgrestError
+
+# Namespace for deterministic Supabase ids derived from SQLite row ids
+MIGRATION_NAMESPACE = uuid.UUID('4f297103-1bee-4e06-8a46-20699cef2195')
+
+CATEGORIES = ['transport', 'energy', 'food']
+
+
+def migration_id(kind: str, *parts: Any) -> str:
+    """Stable UUID for a migrated record, e.g. migration_id('user', 42)."""
+    return str(uuid.uuid5(MIGRATION_NAMESPACE, ":".join([kind, *map(str, parts)])))
+
+
+class SupabaseTarget:
+    """Supabase Auth admin API and batched PostgREST writes, using the service role key."""
+
+    def __init__(self, base_url: str, service_key: str, workers: int = 8, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.writer = PostgrestBatchWriter(base_url, service_key, timeout=timeout)
+        self.timeout = timeout
+
+        # Separate pool sized for the user-creation workers
+        self.session = requests.Session()
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self.session.headers.update({'apikey': service_key, 'Authorization': f"Bearer {service_key}"})
+
+    def create_user(self, user_id: str, email: str, password: str, metadata: Dict[str, Any]) -> str:
+        """Create a confirmed auth user and return its id (the existing id if already created)."""
+        response = self.session.post(f"{self.base_url}/auth/v1/admin/users", json={
+            "id": user_id,
+            "email": email,
+            "password": password,
+            "email_confirm": True,
+            "user_metadata": metadata
+        }, timeout=self.timeout)
+
+        if response.status_code == 422:
+            # Already registered, e.g. by an interrupted earlier run (which may not have
+            # written user_profiles yet); ids are deterministic, so ask for this one
+            existing = self.session.get(f"{self.base_url}/auth/v1/admin/users/{user_id}", timeout=self.timeout)
+            if existing.ok and existing.json().get('email') == email:
+                return user_id
+        if response.status_code >= 300:
+            raise PostgrestError(response.status_code, response.text)
+        return response.json()['id']
+
+    def upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str) -> int:
+        return self.writer.upsert(table, rows, on_conflict=on_conflict)
+
+    def close(self):
+        self.writer.close()
+        self.session.close()
+
+
+class Migration:
+    """Resumable, chunked copy of users.db into Supabase."""
+
+    def __init__(self, db_path: str, target: SupabaseTarget,
+                 checkpoint_path: str = "migration_checkpoint.json",
+                 chunk_size: int = 500, workers: int = 8):
+        self.db_path = db_path
+        self.target = target
+        self.checkpoint_path = Path(checkpoint_path)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.state = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        state = {'users': {}, 'failed_users': [], 'last_user_id': 0,
+                 'last_goal_id': 0, 'last_emission_id': 0}
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, 'r') as f:
+                state.update(json.load(f))
+            print(f"Resuming from checkpoint {self.checkpoint_path}")
+        return state
+
+    def _save_checkpoint(self):
+        tmp_path = self.checkpoint_path.with_suffix(self.checkpoint_path.suffix + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _chunks(self, conn: sqlite3.Connection, query: str, last_id_key: str):
+        """Yield rows in id order, `chunk_size` at a time, starting after the checkpoint."""
+        while True:
+            rows = conn.execute(query, (self.state[last_id_key], self.chunk_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+
+    @staticmethod
+    def _report(stage: str, count: int, started: float):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"  {stage}: {count:,} in {elapsed:.1f}s ({count / elapsed:,.0f}/s)")
+
+    # -- users ---------------------------------------------------------------
+
+    def _create_user(self, row) -> Optional[Dict[str, Any]]:
+        sqlite_id, username, email, created_at = row
+        # Handle missing email - create one from username
+        if not email or email.strip() == '':
+            email = f"{username}@example.com"
+
+        try:
+            # Passwords can't be migrated; users reset them after the move
+            user_id = self.target.create_user(
+                migration_id('user', sqlite_id), email, secrets.token_urlsafe(16), {"username": username}
+            )
+        except Exception as e:
+            print(f"✗ Error migrating user {username}: {str(e)}")
+            return None
+
+        return {'sqlite_id': sqlite_id, 'user_id': user_id, 'username': username,
+                'email': email, 'created_at': created_at}
+
+    def _migrate_user_rows(self, pool: ThreadPoolExecutor, rows) -> int:
+        pending = [row for row in rows if str(row[0]) not in self.state['users']]
+        created = [user for user in pool.map(self._create_user, pending) if user]
+
+        if created:
+            self.target.upsert('user_profiles', [
+                {k: user[k] for k in ('user_id', 'username', 'email', 'created_at')} for user in created
+            ], on_conflict='user_id')
+
+        for user in created:
+            self.state['users'][str(user['sqlite_id'])] = user['user_id']
+        failed = {row[0] for row in pending} - {user['sqlite_id'] for user in created}
+        self.state['failed_users'] = sorted((set(self.state['failed_users']) - {row[0] for row in rows}) | failed)
+        return len(created)
 
-def migrate_sqlite_to_supabase():
+    def migrate_users(self, conn: sqlite3.Connection) -> int:
+        print("Migrating users...")
+        started = time.perf_counter()
+        migrated = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='migrate-user') as pool:
+            # Retry users that failed in an earlier run
+            if self.state['failed_users']:
+                placeholders = ",".join("?" * len(self.state['failed_users']))
+                rows = conn.execute(f"""
+                    SELECT id, username, email, created_at FROM users WHERE id IN ({placeholders})
+                """, self.state['failed_users']).fetchall()
+                migrated += self._migrate_user_rows(pool, rows)
+                self._save_checkpoint()
+
+            for rows in self._chunks(conn, """
+                SELECT id, username, email, created_at FROM users
+                WHERE id > ? ORDER BY id LIMIT ?
+            """, 'last_user_id'):
+                migrated += self._migrate_user_rows(pool, rows)
+                self.state['last_user_id'] = rows[-1][0]
+                self._save_checkpoint()
+                self._report("users", migrated, started)
+
+        if self.state['failed_users']:
+            print(f"✗ {len(self.state['failed_users'])} user(s) failed; re-run to retry them.")
+        return migrated
+
+    # -- goals and emissions -------------------------------------------------
+
+    def migrate_goals(self, conn: sqlite3.Connection) -> int:
+        print("Migrating user goals...")
+        started = time.perf_counter()
+        migrated = 0
+
+        for rows in self._chunks(conn, """
+            SELECT id, user_id, annual_target, monthly_target, start_date, target_date,
+                   created_at, updated_at
+            FROM user_goals WHERE id > ? ORDER BY id LIMIT ?
+        """, 'last_goal_id'):
+            # One row per user; later rows are newer and win
+            goals = {}
+            for _, sqlite_user, annual, monthly, start, target, created_at, updated_at in rows:
+                user_id = self.state['users'].get(str(sqlite_user))
+                if not user_id:
+                    continue
+                goals[user_id] = {
+                    'user_id': user_id,
+                    'goals': {
+                        'annual_target': annual,
+                        'monthly_target': monthly,
+                        'start_date': start,
+                        'target_date': target,
+                        'created_at': created_at
+                    },
+                    'updated_at': updated_at or datetime.now().isoformat()
+                }
+
+            if goals:
+                self.target.upsert('user_goals', list(goals.values()), on_conflict='user_id')
+            migrated += len(goals)
+            self.state['last_goal_id'] = rows[-1][0]
+            self._save_checkpoint()
+            self._report("goals", migrated, started)
+        return migrated
+
+    def migrate_emissions(self, conn: sqlite3.Connection) -> int:
+        print("Migrating user emissions...")
+        started = time.perf_counter()
+        migrated = 0
+
+        for rows in self._chunks(conn, """
+            SELECT id, user_id, date, transport_emissions, energy_emissions, food_emissions, created_at
+            FROM user_emissions WHERE id > ? ORDER BY id LIMIT ?
+        """, 'last_emission_id'):
+            # One Supabase record per non-zero category
+            records = []
+            for sqlite_id, sqlite_user, date, transport, energy, food, created_at in rows:
+                user_id = self.state['users'].get(str(sqlite_user))
+                if not user_id:
+                    continue
+                for category, amount in zip(CATEGORIES, (transport, energy, food)):
+                    if amount and amount > 0:
+                        records.append({
+                            'id': migration_id('emission', sqlite_id, category),
+                            'user_id': user_id,
+                            'category': category,
+                            'emissions': amount,
+                            'details': {'date': date, 'source': 'migration'},
+                            'created_at': created_at
+                        })
+
+            if records:
+                self.target.upsert('user_emissions', records, on_conflict='id,created_at')
+            migrated += len(records)
+            self.state['last_emission_id'] = rows[-1][0]
+            self._save_checkpoint()
+            self._report("emissions", migrated, started)
+        return migrated
+
+    def run(self) -> Dict[str, int]:
+        """Migrate everything not yet covered by the checkpoint."""
+        started = time.perf_counter()
+        with sqlite3.connect(self.db_path) as conn:
+            stats = {
+                'users': self.migrate_users(conn),
+                'goals': self.migrate_goals(conn),
+                'emissions': self.migrate_emissions(conn)
+            }
+
+        elapsed = time.perf_counter() - started
+        print(f"Migration completed in {elapsed:.1f}s: {stats['users']:,} users, "
+              f"{stats['goals']:,} goals, {stats['emissions']:,} emission records.")
+        return stats
+
+
+def migrate_sqlite_to_supabase(db_path: str = "users.db",
+                               checkpoint_path: str = "migration_checkpoint.json",
+                               chunk_size: int = 500, workers: int = 8):
     """Migrate existing SQLite data to Supabase."""
-    
+    from dotenv import load_dotenv
+
     # Load environment variables
     load_dotenv()
-    
-    # Initialize Supabase client
+
     supabase_url = os.getenv('SUPABASE_URL')
     supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')  # Use service role key for admin operations
-    
+
     if not supabase_url or not supabase_key:
         raise ValueError("Missing Supabase credentials. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY environment variables.")
-    
-    supabase: Client = create_client(supabase_url, supabase_key)
-    
-    # Connect to SQLite database
-    if not os.path.exists('users.db'):
+
+    if not os.path.exists(db_path):
         print("No SQLite database found. Nothing to migrate.")
         return
-    
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    
+
     print("Starting migration from SQLite to Supabase...")
-    
-    # Migrate users
-    print("Migrating users...")
-    cursor.execute("SELECT username, email, password_hash, created_at FROM users")
-    users = cursor.fetchall()
-    
-    user_mapping = {}  # SQLite username -> Supabase user_id
-    
-    for username, email, password_hash, created_at in users:
-        try:
-            # Handle missing email - create one from username
-            if not email or email.strip() == '':
-                email = f"{username}@example.com"
-            
-            # Create user in Supabase Auth
-            # Note: We can't migrate passwords directly, so we'll create users with temporary passwords
-            # and they'll need to reset their passwords
-            temp_password = hashlib.sha256(f"{username}_{email}".encode()).hexdigest()[:12]
-            
-            auth_response = supabase.auth.admin.create_user({
-                "email": email,
-                "password": temp_password,
-                "email_confirm": True,
-                "user_metadata": {
-                    "username": username
-                }
-            })
-            
-            if auth_response.user:
-                user_id = auth_response.user.id
-                user_mapping[username] = user_id
-                
-                # Create user profile
-                supabase.table('user_profiles').insert({
-                    'user_id': user_id,
-                    'username': username,
-                    'email': email,
-                    'created_at': created_at
-                }).execute()
-                
-                print(f"✓ Migrated user: {username}")
-            else:
-                print(f"✗ Failed to migrate user: {username}")
-                
-        except Exception as e:
-            print(f"✗ Error migrating user {username}: {str(e)}")
-    
-    # Migrate user goals
-    print("Migrating user goals...")
-    cursor.execute("""
-        SELECT u.username, ug.annual_target, ug.monthly_target, ug.start_date, ug.target_date, ug.created_at, ug.updated_at
-        FROM user_goals ug
-        JOIN users u ON ug.user_id = u.id
-    """)
-    goals = cursor.fetchall()
-    
-    for username, annual_target, monthly_target, start_date, target_date, created_at, updated_at in goals:
-        if username in user_mapping:
-            try:
-                user_id = user_mapping[username]
-                goals_data = {
-                    'annual_target': annual_target,
-                    'monthly_target': monthly_target,
-                    'start_date': start_date,
-                    'target_date': target_date,
-                    'created_at': created_at
-                }
-                
-                supabase.table('user_goals').insert({
-                    'user_id': user_id,
-                    'goals': goals_data,
-                    'updated_at': updated_at or datetime.now().isoformat()
-                }).execute()
-                
-                print(f"✓ Migrated goals for: {username}")
-            except Exception as e:
-                print(f"✗ Error migrating goals for {username}: {str(e)}")
-    
-    # Migrate user emissions
-    print("Migrating user emissions...")
-    cursor.execute("""
-        SELECT u.username, ue.date, ue.transport_emissions, ue.energy_emissions, ue.food_emissions, ue.total_emissions, ue.created_at
-        FROM user_emissions ue
-        JOIN users u ON ue.user_id = u.id
-    """)
-    emissions = cursor.fetchall()
-    
-    for username, date, transport_emissions, energy_emissions, food_emissions, total_emissions, created_at in emissions:
-        if username in user_mapping:
-            try:
-                user_id = user_mapping[username]
-                
-                # Insert separate records for each emission category
-                if transport_emissions and transport_emissions > 0:
-                    supabase.table('user_emissions').insert({
-                        'user_id': user_id,
-                        'category': 'transport',
-                        'emissions': transport_emissions,
-                        'details': {'date': date, 'source': 'migration'},
-                        'created_at': created_at
-                    }).execute()
-                
-                if energy_emissions and energy_emissions > 0:
-                    supabase.table('user_emissions').insert({
-                        'user_id': user_id,
-                        'category': 'energy',
-                        'emissions': energy_emissions,
-                        'details': {'date': date, 'source': 'migration'},
-                        'created_at': created_at
-                    }).execute()
-                
-                if food_emissions and food_emissions > 0:
-                    supabase.table('user_emissions').insert({
-                        'user_id': user_id,
-                        'category': 'food',
-                        'emissions': food_emissions,
-                        'details': {'date': date, 'source': 'migration'},
-                        'created_at': created_at
-                    }).execute()
-                
-                print(f"✓ Migrated emissions for: {username}")
-            except Exception as e:
-                print(f"✗ Error migrating emissions for {username}: {str(e)}")
-    
-    conn.close()
-    print("Migration completed!")
-    print(f"Migrated {len(user_mapping)} users to Supabase.")
+    target = SupabaseTarget(supabase_url, supabase_key, workers=workers)
+    try:
+        Migration(db_path, target, checkpoint_path, chunk_size, workers).run()
+    finally:
+        target.close()
     print("Note: Users will need to reset their passwords as they couldn't be migrated directly.")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate users.db to Supabase (resumable).")
+    parser.add_argument('--db', default='users.db', help="SQLite database to migrate")
+    parser.add_argument('--checkpoint', default='migration_checkpoint.json',
+                        help="Progress file; delete it to start over")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Rows read and written per batch")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent auth user creations")
+    args = parser.parse_args()
+
+    migrate_sqlite_to_supabase(args.db, args.checkpoint, args.chunk_size, args.workers)
+
 if __name__ == "__main__":
-    migrate_sqlite_to_supabase()
+    main()
@@ -0,0 +1,193 @@
+-- Migration: composite indexes and monthly partitioning for user_emissions
+-- Brings user_emissions in a database created from the original
+-- supabase_schema.sql in line with the current one, without taking the
+-- table offline. It can run before or after the later schema sections
+-- (12-16): the flagged/reviewed columns, column grants and counter, sketch
+-- and flag triggers those sections add to user_emissions are carried over
+-- to the partitioned table, with the triggers recreated for whichever of
+-- their functions exist.
+--
+-- Run with psql (each statement on its own; CONCURRENTLY cannot run inside
+-- a transaction):
+--     psql "$DATABASE_URL" -f migrations/001_user_emissions_partitioning.sql
+--
+-- Phase 1 builds everything that needs a table scan while reads and writes
+-- continue. Phase 2 swaps the table for a partitioned one in a single short
+-- transaction: the existing table is attached unchanged as the partition
+-- holding all rows before the cutover month, so no rows are copied. Phase 2
+-- must run before the cutover (the start of the month after next, relative
+-- to when phase 1 ran). Re-running phase 1 is safe.
+
+-- Phase 1: online preparation --------------------------------------------
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_emissions_user_created
+    ON user_emissions (user_id, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_emissions_user_category_created
+    ON user_emissions (user_id, category, created_at);
+
+-- The partitioned table's key must include created_at
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS user_emissions_id_created_key
+    ON user_emissions (id, created_at);
+
+UPDATE user_emissions SET created_at = NOW() WHERE created_at IS NULL;
+
+-- Schema section 15's columns and review queue index, so the table attaches
+-- to the new parent whether or not that section has run. A constant default
+-- doesn't rewrite the table.
+ALTER TABLE user_emissions ADD COLUMN IF NOT EXISTS flagged BOOLEAN NOT NULL DEFAULT false;
+ALTER TABLE user_emissions ADD COLUMN IF NOT EXISTS reviewed BOOLEAN NOT NULL DEFAULT false;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_user_emissions_flagged
+    ON user_emissions (created_at) WHERE flagged;
+
+-- Validated CHECKs let phase 2 set NOT NULL and attach the partition without
+-- scanning; VALIDATE only takes a lock that allows reads and writes.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'user_emissions_created_at_not_null') THEN
+        ALTER TABLE user_emissions
+            ADD CONSTRAINT user_emissions_created_at_not_null CHECK (created_at IS NOT NULL) NOT VALID;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'user_emissions_before_cutover') THEN
+        EXECUTE format(
+            'ALTER TABLE user_emissions ADD CONSTRAINT user_emissions_before_cutover CHECK (created_at < %L::TIMESTAMPTZ) NOT VALID',
+            date_trunc('month', NOW()) + INTERVAL '2 months'
+        );
+    END IF;
+END;
+$$;
+
+ALTER TABLE user_emissions VALIDATE CONSTRAINT user_emissions_created_at_not_null;
+ALTER TABLE user_emissions VALIDATE CONSTRAINT user_emissions_before_cutover;
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_emissions_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_emissions_category;
+DROP INDEX CONCURRENTLY IF EXISTS idx_user_emissions_created_at;
+
+CREATE OR REPLACE FUNCTION create_user_emissions_partitions(
+    months_ahead INTEGER DEFAULT 3,
+    from_month DATE DEFAULT date_trunc('month', NOW())::DATE
+)
+RETURNS VOID AS $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', from_month) + make_interval(months => i))::DATE;
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF public.user_emissions FOR VALUES FROM (%L) TO (%L)',
+            'user_emissions_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Phase 2: swap in the partitioned table -----------------------------------
+
+BEGIN;
+
+-- Give up rather than queue behind long-running queries
+SET LOCAL lock_timeout = '5s';
+LOCK TABLE user_emissions IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE user_emissions RENAME TO user_emissions_legacy;
+-- Partitions can't have triggers with transition tables; the parent gets them back below
+DROP TRIGGER IF EXISTS on_user_emissions_counted ON user_emissions_legacy;
+DROP TRIGGER IF EXISTS on_user_emissions_sketched ON user_emissions_legacy;
+DROP TRIGGER IF EXISTS on_user_emissions_flagged ON user_emissions_legacy;
+ALTER INDEX idx_user_emissions_user_created RENAME TO user_emissions_legacy_user_created_idx;
+ALTER INDEX idx_user_emissions_user_category_created RENAME TO user_emissions_legacy_user_category_created_idx;
+ALTER INDEX idx_user_emissions_flagged RENAME TO user_emissions_legacy_flagged_idx;
+
+-- Proven by the validated CHECK, so neither statement scans the table
+ALTER TABLE user_emissions_legacy ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE user_emissions_legacy DROP CONSTRAINT user_emissions_pkey;
+ALTER TABLE user_emissions_legacy
+    ADD CONSTRAINT user_emissions_legacy_pkey PRIMARY KEY USING INDEX user_emissions_id_created_key;
+
+CREATE TABLE user_emissions (
+    id UUID DEFAULT gen_random_uuid() NOT NULL,
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    category TEXT NOT NULL CONSTRAINT user_emissions_category_check CHECK (category IN ('transport', 'energy', 'food')),
+    emissions DECIMAL(10,2) NOT NULL CONSTRAINT user_emissions_emissions_check CHECK (emissions >= 0),
+    details JSONB,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    flagged BOOLEAN NOT NULL DEFAULT false,
+    reviewed BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Instant on the empty parent; attaching reuses the indexes built in phase 1
+CREATE INDEX idx_user_emissions_user_created ON user_emissions (user_id, created_at DESC);
+CREATE INDEX idx_user_emissions_user_category_created ON user_emissions (user_id, category, created_at);
+CREATE INDEX idx_user_emissions_flagged ON user_emissions (created_at) WHERE flagged;
+
+DO $$
+DECLARE
+    cutover TIMESTAMPTZ;
+BEGIN
+    SELECT substring(pg_get_constraintdef(oid) FROM '''([^'']+)''')::TIMESTAMPTZ INTO cutover
+    FROM pg_constraint WHERE conname = 'user_emissions_before_cutover';
+
+    EXECUTE format(
+        'ALTER TABLE user_emissions ATTACH PARTITION user_emissions_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        cutover
+    );
+    PERFORM create_user_emissions_partitions(3, cutover::DATE);
+END;
+$$;
+
+CREATE TABLE user_emissions_default PARTITION OF user_emissions DEFAULT;
+
+ALTER TABLE user_emissions_legacy
+    DROP CONSTRAINT user_emissions_before_cutover,
+    DROP CONSTRAINT user_emissions_created_at_not_null;
+
+-- Policies and triggers belong to the table, so recreate them on the new parent
+ALTER TABLE user_emissions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own emissions" ON user_emissions
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert their own emissions" ON user_emissions
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update their own emissions" ON user_emissions
+    FOR UPDATE USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete their own emissions" ON user_emissions
+    FOR DELETE USING (auth.uid() = user_id);
+
+-- As in schema section 15: only the service role sets flagged or reviewed
+REVOKE INSERT, UPDATE ON user_emissions FROM anon, authenticated;
+GRANT SELECT, DELETE ON user_emissions TO authenticated;
+GRANT INSERT (id, user_id, category, emissions, details, created_at) ON user_emissions TO authenticated;
+GRANT UPDATE (category, emissions, details) ON user_emissions TO authenticated;
+GRANT ALL ON user_emissions TO service_role;
+
+-- The triggers from schema sections 12, 14 and 15, for the sections that have run
+DO $$
+BEGIN
+    IF to_regproc('count_user_emissions') IS NOT NULL THEN
+        CREATE TRIGGER on_user_emissions_counted
+            AFTER INSERT ON user_emissions
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION count_user_emissions();
+    END IF;
+    IF to_regproc('sketch_user_emissions') IS NOT NULL THEN
+        CREATE TRIGGER on_user_emissions_sketched
+            AFTER INSERT ON user_emissions
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION sketch_user_emissions();
+    END IF;
+    IF to_regproc('recount_flagged_emissions') IS NOT NULL THEN
+        CREATE TRIGGER on_user_emissions_flagged
+            AFTER UPDATE ON user_emissions
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION recount_flagged_emissions();
+    END IF;
+END;
+$$;
+
+COMMIT;
@@ -1,5 +1,6 @@
 import streamlit as st
 from main.utils.supabase_auth import get_current_user, is_authenticated, get_supabase_auth
+from main.utils.user_cache import get_session_cache
 from datetime import datetime
 
 if not is_authenticated():
@@ -31,22 +32,26 @@ if username:
     with col2:
         st.subheader("⚙️ Settings")
         
+        settings = auth.get_user_settings()
+        unit_options = ["metric", "imperial"]
+        language_options = ["en", "es", "fr", "de"]
+        
         with st.form("settings_form"):
             units = st.selectbox(
                 "Units",
-                ["metric", "imperial"],
-                index=0
+                unit_options,
+                index=unit_options.index(settings.get('units', 'metric'))
             )
             
             language = st.selectbox(
                 "Language",
-                ["en", "es", "fr", "de"],
-                index=0  # Default to English
+                language_options,
+                index=language_options.index(settings.get('language', 'en'))
             )
             
             notifications = st.checkbox(
                 "Enable notifications",
-                value=True
+                value=settings.get('notifications', True)
             )
             
             submit = st.form_submit_button("Update Settings")
@@ -58,7 +63,7 @@ if username:
                     'notifications': notifications
                 }
                 
-                if auth.update_user_settings(username, new_settings):
+                if auth.update_user_settings(new_settings):
                     st.success("Settings updated successfully!")
                     st.rerun()
                 else:
@@ -102,6 +107,28 @@ if username:
     else:
         st.info("Complete the emission calculators to see your carbon footprint summary here.")
     
+    # Saved history, aggregated by the database
+    totals = auth.get_emission_totals()
+    if totals['record_count']:
+        st.subheader("🗂️ All-Time Saved Emissions")
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("Transport", f"{totals['transport']:.1f} kg CO₂")
+        with col2:
+            st.metric("Energy", f"{totals['energy']:.1f} kg CO₂")
+        with col3:
+            st.metric("Food", f"{totals['food']:.1f} kg CO₂")
+        with col4:
+            st.metric("Total", f"{totals['total']:.1f} kg CO₂", help=f"{totals['record_count']} saved records")
+        
+        monthly = auth.get_monthly_emissions(months=12)
+        if monthly:
+            import pandas as pd
+            st.bar_chart(
+                pd.DataFrame(monthly).set_index('month')[['transport', 'energy', 'food']]
+            )
+        
     st.divider()
     
     # Account Actions
@@ -125,6 +152,16 @@ if username:
     with col2:
         st.markdown("**Export Data** (Coming Soon)")
         st.button("📁 Export Data", disabled=True, help="Feature coming soon")
+    
+    with st.expander("🔧 Session Cache"):
+        cache_stats = get_session_cache().stats()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Cache Hits", cache_stats['hits'])
+        with col2:
+            st.metric("Cache Misses", cache_stats['misses'])
+        with col3:
+            st.metric("Hit Rate", f"{cache_stats['hit_rate'] * 100:.1f}%")
 
 else:
     st.error("Unable to load user information.")
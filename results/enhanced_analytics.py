@@ -1,9 +1,7 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import numpy as np
+from datetime import datetime
+from main.utils.supabase_auth import get_supabase_auth, is_authenticated
+from main.utils import page_cache
 
 st.set_page_config(
     page_title="Results & Analytics",
@@ -33,12 +31,8 @@ energy = st.session_state.get("energy_emissions", 0.0)
 food = st.session_state.get("food_emissions", 0.0)
 total_emissions = transport + energy + food
 
-# Global averages for comparison (monthly)
-GLOBAL_AVERAGES = {
-    "Global Average": 833,  # kg CO2 per month (10 tons per year)
-    "EU Average": 667,      # kg CO2 per month (8 tons per year)
-    "Paris Agreement Target": 167,  # kg CO2 per month (2 tons per year)
-}
+# Global averages for comparison (monthly), from emission_factors.yaml
+GLOBAL_AVERAGES = page_cache.get_benchmarks()
 
 col1, col2 = st.columns([2, 1])
 
@@ -47,19 +41,11 @@ with col1:
     
     # Create emissions breakdown pie chart
     if total_emissions > 0:
-        emission_data = pd.DataFrame({
-            'Category': ['Transport', 'Energy', 'Food'],
-            'Emissions': [transport, energy, food],
-            'Percentage': [transport/total_emissions*100, energy/total_emissions*100, food/total_emissions*100]
-        })
-        
-        fig = px.pie(emission_data, values='Emissions', names='Category', 
-                    title="Monthly Emissions Breakdown",
-                    color_discrete_map={'Transport': '#ff7f0e', 'Energy': '#2ca02c', 'Food': '#d62728'})
-        fig.update_traces(textposition='inside', textinfo='percent+label')
+        fig = page_cache.breakdown_figure(transport, energy, food)
         st.plotly_chart(fig, use_container_width=True)
         
         # Add horizontal bar chart
+        import pandas as pd
         emission_df = pd.DataFrame({
             "Emissions (kg CO₂)": [transport, energy, food]
         }, index=["Transport", "Energy", "Food"])
@@ -88,13 +74,13 @@ with col2:
     st.metric("Daily Average", f"{total_emissions / 30:.1f} kg CO₂")
     
     # Carbon intensity rating
-    if total_emissions <= 167:
+    if total_emissions <= GLOBAL_AVERAGES['Paris Agreement Target']:
         rating = "🟢 Excellent"
         color = "green"
     elif total_emissions <= 400:
         rating = "🟡 Good"
         color = "orange" 
-    elif total_emissions <= 667:
+    elif total_emissions <= GLOBAL_AVERAGES['EU Average']:
         rating = "🟠 Average"
         color = "orange"
     else:
@@ -108,41 +94,51 @@ st.divider()
 # Comparison with global averages
 st.subheader("🌍 How You Compare")
 
-comparison_data = pd.DataFrame({
-    'Category': list(GLOBAL_AVERAGES.keys()) + ['Your Emissions'],
-    'Monthly Emissions': list(GLOBAL_AVERAGES.values()) + [total_emissions]
-})
-
-fig_comparison = px.bar(comparison_data, x='Category', y='Monthly Emissions',
-                       title="Your Emissions vs. Global Benchmarks",
-                       color='Category',
-                       color_discrete_map={'Your Emissions': '#1f77b4'})
-fig_comparison.update_layout(showlegend=False)
+fig_comparison = page_cache.benchmark_figure(total_emissions)
 st.plotly_chart(fig_comparison, use_container_width=True)
 
+# Percentiles against everyone's calculations from the last three months
+if is_authenticated() and total_emissions > 0:
+    from main.utils.quantile_sketch import ordinal, percentile_ranks
+
+    percentiles = percentile_ranks({'transport': transport, 'energy': energy, 'food': food},
+                                   get_supabase_auth().get_emission_sketches(months=3))
+    if any(value is not None for value in percentiles.values()):
+        # The sketches count saved calculations, not users, so that is what they are compared with
+        st.markdown("**Compared with everyone's saved calculations (last 3 months)**")
+        for column, (category, label) in zip(st.columns(3), [('transport', "🚗 Transport"),
+                                                               ('energy', "⚡ Energy"),
+                                                               ('food', "🥗 Food")]):
+            with column:
+                percentile = percentiles[category]
+                if percentile is None:
+                    st.metric(label, "No data yet")
+                else:
+                    st.metric(label, f"{ordinal(round(percentile))} percentile",
+                              help="Share of calculations saved in the last 3 months at or below yours; "
+                                   "lower is better.")
+                    st.caption(f"Lower than {100 - round(percentile)}% of saved calculations")
+
 # Improvement suggestions
 st.subheader("💡 Personalized Improvement Suggestions")
 
-suggestions = []
-if transport > total_emissions * 0.4:
-    suggestions.append("🚗 **Transport** is your highest emission source. Consider public transport, cycling, or electric vehicles.")
-if energy > total_emissions * 0.4:
-    suggestions.append("⚡ **Energy** consumption is high. Consider renewable energy, better insulation, or energy-efficient appliances.")
-if food > total_emissions * 0.4:
-    suggestions.append("🥗 **Food** emissions are significant. Consider reducing meat consumption or choosing local, seasonal foods.")
-
-if transport > 150:
-    suggestions.append("🚶‍♂️ Try walking or cycling for short trips under 5km.")
-if energy > 100:
-    suggestions.append("🏠 Improve home insulation and use programmable thermostats.")
-if food > 120:
-    suggestions.append("🌱 Try 'Meatless Mondays' or plant-based meals 2-3 times per week.")
-
-if suggestions:
-    for suggestion in suggestions:
-        st.markdown(f"- {suggestion}")
+CATEGORY_ICONS = {'transport': "🚗", 'energy': "⚡", 'food': "🥗"}
+calculator_inputs = {category: st.session_state.get(f"{category}_inputs") for category in CATEGORY_ICONS}
+
+if not any(calculator_inputs.values()):
+    st.info("Calculate your emissions in the category sections to get suggestions ranked by what they save you.")
 else:
-    st.success("🎉 Great job! Your emissions are quite low. Keep up the good work!")
+    # Ranked by the exact saving on the inputs entered in the calculators (numpy, so loaded here)
+    from main.core.recommendations import recommend
+    
+    suggestions = recommend(**calculator_inputs, k=5)
+    if suggestions:
+        for suggestion in suggestions:
+            st.markdown(f"- {CATEGORY_ICONS[suggestion['category']]} {suggestion['title']}: "
+                        f"saves **{suggestion['saving_kg']:.1f} kg CO₂** per month "
+                        f"({suggestion['saving_kg'] * 12:.0f} kg a year)")
+    else:
+        st.success("🎉 Great job! None of our suggested actions would cut your emissions further. Keep up the good work!")
 
 # Future projections
 st.subheader("📈 Impact Projections")
@@ -163,7 +159,7 @@ with col2:
 
 with col3:
     st.markdown("**Paris Agreement Target**")
-    target = 167
+    target = GLOBAL_AVERAGES['Paris Agreement Target']
     st.metric("Monthly Target", f"{target} kg CO₂")
     if total_emissions > target:
         reduction_needed = ((total_emissions - target) / total_emissions) * 100
@@ -185,6 +181,7 @@ if st.button("Generate Detailed Report"):
         'Comparison to Global Average': f"{((total_emissions / GLOBAL_AVERAGES['Global Average']) - 1) * 100:.1f}%"
     }
     
+    import pandas as pd
     df_report = pd.DataFrame([report_data])
     csv = df_report.to_csv(index=False)
     
@@ -194,3 +191,20 @@ if st.button("Generate Detailed Report"):
         file_name=f"carbon_footprint_report_{datetime.now().strftime('%Y%m%d')}.csv",
         mime='text/csv'
     )
+
+# Full history export for authenticated users
+if is_authenticated():
+    if st.button("Generate Emission History (Parquet)"):
+        from main.utils.columnar_export import iter_supabase_batches, emission_history_parquet_bytes
+        
+        auth = get_supabase_auth()
+        history = emission_history_parquet_bytes(
+            iter_supabase_batches(auth.client, user_id=auth.get_current_user_id())
+        )
+        
+        st.download_button(
+            label="🗂️ Download History (Parquet)",
+            data=history,
+            file_name=f"emission_history_{datetime.now().strftime('%Y%m%d')}.parquet",
+            mime='application/octet-stream'
+        )
@@ -1,10 +1,6 @@
 import streamlit as st
-from main.utils.supabase_auth import get_supabase_auth, get_current_user, is_authenticated
-from dotenv import load_dotenv
-import os
-
-# Load environment variables
-load_dotenv()
+# Also loads .env; the Supabase client and page libraries are imported on first use
+from main.utils.supabase_auth import get_supabase_auth, get_current_user, is_authenticated, show_save_status
 
 # Initialize Supabase authentication
 @st.cache_resource
@@ -60,6 +56,14 @@ def show_auth_page():
                         st.error("Passwords do not match")
                 else:
                     st.error("Please fill in all fields")
+    
+    st.divider()
+    st.markdown("Want to try without creating an account?")
+    if st.button("Create Demo Account"):
+        # Demo accounts and their data are removed after a day (admin panel)
+        if auth.create_demo_user():
+            st.success("Demo account created! You're now logged in.")
+            st.rerun()
 
 # Initialize authentication
 auth_system = init_supabase_auth()
@@ -78,6 +82,9 @@ else:
             if st.button("Logout", type="secondary"):
                 auth_system.logout()
                 st.rerun()
+        
+        # Background saves from the category pages
+        show_save_status()
     
     # Define pages
     home = st.Page(
@@ -14,15 +14,49 @@ CREATE TABLE user_profiles (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- 2. User emissions table
+-- 2. User emissions table, range-partitioned by month on created_at
+-- Queries for a time range only touch the matching months, and old months
+-- can be detached or dropped without a bulk DELETE. The primary key has to
+-- include the partition key.
 CREATE TABLE user_emissions (
-    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    id UUID DEFAULT gen_random_uuid() NOT NULL,
     user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
-    category TEXT NOT NULL CHECK (category IN ('transport', 'energy', 'food')),
-    emissions DECIMAL(10,2) NOT NULL CHECK (emissions >= 0),
+    category TEXT NOT NULL CONSTRAINT user_emissions_category_check CHECK (category IN ('transport', 'energy', 'food')),
+    emissions DECIMAL(10,2) NOT NULL CONSTRAINT user_emissions_emissions_check CHECK (emissions >= 0),
     details JSONB,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Rows outside every monthly partition land here
+CREATE TABLE user_emissions_default PARTITION OF user_emissions DEFAULT;
+
+-- Creates the monthly partitions from `from_month` through `months_ahead` months later
+CREATE OR REPLACE FUNCTION create_user_emissions_partitions(
+    months_ahead INTEGER DEFAULT 3,
+    from_month DATE DEFAULT date_trunc('month', NOW())::DATE
+)
+RETURNS VOID AS $$
+DECLARE
+    month_start DATE;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', from_month) + make_interval(months => i))::DATE;
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF public.user_emissions FOR VALUES FROM (%L) TO (%L)',
+            'user_emissions_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The past year through three months ahead
+SELECT create_user_emissions_partitions(15, (date_trunc('month', NOW()) - INTERVAL '12 months')::DATE);
+
+-- Keep future months available (requires the pg_cron extension):
+-- SELECT cron.schedule('user-emissions-partitions', '0 0 1 * *', 'SELECT create_user_emissions_partitions(3)');
 
 -- 3. User goals table
 CREATE TABLE user_goals (
@@ -35,9 +69,9 @@ CREATE TABLE user_goals (
 -- 4. Create indexes for better performance
 CREATE INDEX idx_user_profiles_user_id ON user_profiles(user_id);
 CREATE INDEX idx_user_profiles_username ON user_profiles(username);
-CREATE INDEX idx_user_emissions_user_id ON user_emissions(user_id);
-CREATE INDEX idx_user_emissions_category ON user_emissions(category);
-CREATE INDEX idx_user_emissions_created_at ON user_emissions(created_at);
+-- History is always read per user, newest first; per-category reads add the category
+CREATE INDEX idx_user_emissions_user_created ON user_emissions(user_id, created_at DESC);
+CREATE INDEX idx_user_emissions_user_category_created ON user_emissions(user_id, category, created_at);
 CREATE INDEX idx_user_goals_user_id ON user_goals(user_id);
 
 -- 5. Enable Row Level Security (RLS)
@@ -118,3 +152,418 @@ CREATE TRIGGER update_user_profiles_updated_at
 CREATE TRIGGER update_user_goals_updated_at
     BEFORE UPDATE ON user_goals
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- 11. Aggregates for the current user, computed in the database
+-- Called via RPC so the app receives a few summary rows instead of every
+-- emission record. Runs with the caller's rights, so RLS still applies.
+-- Safe to run on its own against an existing database.
+CREATE INDEX IF NOT EXISTS idx_user_emissions_user_category_created
+    ON user_emissions(user_id, category, created_at);
+
+CREATE OR REPLACE FUNCTION get_emission_totals()
+RETURNS TABLE (category TEXT, total NUMERIC, record_count BIGINT, last_recorded TIMESTAMP WITH TIME ZONE)
+LANGUAGE sql STABLE AS $$
+    SELECT e.category, SUM(e.emissions), COUNT(*), MAX(e.created_at)
+    FROM user_emissions e
+    WHERE e.user_id = auth.uid()
+    GROUP BY e.category;
+$$;
+
+CREATE OR REPLACE FUNCTION get_monthly_emissions(months_back INTEGER DEFAULT 12)
+RETURNS TABLE (month DATE, category TEXT, total NUMERIC, record_count BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT date_trunc('month', e.created_at)::DATE, e.category, SUM(e.emissions), COUNT(*)
+    FROM user_emissions e
+    WHERE e.user_id = auth.uid()
+      AND e.created_at >= date_trunc('month', NOW()) - make_interval(months => months_back - 1)
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_emission_totals() TO authenticated;
+GRANT EXECUTE ON FUNCTION get_monthly_emissions(INTEGER) TO authenticated;
+
+-- 12. Maintained counters for the admin dashboard
+-- Triggers keep these small tables current, so admin statistics never scan
+-- auth.users or user_emissions. Demo accounts carry is_demo = true in their
+-- user metadata. Only the service role can read them.
+-- Safe to run on its own against an existing database.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS app_counters (
+    name TEXT PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS user_login_days (
+    day DATE PRIMARY KEY,
+    users BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS emission_daily_counts (
+    day DATE PRIMARY KEY,
+    records BIGINT NOT NULL DEFAULT 0,
+    total_emissions NUMERIC NOT NULL DEFAULT 0
+);
+
+ALTER TABLE app_counters ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_login_days ENABLE ROW LEVEL SECURITY;
+ALTER TABLE emission_daily_counts ENABLE ROW LEVEL SECURITY;
+
+-- Seed from existing rows (only the first time this section runs)
+LOCK TABLE user_emissions IN SHARE ROW EXCLUSIVE MODE;
+
+INSERT INTO app_counters (name, value)
+SELECT 'total_users', COUNT(*) FROM auth.users
+UNION ALL
+SELECT 'demo_users', COUNT(*) FROM auth.users WHERE (raw_user_meta_data->>'is_demo')::BOOLEAN
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO user_login_days (day, users)
+SELECT last_sign_in_at::DATE, COUNT(*) FROM auth.users
+WHERE last_sign_in_at IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM user_login_days)
+GROUP BY 1;
+
+INSERT INTO emission_daily_counts (day, records, total_emissions)
+SELECT created_at::DATE, COUNT(*), SUM(emissions) FROM user_emissions
+WHERE NOT EXISTS (SELECT 1 FROM emission_daily_counts)
+GROUP BY 1;
+
+CREATE OR REPLACE FUNCTION count_auth_users()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_demo INTEGER := 0;
+    new_demo INTEGER := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_demo := COALESCE((OLD.raw_user_meta_data->>'is_demo')::BOOLEAN, FALSE)::INTEGER;
+        UPDATE public.user_login_days SET users = users - 1 WHERE day = OLD.last_sign_in_at::DATE;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_demo := COALESCE((NEW.raw_user_meta_data->>'is_demo')::BOOLEAN, FALSE)::INTEGER;
+        IF NEW.last_sign_in_at IS NOT NULL THEN
+            INSERT INTO public.user_login_days (day, users) VALUES (NEW.last_sign_in_at::DATE, 1)
+            ON CONFLICT (day) DO UPDATE SET users = user_login_days.users + 1;
+        END IF;
+    END IF;
+
+    UPDATE public.app_counters SET value = value + CASE TG_OP WHEN 'INSERT' THEN 1 WHEN 'DELETE' THEN -1 ELSE 0 END
+    WHERE name = 'total_users';
+    IF new_demo <> old_demo THEN
+        UPDATE public.app_counters SET value = value + new_demo - old_demo WHERE name = 'demo_users';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS on_auth_user_counted ON auth.users;
+CREATE TRIGGER on_auth_user_counted
+    AFTER INSERT OR DELETE ON auth.users
+    FOR EACH ROW EXECUTE FUNCTION count_auth_users();
+
+-- Logins only move a user between days; skip same-day sign-ins
+DROP TRIGGER IF EXISTS on_auth_user_login_counted ON auth.users;
+CREATE TRIGGER on_auth_user_login_counted
+    AFTER UPDATE OF last_sign_in_at, raw_user_meta_data ON auth.users
+    FOR EACH ROW
+    WHEN (OLD.last_sign_in_at::DATE IS DISTINCT FROM NEW.last_sign_in_at::DATE
+          OR OLD.raw_user_meta_data->>'is_demo' IS DISTINCT FROM NEW.raw_user_meta_data->>'is_demo')
+    EXECUTE FUNCTION count_auth_users();
+
+-- One counter update per statement and day, however many rows a batch inserts
+CREATE OR REPLACE FUNCTION count_user_emissions()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.emission_daily_counts (day, records, total_emissions)
+    SELECT created_at::DATE, COUNT(*), SUM(emissions) FROM new_rows GROUP BY 1
+    ON CONFLICT (day) DO UPDATE SET
+        records = emission_daily_counts.records + EXCLUDED.records,
+        total_emissions = emission_daily_counts.total_emissions + EXCLUDED.total_emissions;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS on_user_emissions_counted ON user_emissions;
+CREATE TRIGGER on_user_emissions_counted
+    AFTER INSERT ON user_emissions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_user_emissions();
+
+CREATE OR REPLACE FUNCTION get_app_counters(active_days INTEGER DEFAULT 30)
+RETURNS TABLE (total_users BIGINT, active_users BIGINT, demo_users BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT
+        (SELECT value FROM app_counters WHERE name = 'total_users'),
+        (SELECT COALESCE(SUM(users), 0)::BIGINT FROM user_login_days
+         WHERE day >= CURRENT_DATE - active_days),
+        (SELECT value FROM app_counters WHERE name = 'demo_users');
+$$;
+
+CREATE OR REPLACE FUNCTION get_daily_emission_counts(days INTEGER DEFAULT 30)
+RETURNS TABLE (day DATE, records BIGINT, total_emissions NUMERIC)
+LANGUAGE sql STABLE AS $$
+    SELECT day, records, total_emissions FROM emission_daily_counts
+    WHERE day >= CURRENT_DATE - days
+    ORDER BY day;
+$$;
+
+REVOKE EXECUTE ON FUNCTION get_app_counters(INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION get_daily_emission_counts(INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_app_counters(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION get_daily_emission_counts(INTEGER) TO service_role;
+
+COMMIT;
+
+-- 13. Goal progress history
+-- The goals page keeps a user's latest progress entries in the session and
+-- moves older ones here.
+-- Safe to run on its own against an existing database.
+CREATE TABLE IF NOT EXISTS user_progress (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+    recorded_on DATE NOT NULL,
+    transport DECIMAL(10,2) NOT NULL DEFAULT 0,
+    energy DECIMAL(10,2) NOT NULL DEFAULT 0,
+    food DECIMAL(10,2) NOT NULL DEFAULT 0,
+    total DECIMAL(10,2) NOT NULL,
+    target DECIMAL(10,2),
+    met_target BOOLEAN,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_progress_user_recorded ON user_progress(user_id, recorded_on);
+
+ALTER TABLE user_progress ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view their own progress" ON user_progress;
+CREATE POLICY "Users can view their own progress" ON user_progress
+    FOR SELECT USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can insert their own progress" ON user_progress;
+CREATE POLICY "Users can insert their own progress" ON user_progress
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+-- 14. Population percentiles
+-- One quantile sketch per category and month: counts of emission values in
+-- logarithmic buckets (1% relative accuracy), kept current by a trigger on
+-- the insert path. Buckets from any set of months add up to a sketch of
+-- their union, so a percentile reads a few hundred small rows whatever the
+-- size of user_emissions. Only counts are stored, so any signed-in user may
+-- read them. Like the daily counts, rows later removed stay counted.
+-- Bucket math matches main/utils/quantile_sketch.py.
+-- Safe to run on its own against an existing database.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS emission_sketches (
+    category TEXT NOT NULL,
+    month DATE NOT NULL,
+    bucket INTEGER NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (category, month, bucket)
+);
+
+ALTER TABLE emission_sketches ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Signed-in users can read emission sketches" ON emission_sketches;
+CREATE POLICY "Signed-in users can read emission sketches" ON emission_sketches
+    FOR SELECT TO authenticated USING (true);
+
+-- Bucket i holds values in (gamma^(i-1), gamma^i], gamma = 1.01 / 0.99; values below 0.01 share one bucket
+CREATE OR REPLACE FUNCTION emission_sketch_bucket(value NUMERIC)
+RETURNS INTEGER
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CEIL(LN(GREATEST(value, 0.01)::DOUBLE PRECISION) / LN(1.01 / 0.99::DOUBLE PRECISION))::INTEGER;
+$$;
+
+-- Seed from existing rows (only the first time this section runs)
+LOCK TABLE user_emissions IN SHARE ROW EXCLUSIVE MODE;
+
+INSERT INTO emission_sketches (category, month, bucket, count)
+SELECT category, date_trunc('month', created_at)::DATE, emission_sketch_bucket(emissions), COUNT(*)
+FROM user_emissions
+WHERE NOT EXISTS (SELECT 1 FROM emission_sketches)
+GROUP BY 1, 2, 3;
+
+CREATE OR REPLACE FUNCTION sketch_user_emissions()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.emission_sketches (category, month, bucket, count)
+    SELECT category, date_trunc('month', created_at)::DATE, public.emission_sketch_bucket(emissions), COUNT(*)
+    FROM new_rows GROUP BY 1, 2, 3
+    ON CONFLICT (category, month, bucket) DO UPDATE SET count = emission_sketches.count + EXCLUDED.count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS on_user_emissions_sketched ON user_emissions;
+CREATE TRIGGER on_user_emissions_sketched
+    AFTER INSERT ON user_emissions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sketch_user_emissions();
+
+-- Sketch buckets summed over the last `months` months, per category
+CREATE OR REPLACE FUNCTION get_emission_sketch(months INTEGER DEFAULT 3)
+RETURNS TABLE (category TEXT, bucket INTEGER, count BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT s.category, s.bucket, SUM(s.count)::BIGINT FROM emission_sketches s
+    WHERE s.month >= (date_trunc('month', CURRENT_DATE) - (months - 1) * INTERVAL '1 month')::DATE
+    GROUP BY s.category, s.bucket
+    ORDER BY s.category, s.bucket;
+$$;
+
+REVOKE EXECUTE ON FUNCTION get_emission_sketch(INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION get_emission_sketch(INTEGER) TO authenticated, service_role;
+
+COMMIT;
+
+-- 15. Anomalous records
+-- main/utils/anomaly.py flags records that look like data entry mistakes
+-- (100000 km in a month, nine long-haul flights): far out for the whole
+-- population and for the user's own history. Flagged rows are left out of
+-- the totals, monthly series, sketches and daily counts until someone
+-- reviews them. Clearing the flag counts a row again, and setting reviewed
+-- keeps the detector from flagging it again; deleting it drops it for good.
+-- Only the service role can set either column.
+-- Safe to run on its own against an existing database.
+BEGIN;
+
+ALTER TABLE user_emissions ADD COLUMN IF NOT EXISTS flagged BOOLEAN NOT NULL DEFAULT false;
+ALTER TABLE user_emissions ADD COLUMN IF NOT EXISTS reviewed BOOLEAN NOT NULL DEFAULT false;
+
+-- The review queue
+CREATE INDEX IF NOT EXISTS idx_user_emissions_flagged ON user_emissions(created_at) WHERE flagged;
+
+REVOKE INSERT, UPDATE ON user_emissions FROM anon, authenticated;
+-- id too, so queued rows can carry their own and be replayed without duplicates
+GRANT INSERT (id, user_id, category, emissions, details, created_at) ON user_emissions TO authenticated;
+GRANT UPDATE (category, emissions, details) ON user_emissions TO authenticated;
+
+-- The section 11 aggregates, without flagged rows
+CREATE OR REPLACE FUNCTION get_emission_totals()
+RETURNS TABLE (category TEXT, total NUMERIC, record_count BIGINT, last_recorded TIMESTAMP WITH TIME ZONE)
+LANGUAGE sql STABLE AS $$
+    SELECT e.category, SUM(e.emissions), COUNT(*), MAX(e.created_at)
+    FROM user_emissions e
+    WHERE e.user_id = auth.uid() AND NOT e.flagged
+    GROUP BY e.category;
+$$;
+
+CREATE OR REPLACE FUNCTION get_monthly_emissions(months_back INTEGER DEFAULT 12)
+RETURNS TABLE (month DATE, category TEXT, total NUMERIC, record_count BIGINT)
+LANGUAGE sql STABLE AS $$
+    SELECT date_trunc('month', e.created_at)::DATE, e.category, SUM(e.emissions), COUNT(*)
+    FROM user_emissions e
+    WHERE e.user_id = auth.uid() AND NOT e.flagged
+      AND e.created_at >= date_trunc('month', NOW()) - make_interval(months => months_back - 1)
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
+
+-- Take newly flagged rows out of the counters and sketches, and put cleared ones back
+CREATE OR REPLACE FUNCTION recount_flagged_emissions()
+RETURNS TRIGGER AS $$
+BEGIN
+    WITH changes AS (
+        SELECT n.category, n.created_at,
+               CASE WHEN n.flagged THEN o.emissions ELSE n.emissions END AS emissions,
+               CASE WHEN n.flagged THEN -1 ELSE 1 END AS sign
+        FROM new_rows n JOIN old_rows o ON o.id = n.id AND o.created_at = n.created_at
+        WHERE n.flagged <> o.flagged
+    ), sketched AS (
+        INSERT INTO public.emission_sketches (category, month, bucket, count)
+        SELECT category, date_trunc('month', created_at)::DATE, public.emission_sketch_bucket(emissions), SUM(sign)
+        FROM changes GROUP BY 1, 2, 3
+        ON CONFLICT (category, month, bucket) DO UPDATE SET count = emission_sketches.count + EXCLUDED.count
+    )
+    INSERT INTO public.emission_daily_counts (day, records, total_emissions)
+    SELECT created_at::DATE, SUM(sign), SUM(sign * emissions) FROM changes GROUP BY 1
+    ON CONFLICT (day) DO UPDATE SET
+        records = emission_daily_counts.records + EXCLUDED.records,
+        total_emissions = emission_daily_counts.total_emissions + EXCLUDED.total_emissions;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS on_user_emissions_flagged ON user_emissions;
+CREATE TRIGGER on_user_emissions_flagged
+    AFTER UPDATE ON user_emissions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION recount_flagged_emissions();
+
+COMMIT;
+
+-- 16. Demo account cleanup
+-- Demo accounts are created by the app with is_demo = true in their user
+-- metadata, which handle_new_user copies to user_profiles.is_demo. A partial
+-- index on the demo profiles' creation time lets the admin panel find old
+-- demo accounts without scanning auth.users: count_demo_users once, then
+-- delete_demo_users one batch per call, so no single transaction holds locks
+-- on auth.users for long. Deleting the auth user cascades to the profile,
+-- emissions, goals and progress, and the section 12 triggers update the user
+-- counters. Users can't change their own is_demo. Only the service role can
+-- call either function.
+-- Safe to run on its own against an existing database.
+BEGIN;
+
+ALTER TABLE user_profiles ADD COLUMN IF NOT EXISTS is_demo BOOLEAN NOT NULL DEFAULT false;
+
+UPDATE user_profiles p SET is_demo = true
+FROM auth.users u
+WHERE u.id = p.user_id AND (u.raw_user_meta_data->>'is_demo')::BOOLEAN AND NOT p.is_demo;
+
+CREATE INDEX IF NOT EXISTS idx_user_profiles_demo_created ON user_profiles(created_at) WHERE is_demo;
+
+REVOKE INSERT, UPDATE ON user_profiles FROM anon, authenticated;
+GRANT INSERT (user_id, username, email) ON user_profiles TO authenticated;
+GRANT UPDATE (username, email) ON user_profiles TO authenticated;
+
+-- Section 7's function, also recording demo accounts
+CREATE OR REPLACE FUNCTION handle_new_user()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.user_profiles (user_id, username, email, is_demo, created_at)
+    VALUES (
+        NEW.id,
+        COALESCE(NEW.raw_user_meta_data->>'username', split_part(NEW.email, '@', 1)),
+        NEW.email,
+        COALESCE((NEW.raw_user_meta_data->>'is_demo')::BOOLEAN, false),
+        COALESCE(NEW.created_at, NOW())
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION count_demo_users(days_old INTEGER DEFAULT 1)
+RETURNS BIGINT
+LANGUAGE sql STABLE SECURITY DEFINER AS $$
+    SELECT COUNT(*) FROM public.user_profiles
+    WHERE is_demo AND created_at < NOW() - make_interval(days => days_old);
+$$;
+
+DROP FUNCTION IF EXISTS delete_demo_users(INTEGER, INTEGER);
+CREATE FUNCTION delete_demo_users(days_old INTEGER DEFAULT 1, batch_size INTEGER DEFAULT 500)
+RETURNS BIGINT AS $$
+DECLARE
+    deleted BIGINT;
+BEGIN
+    WITH batch AS (
+        SELECT user_id FROM public.user_profiles
+        WHERE is_demo AND created_at < NOW() - make_interval(days => days_old)
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    ), removed AS (
+        DELETE FROM auth.users u USING batch WHERE u.id = batch.user_id
+        RETURNING u.id
+    )
+    SELECT COUNT(*) INTO deleted FROM removed;
+    RETURN deleted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION count_demo_users(INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION delete_demo_users(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION count_demo_users(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION delete_demo_users(INTEGER, INTEGER) TO service_role;
+
+COMMIT;
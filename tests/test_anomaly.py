@@ -0,0 +1,176 @@
+import sqlite3
+import unittest
+
+import numpy as np
+
+from main.utils.anomaly import (find_anomalies, flag_sqlite, flagged_records, group_quantiles, review_records,
+                                score_records, sqlite_records)
+from main.utils.counters import install_counters
+from main.utils.emission_aggregates import user_emission_totals
+from main.utils.retention import USER_EMISSIONS_ROLLUP_DDL, add_flag_columns
+
+MONTHS = [f"2024-{month:02d}" for month in range(1, 13)]
+
+
+def population(users: int = 150, seed: int = 0):
+    """Monthly records per user and category; energy peaks in winter for everyone."""
+    rng = np.random.default_rng(seed)
+    level = {'transport': rng.lognormal(4.5, 0.6, users), 'energy': rng.lognormal(4.8, 0.4, users),
+             'food': rng.lognormal(5.0, 0.2, users)}
+    rows = []
+    for user in range(users):
+        for month_index, month in enumerate(MONTHS):
+            winter = 1 + 0.8 * np.cos(2 * np.pi * month_index / 12)
+            for category in ('transport', 'energy', 'food'):
+                value = level[category][user] * (winter if category == 'energy' else 1)
+                rows.append((user, category, month, value * rng.lognormal(0, 0.1)))
+    return rows
+
+
+def score(rows, baseline=None):
+    users, categories, months, values = zip(*rows)
+    return score_records(users, categories, months, values, baseline)
+
+
+class TestAnomalyScores(unittest.TestCase):
+
+    def test_group_quantiles_match_numpy(self):
+        rng = np.random.default_rng(1)
+        groups = rng.integers(0, 7, 500)
+        values = rng.normal(size=500)
+        result = group_quantiles(groups, values, [0.25, 0.5, 0.75], 8)
+        for group in range(7):
+            np.testing.assert_allclose(result[group], np.quantile(values[groups == group], [0.25, 0.5, 0.75]))
+        self.assertTrue(np.isnan(result[7]).all())
+
+    def test_clean_population_is_not_flagged(self):
+        scores = score(population())
+        self.assertLess(scores['flagged'].mean(), 0.001)
+
+    def test_data_entry_mistakes_are_flagged(self):
+        rows = population()
+        # 100000 km by petrol car, and a new user's nine long-haul flights
+        rows.append((3, 'transport', '2024-12', 100000 * 0.17))
+        rows.append((999, 'transport', '2024-12', 9 * 1100))
+        scores = score(rows)
+        self.assertTrue(scores['flagged'][-2:].all())
+        self.assertGreater(scores['user_z'][-2], 3.5)
+        self.assertTrue(np.isnan(scores['user_z'][-1]))
+
+    def test_consistently_high_user_is_not_flagged(self):
+        rows = population()
+        # A commuter whose every month is far above everyone else
+        rows += [(500, 'transport', month, 5000.0 + 100 * i) for i, month in enumerate(MONTHS)]
+        scores = score(rows)
+        self.assertGreater(scores['population_score'][-1], 3.0)
+        self.assertFalse(scores['flagged'][-12:].any())
+
+    def test_seasonal_baseline(self):
+        rows = population()
+        summer = [value for _, category, month, value in rows if category == 'energy' and month == '2024-07']
+        # High for July, ordinary for January
+        rows.append((1000, 'energy', '2024-07', float(np.quantile(summer, 0.75)) * 8))
+        rows.append((1001, 'energy', '2024-01', float(np.quantile(summer, 0.75)) * 8))
+        flagged = score(rows)['flagged']
+        self.assertTrue(flagged[-2])
+        self.assertFalse(flagged[-1])
+
+    def test_baseline_leaves_out_flagged_rows(self):
+        rows = population(users=40)
+        rows += [(1000 + i, 'food', '2024-03', 50000.0) for i in range(15)]
+        scores = score(rows, baseline=np.array([True] * (len(rows) - 15) + [False] * 15))
+        self.assertTrue(scores['flagged'][-15:].all())
+
+    def test_low_values_are_not_flagged(self):
+        rows = population() + [(3, 'transport', '2024-12', 0.0)]
+        self.assertFalse(score(rows)['flagged'][-1])
+
+
+class TestSqliteFlags(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        # A table from before the flag columns existed
+        self.conn.execute("""
+            CREATE TABLE user_emissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                date DATE,
+                transport_emissions REAL DEFAULT 0,
+                energy_emissions REAL DEFAULT 0,
+                food_emissions REAL DEFAULT 0,
+                total_emissions REAL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, is_demo BOOLEAN, last_login TIMESTAMP)")
+        self.conn.execute(USER_EMISSIONS_ROLLUP_DDL)
+        add_flag_columns(self.conn)
+        install_counters(self.conn)
+        by_row = {}
+        for user, category, month, value in population(users=60):
+            by_row.setdefault((user, month), {})[category] = value
+        by_row[(7, '2024-12')]['transport'] = 100000 * 0.17
+        for (user, month), values in by_row.items():
+            self.conn.execute("""
+                INSERT INTO user_emissions (user_id, date, transport_emissions, energy_emissions,
+                                            food_emissions, total_emissions)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user, month + "-15", values['transport'], values['energy'], values['food'],
+                  sum(values.values())))
+
+    def daily_total(self, day):
+        return self.conn.execute("SELECT records, total_emissions FROM emission_daily_counts WHERE day = ?",
+                                 (day,)).fetchone()
+
+    def test_flags_only_new_rows_and_excludes_them(self):
+        before = user_emission_totals(self.conn, 7)
+        counted = self.daily_total('2024-12-15')
+
+        self.assertEqual(flag_sqlite(self.conn, since='2024-12-01'), 1)
+        self.assertEqual(self.conn.execute("SELECT user_id, date FROM user_emissions WHERE flagged").fetchall(),
+                         [(7, '2024-12-15')])
+        after = user_emission_totals(self.conn, 7)
+        self.assertEqual(after['record_count'], before['record_count'] - 1)
+        self.assertAlmostEqual(before['transport'] - after['transport'], 17000, delta=500)
+        self.assertEqual(self.daily_total('2024-12-15')[0], counted[0] - 1)
+
+        # Already flagged: nothing new
+        self.assertEqual(flag_sqlite(self.conn, since='2024-12-01'), 0)
+
+    def test_reviewed_rows_are_left_alone(self):
+        flag_sqlite(self.conn)
+        self.conn.execute("UPDATE user_emissions SET flagged = 0, reviewed = 1 WHERE flagged")
+        self.assertEqual(find_anomalies(sqlite_records(self.conn)), [])
+        self.assertEqual(user_emission_totals(self.conn, 7)['record_count'], 12)
+
+    def flag_mistake(self):
+        flag_sqlite(self.conn)
+        records = flagged_records(self.conn)
+        self.assertEqual([(r['user_id'], r['date']) for r in records], [(7, '2024-12-15')])
+        return records[0]['id']
+
+    def test_kept_records_count_again(self):
+        before, counted = user_emission_totals(self.conn, 7), self.daily_total('2024-12-15')
+        record_id = self.flag_mistake()
+
+        self.assertEqual(review_records(self.conn, [record_id], keep=True), 1)
+        self.assertEqual(flagged_records(self.conn), [])
+        self.assertEqual(user_emission_totals(self.conn, 7), before)
+        self.assertEqual(self.daily_total('2024-12-15'), counted)
+        self.assertEqual(flag_sqlite(self.conn), 0)
+
+    def test_rejected_records_are_deleted(self):
+        record_id = self.flag_mistake()
+        without = user_emission_totals(self.conn, 7)
+        other = self.conn.execute("SELECT MIN(id) FROM user_emissions").fetchone()[0]
+
+        # Only flagged rows can be deleted this way
+        self.assertEqual(review_records(self.conn, [record_id, other], keep=False), 1)
+        self.assertIsNone(self.conn.execute("SELECT 1 FROM user_emissions WHERE id = ?", (record_id,)).fetchone())
+        self.assertIsNotNone(self.conn.execute("SELECT 1 FROM user_emissions WHERE id = ?", (other,)).fetchone())
+        self.assertEqual(user_emission_totals(self.conn, 7), without)
+
+
+if __name__ == '__main__':
+    unittest.main()
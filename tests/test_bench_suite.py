@@ -0,0 +1,59 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.suite import CASES, compare, main, measure, run_suite
+
+
+def run_result(**medians):
+    return {'meta': {}, 'cases': {name: ({'skipped': 'x not installed'} if seconds is None else
+                                         {'median_s': seconds, 'min_s': seconds, 'loops': 1, 'repeat': 1})
+                                  for name, seconds in medians.items()}}
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_statuses(self):
+        baseline = run_result(same=1.0, slower=1.0, faster=1.0, gone=1.0, skipped=1.0)
+        current = run_result(same=1.05, slower=1.5, faster=0.5, added=1.0, skipped=None)
+        status = {row['name']: row['status'] for row in compare(baseline, current, threshold=0.2)}
+        self.assertEqual(status, {'same': 'ok', 'slower': 'regression', 'faster': 'faster',
+                                  'gone': 'missing', 'added': 'new', 'skipped': 'skipped'})
+
+    def test_exit_status_flags_regressions(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            baseline, current = Path(workdir) / 'baseline.json', Path(workdir) / 'current.json'
+            baseline.write_text(json.dumps(run_result(case=1.0)))
+            current.write_text(json.dumps(run_result(case=1.3)))
+            self.assertEqual(main(['compare', str(baseline), str(current), '--threshold', '0.5']), 0)
+            self.assertEqual(main(['compare', str(baseline), str(current), '--threshold', '0.2']), 1)
+
+
+class TestRun(unittest.TestCase):
+
+    def test_measure_calibrates_loops(self):
+        result = measure(lambda: sum(range(100)), repeat=3, min_time=0.01)
+        self.assertGreater(result['loops'], 1)
+        self.assertLessEqual(result['min_s'], result['median_s'])
+
+    def test_run_writes_every_selected_case(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            output = Path(workdir) / 'run.json'
+            self.assertEqual(main(['run', '--only', 'calculators.energy', 'storage', '--repeat', '1',
+                                   '--min-time', '0.001', '--output', str(output)]), 0)
+            results = json.loads(output.read_text())
+        expected = {bench.name for bench in CASES
+                    if bench.name == 'calculators.energy' or bench.name.startswith('storage.')}
+        self.assertEqual(set(results['cases']), expected)
+        for name, result in results['cases'].items():
+            self.assertTrue('median_s' in result or 'skipped' in result, name)
+
+    def test_every_case_sets_up_and_runs(self):
+        results = run_suite(repeat=1, min_time=0.0, report=lambda line: None)
+        self.assertEqual(set(results['cases']), {bench.name for bench in CASES})
+        self.assertIn('python', results['meta'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,24 @@
 import unittest
 import yaml
 from main.core.transport import transport_emissions
-from main.core.food import food_emissions
-from main.core.energy import energy_emissions
-from main.data.emission_factors import FOOD_FACTORS, ENERGY_FACTORS
+from main.core.food import food_emissions, detailed_food_emissions, food_sourcing_reduction
+from main.core.energy import energy_emissions, energy_breakdown
+from main.data.emission_factors import (
+    FOOD_FACTORS, ENERGY_FACTORS, FOOD_SERVING_FACTORS, TRANSPORT_FACTORS, CAR_FUEL_CONSUMPTION
+)
 # This code is a unit test for the emission calculator module.
 
 class TestCalculator(unittest.TestCase):
     
     def test_transport_emissions(self):
-        result = transport_emissions(100, 50, 200)
-        expected = (100 * 0.192) + (50 * 0.105) + (200 * 0.255)
-        self.assertAlmostEqual(result, expected, places=2)
+        result = transport_emissions(100, 'petrol', 50, 'diesel', 200, 'electric', 1, 0, 2)
+        expected_car = 100 * TRANSPORT_FACTORS['car']['petrol'] * CAR_FUEL_CONSUMPTION['petrol']
+        self.assertAlmostEqual(result['breakdown']['car'], expected_car, places=2)
+        self.assertAlmostEqual(result['breakdown']['bus'], 50 * TRANSPORT_FACTORS['bus']['diesel'], places=2)
+        self.assertAlmostEqual(result['breakdown']['train'], 200 * TRANSPORT_FACTORS['train']['electric'], places=2)
+        flights = TRANSPORT_FACTORS['flight']['short'] + 2 * TRANSPORT_FACTORS['flight']['long']
+        self.assertAlmostEqual(result['breakdown']['flights'], flights, places=2)
+        self.assertAlmostEqual(result['total'], sum(result['breakdown'].values()), places=2)
 
 
     def test_food_emissions(self):
@@ -33,31 +40,53 @@ class TestCalculator(unittest.TestCase):
     
     
     def test_energy_emissions(self):
-        result = energy_emissions(100, 0, 0, 0)
-        expected = 100 * ENERGY_FACTORS['electricity']
+        result = energy_emissions(kwh_electricity=100)
+        expected = 100 * ENERGY_FACTORS['kwh_electricity']
         self.assertAlmostEqual(result, expected, places=2)
 
-        result = energy_emissions(0, 200, 0, 0)
-        expected = 200 * ENERGY_FACTORS['oil']
+        result = energy_emissions(kwh_oil=200)
+        expected = 200 * ENERGY_FACTORS['kwh_oil']
         self.assertAlmostEqual(result, expected, places=2)
 
-        result = energy_emissions(0, 0, 0, 75)
-        expected = 75 * ENERGY_FACTORS['wood']
+        result = energy_emissions(kwh_wood=75)
+        expected = 75 * ENERGY_FACTORS['kwh_wood']
         self.assertAlmostEqual(result, expected, places=2)
 
-        result = energy_emissions(0, 0, 200, 0)
-        expected = 200 * ENERGY_FACTORS['gas']
+        result = energy_emissions(kwh_gas=200)
+        expected = 200 * ENERGY_FACTORS['kwh_gas']
         self.assertAlmostEqual(result, expected, places=2)
 
-        result = energy_emissions(10, 20, 30, 40)
+        result = energy_emissions(kwh_electricity=10, kwh_oil=20, kwh_gas=30, kwh_wood=40)
         expected = (
-            10 * ENERGY_FACTORS['electricity'] +
-            20 * ENERGY_FACTORS['oil'] +
-            30 * ENERGY_FACTORS['gas'] +
-            40 * ENERGY_FACTORS['wood']
+            10 * ENERGY_FACTORS['kwh_electricity'] +
+            20 * ENERGY_FACTORS['kwh_oil'] +
+            30 * ENERGY_FACTORS['kwh_gas'] +
+            40 * ENERGY_FACTORS['kwh_wood']
         )
         self.assertAlmostEqual(result, expected, places=2)
 
+    def test_detailed_food_emissions(self):
+        result = detailed_food_emissions({'beef': 8, 'milk': 1, 'eggs': 16})
+        self.assertAlmostEqual(result['beef'], 8 * FOOD_SERVING_FACTORS['beef'], places=2)
+        self.assertAlmostEqual(result['milk'], 30.44 * FOOD_SERVING_FACTORS['milk'], places=2)
+        self.assertEqual(result['pork'], 0)
+        subtotal = sum(value for food, value in result.items() if food != 'total')
+        self.assertAlmostEqual(result['total'], subtotal, places=2)
+
+        reduced = detailed_food_emissions({'beef': 8}, local_produce_pct=100, organic_pct=100)
+        self.assertAlmostEqual(reduced['total'], 8 * FOOD_SERVING_FACTORS['beef'] * 0.8, places=2)
+
+    def test_food_sourcing_reduction_is_capped(self):
+        self.assertAlmostEqual(food_sourcing_reduction(50, 20), 0.085, places=3)
+        self.assertAlmostEqual(food_sourcing_reduction(100, 100), 0.2, places=3)
+        self.assertLessEqual(food_sourcing_reduction(1000, 1000), 0.25)
+
+    def test_energy_breakdown(self):
+        result = energy_breakdown(kwh_electricity=100, kwh_gas=200)
+        self.assertAlmostEqual(result['kwh_electricity'], 100 * ENERGY_FACTORS['kwh_electricity'], places=2)
+        self.assertAlmostEqual(result['kwh_gas'], 200 * ENERGY_FACTORS['kwh_gas'], places=2)
+        self.assertAlmostEqual(energy_emissions(kwh_electricity=100, kwh_gas=200), sum(result.values()), places=2)
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,37 @@
+import unittest
+
+import pandas as pd
+
+from main.data.emission_factors import BENCHMARKS
+from main.utils.charts import benchmark_frame, breakdown_frame, goal_progress_frame, progress_history_frame
+
+
+class TestChartFrames(unittest.TestCase):
+
+    def test_breakdown_shares(self):
+        frame = breakdown_frame(50.0, 30.0, 20.0)
+        self.assertEqual(list(frame['Category']), ['Transport', 'Energy', 'Food'])
+        self.assertEqual(list(frame['Percentage']), [50.0, 30.0, 20.0])
+        self.assertEqual(list(breakdown_frame(0.0, 0.0, 0.0)['Percentage']), [0.0, 0.0, 0.0])
+
+    def test_benchmarks_come_from_yaml(self):
+        self.assertEqual(BENCHMARKS['Paris Agreement Target'], 167)
+        frame = benchmark_frame(300.0, BENCHMARKS)
+        self.assertEqual(frame['Category'].iloc[-1], 'Your Emissions')
+        self.assertEqual(len(frame), len(BENCHMARKS) + 1)
+
+    def test_goal_progress_under_and_over_target(self):
+        under = goal_progress_frame(100.0, 167.0)
+        self.assertEqual(list(under['Amount']), [100.0, 67.0])
+        over = goal_progress_frame(200.0, 167.0)
+        self.assertEqual(list(over['Category']), ['Target', 'Over Target'])
+        self.assertEqual(list(over['Amount']), [167.0, 33.0])
+
+    def test_progress_history_parses_dates(self):
+        frame = progress_history_frame([('2024-01-01', 180.0, 167.0), ('2024-02-01', 150.0, 167.0)])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(frame['date']))
+        self.assertEqual(list(frame['total']), [180.0, 150.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+from main.utils.circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, CallTimeoutError, CircuitBreaker, CircuitOpenError
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError("backend down")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, call_timeout=0.2,
+                                      clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        self.assertEqual(self.breaker.call(lambda: 42), 42)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        calls = []
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: calls.append(1))
+        self.assertEqual(calls, [])
+
+    def test_half_open_trial_closes_or_reopens(self):
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                self.breaker.call(fail)
+
+        self.clock.now += 31
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(fail)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.clock.now += 31
+        self.assertEqual(self.breaker.call(lambda: "ok"), "ok")
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_slow_calls_time_out(self):
+        release = threading.Event()
+        started = time.perf_counter()
+        for _ in range(2):
+            with self.assertRaises(CallTimeoutError):
+                self.breaker.call(release.wait, 5)
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.breaker.stats()['timeouts'], 2)
+        release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from main.utils.columnar_export import (
+    iter_sqlite_batches, write_partitioned_parquet, read_emission_history,
+    emission_history_parquet_bytes
+)
+
+
+class TestColumnarExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmp.name) / "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE user_emissions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    date DATE,
+                    transport_emissions REAL DEFAULT 0,
+                    energy_emissions REAL DEFAULT 0,
+                    food_emissions REAL DEFAULT 0,
+                    total_emissions REAL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            rows = [
+                (1, '2024-01-15', 10.0, 20.0, 30.0, '2024-01-15 08:00:00'),
+                (1, '2024-02-03', 11.0, 21.0, 31.0, '2024-02-03 08:00:00'),
+                (2, '2024-02-10', 12.0, 22.0, 32.0, '2024-02-10 08:00:00'),
+            ]
+            conn.executemany("""
+                INSERT INTO user_emissions
+                (user_id, date, transport_emissions, energy_emissions, food_emissions, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sqlite_batches_are_unpivoted(self):
+        batches = list(iter_sqlite_batches(self.db_path, batch_size=2))
+        self.assertEqual([b.num_rows for b in batches], [6, 3])
+        self.assertEqual(batches[0].column('category').to_pylist()[:3], ['transport', 'energy', 'food'])
+
+    def test_partitioned_roundtrip_with_filters(self):
+        out_dir = str(Path(self.tmp.name) / "export")
+        write_partitioned_parquet(iter_sqlite_batches(self.db_path, batch_size=2), out_dir)
+
+        self.assertTrue((Path(out_dir) / "month=2024-02" / "category=food").is_dir())
+
+        table = read_emission_history(out_dir)
+        self.assertEqual(table.num_rows, 9)
+
+        table = read_emission_history(out_dir, months=['2024-02'], categories=['food'])
+        self.assertEqual(sorted(table.column('emissions').to_pylist()), [31.0, 32.0])
+
+        table = read_emission_history(out_dir, user_id='2', columns=['emissions'])
+        self.assertEqual(sorted(table.column('emissions').to_pylist()), [12.0, 22.0, 32.0])
+
+    def test_single_file_export(self):
+        data = emission_history_parquet_bytes(iter_sqlite_batches(self.db_path))
+        path = Path(self.tmp.name) / "history.parquet"
+        path.write_bytes(data)
+        self.assertEqual(pq.read_table(path).num_rows, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import sqlite3
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from main.utils.counters import COUNTER_TABLES_DDL, install_counters, read_daily_emission_counts, read_user_counters
+
+
+class TestCounters(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.executescript("""
+            CREATE TABLE users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP,
+                is_demo BOOLEAN DEFAULT 0
+            );
+            CREATE TABLE user_emissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                date DATE,
+                total_emissions REAL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+    def exact_stats(self):
+        """What the old full-table COUNT(*) queries returned."""
+        total, demo = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(is_demo), 0) FROM users").fetchone()
+        active = self.conn.execute(
+            "SELECT COUNT(*) FROM users WHERE last_login >= date('now', '-30 days')"
+        ).fetchone()[0]
+        return {"total_users": total, "active_users": active, "demo_users": demo}
+
+    def test_backfill_then_triggers_match_full_counts(self):
+        self.conn.execute("INSERT INTO users (username, last_login) VALUES ('old', datetime('now', '-60 days'))")
+        self.conn.execute("INSERT INTO users (username, is_demo) VALUES ('demo_1', 1)")
+        install_counters(self.conn)
+        self.assertEqual(read_user_counters(self.conn), self.exact_stats())
+
+        self.conn.execute("INSERT INTO users (username, is_demo) VALUES ('demo_2', 1)")
+        self.conn.execute("INSERT INTO users (username) VALUES ('alice')")
+        self.conn.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE username IN ('alice', 'old')")
+        self.conn.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE username = 'alice'")
+        self.conn.execute("DELETE FROM users WHERE username = 'demo_1'")
+        self.conn.commit()
+
+        self.assertEqual(read_user_counters(self.conn), self.exact_stats())
+        self.assertEqual(read_user_counters(self.conn),
+                         {"total_users": 3, "active_users": 2, "demo_users": 1})
+
+    def test_install_is_idempotent(self):
+        install_counters(self.conn)
+        self.conn.execute("INSERT INTO users (username) VALUES ('bob')")
+        install_counters(self.conn)
+        self.assertEqual(read_user_counters(self.conn)["total_users"], 1)
+
+    def test_daily_emission_counts(self):
+        self.conn.execute("INSERT INTO user_emissions (user_id, date, total_emissions) VALUES (1, date('now'), 2.5)")
+        install_counters(self.conn)
+        self.conn.execute("INSERT INTO user_emissions (user_id, date, total_emissions) VALUES (1, date('now'), 1.5)")
+        self.conn.execute("INSERT INTO user_emissions (user_id, date, total_emissions) VALUES (2, date('now', '-90 days'), 9)")
+        # Activity stays counted after raw rows are compacted away
+        self.conn.execute("DELETE FROM user_emissions")
+
+        counts = read_daily_emission_counts(self.conn, days=30)
+        self.assertEqual(len(counts), 1)
+        self.assertEqual((counts[0]['records'], counts[0]['total_emissions']), (2, 4.0))
+        self.assertEqual(len(read_daily_emission_counts(self.conn, days=365)), 2)
+
+    def test_install_interrupted_before_the_backfill_finishes_it(self):
+        self.conn.execute("INSERT INTO users (username, last_login) VALUES ('alice', CURRENT_TIMESTAMP)")
+        self.conn.execute("INSERT INTO user_emissions (user_id, date, total_emissions) VALUES (1, date('now'), 2)")
+        # What a process stopped between creating the tables and seeding them left behind
+        self.conn.executescript(COUNTER_TABLES_DDL)
+        install_counters(self.conn)
+        install_counters(self.conn)
+
+        self.assertEqual(read_user_counters(self.conn), self.exact_stats())
+        self.assertEqual([c['records'] for c in read_daily_emission_counts(self.conn)], [1])
+
+    def test_concurrent_installs_backfill_once(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = str(Path(workdir) / "users.db")
+            with sqlite3.connect(db_path) as conn:
+                conn.executescript("""
+                    CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, last_login TIMESTAMP,
+                                        is_demo BOOLEAN DEFAULT 0);
+                    CREATE TABLE user_emissions (id INTEGER PRIMARY KEY, user_id INTEGER, date DATE,
+                                                 total_emissions REAL, created_at TIMESTAMP);
+                    INSERT INTO users (username, last_login) VALUES ('a', date('now')), ('b', date('now'));
+                    INSERT INTO user_emissions (user_id, date, total_emissions) VALUES (1, date('now'), 3);
+                """)
+            conn.close()
+
+            start = threading.Barrier(4)
+            errors = []
+
+            def install():
+                conn = sqlite3.connect(db_path, timeout=10)
+                try:
+                    start.wait()
+                    install_counters(conn)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    conn.close()
+
+            threads = [threading.Thread(target=install) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            conn = sqlite3.connect(db_path)
+            self.assertEqual(errors, [])
+            self.assertEqual(read_user_counters(conn), {"total_users": 2, "active_users": 2, "demo_users": 0})
+            self.assertEqual([c['records'] for c in read_daily_emission_counts(conn)], [1])
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
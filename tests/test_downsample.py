@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from main.utils.downsample import downsample_frame, lttb_indices, minmax_indices
+from main.utils.timeframe_standards import resample_history
+
+
+def daily_history(days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    total = 150 + 20 * np.sin(np.arange(days) / 30) + rng.normal(0, 5, days)
+    total[days // 3] = 900.0  # one-off spike
+    return pd.DataFrame({
+        'date': pd.date_range('2021-01-01', periods=days, freq='D'),
+        'total': total,
+        'target': 167.0,
+    })
+
+
+class TestDownsample(unittest.TestCase):
+
+    def test_lttb_caps_points_and_keeps_ends_and_peak(self):
+        frame = daily_history(1500)
+        indices = lttb_indices(np.arange(1500), frame['total'], 200)
+        self.assertEqual(len(indices), 200)
+        self.assertEqual((indices[0], indices[-1]), (0, 1499))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(500, indices)
+
+    def test_minmax_keeps_every_bucket_extreme(self):
+        frame = daily_history(1000)
+        indices = minmax_indices(frame['total'], 100)
+        self.assertLessEqual(len(indices), 100)
+        self.assertIn(int(frame['total'].idxmax()), indices)
+        self.assertIn(int(frame['total'].idxmin()), indices)
+
+    def test_short_series_unchanged(self):
+        frame = daily_history(50)
+        self.assertIs(downsample_frame(frame, 'date', 'total', max_points=500), frame)
+        self.assertEqual(list(lttb_indices([1, 2], [3, 4], 500)), [0, 1])
+
+    def test_downsample_frame_keeps_other_columns(self):
+        frame = daily_history(2000)
+        for method in ('lttb', 'minmax'):
+            sampled = downsample_frame(frame, 'date', 'total', max_points=300, method=method)
+            self.assertLessEqual(len(sampled), 300)
+            self.assertEqual(sampled['total'].max(), 900.0)
+            self.assertTrue((sampled['target'] == 167.0).all())
+            self.assertTrue(sampled['date'].is_monotonic_increasing)
+
+        with self.assertRaises(ValueError):
+            downsample_frame(frame, 'date', 'total', max_points=300, method='random')
+
+
+class TestResampleHistory(unittest.TestCase):
+
+    def test_week_and_month_average_entries(self):
+        frame = pd.DataFrame({
+            'date': pd.to_datetime(['2024-01-01', '2024-01-03', '2024-01-08', '2024-03-10']),
+            'total': [100.0, 200.0, 300.0, 400.0],
+            'target': [167.0] * 4,
+        })
+        weekly = resample_history(frame, 'week')
+        self.assertEqual(list(weekly['date'].dt.strftime('%Y-%m-%d')), ['2024-01-01', '2024-01-08', '2024-03-04'])
+        self.assertEqual(list(weekly['total']), [150.0, 300.0, 400.0])
+
+        monthly = resample_history(frame, 'month', value_columns=['total'])
+        self.assertEqual(list(monthly.columns), ['date', 'total'])
+        self.assertEqual(list(monthly['total']), [200.0, 400.0])
+
+    def test_unknown_timeframe(self):
+        with self.assertRaises(ValueError):
+            resample_history(daily_history(10), 'fortnight')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import sqlite3
+import unittest
+from datetime import date
+
+from main.utils.emission_aggregates import (
+    all_users_monthly_emissions, monthly_from_category_rows, month_cutoff, totals_from_category_rows,
+    user_emission_totals, user_monthly_emissions
+)
+from main.utils.retention import USER_EMISSIONS_ROLLUP_DDL
+
+
+class TestEmissionAggregates(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("""
+            CREATE TABLE user_emissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                date DATE,
+                transport_emissions REAL DEFAULT 0,
+                energy_emissions REAL DEFAULT 0,
+                food_emissions REAL DEFAULT 0,
+                total_emissions REAL DEFAULT 0,
+                flagged BOOLEAN DEFAULT 0
+            )
+        """)
+        self.conn.execute(USER_EMISSIONS_ROLLUP_DDL)
+        rows = [(1, '2024-05-03', 1.0, 2.0, 3.0), (1, '2024-05-20', 1.0, 1.0, 1.0),
+                (1, '2024-06-01', 4.0, 0.0, 0.0), (2, '2024-06-01', 100.0, 0.0, 0.0)]
+        for user_id, day, t, e, f in rows:
+            self.conn.execute("""
+                INSERT INTO user_emissions (user_id, date, transport_emissions, energy_emissions,
+                                            food_emissions, total_emissions)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_id, day, t, e, f, t + e + f))
+        # A month already compacted by the retention job
+        self.conn.execute("""
+            INSERT INTO user_emissions_monthly VALUES (1, '2024-01', 10.0, 5.0, 5.0, 20.0, 4)
+        """)
+
+    def test_totals_include_rollups(self):
+        totals = user_emission_totals(self.conn, 1)
+        self.assertEqual(totals, {'transport': 16.0, 'energy': 8.0, 'food': 9.0,
+                                  'total': 33.0, 'record_count': 7})
+        self.assertEqual(user_emission_totals(self.conn, 99)['record_count'], 0)
+
+    def test_monthly_window(self):
+        monthly = user_monthly_emissions(self.conn, 1, months=6, today=date(2024, 6, 15))
+        self.assertEqual([m['month'] for m in monthly], ['2024-01', '2024-05', '2024-06'])
+        self.assertEqual(monthly[1]['total'], 9.0)
+
+        recent = user_monthly_emissions(self.conn, 1, months=2, today=date(2024, 6, 15))
+        self.assertEqual([m['month'] for m in recent], ['2024-05', '2024-06'])
+
+    def test_all_users_monthly(self):
+        monthly = all_users_monthly_emissions(self.conn, months=6, today=date(2024, 6, 15))
+        self.assertEqual([(m['user_id'], m['month'], m['total']) for m in monthly], [
+            (1, '2024-01', 20.0), (1, '2024-05', 9.0), (1, '2024-06', 4.0), (2, '2024-06', 100.0)])
+
+    def test_month_cutoff_crosses_year(self):
+        self.assertEqual(month_cutoff(12, date(2024, 6, 15)), '2023-07')
+        self.assertEqual(month_cutoff(1, date(2024, 1, 31)), '2024-01')
+
+    def test_rpc_rows_are_shaped_like_sqlite(self):
+        totals = totals_from_category_rows([
+            {'category': 'food', 'total': '3.50', 'record_count': 2},
+            {'category': 'energy', 'total': 1, 'record_count': 1},
+        ])
+        self.assertEqual(totals['total'], 4.5)
+        self.assertEqual(totals['record_count'], 3)
+
+        monthly = monthly_from_category_rows([
+            {'month': '2024-06-01', 'category': 'food', 'total': 2},
+            {'month': '2024-05-01', 'category': 'transport', 'total': 1},
+            {'month': '2024-06-01', 'category': 'energy', 'total': 3},
+        ])
+        self.assertEqual([m['month'] for m in monthly], ['2024-05', '2024-06'])
+        self.assertEqual(monthly[1]['total'], 5.0)
+
+    def test_monthly_average_counts_repeated_saves_once(self):
+        rows = [
+            # The same calculation saved three times in May, once in June
+            {'month': '2024-05-01', 'category': 'transport', 'total': 30, 'record_count': 3},
+            {'month': '2024-05-01', 'category': 'food', 'total': 6, 'record_count': 3},
+            {'month': '2024-06-01', 'category': 'transport', 'total': 12, 'record_count': 1},
+        ]
+        summed = monthly_from_category_rows(rows)
+        averaged = monthly_from_category_rows(rows, average=True)
+        self.assertEqual(summed[0]['total'], 36.0)
+        self.assertEqual(averaged[0]['transport'], 10.0)
+        self.assertEqual(averaged[0]['total'], 12.0)
+        self.assertEqual(averaged[1]['total'], 12.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
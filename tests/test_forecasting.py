@@ -0,0 +1,132 @@
+import math
+import sqlite3
+import unittest
+
+import numpy as np
+
+from main.utils.forecasting import ForecastBatch, digest, history_matrix, month_index, month_label
+from main.utils.retention import USER_EMISSIONS_ROLLUP_DDL
+
+
+def monthly_rows(user_id, start: str, values):
+    first = month_index(start)
+    return [{'user_id': user_id, 'month': month_label(first + i), 'total': value}
+            for i, value in enumerate(values) if value is not None]
+
+
+class TestForecasting(unittest.TestCase):
+
+    def test_history_matrix_sums_duplicates_and_marks_gaps(self):
+        rows = monthly_rows('a', '2024-01', [10, None, 30]) + [{'user_id': 'a', 'month': '2024-01-15', 'total': 5}]
+        users, origin, values = history_matrix(rows)
+        self.assertEqual((users, month_label(origin)), (['a'], '2024-01'))
+        self.assertEqual(values[0, 0], 15)
+        self.assertTrue(np.isnan(values[0, 1]))
+
+    def test_linear_and_holt_find_goal_on_straight_decline(self):
+        # 300 kg falling 10 kg a month reaches 167 kg in month 14 (2024-01 + 14)
+        batch = ForecastBatch.from_rows(monthly_rows('a', '2024-01', [300 - 10 * i for i in range(8)]))
+        for model in ('linear', 'holt', 'seasonal'):
+            with self.subTest(model=model):
+                dates = batch.goal_dates([167], model=model)[0]
+                self.assertEqual(dates['expected'], '2025-03')
+                self.assertAlmostEqual(batch.trend_per_month(model)[0], -10.0)
+
+    def test_interval_brackets_expected_date(self):
+        rng = np.random.default_rng(4)
+        values = 300 - 8 * np.arange(18) + rng.normal(0, 15, 18)
+        batch = ForecastBatch.from_rows(monthly_rows('a', '2023-01', values))
+        for model in ('linear', 'holt'):
+            with self.subTest(model=model):
+                months, mean, lower, upper = batch.forecast(model, horizon=12)
+                self.assertTrue(np.all(lower < mean) and np.all(mean < upper))
+                # Uncertainty grows with the horizon
+                self.assertGreater(upper[0, -1] - lower[0, -1], upper[0, 0] - lower[0, 0])
+                dates = batch.goal_dates([160], model=model)[0]
+                self.assertLessEqual(dates['earliest'], dates['expected'])
+                self.assertLessEqual(dates['expected'], dates['latest'] or '9999-12')
+
+    def test_seasonal_model_tracks_yearly_cycle(self):
+        months = np.arange(36)
+        values = 250 - 2 * months + 40 * np.cos(2 * math.pi * months / 12)
+        batch = ForecastBatch.from_rows(monthly_rows('a', '2022-01', values))
+        _, seasonal, _, _ = batch.forecast('seasonal', horizon=12)
+        _, linear, _, _ = batch.forecast('linear', horizon=12)
+        actual = 250 - 2 * (months + 36) + 40 * np.cos(2 * math.pi * (months + 36) / 12)
+        self.assertLess(np.abs(seasonal[0] - actual[:12]).max(), 1.0)
+        self.assertGreater(np.abs(linear[0] - actual[:12]).max(), 20.0)
+
+    def test_batch_rows_are_independent(self):
+        rows = (monthly_rows('down', '2024-01', [200, 190, 180, 170, 160])
+                + monthly_rows('up', '2024-03', [160, 170, 180])
+                + monthly_rows('short', '2024-01', [100, 90]))
+        batch = ForecastBatch.from_rows(rows)
+        dates = {entry['user_id']: entry for entry in batch.goal_dates([150, 150, 150], model='linear')}
+        self.assertEqual(dates['down']['expected'], '2024-06')
+        self.assertIsNone(dates['up']['expected'])
+        self.assertIsNone(dates['short']['expected'])
+
+    def test_update_matches_refit(self):
+        values = [310, 290, None, 275, 260, 262, 240, 235]
+        grid = {'alphas': (0.5,), 'betas': (0.2,)}
+        full = ForecastBatch.from_rows(monthly_rows('a', '2024-01', values) + monthly_rows('b', '2024-01', [90, 95, 97, 99]),
+                                       **grid)
+        partial = ForecastBatch.from_rows(monthly_rows('a', '2024-01', values[:-1]), **grid)
+        partial.update('a', '2024-08', values[-1])
+        for month, value in [('2024-01', 90), ('2024-02', 95), ('2024-03', 97), ('2024-04', 99)]:
+            partial.update('b', month, value)
+
+        for model in ('linear', 'holt', 'seasonal'):
+            with self.subTest(model=model):
+                np.testing.assert_allclose(partial.forecast(model)[1], full.forecast(model)[1])
+                np.testing.assert_allclose(partial.forecast(model)[3], full.forecast(model)[3])
+
+    def test_update_rejects_past_month(self):
+        batch = ForecastBatch.from_rows(monthly_rows('a', '2024-01', [100, 90, 80]))
+        with self.assertRaises(ValueError):
+            batch.update('a', '2024-02', 70)
+
+    def test_unknown_model(self):
+        batch = ForecastBatch.from_rows(monthly_rows('a', '2024-01', [100, 90, 80]))
+        with self.assertRaises(ValueError):
+            batch.forecast('arima')
+
+
+class TestDigest(unittest.TestCase):
+
+    def test_digest_covers_users_with_goals(self):
+        conn = sqlite3.connect(":memory:")
+        conn.executescript("""
+            CREATE TABLE user_emissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                date DATE,
+                total_emissions REAL DEFAULT 0,
+                flagged BOOLEAN DEFAULT 0
+            );
+            CREATE TABLE user_goals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                annual_target REAL,
+                monthly_target REAL
+            );
+        """)
+        conn.execute(USER_EMISSIONS_ROLLUP_DDL)
+        start = month_index('2024-01')
+        for user_id in (1, 2):
+            for i in range(6):
+                conn.execute("INSERT INTO user_emissions (user_id, date, total_emissions) VALUES (?, ?, ?)",
+                             (user_id, month_label(start + i) + "-10", 300 - 20 * i))
+        conn.execute("INSERT INTO user_goals (user_id, annual_target, monthly_target) VALUES (1, 9000, 500)")
+        conn.execute("INSERT INTO user_goals (user_id, annual_target, monthly_target) VALUES (1, 2400, 167)")
+
+        entries = digest(conn, months=1200, model='linear')
+        self.assertEqual([entry['user_id'] for entry in entries], [1])
+        self.assertEqual(entries[0]['trend_per_month'], -20.0)
+        self.assertEqual(entries[0]['monthly_target']['expected'], '2024-08')
+        # 2400 kg a year is 200 kg a month
+        self.assertEqual(entries[0]['annual_target']['expected'], '2024-07')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.postgrest_standin import PostgrestStandIn
+from migrate_to_supabase import Migration, SupabaseTarget
+from main.utils.postgrest_batch import PostgrestError
+
+
+class FlakyTarget(SupabaseTarget):
+    """Fails the Nth emission upsert, like a dropped connection halfway through."""
+
+    def __init__(self, *args, fail_on=2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_on = fail_on
+        self.emission_calls = 0
+
+    def upsert(self, table, rows, on_conflict):
+        if table == 'user_emissions':
+            self.emission_calls += 1
+            if self.emission_calls == self.fail_on:
+                raise PostgrestError(503, "unavailable")
+        return super().upsert(table, rows, on_conflict)
+
+
+class TestMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmp.name) / "users.db")
+        self.checkpoint = str(Path(self.tmp.name) / "checkpoint.json")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executescript("""
+                CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT,
+                                    email TEXT, created_at TIMESTAMP);
+                CREATE TABLE user_goals (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+                                         annual_target REAL, monthly_target REAL, start_date DATE,
+                                         target_date DATE, created_at TIMESTAMP, updated_at TIMESTAMP);
+                CREATE TABLE user_emissions (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+                                             date DATE, transport_emissions REAL, energy_emissions REAL,
+                                             food_emissions REAL, created_at TIMESTAMP);
+            """)
+            for i in range(1, 11):
+                conn.execute("INSERT INTO users (username, email, created_at) VALUES (?, ?, '2024-01-01')",
+                             (f"user{i}", f"user{i}@test.org" if i % 2 else ""))
+                conn.execute("INSERT INTO user_goals (user_id, annual_target, monthly_target) VALUES (?, 1000, 80)",
+                             (i,))
+                for day in range(3):
+                    conn.execute("""
+                        INSERT INTO user_emissions (user_id, date, transport_emissions,
+                                                    energy_emissions, food_emissions, created_at)
+                        VALUES (?, ?, 5, 2, 0, '2024-01-01 00:00:00')
+                    """, (i, f"2024-01-0{day + 1}"))
+            # Newer goals for user 1 replace the older ones
+            conn.execute("INSERT INTO user_goals (user_id, annual_target, monthly_target) VALUES (1, 500, 40)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def migrate(self, standin, target_cls=SupabaseTarget, **kwargs):
+        target = target_cls(standin.url, 'service-key', workers=4, **kwargs)
+        try:
+            return Migration(self.db_path, target, self.checkpoint, chunk_size=4, workers=4).run()
+        finally:
+            target.close()
+
+    def test_migrates_everything_once(self):
+        with PostgrestStandIn() as standin:
+            stats = self.migrate(standin)
+            self.assertEqual((stats['users'], stats['emissions']), (10, 60))
+            self.assertEqual(len(standin.users), 10)
+            self.assertEqual(len(standin.rows['user_profiles']), 10)
+            self.assertEqual(len(standin.rows['user_emissions']), 60)
+            goals = {g['user_id']: g['goals'] for g in standin.rows['user_goals']}
+            self.assertEqual(len(goals), 10)
+            self.assertIn(40, [g['monthly_target'] for g in goals.values()])
+            self.assertIn('user2@example.com', standin.users)
+
+            # Nothing left to do on a second run
+            self.assertEqual(self.migrate(standin), {'users': 0, 'goals': 0, 'emissions': 0})
+
+    def test_resume_after_failure_does_not_duplicate(self):
+        with PostgrestStandIn() as standin:
+            with self.assertRaises(PostgrestError):
+                self.migrate(standin, FlakyTarget)
+            partial = len(standin.rows['user_emissions'])
+            self.assertLess(partial, 60)
+
+            stats = self.migrate(standin)
+            self.assertEqual(stats['users'], 0)
+            self.assertEqual(len(standin.rows['user_emissions']), 60)
+            self.assertEqual(len(standin.users), 10)
+
+    def test_rerun_without_checkpoint_is_idempotent(self):
+        with PostgrestStandIn() as standin:
+            self.migrate(standin)
+            Path(self.checkpoint).unlink()
+            self.migrate(standin)
+            self.assertEqual(len(standin.users), 10)
+            self.assertEqual(len(standin.rows['user_emissions']), 60)
+            self.assertEqual(len(standin.rows['user_goals']), 10)
+
+    def test_rerun_finds_users_created_before_their_profiles(self):
+        with PostgrestStandIn() as standin:
+            self.migrate(standin)
+            # Interrupted after the auth users were created, before user_profiles was written
+            Path(self.checkpoint).unlink()
+            standin.rows['user_profiles'].clear()
+
+            stats = self.migrate(standin)
+            self.assertEqual(stats['users'], 10)
+            self.assertEqual({p['user_id'] for p in standin.rows['user_profiles']},
+                             {u['id'] for u in standin.users.values()})
+            self.assertEqual(len(standin.rows['user_emissions']), 60)
+
+    def test_email_taken_by_another_account_fails_that_user(self):
+        with PostgrestStandIn() as standin:
+            standin.users['user1@test.org'] = {'id': 'someone-else', 'email': 'user1@test.org'}
+            stats = self.migrate(standin)
+            self.assertEqual(stats['users'], 9)
+            self.assertNotIn('someone-else', {p['user_id'] for p in standin.rows['user_profiles']})
+
+
+if __name__ == '__main__':
+    unittest.main()
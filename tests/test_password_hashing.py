@@ -0,0 +1,47 @@
+import hashlib
+import unittest
+
+from main.utils.password_hashing import HashingService, hash_password, verify_password
+
+LOW_COST = 4
+
+
+class TestPasswordHashing(unittest.TestCase):
+
+    def test_hash_roundtrip(self):
+        stored = hash_password("secret123", cost=LOW_COST)
+        self.assertTrue(stored.startswith("scrypt$4$"))
+        self.assertEqual(verify_password("secret123", stored, cost=LOW_COST), (True, False))
+        self.assertEqual(verify_password("wrong", stored, cost=LOW_COST), (False, False))
+
+    def test_salts_are_unique(self):
+        self.assertNotEqual(hash_password("secret123", cost=LOW_COST),
+                            hash_password("secret123", cost=LOW_COST))
+
+    def test_legacy_hash_needs_rehash(self):
+        legacy = hashlib.sha256(("secret123" + "legacy_salt").encode()).hexdigest()
+        self.assertEqual(verify_password("secret123", legacy, legacy_salt="legacy_salt"), (True, True))
+        self.assertEqual(verify_password("wrong", legacy, legacy_salt="legacy_salt"), (False, False))
+        self.assertEqual(verify_password("secret123", legacy), (False, False))
+
+    def test_cost_change_needs_rehash(self):
+        stored = hash_password("secret123", cost=LOW_COST)
+        self.assertEqual(verify_password("secret123", stored, cost=LOW_COST + 1), (True, True))
+
+    def test_block_size_or_parallelism_change_needs_rehash(self):
+        stored = hash_password("secret123", cost=LOW_COST, r=8, p=1)
+        self.assertEqual(verify_password("secret123", stored, cost=LOW_COST, r=16, p=1), (True, True))
+        self.assertEqual(verify_password("secret123", stored, cost=LOW_COST, r=8, p=2), (True, True))
+
+    def test_service_runs_in_pool(self):
+        service = HashingService(max_workers=1, cost=LOW_COST)
+        try:
+            stored = service.hash("secret123")
+            self.assertEqual(service.verify("secret123", stored), (True, False))
+            self.assertEqual(service._executor._mp_context.get_start_method(), 'spawn')
+        finally:
+            service.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from benchmarks.postgrest_standin import PostgrestStandIn
+from main.utils.postgrest_batch import PostgrestBatchWriter, PostgrestError
+
+
+class TestPostgrestBatchWriter(unittest.TestCase):
+
+    def rows(self, count):
+        return [{'user_id': 'u1', 'category': 'food', 'emissions': float(i)} for i in range(count)]
+
+    def test_rows_are_grouped_into_requests(self):
+        with PostgrestStandIn() as standin:
+            writer = PostgrestBatchWriter(standin.url, 'key', max_rows_per_request=10)
+            written = writer.write({'user_emissions': self.rows(25), 'user_goals': self.rows(3)})
+            writer.close()
+
+        self.assertEqual(written, 28)
+        self.assertEqual(standin.requests, 4)
+        self.assertEqual(len(standin.rows['user_emissions']), 25)
+        self.assertEqual(len(standin.rows['user_goals']), 3)
+
+    def test_failure_raises(self):
+        with PostgrestStandIn(fail_status=401) as standin:
+            writer = PostgrestBatchWriter(standin.url, 'key')
+            with self.assertRaises(PostgrestError) as ctx:
+                writer.insert('user_emissions', self.rows(2))
+            writer.close()
+        self.assertEqual(ctx.exception.status_code, 401)
+
+    def test_replayed_insert_skips_rows_already_written(self):
+        rows = [dict(row, id=str(i)) for i, row in enumerate(self.rows(25))]
+        with PostgrestStandIn() as standin:
+            writer = PostgrestBatchWriter(standin.url, 'key', max_rows_per_request=10)
+            # The first attempt got two chunks through before failing
+            writer.insert('user_emissions', rows[:20], on_conflict='id')
+            writer.insert('user_emissions', rows, on_conflict='id', access_token='user-jwt')
+            writer.close()
+
+        self.assertEqual(sorted(row['id'] for row in standin.rows['user_emissions']),
+                         sorted(row['id'] for row in rows))
+        self.assertEqual(standin.tokens, ['key'] * 2 + ['user-jwt'] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import gc
+import unittest
+
+from main.utils.progress_history import ProgressHistory, register_history, session_memory_report
+
+
+def entry(day: int, total: float, target: float = 167.0):
+    return {'date': f"2024-01-{day:02d}", 'transport': total / 2, 'energy': total / 4,
+            'food': total / 4, 'total': total, 'target': target, 'met_target': total <= target}
+
+
+class TestProgressHistory(unittest.TestCase):
+
+    def test_evicts_oldest_beyond_capacity(self):
+        history = ProgressHistory(capacity=3)
+        evicted = []
+        for day in range(1, 6):
+            evicted += history.append(entry(day, 100.0 + day))
+
+        self.assertEqual(len(history), 3)
+        self.assertEqual([e['date'] for e in evicted], ['2024-01-01', '2024-01-02'])
+        self.assertEqual([p[0] for p in history.points()], ['2024-01-03', '2024-01-04', '2024-01-05'])
+        self.assertEqual(history.spilled, 2)
+
+    def test_ids_of_entries_in_memory(self):
+        history = ProgressHistory(capacity=2)
+        for day in range(1, 4):
+            history.append({**entry(day, 100.0), 'id': f"entry-{day}"})
+        history.append(entry(4, 100.0))
+
+        self.assertEqual(history.ids(), {'entry-3'})
+
+    def test_stats_cover_spilled_entries(self):
+        history = ProgressHistory(capacity=2)
+        for day, total in enumerate([200.0, 150.0, 100.0, 180.0], start=1):
+            history.append(entry(day, total))
+
+        stats = history.stats()
+        self.assertEqual(stats['count'], 4)
+        self.assertAlmostEqual(stats['average'], 157.5)
+        self.assertAlmostEqual(stats['success_rate'], 50.0)
+        self.assertAlmostEqual(stats['trend'], -20.0)
+
+    def test_frame_updated_incrementally(self):
+        history = ProgressHistory(capacity=3)
+        for day in range(1, 4):
+            history.append(entry(day, float(day)))
+        frame = history.frame()
+        self.assertEqual(list(frame['total']), [1.0, 2.0, 3.0])
+
+        history.append(entry(4, 4.0))
+        frame = history.frame()
+        self.assertEqual(list(frame['total']), [2.0, 3.0, 4.0])
+        self.assertEqual(list(frame.index), [0, 1, 2])
+        self.assertEqual(str(frame['date'].iloc[-1].date()), '2024-01-04')
+
+    def test_frame_with_saved_points_comes_first(self):
+        history = ProgressHistory(capacity=2)
+        self.assertIs(history.frame_with([]), history.frame())
+        for day in (3, 4):
+            history.append(entry(day, float(day)))
+        saved = [('2024-01-01', 1.0, 167.0), ('2024-01-02', 2.0, None)]
+
+        frame = history.frame_with(saved)
+        self.assertEqual(list(frame['total']), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(list(frame.index), [0, 1, 2, 3])
+        self.assertEqual(list(history.frame()['total']), [3.0, 4.0])
+
+    def test_memory_report_tracks_live_sessions(self):
+        small, large = ProgressHistory(capacity=5, owner='a'), ProgressHistory(capacity=50, owner='b')
+        small.append(entry(1, 100.0))
+        for day in range(1, 21):
+            large.append(entry(day, 100.0))
+        register_history('session-small', small)
+        register_history('session-large', large)
+
+        report = {row['session']: row for row in session_memory_report()}
+        self.assertEqual(report['session-large']['entries'], 20)
+        self.assertGreater(report['session-large']['bytes'], report['session-small']['bytes'])
+
+        del small
+        gc.collect()
+        self.assertNotIn('session-small', {row['session'] for row in session_memory_report()})
+
+
+if __name__ == '__main__':
+    unittest.main()
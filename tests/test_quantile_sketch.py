@@ -0,0 +1,82 @@
+import random
+import unittest
+from bisect import bisect_right
+
+from main.utils.quantile_sketch import QuantileSketch, ordinal, percentile_ranks, sketches_from_rows
+
+
+def lognormal_values(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(4.5, 0.8) for _ in range(count)]
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def test_quantiles_within_relative_accuracy(self):
+        values = lognormal_values(20000)
+        sketch = QuantileSketch()
+        sketch.extend(values)
+        ordered = sorted(values)
+        for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q) / exact, 1.0, delta=0.0101, msg=f"q={q}")
+
+    def test_rank_close_to_exact(self):
+        values = lognormal_values(20000)
+        sketch = QuantileSketch()
+        sketch.extend(values)
+        ordered = sorted(values)
+        for value in (10.0, 50.0, 90.0, 150.0, 400.0):
+            exact = bisect_right(ordered, value) / len(ordered)
+            self.assertAlmostEqual(sketch.rank(value), exact, delta=0.01, msg=f"value={value}")
+
+    def test_merge_matches_single_sketch(self):
+        values = lognormal_values(5000)
+        whole = QuantileSketch()
+        whole.extend(values)
+        merged = QuantileSketch()
+        for start in range(0, len(values), 1000):
+            part = QuantileSketch()
+            part.extend(values[start:start + 1000])
+            merged.merge(part)
+        self.assertEqual(merged.counts, whole.counts)
+        self.assertEqual(merged.count, 5000)
+
+    def test_size_independent_of_count(self):
+        sketch = QuantileSketch()
+        sketch.extend(lognormal_values(50000))
+        self.assertLess(len(sketch.counts), 800)
+
+    def test_zero_and_tiny_values_share_lowest_bucket(self):
+        sketch = QuantileSketch()
+        sketch.extend([0.0, 0.001, 0.01])
+        self.assertEqual(len(sketch.counts), 1)
+        self.assertEqual(sketch.rank(0.0), 1.0)
+
+    def test_empty_sketch(self):
+        sketch = QuantileSketch()
+        self.assertEqual(sketch.rank(10.0), 0.0)
+        self.assertIsNone(sketch.quantile(0.5))
+
+    def test_merge_rejects_other_accuracy(self):
+        with self.assertRaises(ValueError):
+            QuantileSketch().merge(QuantileSketch(relative_accuracy=0.02))
+
+    def test_rpc_rows_to_percentiles(self):
+        source = QuantileSketch()
+        source.extend(range(1, 101))
+        rows = [{'category': 'food', **row} for row in source.to_rows()]
+        sketches = sketches_from_rows(rows)
+        ranks = percentile_ranks({'food': 25.0, 'energy': 40.0}, sketches)
+        self.assertAlmostEqual(ranks['food'], 25.0, delta=1.0)
+        self.assertIsNone(ranks['energy'])
+
+    def test_ordinal_suffixes(self):
+        for number, expected in [(0, '0th'), (1, '1st'), (2, '2nd'), (3, '3rd'), (4, '4th'),
+                                 (11, '11th'), (12, '12th'), (13, '13th'), (21, '21st'),
+                                 (22, '22nd'), (23, '23rd'), (100, '100th'), (101, '101st')]:
+            self.assertEqual(ordinal(number), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import random
+import unittest
+
+import numpy as np
+
+from main.core.energy import energy_emissions
+from main.core.food import detailed_food_emissions, food_emissions
+from main.core.recommendations import (
+    ACTION_KEYS, ACTIONS, FOODS, feature_matrix, features_from_inputs, footprint, inputs_from_details,
+    recommend, savings_matrix, top_actions
+)
+from main.core.transport import transport_emissions
+
+
+def random_profile(rng: random.Random):
+    return {
+        'transport': {
+            'km_car': rng.uniform(0, 2000), 'car_fuel_type': rng.choice(['petrol', 'diesel', 'electric']),
+            'km_bus': rng.uniform(0, 300), 'bus_fuel_type': rng.choice(['diesel', 'biofuel', 'electric']),
+            'km_train': rng.uniform(0, 500), 'train_type': rng.choice(['electric', 'diesel']),
+            'short_flights': rng.choice([0, 0.5, 1]), 'medium_flights': rng.choice([0, 0.2]),
+            'long_flights': rng.choice([0, 0.1, 2]),
+        },
+        'energy': {source: rng.uniform(0, 800) for source in ('kwh_electricity', 'kwh_oil', 'kwh_gas', 'kwh_wood')},
+        'food': {
+            'diet_type': rng.choice(['custom', 'custom', 'high_meat', 'vegan']),
+            'servings': {food: rng.randint(0, 30) for food in FOODS} | {'milk': rng.randint(0, 3)},
+            'local_produce_pct': rng.randint(0, 100), 'organic_pct': rng.randint(0, 100),
+        },
+    }
+
+
+def calculator_total(profile) -> float:
+    """Footprint from the core calculators, as the pages compute it."""
+    food = profile['food']
+    food_total = (detailed_food_emissions(food['servings'], food['local_produce_pct'], food['organic_pct'])['total']
+                  if food['diet_type'] == 'custom' else food_emissions(food['diet_type']))
+    return transport_emissions(**profile['transport'])['total'] + energy_emissions(**profile['energy']) + food_total
+
+
+class TestRecommendations(unittest.TestCase):
+
+    def test_footprint_matches_calculators(self):
+        rng = random.Random(5)
+        profiles = [random_profile(rng) for _ in range(50)]
+        totals = footprint(feature_matrix(profiles)).sum(axis=1)
+        np.testing.assert_allclose(totals, [calculator_total(profile) for profile in profiles])
+
+    def test_savings_match_recalculated_inputs(self):
+        profile = random_profile(random.Random(1))
+        profile['transport'].update(km_car=1000, car_fuel_type='petrol', short_flights=0.5, train_type='electric')
+        profile['food'] = {'diet_type': 'custom', 'servings': {'beef': 3, 'pork': 10},
+                           'local_produce_pct': 20, 'organic_pct': 0}
+        savings = dict(zip(ACTION_KEYS, savings_matrix(features_from_inputs(**profile))[0]))
+        before = calculator_total(profile)
+
+        def after(**changes):
+            changed = {category: dict(inputs) for category, inputs in profile.items()}
+            for category, update in changes.items():
+                changed[category].update(update)
+            return calculator_total(changed)
+
+        self.assertAlmostEqual(savings['beef_to_legumes'], before - after(
+            food={'servings': {'beef': 0, 'pork': 10, 'legumes': 3}}))
+        self.assertAlmostEqual(savings['buy_local'], before - after(food={'local_produce_pct': 50}))
+        self.assertAlmostEqual(savings['short_flight_to_train'], before - after(transport={
+            'short_flights': 0.5 - 1 / 12, 'km_train': profile['transport']['km_train'] + 500 / 12}))
+        self.assertAlmostEqual(savings['car_to_electric'], before - after(transport={'car_fuel_type': 'electric'}))
+        self.assertAlmostEqual(savings['gas_heat_pump'], before - after(energy={
+            'kwh_gas': 0, 'kwh_electricity': profile['energy']['kwh_electricity'] + profile['energy']['kwh_gas'] / 3}))
+
+    def test_actions_that_do_not_apply_save_nothing(self):
+        savings = dict(zip(ACTION_KEYS, savings_matrix(features_from_inputs(
+            transport={'km_car': 0, 'car_fuel_type': 'petrol'}, food={'diet_type': 'vegan'}))[0]))
+        for key in ('car_to_electric', 'drive_less', 'skip_long_flight', 'beef_to_legumes', 'go_vegetarian'):
+            self.assertEqual(savings[key], 0.0, key)
+
+    def test_recommend_ranks_best_first(self):
+        ranked = recommend(transport={'km_car': 1500, 'car_fuel_type': 'diesel', 'long_flights': 1},
+                           energy={'kwh_gas': 1200}, food={'diet_type': 'high_meat'}, k=3)
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(ranked[0]['key'], 'car_to_electric')
+        self.assertEqual([r['saving_kg'] for r in ranked], sorted((r['saving_kg'] for r in ranked), reverse=True))
+        self.assertAlmostEqual(ranked[0]['saving_kg'], 1500 * 0.15 * 2.68)
+
+    def test_batch_ranking_matches_single_users(self):
+        rng = random.Random(9)
+        profiles = [random_profile(rng) for _ in range(20)]
+        batch = top_actions(savings_matrix(feature_matrix(profiles)), k=4)
+        for profile, indexes in zip(profiles, batch):
+            self.assertEqual([ACTIONS[i].key for i in indexes], [r['key'] for r in recommend(**profile, k=4)])
+
+    def test_inputs_from_saved_details(self):
+        details = {'car_km': 400, 'car_fuel': 'Petrol', 'bus_km': 0, 'bus_fuel': 'Diesel', 'train_km': 50,
+                   'train_type': 'Electric', 'short_flights': 0.0, 'medium_flights': 0.0, 'long_flights': 0.5}
+        transport = inputs_from_details('transport', details)
+        row = features_from_inputs(transport=transport)
+        self.assertAlmostEqual(footprint(row)[0, 0], transport_emissions(
+            400, 'petrol', 0, 'diesel', 50, 'electric', 0, 0, 0.5)['total'])
+        food = inputs_from_details('food', {'diet_type': 'custom', 'beef_servings': 8, 'milk_glasses': 1})
+        self.assertEqual(food['servings']['beef'], 8)
+        with self.assertRaises(ValueError):
+            inputs_from_details('water', {})
+
+
+if __name__ == '__main__':
+    unittest.main()
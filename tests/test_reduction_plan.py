@@ -0,0 +1,114 @@
+import random
+import unittest
+from itertools import combinations
+
+import numpy as np
+
+from main.core.recommendations import ACTION_KEYS, ACTIONS, feature_matrix, features_from_inputs, footprint
+from main.core.reduction_plan import EFFORT, GROUPS, MIN_SAVING, plan, plan_batch
+from tests.test_recommendations import random_profile
+
+ORDER = [ACTION_KEYS.index(key) for group in GROUPS for key in group]
+
+
+def brute_force(features: np.ndarray, target: float, allowed):
+    """Least effort over every subset of the allowed actions, applied in group order."""
+    best = None
+    for size in range(len(allowed) + 1):
+        for subset in combinations(allowed, size):
+            changed = features[None, :]
+            for index in sorted(subset, key=ORDER.index):
+                changed = ACTIONS[index].apply(changed)
+            if footprint(changed).sum() <= target + 1e-9:
+                effort = sum(EFFORT[ACTION_KEYS[index]] for index in subset)
+                best = effort if best is None else min(best, effort)
+    return best
+
+
+def applicable(features: np.ndarray):
+    current = footprint(features).sum()
+    return [i for i, action in enumerate(ACTIONS)
+            if current - footprint(action.apply(features[None, :])).sum() >= MIN_SAVING]
+
+
+class TestReductionPlan(unittest.TestCase):
+
+    def test_catalog_covered(self):
+        self.assertEqual(set(EFFORT), set(ACTION_KEYS))
+        self.assertEqual(sorted(key for group in GROUPS for key in group), sorted(ACTION_KEYS))
+
+    def test_groups_add_up(self):
+        features = feature_matrix([random_profile(random.Random(seed)) for seed in range(20)])
+        current = footprint(features).sum(axis=1)
+        one_per_group = [ACTION_KEYS.index(group[-1]) for group in GROUPS]
+        combined, separate = features, np.zeros(len(features))
+        for index in one_per_group:
+            combined = ACTIONS[index].apply(combined)
+            separate += current - footprint(ACTIONS[index].apply(features)).sum(axis=1)
+        np.testing.assert_allclose(current - footprint(combined).sum(axis=1), separate)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        for _ in range(6):
+            profile = random_profile(rng)
+            profile['food']['diet_type'] = 'custom'
+            features = features_from_inputs(**profile)
+            allowed = applicable(features)
+            # Keep the search small: drop the rarely useful actions
+            allowed = allowed[:11]
+            excluded = [key for i, key in enumerate(ACTION_KEYS) if i not in allowed]
+            total = footprint(features).sum()
+            for share in (0.97, 0.9, 0.8):
+                result = plan(total * share, **profile, excluded=excluded)
+                expected = brute_force(features, total * share, allowed)
+                self.assertEqual(result['reached'], expected is not None)
+                if expected is not None:
+                    self.assertEqual(result['effort'], expected)
+                    self.assertGreaterEqual(result['saving_kg'], total * (1 - share) - 1e-9)
+
+    def test_plan_saving_is_recalculated_total(self):
+        profile = random_profile(random.Random(11))
+        features = features_from_inputs(**profile)
+        result = plan(footprint(features).sum() * 0.85, **profile)
+        changed = features[None, :]
+        for index in sorted((ACTION_KEYS.index(key) for key in result['actions']), key=ORDER.index):
+            changed = ACTIONS[index].apply(changed)
+        self.assertAlmostEqual(result['total_kg'] - footprint(changed).sum(), result['saving_kg'])
+        self.assertEqual(result['effort'], sum(EFFORT[key] for key in result['actions']))
+
+    def test_user_constraints(self):
+        no_car = {'km_car': 0, 'car_fuel_type': 'petrol', 'long_flights': 1}
+        result = plan(0, transport=no_car, energy={'kwh_gas': 800}, food={'diet_type': 'high_meat'})
+        self.assertFalse(result['reached'])
+        self.assertFalse({'car_to_electric', 'car_to_train', 'drive_less'} & set(result['actions']))
+        self.assertIn('gas_heat_pump', result['actions'])
+
+        ruled_out = plan(0, transport=no_car, energy={'kwh_gas': 800}, food={'diet_type': 'high_meat'},
+                         excluded=['gas_heat_pump'])
+        self.assertNotIn('gas_heat_pump', ruled_out['actions'])
+        self.assertLess(ruled_out['saving_kg'], result['saving_kg'])
+
+    def test_already_under_target(self):
+        result = plan(1000, transport={'km_car': 100, 'car_fuel_type': 'diesel'})
+        self.assertEqual((result['actions'], result['effort'], result['reached']), ([], 0, True))
+
+    def test_prefers_low_effort(self):
+        # 10% less driving covers a small gap; going electric would too, at more effort
+        transport = {'km_car': 1000, 'car_fuel_type': 'petrol'}
+        result = plan(footprint(features_from_inputs(transport)).sum() - 5, transport=transport)
+        self.assertEqual(result['actions'], ['drive_less'])
+
+    def test_batch_matches_single_users(self):
+        rng = random.Random(4)
+        profiles = [random_profile(rng) for _ in range(15)]
+        targets = [rng.uniform(100, 600) for _ in profiles]
+        batch = plan_batch(feature_matrix(profiles), targets)
+        for profile, target, result in zip(profiles, targets, batch):
+            single = plan(target, **profile)
+            self.assertEqual((result['actions'], result['effort'], result['reached']),
+                             (single['actions'], single['effort'], single['reached']))
+            self.assertAlmostEqual(result['saving_kg'], single['saving_kg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import gzip
+import json
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from main.utils.database import EmissionDatabase
+from main.utils.counters import install_counters, read_user_counters
+from main.utils.retention import USER_DEPENDENT_TABLES, add_flag_columns, compact_database, delete_demo_users
+
+
+class TestRetention(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmp.name) / "emissions.db")
+        self.archive_dir = str(Path(self.tmp.name) / "archive")
+        self.db = EmissionDatabase(self.db_path)
+
+        self.old_date = (datetime.now() - timedelta(days=400)).strftime("%Y-%m-%d")
+        with sqlite3.connect(self.db_path) as conn:
+            for i in range(5):
+                conn.execute("""
+                    INSERT INTO emissions (date, transport_emissions, energy_emissions,
+                                           food_emissions, total_emissions, inputs_json)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (self.old_date, 10.0 * i, 1.0, 2.0, 10.0 * i + 3.0, json.dumps({'i': i})))
+        self.db.save_calculation(100.0, 10.0, 20.0, {'recent': True})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compaction_preserves_monthly_summary(self):
+        year, month = int(self.old_date[:4]), int(self.old_date[5:7])
+        before = self.db.get_monthly_summary(year, month)
+
+        stats = compact_database(self.db_path, 'emissions', keep_days=90,
+                                 archive_dir=self.archive_dir, chunk_size=2)
+        self.assertEqual(stats['compacted'], 5)
+
+        self.assertEqual(self.db.get_monthly_summary(year, month), before)
+        self.assertEqual(len(self.db.get_historical_data()), 1)
+
+    def test_raw_rows_are_archived(self):
+        compact_database(self.db_path, 'emissions', keep_days=90, archive_dir=self.archive_dir)
+
+        path = Path(self.archive_dir) / f"emissions-{self.old_date[:7]}.jsonl.gz"
+        with gzip.open(path, 'rt') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(json.loads(rows[3]['inputs_json']), {'i': 3})
+
+    def test_compaction_is_repeatable(self):
+        compact_database(self.db_path, 'emissions', keep_days=90, archive_dir=self.archive_dir)
+        stats = compact_database(self.db_path, 'emissions', keep_days=90, archive_dir=self.archive_dir)
+        self.assertEqual(stats['compacted'], 0)
+
+
+class TestUserEmissionsRetention(unittest.TestCase):
+
+    def test_flagged_rows_stay_raw(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = str(Path(tmp) / "users.db")
+            old_date = (datetime.now() - timedelta(days=400)).strftime("%Y-%m-%d")
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("""
+                    CREATE TABLE user_emissions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, date DATE,
+                        transport_emissions REAL DEFAULT 0, energy_emissions REAL DEFAULT 0,
+                        food_emissions REAL DEFAULT 0, total_emissions REAL DEFAULT 0
+                    )
+                """)
+                add_flag_columns(conn)
+                conn.executemany("""
+                    INSERT INTO user_emissions (user_id, date, total_emissions, flagged) VALUES (1, ?, ?, ?)
+                """, [(old_date, 10.0, 0), (old_date, 99999.0, 1)])
+
+            stats = compact_database(db_path, 'user_emissions', keep_days=90,
+                                     archive_dir=str(Path(tmp) / "archive"))
+            self.assertEqual(stats['compacted'], 1)
+            with sqlite3.connect(db_path) as conn:
+                self.assertEqual(conn.execute("SELECT total_emissions FROM user_emissions").fetchall(), [(99999.0,)])
+                self.assertEqual(conn.execute("SELECT total_emissions FROM user_emissions_monthly").fetchall(),
+                                 [(10.0,)])
+
+
+class TestDemoUserCleanup(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("""
+            CREATE TABLE users (
+                id INTEGER PRIMARY KEY, username TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP, is_demo BOOLEAN DEFAULT 0
+            )
+        """)
+        for table in USER_DEPENDENT_TABLES:
+            self.conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, user_id INTEGER, date DATE, "
+                              f"total_emissions REAL, flagged BOOLEAN DEFAULT 0, created_at TIMESTAMP)")
+        install_counters(self.conn)
+
+        old = (datetime.utcnow() - timedelta(days=3)).strftime("%Y-%m-%d %H:%M:%S")
+        users = [(f'demo_{i}', old, 1) for i in range(7)] + [('demo_new', None, 1), ('alice', old, 0)]
+        with self.conn:
+            for username, created_at, is_demo in users:
+                user_id = self.conn.execute(
+                    "INSERT INTO users (username, created_at, is_demo) VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), ?)",
+                    (username, created_at, is_demo)).lastrowid
+                for table in USER_DEPENDENT_TABLES:
+                    self.conn.executemany(f"INSERT INTO {table} (user_id, date) VALUES (?, date('now'))",
+                                          [(user_id,)] * 2)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_deletes_in_chunks_with_dependent_rows(self):
+        progress = []
+        deleted = delete_demo_users(self.conn, days_old=1, chunk_size=3,
+                                    progress_callback=lambda done, total, rate: progress.append((done, total)))
+        self.assertEqual(deleted, 7)
+        self.assertEqual(progress, [(3, 7), (6, 7), (7, 7)])
+
+        remaining = [row[0] for row in self.conn.execute("SELECT username FROM users ORDER BY id")]
+        self.assertEqual(remaining, ['demo_new', 'alice'])
+        for table in USER_DEPENDENT_TABLES:
+            owners = {row[0] for row in self.conn.execute(f"SELECT user_id FROM {table}")}
+            self.assertEqual(owners, {8, 9}, table)
+        counters = read_user_counters(self.conn)
+        self.assertEqual((counters['total_users'], counters['demo_users']), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,460 @@
+"""
+EXPLAIN checks for supabase_schema.sql and its migrations.
+
+These need a local PostgreSQL (13+) and psycopg2; they are skipped unless
+TEST_POSTGRES_URL points at a server where the user may create databases
+and roles, e.g. postgresql://postgres@localhost/postgres.
+"""
+
+import json
+import os
+import re
+import unittest
+import uuid
+from pathlib import Path
+
+from main.utils.quantile_sketch import QuantileSketch, sketches_from_rows
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+POSTGRES_URL = os.getenv('TEST_POSTGRES_URL')
+ROOT = Path(__file__).resolve().parent.parent
+
+# Stand-ins for what Supabase provides outside the public schema
+SUPABASE_STUBS = """
+    CREATE SCHEMA auth;
+    CREATE TABLE auth.users (
+        id UUID PRIMARY KEY,
+        email TEXT,
+        raw_user_meta_data JSONB,
+        last_sign_in_at TIMESTAMPTZ,
+        created_at TIMESTAMPTZ DEFAULT NOW()
+    );
+    CREATE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS $$
+        SELECT NULLIF(current_setting('request.jwt.claim.sub', true), '')::UUID
+    $$;
+    DO $$
+    DECLARE
+        role_name TEXT;
+    BEGIN
+        FOREACH role_name IN ARRAY ARRAY['anon', 'authenticated', 'service_role'] LOOP
+            IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = role_name) THEN
+                EXECUTE format('CREATE ROLE %I NOLOGIN', role_name);
+            END IF;
+        END LOOP;
+    END;
+    $$;
+"""
+
+
+def split_sql(script: str):
+    """Split a SQL file into statements, keeping $$-quoted bodies intact."""
+    statements, current, in_body = [], [], False
+    for line in script.splitlines():
+        if not current and (not line.strip() or line.strip().startswith('--')):
+            continue
+        current.append(line)
+        if line.count('$$') % 2:
+            in_body = not in_body
+        if not in_body and line.rstrip().endswith(';'):
+            statements.append("\n".join(current))
+            current = []
+    return statements
+
+
+def schema_sections(*numbers: int) -> str:
+    """The numbered sections of supabase_schema.sql with these numbers."""
+    sections, number = {}, None
+    for line in (ROOT / "supabase_schema.sql").read_text().splitlines():
+        heading = re.match(r'-- (\d+)\. ', line)
+        if heading:
+            number = int(heading.group(1))
+        sections.setdefault(number, []).append(line)
+    return "\n".join(line for n in numbers for line in sections[n])
+
+
+@unittest.skipUnless(psycopg2 and POSTGRES_URL, "set TEST_POSTGRES_URL to run (needs psycopg2)")
+class PostgresTestCase(unittest.TestCase):
+    """Runs each test class in a throwaway database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db_name = f"emission_schema_test_{uuid.uuid4().hex[:8]}"
+        admin = psycopg2.connect(POSTGRES_URL)
+        admin.autocommit = True
+        with admin.cursor() as cur:
+            cur.execute(f"CREATE DATABASE {cls.db_name}")
+        admin.close()
+
+        cls.conn = psycopg2.connect(POSTGRES_URL, dbname=cls.db_name)
+        cls.conn.autocommit = True
+        cls.run_script(SUPABASE_STUBS)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        admin = psycopg2.connect(POSTGRES_URL)
+        admin.autocommit = True
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {cls.db_name}")
+        admin.close()
+
+    @classmethod
+    def run_script(cls, script: str):
+        with cls.conn.cursor() as cur:
+            for statement in split_sql(script):
+                cur.execute(statement)
+
+    @classmethod
+    def seed(cls, users: int = 20, rows_per_user: int = 300):
+        """Users with emissions spread over the last six months."""
+        with cls.conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO auth.users (id, email)
+                SELECT gen_random_uuid(), 'user' || i || '@test.org' FROM generate_series(1, %s) i
+            """, (users,))
+            cur.execute("""
+                INSERT INTO user_emissions (user_id, category, emissions, created_at)
+                SELECT u.id, (ARRAY['transport', 'energy', 'food'])[1 + i %% 3], i %% 50,
+                       date_trunc('month', NOW()) - INTERVAL '5 months' + (i * INTERVAL '13 hours')
+                FROM auth.users u, generate_series(1, %s) i
+            """, (rows_per_user,))
+            cur.execute("ANALYZE")
+            cur.execute("SELECT id FROM auth.users LIMIT 1")
+            return cur.fetchone()[0]
+
+    def plan(self, query: str, params=()):
+        with self.conn.cursor() as cur:
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            return cur.fetchone()[0][0]['Plan']
+
+    def nodes(self, plan):
+        yield plan
+        for child in plan.get('Plans', []):
+            yield from self.nodes(child)
+
+    def assertIndexOnly(self, plan):
+        """Every populated partition is read through an index and no sort is needed."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples > 0")
+            populated = {row[0] for row in cur.fetchall()}
+        nodes = list(self.nodes(plan))
+        seq_scans = [n['Relation Name'] for n in nodes
+                     if n['Node Type'] == 'Seq Scan' and n['Relation Name'] in populated]
+        self.assertEqual(seq_scans, [], json.dumps(plan, indent=1))
+        self.assertNotIn('Sort', [n['Node Type'] for n in nodes], json.dumps(plan, indent=1))
+        self.assertTrue(any('Index' in n['Node Type'] for n in nodes))
+
+    def scanned_tables(self, plan):
+        return {node['Relation Name'] for node in self.nodes(plan) if 'Relation Name' in node}
+
+
+class TestSchemaPlans(PostgresTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.run_script((ROOT / "supabase_schema.sql").read_text())
+        cls.user_id = cls.seed()
+
+    def test_user_emissions_is_partitioned(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM pg_inherits WHERE inhparent = 'user_emissions'::regclass")
+            self.assertGreaterEqual(cur.fetchone()[0], 16)
+
+    def test_history_uses_user_created_index(self):
+        plan = self.plan("""
+            SELECT * FROM user_emissions WHERE user_id = %s ORDER BY created_at DESC LIMIT 20
+        """, (self.user_id,))
+        self.assertIndexOnly(plan)
+
+    def test_category_history_uses_composite_index(self):
+        plan = self.plan("""
+            SELECT * FROM user_emissions WHERE user_id = %s AND category = 'food'
+            ORDER BY created_at DESC LIMIT 20
+        """, (self.user_id,))
+        self.assertIndexOnly(plan)
+
+    def test_month_range_prunes_partitions(self):
+        plan = self.plan("""
+            SELECT SUM(emissions) FROM user_emissions
+            WHERE user_id = %s
+              AND created_at >= date_trunc('month', NOW()) - INTERVAL '2 months'
+              AND created_at < date_trunc('month', NOW()) - INTERVAL '1 month'
+        """, (self.user_id,))
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT 'user_emissions_' || to_char(NOW() - INTERVAL '2 months', 'YYYY_MM')")
+            partition = cur.fetchone()[0]
+        self.assertEqual(self.scanned_tables(plan), {partition})
+
+    def test_counter_trigger_sees_batched_inserts(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT SUM(records) FROM emission_daily_counts")
+            self.assertEqual(cur.fetchone()[0], 20 * 300)
+
+    def test_sketch_trigger_matches_python_buckets(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT category, emissions FROM user_emissions")
+            expected = {}
+            for category, emissions in cur.fetchall():
+                expected.setdefault(category, QuantileSketch()).add(float(emissions))
+            cur.execute("SELECT category, bucket, SUM(count) FROM emission_sketches GROUP BY 1, 2")
+            stored = sketches_from_rows({'category': c, 'bucket': b, 'count': n} for c, b, n in cur.fetchall())
+            self.assertEqual({c: s.counts for c, s in stored.items()},
+                             {c: s.counts for c, s in expected.items()})
+
+            cur.execute("SELECT COUNT(*) FROM user_emissions WHERE created_at >= date_trunc('month', NOW())")
+            this_month = cur.fetchone()[0]
+            cur.execute("SELECT SUM(count) FROM get_emission_sketch(1)")
+            self.assertEqual(cur.fetchone()[0], this_month)
+
+    def test_flagged_rows_leave_the_aggregates_until_cleared(self):
+        def snapshot(cur):
+            cur.execute("SELECT set_config('request.jwt.claim.sub', %s, false)", (str(self.user_id),))
+            cur.execute("SELECT SUM(record_count), SUM(total) FROM get_emission_totals()")
+            totals = cur.fetchone()
+            cur.execute("SELECT SUM(records), SUM(total_emissions) FROM emission_daily_counts")
+            daily = cur.fetchone()
+            cur.execute("SELECT SUM(count) FROM emission_sketches")
+            return totals, daily, cur.fetchone()[0]
+
+        with self.conn.cursor() as cur:
+            before = snapshot(cur)
+            cur.execute("""
+                UPDATE user_emissions SET flagged = true
+                WHERE id IN (SELECT id FROM user_emissions WHERE user_id = %s AND emissions > 0 LIMIT 3)
+                RETURNING emissions
+            """, (self.user_id,))
+            removed = sum(row[0] for row in cur.fetchall())
+            (count, total), (records, daily_total), sketched = snapshot(cur)
+            self.assertEqual((count, total), (before[0][0] - 3, before[0][1] - removed))
+            self.assertEqual((records, daily_total), (before[1][0] - 3, before[1][1] - removed))
+            self.assertEqual(sketched, before[2] - 3)
+
+            cur.execute("UPDATE user_emissions SET flagged = false, reviewed = true WHERE flagged")
+            self.assertEqual(snapshot(cur), before)
+
+    def test_users_cannot_set_flags(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SET ROLE authenticated")
+            try:
+                with self.assertRaises(psycopg2.errors.InsufficientPrivilege):
+                    cur.execute("UPDATE user_emissions SET reviewed = true")
+            finally:
+                cur.execute("RESET ROLE")
+
+    def test_users_can_replay_rows_with_their_own_ids(self):
+        row_id = str(uuid.uuid4())
+        with self.conn.cursor() as cur:
+            # Supabase grants these by default; section 15 narrows INSERT to some columns
+            cur.execute("GRANT USAGE ON SCHEMA public, auth TO authenticated")
+            cur.execute("GRANT SELECT ON user_emissions TO authenticated")
+            cur.execute("SELECT set_config('request.jwt.claim.sub', %s, false)", (str(self.user_id),))
+            cur.execute("SET ROLE authenticated")
+            try:
+                # What PostgREST runs for Prefer: resolution=ignore-duplicates, on_conflict=id,created_at
+                for _ in range(2):
+                    cur.execute("""
+                        INSERT INTO user_emissions (id, user_id, category, emissions, created_at)
+                        VALUES (%s, %s, 'food', 1, '2024-03-01') ON CONFLICT (id, created_at) DO NOTHING
+                    """, (row_id, self.user_id))
+            finally:
+                cur.execute("RESET ROLE")
+            cur.execute("SELECT COUNT(*) FROM user_emissions WHERE id = %s", (row_id,))
+            self.assertEqual(cur.fetchone()[0], 1)
+
+
+class TestDemoCleanup(PostgresTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.run_script((ROOT / "supabase_schema.sql").read_text())
+
+    def test_deletes_old_demo_users_in_batches_with_their_data(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO auth.users (id, email, raw_user_meta_data, created_at)
+                SELECT gen_random_uuid(), kind || i || '@test.org',
+                       jsonb_build_object('is_demo', kind <> 'user'),
+                       NOW() - CASE WHEN kind = 'new_demo' THEN INTERVAL '1 hour' ELSE INTERVAL '3 days' END
+                FROM (VALUES ('old_demo', 7), ('new_demo', 2), ('user', 2)) AS kinds(kind, n),
+                     generate_series(1, n) i
+            """)
+            cur.execute("""
+                INSERT INTO user_emissions (user_id, category, emissions)
+                SELECT id, 'food', 10 FROM auth.users, generate_series(1, 3)
+            """)
+            cur.execute("INSERT INTO user_goals (user_id, goals) SELECT id, '{}' FROM auth.users")
+            cur.execute("INSERT INTO user_progress (user_id, recorded_on, total) SELECT id, CURRENT_DATE, 1 FROM auth.users")
+
+            cur.execute("SELECT count_demo_users(1)")
+            self.assertEqual(cur.fetchone()[0], 7)
+            batches = []
+            while True:
+                cur.execute("SELECT delete_demo_users(1, 3)")
+                batches.append(cur.fetchone()[0])
+                if batches[-1] < 3:
+                    break
+            self.assertEqual(batches, [3, 3, 1])
+
+            cur.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE email LIKE 'old_demo%%') FROM auth.users")
+            self.assertEqual(cur.fetchone(), (4, 0))
+            for table in ('user_profiles', 'user_goals', 'user_progress'):
+                cur.execute(f"SELECT COUNT(*) FROM {table}")
+                self.assertEqual(cur.fetchone()[0], 4, table)
+            cur.execute("SELECT COUNT(*) FROM user_emissions")
+            self.assertEqual(cur.fetchone()[0], 4 * 3)
+            cur.execute("SELECT total_users, demo_users FROM get_app_counters()")
+            self.assertEqual(cur.fetchone(), (4, 2))
+
+    def test_only_the_service_role_may_delete(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SET ROLE authenticated")
+            try:
+                with self.assertRaises(psycopg2.errors.InsufficientPrivilege):
+                    cur.execute("SELECT * FROM delete_demo_users(0, 10)")
+            finally:
+                cur.execute("RESET ROLE")
+
+    def test_users_cannot_change_their_demo_flag(self):
+        with self.conn.cursor() as cur:
+            cur.execute("GRANT USAGE ON SCHEMA public TO authenticated")
+            cur.execute("SET ROLE authenticated")
+            try:
+                with self.assertRaises(psycopg2.errors.InsufficientPrivilege):
+                    cur.execute("UPDATE user_profiles SET is_demo = false")
+            finally:
+                cur.execute("RESET ROLE")
+
+    def test_old_demo_users_found_through_the_partial_index(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO auth.users (id, email, raw_user_meta_data)
+                SELECT gen_random_uuid(), 'plan' || i || '@test.org', jsonb_build_object('is_demo', i % 50 = 0)
+                FROM generate_series(1, 5000) i
+            """)
+            cur.execute("ANALYZE user_profiles")
+        try:
+            plan = self.plan("""
+                SELECT user_id FROM user_profiles
+                WHERE is_demo AND created_at < NOW() - INTERVAL '1 day' LIMIT 500
+            """)
+            self.assertIn('idx_user_profiles_demo_created', json.dumps(plan))
+        finally:
+            with self.conn.cursor() as cur:
+                cur.execute("DELETE FROM auth.users WHERE email LIKE 'plan%'")
+
+
+class TestPartitionMigration(PostgresTestCase):
+
+    ORIGINAL_TABLE = """
+        CREATE TABLE user_emissions (
+            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+            user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+            category TEXT NOT NULL CHECK (category IN ('transport', 'energy', 'food')),
+            emissions DECIMAL(10,2) NOT NULL CHECK (emissions >= 0),
+            details JSONB,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        );
+        CREATE INDEX idx_user_emissions_user_id ON user_emissions(user_id);
+        CREATE INDEX idx_user_emissions_category ON user_emissions(category);
+        CREATE INDEX idx_user_emissions_created_at ON user_emissions(created_at);
+        ALTER TABLE user_emissions ENABLE ROW LEVEL SECURITY;
+    """
+
+    # Later schema sections already run against the original table
+    LATER_SECTIONS = ()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.run_script(cls.ORIGINAL_TABLE)
+        cls.run_script(schema_sections(*cls.LATER_SECTIONS))
+        cls.user_id = cls.seed()
+        cls.run_script((ROOT / "migrations" / "001_user_emissions_partitioning.sql").read_text())
+        cls.conn.cursor().execute("ANALYZE")
+
+    def test_rows_kept_and_table_partitioned(self):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM user_emissions")
+            self.assertEqual(cur.fetchone()[0], 20 * 300)
+            cur.execute("SELECT count(*) FROM pg_partitioned_table WHERE partrelid = 'user_emissions'::regclass")
+            self.assertEqual(cur.fetchone()[0], 1)
+
+            cur.execute("INSERT INTO user_emissions (user_id, category, emissions) VALUES (%s, 'food', 1)",
+                        (self.user_id,))
+            cur.execute("""
+                INSERT INTO user_emissions (user_id, category, emissions, created_at)
+                VALUES (%s, 'food', 1, NOW() + INTERVAL '2 months')
+            """, (self.user_id,))
+            cur.execute("SELECT count(*) FROM user_emissions")
+            self.assertEqual(cur.fetchone()[0], 20 * 300 + 2)
+
+    def test_history_uses_composite_index_after_migration(self):
+        plan = self.plan("""
+            SELECT * FROM user_emissions WHERE user_id = %s ORDER BY created_at DESC LIMIT 20
+        """, (self.user_id,))
+        self.assertIndexOnly(plan)
+
+    def test_old_single_column_indexes_dropped(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT count(*) FROM pg_indexes
+                WHERE indexname IN ('idx_user_emissions_user_id', 'idx_user_emissions_category',
+                                    'idx_user_emissions_created_at')
+            """)
+            self.assertEqual(cur.fetchone()[0], 0)
+
+
+
+class TestPartitionMigrationAfterLaterSections(TestPartitionMigration):
+
+    LATER_SECTIONS = (12, 14, 15)
+
+    def test_triggers_moved_to_the_partitioned_table(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT tgname FROM pg_trigger
+                WHERE tgrelid = 'user_emissions'::regclass AND NOT tgisinternal ORDER BY 1
+            """)
+            self.assertEqual([row[0] for row in cur.fetchall()],
+                             ['on_user_emissions_counted', 'on_user_emissions_flagged',
+                              'on_user_emissions_sketched'])
+
+            cur.execute("SELECT COALESCE(SUM(count), 0) FROM emission_sketches")
+            sketched = cur.fetchone()[0]
+            cur.execute("""
+                INSERT INTO user_emissions (user_id, category, emissions, created_at)
+                VALUES (%s, 'energy', 7, NOW() - INTERVAL '1 year')
+                RETURNING id
+            """, (self.user_id,))
+            row_id = cur.fetchone()[0]
+            cur.execute("SELECT SUM(count) FROM emission_sketches")
+            self.assertEqual(cur.fetchone()[0], sketched + 1)
+
+            cur.execute("UPDATE user_emissions SET flagged = true WHERE id = %s", (row_id,))
+            cur.execute("SELECT SUM(count) FROM emission_sketches")
+            self.assertEqual(cur.fetchone()[0], sketched)
+
+    def test_users_still_cannot_flag_rows(self):
+        with self.conn.cursor() as cur:
+            cur.execute("GRANT USAGE ON SCHEMA public, auth TO authenticated")
+            cur.execute("SET ROLE authenticated")
+            try:
+                with self.assertRaises(psycopg2.errors.InsufficientPrivilege):
+                    cur.execute("UPDATE user_emissions SET flagged = false")
+            finally:
+                cur.execute("RESET ROLE")
+
+    def test_review_queue_uses_the_flagged_index(self):
+        plan = self.plan("SELECT * FROM user_emissions WHERE flagged ORDER BY created_at LIMIT 20")
+        indexes = {node.get('Index Name') for node in self.nodes(plan)}
+        self.assertIn('user_emissions_legacy_flagged_idx', indexes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from main.utils.session_cookie import COOKIE_NAME, cookie_script, parse_cookie
+
+
+class TestSessionCookie(unittest.TestCase):
+
+    def test_parse_finds_the_session_cookie(self):
+        header = f"theme=dark; {COOKIE_NAME}=abc-DEF_123; other=1"
+        self.assertEqual(parse_cookie(header), "abc-DEF_123")
+        self.assertIsNone(parse_cookie("theme=dark"))
+        self.assertIsNone(parse_cookie(f"{COOKIE_NAME}="))
+        self.assertIsNone(parse_cookie(""))
+
+    def test_script_sets_a_strict_cookie_that_expires_with_the_session(self):
+        script = cookie_script("abc-DEF_123", 3600)
+        self.assertIn(f'"{COOKIE_NAME}" + \'=\' + "abc-DEF_123"', script)
+        self.assertIn("Max-Age=3600; Path=/; SameSite=Strict", script)
+        self.assertIn("'; Secure'", script)
+
+    def test_script_without_token_deletes_the_cookie(self):
+        script = cookie_script(None, 3600)
+        self.assertIn('+ ""', script)
+        self.assertIn("Max-Age=0", script)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from main.utils.session_store import SessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tmp.name) / "users.db")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    is_active BOOLEAN DEFAULT 1
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE user_sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    session_token TEXT UNIQUE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at TIMESTAMP,
+                    is_active BOOLEAN DEFAULT 1
+                )
+            """)
+            conn.execute("INSERT INTO users (username) VALUES ('alice')")
+        self.clock = FakeClock()
+        self.store = SessionStore(self.db_path, session_ttl=3600, cache_ttl=60, clock=self.clock)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def session_rows(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("SELECT session_token FROM user_sessions").fetchall()
+
+    def test_validate_uses_cache(self):
+        token = self.store.create_session(1, 'alice')
+        for _ in range(3):
+            self.assertEqual(self.store.validate(token), 'alice')
+        self.assertEqual((self.store.hits, self.store.misses), (3, 0))
+        # Only a digest of the token is stored
+        self.assertNotEqual(self.session_rows()[0][0], token)
+
+    def test_other_worker_reads_from_database(self):
+        token = self.store.create_session(1, 'alice')
+        other = SessionStore(self.db_path, clock=self.clock)
+        self.assertEqual(other.validate(token), 'alice')
+        self.assertEqual(other.misses, 1)
+        self.assertIsNone(other.validate('not-a-token'))
+
+    def test_expiry_and_sweep(self):
+        token = self.store.create_session(1, 'alice')
+        self.clock.now += 3601
+        self.assertIsNone(self.store.validate(token))
+        self.assertEqual(self.store.sweep_expired(batch_size=1), 1)
+        self.assertEqual(self.session_rows(), [])
+
+    def test_revoke(self):
+        token = self.store.create_session(1, 'alice')
+        self.store.revoke(token)
+        self.assertIsNone(self.store.validate(token))
+        self.assertEqual(self.store.sweep_expired(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import importlib.util
+import os
+import unittest
+
+from main.utils.import_profile import (HEAVY_MODULES, ROOT, loaded_packages, parse_importtime,
+                                       profile_imports, script_imports, total_ms)
+
+# Milliseconds; generous enough for a slow CI runner, far below a pandas/plotly import
+CORE_BUDGET_MS = float(os.getenv('CORE_IMPORT_BUDGET_MS', '250'))
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '400'))
+
+CORE_MODULES = [
+    "import main.core.energy",
+    "import main.core.food",
+    "import main.core.transport",
+    "import main.utils.charts",
+    "import main.utils.emission_aggregates",
+    "import main.utils.quantile_sketch",
+    "import main.utils.validators",
+]
+
+PAGES = [
+    "streamlit_app.py",
+    "overview/home.py",
+    "categories/transport.py",
+    "categories/energy.py",
+    "categories/enhanced_food.py",
+    "categories/goals_tracking.py",
+    "results/enhanced_analytics.py",
+    "profile/user_profile.py",
+    "admin/admin_panel.py",
+]
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       500 |        500 |   yaml.error
+import time:       300 |        800 | yaml
+-- startup imports --
+import time:        98 |         98 |   pandas.util._tester
+import time:       326 |     256058 | pandas
+import time:       120 |        120 | main.core
+"""
+
+
+def app_dependencies_installed():
+    return all(importlib.util.find_spec(name) for name in ('streamlit', 'dotenv'))
+
+
+class TestImportProfile(unittest.TestCase):
+
+    def test_parse_importtime_after_marker(self):
+        timings = parse_importtime(SAMPLE)
+        self.assertEqual([t.module for t in timings], ['pandas.util._tester', 'pandas', 'main.core'])
+        self.assertEqual(timings[0].depth, 1)
+        self.assertEqual(timings[1].depth, 0)
+        self.assertAlmostEqual(total_ms(timings), 256.178)
+        self.assertEqual(set(loaded_packages(timings)), {'pandas'})
+
+    def test_script_imports_only_module_level(self):
+        statements = script_imports(ROOT / "results" / "enhanced_analytics.py")
+        self.assertIn("import streamlit as st", statements)
+        self.assertNotIn("import pandas as pd", statements)
+
+    def test_pages_defer_numpy_backed_modules(self):
+        # Runs without streamlit, unlike the budget check below
+        deferred = ["main.core.recommendations", "main.utils.forecasting", "main.utils.anomaly"]
+        for page in PAGES:
+            statements = script_imports(ROOT / page)
+            for module in deferred:
+                with self.subTest(page=page, module=module):
+                    self.assertFalse(any(module in statement for statement in statements))
+
+
+class TestStartupBudget(unittest.TestCase):
+
+    def assertLight(self, title, timings, budget_ms):
+        heavy = set(loaded_packages(timings)) & set(HEAVY_MODULES)
+        self.assertEqual(heavy, set(), f"{title} imports {', '.join(sorted(heavy))} at startup")
+        self.assertLess(total_ms(timings), budget_ms, f"{title} imports took {total_ms(timings):.0f}ms")
+
+    def test_core_modules_within_budget(self):
+        self.assertLight("main.core/main.utils", profile_imports(CORE_MODULES), CORE_BUDGET_MS)
+
+    @unittest.skipUnless(app_dependencies_installed(), "streamlit and python-dotenv not installed")
+    def test_pages_within_budget(self):
+        for page in PAGES:
+            with self.subTest(page=page):
+                timings = profile_imports(script_imports(ROOT / page), preload=['streamlit'])
+                self.assertLight(page, timings, STARTUP_BUDGET_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
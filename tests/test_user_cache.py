@@ -0,0 +1,61 @@
+import unittest
+
+from main.utils.user_cache import UserDataCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestUserDataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = UserDataCache(ttl=60, clock=self.clock)
+        self.loads = 0
+
+    def loader(self):
+        self.loads += 1
+        return {'monthly_target': 167}
+
+    def test_read_through_and_hit_rate(self):
+        for _ in range(4):
+            self.assertEqual(self.cache.get_or_load('u1', 'goals', self.loader), {'monthly_target': 167})
+        self.assertEqual(self.loads, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 0.75)
+
+    def test_ttl_expiry(self):
+        self.cache.get_or_load('u1', 'goals', self.loader)
+        self.clock.now = 61
+        self.cache.get_or_load('u1', 'goals', self.loader)
+        self.assertEqual(self.loads, 2)
+
+    def test_write_through(self):
+        self.cache.get_or_load('u1', 'goals', self.loader)
+        self.cache.set('u1', 'goals', {'monthly_target': 100})
+        self.assertEqual(self.cache.get_or_load('u1', 'goals', self.loader), {'monthly_target': 100})
+        self.assertEqual(self.loads, 1)
+
+    def test_invalidate_is_per_user(self):
+        self.cache.set('u1', 'goals', 1)
+        self.cache.set('u1', 'settings', 2)
+        self.cache.set('u2', 'goals', 3)
+        self.cache.invalidate('u1')
+        self.assertEqual(self.cache.peek('u1', 'goals'), (False, None))
+        self.assertEqual(self.cache.peek('u2', 'goals'), (True, 3))
+
+    def test_peek_stale(self):
+        self.cache.set('u1', 'goals', 1)
+        self.clock.now = 120
+        self.assertEqual(self.cache.peek('u1', 'goals'), (False, None))
+        self.assertEqual(self.cache.peek('u1', 'goals', allow_stale=True), (True, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import multiprocessing
+import tempfile
+import unittest
+from pathlib import Path
+
+from main.utils.user_log import UserLogStore, fcntl
+
+
+def register_users(log_path: str, prefix: str, count: int):
+    """Writer process for the concurrency test; compacts often."""
+    store = UserLogStore(log_path, legacy_path=None, compact_ratio=1.5, min_compact_records=5, fsync=False)
+    for i in range(count):
+        store.add(f'{prefix}{i}', {'n': i})
+        store.update(f'{prefix}{i}', {'n': i + 1})
+
+
+class TestUserLogStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.tmp.name) / "users.log"
+        self.legacy_path = Path(self.tmp.name) / "users.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_store(self, **kwargs):
+        kwargs.setdefault('fsync', False)
+        return UserLogStore(str(self.log_path), legacy_path=str(self.legacy_path), **kwargs)
+
+    def test_changes_are_appended_and_replayed(self):
+        store = self.make_store()
+        store.put('alice', {'email': 'a@example.com', 'last_login': None})
+        store.update('alice', {'last_login': '2024-01-01T00:00:00'})
+        store.put('bob', {'email': 'b@example.com'})
+        store.delete('bob')
+        self.assertEqual(len(self.log_path.read_text().splitlines()), 4)
+
+        restored = self.make_store()
+        self.assertEqual(restored.users, {'alice': {'email': 'a@example.com',
+                                                    'last_login': '2024-01-01T00:00:00'}})
+
+    def test_update_unknown_user(self):
+        self.assertFalse(self.make_store().update('nobody', {'x': 1}))
+
+    def test_torn_trailing_record_is_discarded(self):
+        store = self.make_store()
+        store.put('alice', {'email': 'a@example.com'})
+        with open(self.log_path, 'a') as f:
+            f.write('{"op":"set","user":"alice","data":{"ema')
+
+        restored = self.make_store()
+        self.assertEqual(restored.get('alice'), {'email': 'a@example.com'})
+        restored.update('alice', {'email': 'new@example.com'})
+        self.assertEqual(self.make_store().get('alice'), {'email': 'new@example.com'})
+
+    def test_compaction(self):
+        store = self.make_store(compact_ratio=2, min_compact_records=4)
+        store.put('alice', {'logins': 0})
+        for i in range(1, 10):
+            store.update('alice', {'logins': i})
+        self.assertLessEqual(len(self.log_path.read_text().splitlines()), 4)
+        self.assertEqual(self.make_store().get('alice'), {'logins': 9})
+
+    def test_legacy_json_is_imported(self):
+        self.legacy_path.write_text(json.dumps({'alice': {'email': 'a@example.com'}}))
+        store = self.make_store()
+        self.assertIn('alice', store)
+        self.assertTrue(self.log_path.exists())
+
+    def test_stores_see_each_others_changes(self):
+        first, second = self.make_store(), self.make_store()
+        first.put('alice', {'email': 'a@example.com'})
+        self.assertEqual(second.get('alice'), {'email': 'a@example.com'})
+        self.assertFalse(second.add('alice', {'email': 'other@example.com'}))
+
+        # Compaction keeps what the other store appended after its last read
+        second.put('bob', {'email': 'b@example.com'})
+        first.update('alice', {'email': 'new@example.com'})
+        first.compact()
+        self.assertEqual(second.get('bob'), {'email': 'b@example.com'})
+        self.assertEqual(second.get('alice'), {'email': 'new@example.com'})
+        second.delete('bob')
+        self.assertNotIn('bob', first)
+        self.assertEqual(self.make_store().users, {'alice': {'email': 'new@example.com'}})
+
+    @unittest.skipIf(fcntl is None, "needs fcntl for the inter-process lock")
+    def test_concurrent_processes_with_compaction(self):
+        context = multiprocessing.get_context('spawn')
+        writers = [context.Process(target=register_users, args=(str(self.log_path), prefix, 40))
+                   for prefix in ('a', 'b', 'c')]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(60)
+            self.assertEqual(writer.exitcode, 0)
+
+        users = self.make_store().users
+        self.assertEqual(len(users), 120)
+        self.assertEqual({data['n'] for data in users.values()}, set(range(1, 41)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from main.utils.write_behind import WriteBehindQueue, PENDING, FAILED, SAVED
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "queue.json"
+        self.written = []
+        self.fail = False
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sink(self, rows):
+        if self.fail:
+            raise ConnectionError("backend down")
+        self.written.append(list(rows))
+
+    def make_queue(self, **kwargs):
+        kwargs.setdefault('autostart', False)
+        kwargs.setdefault('backoff_base', 0)
+        return WriteBehindQueue(self.sink, storage_path=str(self.path), **kwargs)
+
+    def test_flush_writes_in_batches(self):
+        queue = self.make_queue(max_batch_size=2)
+        ids = [queue.enqueue({'n': i}, owner='u1') for i in range(5)]
+        self.assertEqual(queue.summary('u1')['pending'], 5)
+
+        self.assertEqual(queue.flush(), 5)
+        self.assertEqual([len(batch) for batch in self.written], [2, 2, 1])
+        self.assertEqual(queue.status(ids[0]), SAVED)
+        self.assertEqual(queue.summary()['pending'], 0)
+
+    def test_queue_survives_restart(self):
+        queue = self.make_queue()
+        entry_id = queue.enqueue({'n': 1}, owner='u1')
+
+        restored = self.make_queue()
+        self.assertEqual(restored.status(entry_id), PENDING)
+        restored.flush()
+        self.assertEqual(self.written, [[{'n': 1}]])
+
+    def test_retries_then_marks_failed(self):
+        queue = self.make_queue(max_retries=3)
+        entry_id = queue.enqueue({'n': 1}, owner='u1')
+
+        self.fail = True
+        for _ in range(3):
+            queue.flush()
+        self.assertEqual(queue.status(entry_id), FAILED)
+        self.assertEqual(queue.summary('u1')['failed'], 1)
+        self.assertIn("backend down", queue.summary('u1')['last_error'])
+
+        self.fail = False
+        self.assertEqual(queue.retry_failed('u1'), 1)
+        queue.flush()
+        self.assertEqual(queue.status(entry_id), SAVED)
+
+    def test_summary_is_per_owner(self):
+        queue = self.make_queue()
+        queue.enqueue({'n': 1}, owner='u1')
+        queue.enqueue({'n': 2}, owner='u2')
+        self.assertEqual(queue.summary('u1')['pending'], 1)
+        self.assertEqual(queue.summary()['pending'], 2)
+
+    def test_enqueue_appends_to_journal(self):
+        queue = self.make_queue()
+        for i in range(3):
+            queue.enqueue({'n': i})
+            self.assertEqual(len(self.path.read_text().splitlines()), i + 1)
+        first = json.loads(self.path.read_text().splitlines()[0])
+        self.assertEqual(first['put']['record'], {'n': 0})
+
+        queue.flush()
+        self.assertEqual(self.path.read_text(), '')
+
+    def test_journal_replays_failures_and_discards(self):
+        queue = self.make_queue(max_retries=1)
+        failed = queue.enqueue({'n': 1}, owner='u1')
+        self.fail = True
+        queue.flush()
+        self.fail = False
+        kept = queue.enqueue({'n': 2}, owner='u2')
+        dropped = queue.enqueue({'n': 3}, owner='u3')
+        self.fail = True
+        queue.flush()
+        queue.discard_failed('u3')
+        # A crash mid-append leaves a partial last line
+        with open(self.path, 'a') as f:
+            f.write('{"put": {"id"')
+
+        restored = self.make_queue()
+        self.assertEqual(restored.status(failed), FAILED)
+        self.assertEqual(restored.status(kept), FAILED)
+        self.assertIsNone(restored.status(dropped))
+        self.assertEqual(len(self.path.read_text().splitlines()), 2)
+
+    def test_loads_queue_files_from_before_the_journal(self):
+        self.path.write_text(json.dumps([{'id': 'old', 'owner': 'u1', 'record': {'n': 1}, 'status': PENDING,
+                                          'attempts': 0, 'next_attempt_at': 0.0, 'error': None,
+                                          'queued_at': 0.0}]))
+        queue = self.make_queue()
+        self.assertEqual(queue.status('old'), PENDING)
+        queue.flush()
+        self.assertEqual(self.written, [[{'n': 1}]])
+
+    def test_background_thread_flushes(self):
+        queue = self.make_queue(autostart=True, flush_interval=0.05)
+        queue.enqueue({'n': 1})
+        queue.close()
+        self.assertEqual(self.written, [[{'n': 1}]])
+
+
+if __name__ == '__main__':
+    unittest.main()